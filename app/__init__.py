@@ -11,7 +11,6 @@ matplotlib.use('Agg')  # Utiliser le backend Agg pour éviter les problèmes ave
 
 from flask import Flask, request
 from dotenv import load_dotenv
-from app.config import config
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -19,6 +18,10 @@ load_dotenv()
 
 def create_app(config_name=None):
     """Crée et configure l'application Flask."""
+    # Import ici : les classes de configuration valident l'environnement de
+    # production à l'import, ce qui ne doit pas empêcher d'importer app.services
+    # hors de Flask (front Streamlit, scripts)
+    from app.config import config
     
     if config_name is None:
         # Par défaut, on part en mode production pour éviter d'exposer le debugger
@@ -77,8 +80,13 @@ def create_app(config_name=None):
             app.logger.debug(f"Initialisation des localisations (peut être ignorée si SQLAlchemy est utilisé): {e}")
     
     # Initialiser les extensions
-    from app.extensions import db, cache, login_manager, migrate
+    from app.extensions import db, cache, login_manager, migrate, executor
     db.init_app(app)
+    executor.init_app(app)
+    
+    # Stockage des jobs en arrière-plan (repli sur logs/jobs/ si Redis est indisponible)
+    from app.services.job_store import configure_job_store, job_store_settings
+    configure_job_store(job_store_settings(app.config))
     
     # Initialiser Flask-Migrate si disponible
     if migrate:
@@ -108,6 +116,10 @@ def create_app(config_name=None):
         app.config['CACHE_TYPE'] = 'SimpleCache'
         cache.init_app(app)
     
+    # Avec Redis, DataFrames du cache en Arrow IPC compressé (grosses valeurs sur disque)
+    from app.services.cache_serializer import install_frame_serializer
+    install_frame_serializer(app.extensions['cache'][cache], app.config)
+    
     # Initialiser le service API boursière avec le cache
     try:
         from app.services.stock_api_service import get_stock_api_service
@@ -119,6 +131,17 @@ def create_app(config_name=None):
         app.logger.warning(f"Échec d'initialisation du service API boursière: {e}")
         app.stock_api_service = None
     
+    # Registre des modèles ML (un par worker, partagé par les routes et les jobs)
+    from app.services.model_registry import get_model_registry
+    app.model_registry = get_model_registry(
+        app.config.get('MODEL_REGISTRY_SIZE'),
+        mmap_mode=app.config.get('MODEL_MMAP_MODE')
+    )
+    
+    # Cache des DataFrames chargés (un par worker, partagé par l'upload, les tests et les prévisions)
+    from app.services.dataframe_cache import get_dataframe_cache
+    app.dataframe_cache = get_dataframe_cache(app.config.get('DATAFRAME_CACHE_MB', 256) * 1024 * 1024)
+    
     # Configurer les headers de cache pour les assets statiques
     @app.after_request
     def set_cache_headers(response):
@@ -165,6 +188,10 @@ def create_app(config_name=None):
     # except Exception as e:
     #     app.logger.warning(f"Impossible d'importer les events SocketIO: {e}")
     
+    # Préchargement des modèles avant le fork des workers (gunicorn --preload)
+    if app.config.get('MODEL_PRELOAD'):
+        preload_models(app)
+    
     # Log des informations
     print(f"Application initialisée en mode {config_name}")
     print(f"Dossier templates: {app.template_folder}")
@@ -175,6 +202,30 @@ def create_app(config_name=None):
     return app
 
 
+def preload_models(app):
+    """
+    Charge tous les modèles ML dans le processus courant.
+    
+    Appelé depuis create_app quand MODEL_PRELOAD est actif : avec `gunicorn --preload`,
+    les workers héritent des modèles déjà chargés au lieu d'en garder chacun une copie.
+    """
+    errors = app.model_registry.preload(app.config['MODELS_DIR'])
+    stats = app.model_registry.stats()
+    app.logger.info(
+        f"Modèles préchargés: {stats['preloaded']} "
+        f"(mmap: {stats['mmap_mode'] or 'non'}, erreurs: {len(errors)})"
+    )
+    
+    # Les connexions ouvertes par le processus maître ne doivent pas être partagées
+    # avec les workers après le fork : chacun ouvrira son propre pool
+    from app.extensions import db
+    try:
+        with app.app_context():
+            db.engine.dispose()
+    except Exception as e:
+        app.logger.debug(f"Fermeture du pool de connexions avant fork: {e}")
+
+
 def configure_logging(app):
     """Configure le logging structuré pour l'application."""
     log_level = getattr(logging, app.config.get('LOG_LEVEL', 'INFO'), logging.INFO)
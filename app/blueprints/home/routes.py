@@ -52,6 +52,51 @@ def health():
         health_status['database'] = 'error'
         health_status['database_error'] = str(e)
     
+    # Compteurs du registre de modèles ML (informatif, n'affecte pas le statut)
+    try:
+        from app.services.model_registry import get_model_registry
+        health_status['models'] = get_model_registry().stats()
+    except Exception as e:
+        health_status['models'] = {'error': str(e)}
+    
+    # Cache des DataFrames chargés (informatif)
+    try:
+        from app.services.dataframe_cache import get_dataframe_cache
+        health_status['dataframes'] = get_dataframe_cache().stats()
+    except Exception as e:
+        health_status['dataframes'] = {'error': str(e)}
+    
+    # Sérialisation des DataFrames du cache Redis (informatif, absent hors Redis)
+    try:
+        from app.services.cache_serializer import get_frame_serializer
+        serializer = get_frame_serializer(cache)
+        if serializer is not None:
+            health_status['cache_serializer'] = serializer.stats()
+    except Exception as e:
+        health_status['cache_serializer'] = {'error': str(e)}
+    
+    # File des jobs en arrière-plan (informatif)
+    try:
+        from app.extensions import executor
+        health_status['jobs'] = executor.stats()
+    except Exception as e:
+        health_status['jobs'] = {'error': str(e)}
+    
+    # Cache des résultats de prévision (informatif)
+    try:
+        from app.services.forecast_cache import get_forecast_cache
+        health_status['forecast_cache'] = get_forecast_cache().stats()
+    except Exception as e:
+        health_status['forecast_cache'] = {'error': str(e)}
+    
+    # Service des APIs boursières : appels regroupés (informatif)
+    try:
+        from flask import current_app
+        if current_app.stock_api_service is not None:
+            health_status['stock_api'] = current_app.stock_api_service.stats()
+    except Exception as e:
+        health_status['stock_api'] = {'error': str(e)}
+    
     # Déterminer le statut global
     if health_status['cache'] == 'error' or health_status['database'] == 'error':
         health_status['status'] = 'degraded'
@@ -1,13 +1,20 @@
-from flask import Blueprint, jsonify, send_file
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
 import os
+import json
+import time
 from app import utils
+from app.extensions import executor
+from app.services.job_store import get_job_store
 
 bp = Blueprint('jobs', __name__)
 
+# Intervalle maximal entre deux messages d'un flux SSE (secondes)
+SSE_HEARTBEAT = 15
+
 
 @bp.route('/status/<jobid>')
 def job_status(jobid):
-    job = utils.read_job(jobid)
+    job = utils.read_job_status(jobid)
     if job is None:
         return jsonify({'status': 'not_found'}), 404
     return jsonify({'status': job.get('status'), 'error': job.get('error')})
@@ -21,3 +28,67 @@ def job_result(jobid):
     if job.get('status') != 'done':
         return jsonify({'status': job.get('status')}), 202
     return jsonify({'status': 'done', 'result': job.get('result')})
+
+
+@bp.route('/stats')
+def job_stats():
+    """Longueur de la file et jobs en cours de l'exécuteur de ce worker."""
+    return jsonify(executor.stats())
+
+
+def _sse(event, data):
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@bp.route('/events/<jobid>')
+def job_events(jobid):
+    """
+    Flux SSE de l'avancement d'un job : événements `progress` puis `done`
+    (avec le résultat, sauf `?result=0`) ou `failed`.
+
+    Le flux est fermé après JOB_EVENTS_TIMEOUT secondes ; EventSource se
+    reconnecte alors automatiquement. /jobs/status reste disponible en repli.
+    """
+    store = get_job_store()
+    status = store.get_status(jobid)
+    if status is None:
+        return jsonify({'status': 'not_found'}), 404
+
+    include_result = request.args.get('result', '1') != '0'
+    timeout = float(current_app.config.get('JOB_EVENTS_TIMEOUT', 60))
+
+    def stream(status):
+        yield "retry: 2000\n\n"
+        deadline = time.monotonic() + timeout
+        version = None
+        while True:
+            if status is None:
+                yield _sse('failed', {'status': 'not_found', 'error': "Job introuvable."})
+                return
+            state = status.get('status')
+            if state == 'done':
+                payload = {'status': 'done', 'progress': status.get('progress')}
+                if include_result:
+                    payload['result'] = store.get_result(jobid)
+                yield _sse('done', payload)
+                return
+            if state == 'failed':
+                yield _sse('failed', {'status': 'failed', 'error': status.get('error')})
+                return
+            if store.version(status) != version:
+                version = store.version(status)
+                yield _sse('progress', {'status': state, 'progress': status.get('progress')})
+            else:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": keep-alive\n\n"
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            status = store.wait_for_change(jobid, version, timeout=min(SSE_HEARTBEAT, remaining))
+
+    return Response(stream(status), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,14 +1,23 @@
-# Minimal ML pipeline skeleton
-import joblib
-import os
+"""
+Pipeline de prévision ML.
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'models_ml', 'model_final.joblib')
+Les modèles sont chargés par le registre (`app.services.model_registry`) et
+les prévisions calculées par le moteur unique (`app.services.forecast_engine`),
+partagé par la route, les jobs et la page Streamlit.
+"""
+from app.services.forecast_engine import ForecastEngine, ForecastResult, forecast
+from app.services.model_registry import get_model_registry
+
+
+def load_model(model_path):
+    """Retourne le LoadedModel (model, feature_cols, metadata) d'un artifact `.joblib`."""
+    return get_model_registry().get(model_path)
 
-def load_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
 
 def predict(model, X):
     # X expected as a pandas DataFrame or 2D array
-    return model.predict(X)
+    estimator = model.model if hasattr(model, 'feature_cols') else model
+    return estimator.predict(X)
+
+
+__all__ = ['ForecastEngine', 'ForecastResult', 'forecast', 'load_model', 'predict']
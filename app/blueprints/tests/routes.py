@@ -12,6 +12,8 @@ from app.utils import (
     allowed_file, load_dataframe, validate_test_requirements, 
     generate_plot_image, add_to_history
 )
+from app.services.dataset_profile import current_file_profile, get_file_profile
+from app.services.upload_store import current_upload_path
 import os
 
 bp = Blueprint('tests', __name__)
@@ -23,7 +25,20 @@ def index():
     return render_template('tests.html',
                            current_file=session.get('current_file'),
                            file_columns=session.get('file_columns', []),
-                           file_dtypes=session.get('file_dtypes', {}))
+                           file_dtypes=session.get('file_dtypes', {}),
+                           file_profile=current_file_profile())
+
+
+def _normal_parameters(filepath, column_data):
+    """
+    Moyenne et écart-type de la colonne, repris du profil calculé à l'upload
+    lorsqu'il porte sur exactement les mêmes valeurs.
+    """
+    column_stats = (get_file_profile(filepath) or {}).get('columns', {}).get(str(column_data.name)) or {}
+    if (column_stats.get('count') == len(column_data)
+            and column_stats.get('mean') is not None and column_stats.get('std') is not None):
+        return column_stats['mean'], column_stats['std']
+    return column_data.mean(), column_data.std()
 
 
 @bp.route('/run_test', methods=['POST'])
@@ -42,10 +57,10 @@ def run_test():
     if not is_valid:
         return render_template('resultats.html', error=error_msg)
 
-    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    filepath = current_upload_path(filename)
 
     try:
-        df = load_dataframe(filepath)
+        df = load_dataframe(filepath, columns=selected_columns)
         data = df[selected_columns].apply(pd.to_numeric, errors='coerce').dropna()
 
         if data.empty:
@@ -59,9 +74,8 @@ def run_test():
             'kruskal': lambda: kruskal(*[data[col].values for col in selected_columns]),
             'spearman': lambda: stats.spearmanr(data[selected_columns[0]], data[selected_columns[1]]),
             'friedman': lambda: stats.friedmanchisquare(*[data[col].values for col in selected_columns]),
-            'kolmogorov_smirnov': lambda: kstest(data[selected_columns[0]], 'norm', 
-                                                 args=(data[selected_columns[0]].mean(), 
-                                                       data[selected_columns[0]].std())),
+            'kolmogorov_smirnov': lambda: kstest(data[selected_columns[0]], 'norm',
+                                                 args=_normal_parameters(filepath, data[selected_columns[0]])),
             'shapiro_wilk': lambda: shapiro(data[selected_columns[0]])
         }
 
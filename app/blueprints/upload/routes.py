@@ -1,14 +1,14 @@
 """
 Blueprint pour la gestion de l'upload de fichiers.
 """
+import io
+import math
 import mimetypes
 import os
 import re
-import shutil
 import tempfile
-import time
-from collections import defaultdict
-from typing import Optional
+import uuid
+from typing import Any, Dict, Optional
 
 # ClamAV est optionnel - peut ne pas être installé
 try:
@@ -21,17 +21,29 @@ except ImportError:
 import pandas as pd
 import requests
 import yfinance as yf
-from flask import Blueprint, request, session, jsonify, current_app
+from flask import Blueprint, request, session, jsonify, current_app, url_for
+from flask_login import current_user
 from werkzeug.utils import secure_filename
-from app.extensions import cache
+from app.extensions import cache, executor
 
+from app import utils as _utils
 from app.utils import allowed_file, load_dataframe
+from app.services.file_format import load_csv
+from app.services.job_executor import JobQueueFull, JobExecutorUnavailable
+from app.services.upload_stream import (
+    DEFAULT_CHUNK_SIZE, UploadError, convert_upload, get_chunked_uploads
+)
+from app.services.upload_store import (
+    accept_upload, dataframe_summary, file_extension, file_sha256, get_upload_store, preview_rows,
+    reuse_upload, save_and_hash
+)
+from app.services.provider_http import provider_get
+from app.services.rate_limiter import get_rate_limiter
 from app.services.stock_api_service import get_stock_api_service, StockAPIError, RateLimitExceeded
 
 bp = Blueprint('upload', __name__)
 
-# Rate limiting pour les API externes (par session/IP)
-_api_rate_limit = defaultdict(list)
+# Rate limiting pour les API externes (par session/IP, seau partagé par les workers)
 _RATE_LIMIT_WINDOW = 60  # secondes
 _RATE_LIMIT_MAX_REQUESTS = 10  # requêtes par fenêtre
 
@@ -46,25 +58,107 @@ def handle_upload_error(e):
     }), 500
 
 
-def _set_session_from_df(df: pd.DataFrame, filename: str):
+def _looks_like_csv_or_text(head: bytes) -> bool:
+    # autorise ASCII/UTF-8 sans NULL
+    return b'\x00' not in head
+
+
+def _looks_like_xlsx(head: bytes) -> bool:
+    # XLSX = ZIP donc signature PK
+    return head.startswith(b'PK\x03\x04')
+
+
+def _current_username() -> Optional[str]:
+    try:
+        return current_user.username if current_user.is_authenticated else None
+    except Exception:
+        return None
+
+
+def _accept_upload(filepath: str, df: pd.DataFrame, sha256: Optional[str] = None) -> Optional[dict]:
+    """
+    Enregistre le fichier accepté (best-effort) : `data_files`, profil, copie
+    Parquet (si UPLOAD_COLUMNAR_COPY) et résumé réutilisé par les uploads identiques.
+
+    `df` doit être le DataFrame tel que relu depuis `filepath`.
+
+    Returns:
+        Résumé du fichier (colonnes, aperçu, profil...), None en cas d'échec
+    """
+    try:
+        return accept_upload(get_upload_store(current_app.config), filepath, df, sha256=sha256,
+                             user=_current_username(),
+                             columnar_copy=current_app.config.get('UPLOAD_COLUMNAR_COPY', True))
+    except Exception as e:
+        current_app.logger.warning(f"Enregistrement incomplet pour {filepath}: {e}")
+        return None
+
+
+def _upload_response(df: pd.DataFrame, filename: str, summary: Optional[dict], sha256: str):
+    """Réponse de l'upload, à partir du résumé enregistré s'il existe."""
+    if summary is not None:
+        response = _set_session_from_summary(summary, filename, sha256)
+    else:
+        response = _set_session_from_df(df, filename, sha256)
+    response['sha256'] = sha256
+    return response
+
+
+def _reuse_upload(filename: str, sha256: str, summary: dict):
+    """Réponse pour un contenu déjà reçu : ni analyse, ni lecture, ni conversion."""
+    reuse_upload(get_upload_store(current_app.config), filename, sha256, summary, user=_current_username())
+    current_app.logger.info(f"Upload {filename}: contenu déjà connu ({sha256[:12]})")
+    response = _set_session_from_summary(summary, filename, sha256)
+    response.update({'sha256': sha256, 'deduplicated': True})
+    return response
+
+
+def _remove_upload(filepath: Optional[str]):
+    """Supprime un fichier rejeté (et son contenu s'il n'a jamais été accepté)."""
+    if filepath and os.path.lexists(filepath):
+        try:
+            get_upload_store(current_app.config).remove(filepath)
+        except Exception:
+            pass
+
+
+def _set_session_from_df(df: pd.DataFrame, filename: str, sha256: Optional[str] = None):
     """Stocke les infos fichier dans la session et prépare la réponse JSON."""
     try:
-        # Convertir les colonnes et les dtypes en types JSON-serializables (clés string)
-        columns = [str(c) for c in df.columns.tolist()]
-        preview = df.head(5).fillna('').astype(str).values.tolist()
-        raw_dtypes = df.dtypes.apply(lambda x: x.name).to_dict()
-        dtypes = {str(k): v for k, v in raw_dtypes.items()}
+        summary = dataframe_summary(df)
+    except Exception as e:
+        current_app.logger.exception(f"Erreur lors de la préparation de l'aperçu: {e}")
+        return {
+            'success': True,
+            'filename': filename,
+            'columns': df.columns.tolist(),
+            'preview': preview_rows(df),
+            'dtypes': df.dtypes.apply(lambda x: x.name).to_dict(),
+            'warning': 'Session non sauvegardée'
+        }
+    return _set_session_from_summary(summary, filename, sha256)
+
+
+def _set_session_from_summary(summary: dict, filename: str, sha256: Optional[str] = None):
+    """
+    Stocke colonnes et types dans la session ; réponse JSON de l'upload.
 
+    L'empreinte du contenu est gardée avec le nom : un autre utilisateur peut
+    ensuite associer le même nom à un autre contenu (voir `current_upload_path`).
+    """
+    columns, preview, dtypes = summary['columns'], summary['preview'], summary['dtypes']
+    try:
         # Vérifier que la session est disponible
         if not hasattr(session, 'get'):
             current_app.logger.warning("Session Flask non disponible")
         
         session['current_file'] = str(filename)
+        session['current_file_sha256'] = sha256
         session['file_columns'] = columns
         session['file_dtypes'] = dtypes
         session.modified = True  # S'assurer que la session est marquée comme modifiée
 
-        return {
+        response = {
             'success': True,
             'filename': filename,
             'columns': columns,
@@ -74,14 +168,20 @@ def _set_session_from_df(df: pd.DataFrame, filename: str):
     except Exception as e:
         current_app.logger.exception(f"Erreur lors de la sauvegarde en session: {e}")
         # Retourner quand même les données même si la session échoue
-        return {
+        response = {
             'success': True,
             'filename': filename,
-            'columns': df.columns.tolist(),
-            'preview': df.head(5).fillna('').astype(str).values.tolist(),
-            'dtypes': df.dtypes.apply(lambda x: x.name).to_dict(),
+            'columns': columns,
+            'preview': preview,
+            'dtypes': dtypes,
             'warning': 'Session non sauvegardée'
         }
+    # Occupation mémoire du DataFrame chargé (avant/après compaction des types)
+    # et profil calculé à l'upload
+    for key in ('memory', 'profile'):
+        if key in summary:
+            response[key] = summary[key]
+    return response
 
 
 @bp.route('/upload_file', methods=['POST'])
@@ -115,8 +215,9 @@ def upload_file():
         # Enregistrer dans un fichier temporaire pour inspection
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
-                file.save(tmp.name)
                 tmp_path = tmp.name
+            # Empreinte calculée pendant l'écriture (stockage adressé par contenu)
+            sha256, _ = save_and_hash(file.stream, tmp_path)
         except Exception as e:
             current_app.logger.error(f"Erreur sauvegarde fichier temporaire: {e}")
             return jsonify({'success': False, 'message': f"Erreur lors de la sauvegarde du fichier: {str(e)}"}), 500
@@ -131,14 +232,6 @@ def upload_file():
         provided_mime = (file.mimetype or '').split(';')[0].strip()
         guessed_mime, _ = mimetypes.guess_type(filename)
 
-        def looks_like_csv_or_text(head: bytes) -> bool:
-            # autorise ASCII/UTF-8 sans NULL
-            return b'\x00' not in head
-
-        def looks_like_xlsx(head: bytes) -> bool:
-            # XLSX = ZIP donc signature PK
-            return head.startswith(b'PK\x03\x04')
-
         try:
             with open(tmp_path, 'rb') as fh:
                 head = fh.read(8)
@@ -151,7 +244,7 @@ def upload_file():
                     pass
             return jsonify({'success': False, 'message': f"Erreur lors de la lecture du fichier: {str(e)}"}), 500
 
-        signature_ok = looks_like_csv_or_text(head) or looks_like_xlsx(head)
+        signature_ok = _looks_like_csv_or_text(head) or _looks_like_xlsx(head)
         mime_ok = (
             (provided_mime in allowed_mimes if provided_mime else True)
             and (guessed_mime in allowed_mimes if guessed_mime else True)
@@ -165,6 +258,14 @@ def upload_file():
                     pass
             return jsonify({'success': False, 'message': 'Type de fichier/MIME non autorisé'}), 400
 
+        # Contenu déjà accepté (sous ce nom ou un autre) : réutilisé tel quel
+        store = get_upload_store(current_app.config)
+        summary = store.lookup(sha256, file_extension(filename))
+        if summary is not None:
+            os.remove(tmp_path)
+            tmp_path = None
+            return jsonify(_reuse_upload(filename, sha256, summary))
+
         # Antivirus ClamAV (si disponible)
         def scan_with_clamav(path: str):
             if not CLAMAV_AVAILABLE or clamd is None:
@@ -193,19 +294,12 @@ def upload_file():
                     pass
             return jsonify({'success': False, 'message': f'Fichier rejeté (AV: {av_status})'}), 400
 
-        # Déplacer le fichier validé vers l'emplacement final
-        # Utiliser shutil.move() au lieu de os.replace() pour gérer les déplacements
-        # entre différents lecteurs (Windows)
+        # Ranger le fichier validé sous son empreinte, puis y faire pointer son nom
+        # (shutil.move dans ingest pour gérer les déplacements entre lecteurs sous Windows)
         try:
-            # Si le fichier de destination existe déjà, le supprimer d'abord
-            if os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except Exception as e:
-                    current_app.logger.warning(f"Impossible de supprimer le fichier existant {filepath}: {e}")
-            
-            shutil.move(tmp_path, filepath)
+            object_path = store.ingest(tmp_path, sha256, file_extension(filename))
             tmp_path = None  # Marquer comme déplacé pour éviter la suppression
+            filepath = store.link(filename, object_path)
         except Exception as e:
             current_app.logger.error(f"Erreur déplacement fichier: {e}")
             if tmp_path and os.path.exists(tmp_path):
@@ -219,37 +313,23 @@ def upload_file():
         try:
             df = load_dataframe(filepath)
             if df is None or df.empty:
-                if filepath and os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass
+                _remove_upload(filepath)
                 return jsonify({'success': False, 'message': 'Le fichier est vide ou ne contient pas de données valides'}), 400
             
+            summary = _accept_upload(filepath, df, sha256)
+
             # Stocker dans la session et retourner la réponse
-            return jsonify(_set_session_from_df(df, filename))
+            return jsonify(_upload_response(df, filename, summary, sha256))
 
         except pd.errors.EmptyDataError:
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+            _remove_upload(filepath)
             return jsonify({'success': False, 'message': 'Le fichier est vide'}), 400
         except pd.errors.ParserError as e:
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+            _remove_upload(filepath)
             current_app.logger.error(f"Erreur parsing fichier: {e}")
             return jsonify({'success': False, 'message': f"Erreur de format du fichier: {str(e)}"}), 400
         except Exception as e:
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+            _remove_upload(filepath)
             current_app.logger.exception(f"Erreur chargement DataFrame: {e}")
             return jsonify({'success': False, 'message': f"Erreur de lecture: {str(e)}"}), 500
 
@@ -260,19 +340,162 @@ def upload_file():
                 os.remove(tmp_path)
             except:
                 pass
-        if filepath and os.path.exists(filepath):
-            try:
-                os.remove(filepath)
-            except:
-                pass
+        _remove_upload(filepath)
         current_app.logger.exception(f"Erreur inattendue lors de l'upload: {e}")
         return jsonify({'success': False, 'message': f"Erreur serveur interne: {str(e)}"}), 500
 
 
+def _chunked_uploads():
+    return get_chunked_uploads(current_app.config)
+
+
+def _upload_error(e: UploadError):
+    payload = {'success': False, 'message': str(e)}
+    if e.offset is not None:
+        payload['offset'] = e.offset
+    return jsonify(payload), e.status
+
+
+def _preview_dataframe(filepath: str) -> pd.DataFrame:
+    """Premières lignes du fichier (UPLOAD_PREVIEW_ROWS), sans lecture complète."""
+    nrows = int(current_app.config.get('UPLOAD_PREVIEW_ROWS', 1000))
+    if filepath.endswith('.csv'):
+        return load_csv(filepath, nrows=nrows)
+    return pd.read_excel(filepath, nrows=nrows)
+
+
+@bp.route('/upload/chunked', methods=['POST'])
+def chunked_upload_start():
+    """Ouvre un upload par morceaux (fichiers plus gros que MAX_CONTENT_LENGTH)."""
+    payload = request.get_json(silent=True) or {}
+    filename = secure_filename(str(payload.get('filename') or ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'success': False, 'message': 'Type de fichier non autorisé'}), 400
+    try:
+        total_size = int(payload['size']) if payload.get('size') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Taille invalide'}), 400
+
+    try:
+        info = _chunked_uploads().start(filename, total_size)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({
+        'success': True,
+        'upload_id': info['upload_id'],
+        'offset': 0,
+        'chunk_size': int(current_app.config.get('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)),
+        'upload_url': url_for('upload.chunked_upload_chunk', upload_id=info['upload_id']),
+        'complete_url': url_for('upload.chunked_upload_complete', upload_id=info['upload_id']),
+    }), 201
+
+
+@bp.route('/upload/chunked/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """Offset à partir duquel reprendre un upload interrompu."""
+    try:
+        info = _chunked_uploads().status(upload_id)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'success': True, 'upload_id': upload_id, 'offset': info['offset'],
+                    'size': info.get('total_size')})
+
+
+@bp.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def chunked_upload_chunk(upload_id):
+    """Reçoit un morceau (corps brut) à la position `?offset=`."""
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Paramètre offset manquant'}), 400
+    try:
+        new_offset = _chunked_uploads().append(upload_id, offset, request.stream)
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({'success': True, 'offset': new_offset})
+
+
+@bp.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+def chunked_upload_abort(upload_id):
+    """Abandonne un upload par morceaux."""
+    _chunked_uploads().discard(upload_id)
+    return jsonify({'success': True})
+
+
+@bp.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+def chunked_upload_complete(upload_id):
+    """
+    Termine l'upload : contrôles, déplacement, aperçu sur les premières lignes.
+
+    La lecture complète (format, copie colonnaire) est faite par un job en
+    arrière-plan dont l'état est suivi via /jobs/.
+    """
+    payload = request.get_json(silent=True) or {}
+    uploads = _chunked_uploads()
+    try:
+        info = uploads.complete(upload_id, payload.get('sha256'))
+    except UploadError as e:
+        return _upload_error(e)
+
+    try:
+        with open(info['path'], 'rb') as fh:
+            head = fh.read(8)
+        if not (_looks_like_csv_or_text(head) or _looks_like_xlsx(head)):
+            uploads.discard(upload_id)
+            return jsonify({'success': False, 'message': 'Type de fichier/MIME non autorisé'}), 400
+        if not info['clean']:
+            uploads.discard(upload_id)
+            return jsonify({'success': False, 'message': f"Fichier rejeté (AV: {info['av_status']})"}), 400
+
+        filename = info['filename']
+        store = get_upload_store(current_app.config)
+        summary = store.lookup(info['sha256'], file_extension(filename))
+        if summary is not None:
+            # Contenu déjà accepté : ni aperçu ni conversion
+            uploads.discard(upload_id)
+            response = _reuse_upload(filename, info['sha256'], summary)
+            response.update({'size': info['size'], 'av_status': info['av_status'], 'conversion': None})
+            return jsonify(response)
+        filepath = store.link(filename, store.ingest(info['path'], info['sha256'], file_extension(filename)))
+        uploads.discard(upload_id)
+    except Exception as e:
+        uploads.discard(upload_id)
+        current_app.logger.exception(f"Erreur finalisation upload {upload_id}: {e}")
+        return jsonify({'success': False, 'message': f"Erreur lors du déplacement du fichier: {str(e)}"}), 500
+
+    try:
+        preview = _preview_dataframe(filepath)
+    except Exception as e:
+        _remove_upload(filepath)
+        return jsonify({'success': False, 'message': f"Erreur de lecture: {str(e)}"}), 400
+    if preview.empty:
+        _remove_upload(filepath)
+        return jsonify({'success': False, 'message': 'Le fichier est vide ou ne contient pas de données valides'}), 400
+
+    response = _set_session_from_df(preview, filename, info['sha256'])
+    response.update({'size': info['size'], 'sha256': info['sha256'], 'av_status': info['av_status']})
+
+    jobid = str(uuid.uuid4())
+    _utils.write_job_pending(jobid, {'filename': filename, 'kind': 'upload_conversion'})
+    try:
+        executor.submit_job(jobid, convert_upload, filepath, info['sha256'])
+        response['conversion'] = {
+            'jobid': jobid,
+            'poll_url': url_for('jobs.job_status', jobid=jobid),
+            'events_url': url_for('jobs.job_events', jobid=jobid),
+        }
+    except (JobQueueFull, JobExecutorUnavailable) as e:
+        # Sans conversion, load_dataframe relira simplement l'original
+        _utils.delete_job(jobid)
+        current_app.logger.warning(f"Conversion de {filename} non planifiée: {e}")
+        response['conversion'] = None
+    return jsonify(response)
+
+
 @bp.route("/clear_session_file", methods=["POST"])
 def clear_session_file():
     """Efface les données du fichier en session."""
-    for key in ['current_file', 'file_columns', 'file_dtypes']:
+    for key in ['current_file', 'current_file_sha256', 'file_columns', 'file_dtypes']:
         session.pop(key, None)
     return jsonify({'success': True})
 
@@ -297,20 +520,16 @@ def _validate_interval_alpha_vantage(interval: Optional[str]) -> bool:
     return interval is None or interval in valid_intervals
 
 
-def _check_rate_limit(identifier: str) -> bool:
-    """Vérifie le rate limiting pour un identifiant (session/IP)."""
-    now = time.time()
-    # Nettoyer les anciennes entrées
-    _api_rate_limit[identifier] = [
-        ts for ts in _api_rate_limit[identifier]
-        if now - ts < _RATE_LIMIT_WINDOW
-    ]
-    # Vérifier la limite
-    if len(_api_rate_limit[identifier]) >= _RATE_LIMIT_MAX_REQUESTS:
-        return False
-    # Ajouter la requête actuelle
-    _api_rate_limit[identifier].append(now)
-    return True
+def _check_rate_limit(identifier: str) -> Dict[str, Any]:
+    """
+    Consomme une requête du budget d'un identifiant (session/IP).
+
+    Returns:
+        Dict {'allowed', 'remaining', 'limit', 'retry_after'}
+    """
+    return get_rate_limiter().acquire(
+        f"session:{identifier}", _RATE_LIMIT_MAX_REQUESTS, _RATE_LIMIT_MAX_REQUESTS / _RATE_LIMIT_WINDOW
+    )
 
 
 @cache.memoize(timeout=300)  # Cache 5 minutes avec clé basée sur les paramètres
@@ -388,8 +607,8 @@ def _fetch_alpha_vantage(symbol: str, interval: Optional[str], api_key: Optional
     }
     
     try:
-        # Timeout de 30 secondes, vérification SSL
-        resp = requests.get(url, params=params, timeout=30, verify=True)
+        # Session partagée (keep-alive, nouvelles tentatives), vérification SSL
+        resp = provider_get('alpha_vantage', url, params=params)
         
         if resp.status_code != 200:
             raise ValueError(f"Erreur API Alpha Vantage: HTTP {resp.status_code}")
@@ -405,7 +624,7 @@ def _fetch_alpha_vantage(symbol: str, interval: Optional[str], api_key: Optional
         if not resp.text or len(resp.text) < 50:
             raise ValueError("Réponse API Alpha Vantage vide ou invalide")
         
-        df = pd.read_csv(pd.compat.StringIO(resp.text))
+        df = pd.read_csv(io.StringIO(resp.text))
         if df.empty or len(df) < 1:
             raise ValueError("Aucune donnée retournée par Alpha Vantage")
         
@@ -430,11 +649,12 @@ def api_fetch():
     """Récupère des données boursières depuis une API gratuite et les charge comme un fichier."""
     # Rate limiting par session (pour limiter les abus côté client)
     session_id = session.get('_id', request.remote_addr)
-    if not _check_rate_limit(session_id):
+    limit = _check_rate_limit(session_id)
+    if not limit['allowed']:
         return jsonify({
             'success': False,
             'message': f'Trop de requêtes. Limite: {_RATE_LIMIT_MAX_REQUESTS} requêtes par {_RATE_LIMIT_WINDOW} secondes'
-        }), 429
+        }), 429, {'Retry-After': str(math.ceil(limit['retry_after']))}
     
     payload = request.get_json(silent=True) or {}
     source = (payload.get('source') or '').strip().lower()
@@ -465,13 +685,16 @@ def api_fetch():
         else:
             api_service = get_stock_api_service(cache=cache)
         
-        # Récupérer les données via le service
-        df = api_service.fetch_stock_data(
+        # Récupérer les données via le service (autre fournisseur si celui-ci tarde ou échoue)
+        df, provider = api_service.fetch_with_failover(
             api_name=source,
             symbol=symbol,
             interval=interval,
             api_key=api_key
         )
+        if provider != source:
+            current_app.logger.warning(f"{source} indisponible pour {symbol}, données fournies par {provider}")
+            source = provider
         
     except RateLimitExceeded as e:
         # Rate limit spécifique à l'API
@@ -479,7 +702,7 @@ def api_fetch():
         return jsonify({
             'success': False,
             'message': f'Limite de requêtes dépassée pour {source}: {str(e)}'
-        }), 429
+        }), 429, {'Retry-After': str(math.ceil(e.retry_after or _RATE_LIMIT_WINDOW))}
     except StockAPIError as exc:
         # Erreurs API spécifiques
         current_app.logger.error(f"Erreur API {source} pour {symbol}: {str(exc)}")
@@ -502,21 +725,36 @@ def api_fetch():
     
     os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
     filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+    linked = False
     
     try:
         # Validation de la taille des données avant sauvegarde
         if len(df) > 10000:  # Limite raisonnable
             current_app.logger.warning(f"Dataset volumineux: {len(df)} lignes pour {symbol}")
         
-        df.to_csv(filepath, index=False)
-        return jsonify(_set_session_from_df(df, filename))
+        df.to_csv(tmp_path, index=False)
+        sha256 = file_sha256(tmp_path)
+        store = get_upload_store(current_app.config)
+        summary = store.lookup(sha256, 'csv')
+        if summary is not None:
+            os.remove(tmp_path)
+            return jsonify(_reuse_upload(filename, sha256, summary))
+        filepath = store.link(filename, store.ingest(tmp_path, sha256, 'csv'))
+        linked = True
+        # Le DataFrame relu depuis le CSV (types inférés) sert de copie colonnaire
+        summary = _accept_upload(filepath, load_dataframe(filepath), sha256)
+        return jsonify(_upload_response(df, filename, summary, sha256))
     except Exception as exc:
         current_app.logger.exception(f"Erreur sauvegarde fichier API: {exc}")
-        if os.path.exists(filepath):
+        if os.path.exists(tmp_path):
             try:
-                os.remove(filepath)
+                os.remove(tmp_path)
             except:
                 pass
+        # Avant `link`, le nom désigne encore un upload précédent : ne pas le supprimer
+        if linked:
+            _remove_upload(filepath)
         return jsonify({'success': False, 'message': f'Impossible d\'enregistrer les données: {exc}'}), 500
 
 
@@ -1,12 +1,16 @@
 """
 Blueprint pour la visualisation de données.
 """
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, session
+
+from app.services.dataset_profile import current_file_profile
 
 bp = Blueprint('visualisation', __name__)
 
 
 @bp.route('/')
 def index():
-    """Page de visualisation de données."""
-    return render_template('visualisation.html')
+    """Page de visualisation de données (profil du fichier courant)."""
+    return render_template('visualisation.html',
+                           current_file=session.get('current_file'),
+                           file_profile=current_file_profile())
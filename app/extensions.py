@@ -5,7 +5,7 @@ Extensions Flask utilisées dans l'application.
 from flask_sqlalchemy import SQLAlchemy
 from flask_caching import Cache
 from flask_login import LoginManager
-from concurrent.futures import ThreadPoolExecutor
+from app.services.job_executor import JobExecutor
 
 # SQLAlchemy utilisé par les modèles optionnels (ex: TestHistory)
 db = SQLAlchemy()
@@ -65,5 +65,5 @@ except ImportError:
 	# flask-socketio n'est pas installé, socketio reste None
 	socketio = None
 
-# Shared thread pool for background tasks
-executor = ThreadPoolExecutor(max_workers=4)
+# Exécuteur partagé des tâches en arrière-plan (backend configuré par init_app)
+executor = JobExecutor()
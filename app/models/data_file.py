@@ -1,3 +1,5 @@
+import json
+
 from ..extensions import db
 from datetime import datetime
 
@@ -8,3 +10,46 @@ class DataFile(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.Column(db.String(128), nullable=True)
     file_metadata = db.Column(db.Text, nullable=True)
+
+    def metadata_dict(self):
+        """Métadonnées du fichier (JSON décodé, {} si absentes ou invalides)."""
+        try:
+            metadata = json.loads(self.file_metadata or '{}')
+        except ValueError:
+            return {}
+        return metadata if isinstance(metadata, dict) else {}
+
+    @classmethod
+    def get_by_filename(cls, filename, user=None):
+        """
+        Dernier enregistrement pour un nom de fichier.
+
+        Args:
+            filename: Nom du fichier uploadé
+            user: Propriétaire ; None = quel que soit le propriétaire (le fichier
+                sur disque est celui du dernier upload de ce nom)
+        """
+        query = cls.query.filter_by(filename=filename)
+        if user is not None:
+            query = query.filter_by(user=user)
+        return query.order_by(cls.uploaded_at.desc(), cls.id.desc()).first()
+
+    @classmethod
+    def save_metadata(cls, filename, metadata, user=None):
+        """
+        Enregistre les métadonnées d'un fichier uploadé.
+
+        Un enregistrement par (propriétaire, nom) : l'upload d'un autre
+        utilisateur sous le même nom ne modifie pas le sien. Les métadonnées
+        d'un nouvel upload remplacent les précédentes, sans fusion avec celles
+        de l'ancien contenu.
+        """
+        record = (cls.query.filter_by(filename=filename, user=user)
+                  .order_by(cls.id.desc()).first())
+        if record is None:
+            record = cls(filename=filename, user=user)
+            db.session.add(record)
+        record.file_metadata = json.dumps(metadata, separators=(',', ':'))
+        record.uploaded_at = datetime.utcnow()
+        db.session.commit()
+        return record
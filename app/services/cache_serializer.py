@@ -0,0 +1,290 @@
+"""
+Sérialisation compacte des DataFrames mis dans le cache Flask (Redis).
+
+Par défaut, Flask-Caching picke les valeurs : un DataFrame (données des APIs
+boursières, `@cache.memoize` de l'upload) devient un gros pickle, lent à
+(dé)sérialiser à chaque lecture et lié à la version de pandas. Ce
+sérialiseur remplace celui du backend Redis : chaque DataFrame contenu dans
+la valeur (directement, ou dans un dict / tuple comme l'enveloppe du service
+des APIs boursières) est encodé en Arrow IPC (ou Parquet), compressé en zstd
+ou lz4 ; le reste de la valeur reste picklé.
+
+Au-delà de `CACHE_FRAME_DISK_THRESHOLD` octets, la valeur est écrite sur le
+disque local (`CACHE_FRAME_DISK_DIR`, fichier nommé par l'empreinte du
+contenu) et Redis ne garde qu'une référence. Une référence dont le fichier
+est absent (autre machine, fichier nettoyé après `CACHE_FRAME_DISK_TTL`) est
+lue comme une absence d'entrée.
+
+Les valeurs sans DataFrame (et les entiers de `inc`/`dec`) gardent le format
+de cachelib : les entrées déjà présentes dans Redis restent lisibles.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from cachelib.redis_base import BaseRedisCache
+from cachelib.serializers import RedisSerializer
+
+from app.services.columnar_store import PYARROW_AVAILABLE, pa, pq
+
+logger = logging.getLogger(__name__)
+
+# Préfixes des valeurs (cachelib utilise b'!' pour le pickle et l'ASCII pour les entiers)
+INLINE_PREFIX = b'#F1'
+DISK_PREFIX = b'#D1'
+FORMATS = ('arrow', 'parquet')
+DEFAULT_DISK_THRESHOLD = 1024 * 1024
+DEFAULT_DISK_TTL = 24 * 3600
+DISK_GC_INTERVAL = 600
+SUFFIX = '.frames'
+
+
+class _FramePickler(pickle.Pickler):
+    """Pickle dont les DataFrames sont remplacés par leur encodage colonnaire."""
+
+    def __init__(self, file, serializer: 'FrameSerializer'):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._serializer = serializer
+        self.frames = 0
+
+    def persistent_id(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            encoded = self._serializer.encode_frame(obj)
+            if encoded is not None:
+                self.frames += 1
+                return ('frame', self._serializer.format, encoded)
+        return None
+
+
+class _FrameUnpickler(pickle.Unpickler):
+    def __init__(self, file, serializer: 'FrameSerializer'):
+        super().__init__(file)
+        self._serializer = serializer
+
+    def persistent_load(self, pid):
+        tag, fmt, data = pid
+        if tag != 'frame':
+            raise pickle.UnpicklingError(f"Référence inconnue: {tag!r}")
+        return self._serializer.decode_frame(fmt, data)
+
+
+class FrameSerializer(RedisSerializer):
+    """
+    Sérialiseur Redis : DataFrames en Arrow IPC / Parquet compressé, grosses
+    valeurs sur le disque local.
+    """
+
+    def __init__(self, format: str = 'arrow', compression: Optional[str] = 'zstd',
+                 disk_dir: Optional[str] = None, disk_threshold: int = DEFAULT_DISK_THRESHOLD,
+                 disk_ttl: int = DEFAULT_DISK_TTL):
+        """
+        Args:
+            format: 'arrow' (IPC, lecture la plus rapide) ou 'parquet' (plus compact)
+            compression: 'zstd', 'lz4' ou None
+            disk_dir: Répertoire du niveau disque
+            disk_threshold: Taille (octets) au-delà de laquelle la valeur va sur
+                le disque (0 = jamais)
+            disk_ttl: Âge (secondes) au-delà duquel un fichier est supprimé
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Format de sérialisation inconnu: {format}")
+        if compression and not pa.Codec.is_available(compression):
+            logger.warning("Compression %s indisponible, DataFrames du cache non compressés", compression)
+            compression = None
+        self.format = format
+        self.compression = compression or None
+        self.disk_dir = os.path.abspath(disk_dir or os.path.join('data', 'cache_frames'))
+        self.disk_threshold = max(0, int(disk_threshold))
+        self.disk_ttl = int(disk_ttl)
+        self._lock = threading.Lock()
+        self._last_gc = 0.0
+        self._stats = {
+            'frames_serialized': 0, 'frames_deserialized': 0, 'frames_pickled': 0,
+            'bytes_stored': 0, 'bytes_disk': 0, 'disk_writes': 0, 'disk_reads': 0, 'disk_misses': 0,
+            'serialize_seconds': 0.0, 'deserialize_seconds': 0.0,
+        }
+
+    # --- DataFrames ---
+
+    def encode_frame(self, df: pd.DataFrame) -> Optional[bytes]:
+        """Encodage colonnaire d'un DataFrame ; None s'il doit rester picklé."""
+        if isinstance(df.columns, pd.MultiIndex) or not all(isinstance(c, str) for c in df.columns) \
+                or df.columns.duplicated().any():
+            self._count('frames_pickled')
+            return None
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            if self.format == 'parquet':
+                buffer = io.BytesIO()
+                pq.write_table(table, buffer, compression=self.compression or 'none')
+                return buffer.getvalue()
+            sink = pa.BufferOutputStream()
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # Colonnes objet hétérogènes, etc.
+            logger.debug("DataFrame picklé dans le cache: %s", e)
+            self._count('frames_pickled')
+            return None
+
+    def decode_frame(self, fmt: str, data: bytes) -> pd.DataFrame:
+        """Inverse de `encode_frame`."""
+        if fmt == 'parquet':
+            table = pq.read_table(io.BytesIO(data))
+        else:
+            table = pa.ipc.open_stream(data).read_all()
+        self._count('frames_deserialized')
+        return table.to_pandas()
+
+    # --- Interface cachelib ---
+
+    def dumps(self, value: Any, protocol: int = pickle.HIGHEST_PROTOCOL) -> bytes:
+        if type(value) is int:
+            return super().dumps(value, protocol)
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        pickler = _FramePickler(buffer, self)
+        pickler.dump(value)
+        if not pickler.frames:
+            # Aucun DataFrame : format cachelib inchangé
+            return b'!' + buffer.getvalue()
+        payload = INLINE_PREFIX + buffer.getvalue()
+        if self.disk_threshold and len(payload) > self.disk_threshold:
+            payload = self._write_disk(payload)
+        with self._lock:
+            self._stats['frames_serialized'] += pickler.frames
+            self._stats['bytes_stored'] += len(payload)
+            self._stats['serialize_seconds'] += time.perf_counter() - started
+        return payload
+
+    def loads(self, value: Optional[bytes]) -> Any:
+        if value is None or not value.startswith((INLINE_PREFIX, DISK_PREFIX)):
+            return super().loads(value)
+        started = time.perf_counter()
+        if value.startswith(DISK_PREFIX):
+            value = self._read_disk(value[len(DISK_PREFIX):].decode('ascii'))
+            if value is None:
+                return None
+        try:
+            result = _FrameUnpickler(io.BytesIO(value[len(INLINE_PREFIX):]), self).load()
+        except Exception as e:
+            logger.warning("Entrée du cache illisible, ignorée: %s", e)
+            return None
+        with self._lock:
+            self._stats['deserialize_seconds'] += time.perf_counter() - started
+        return result
+
+    # --- Niveau disque ---
+
+    def _disk_path(self, digest: str) -> str:
+        return os.path.join(self.disk_dir, digest[:2], digest + SUFFIX)
+
+    def _write_disk(self, payload: bytes) -> bytes:
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._disk_path(digest)
+        if os.path.exists(path):
+            # Même contenu déjà écrit : on prolonge sa durée de vie
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        with self._lock:
+            self._stats['disk_writes'] += 1
+            self._stats['bytes_disk'] += len(payload)
+        self._maybe_gc()
+        return DISK_PREFIX + digest.encode('ascii')
+
+    def _read_disk(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._disk_path(digest), 'rb') as f:
+                payload = f.read()
+        except (OSError, ValueError):
+            self._count('disk_misses')
+            return None
+        self._count('disk_reads')
+        return payload
+
+    def _maybe_gc(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_gc < DISK_GC_INTERVAL:
+                return
+            self._last_gc = now
+        self.gc(now)
+
+    def gc(self, now: Optional[float] = None) -> int:
+        """Supprime les fichiers plus anciens que `disk_ttl` ; retourne leur nombre."""
+        now = time.time() if now is None else now
+        removed = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if now - os.path.getmtime(path) > self.disk_ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs : DataFrames (dé)sérialisés, octets écrits, temps passé."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['serialize_seconds'] = round(stats['serialize_seconds'], 4)
+        stats['deserialize_seconds'] = round(stats['deserialize_seconds'], 4)
+        stats.update(format=self.format, compression=self.compression, disk_threshold=self.disk_threshold)
+        return stats
+
+
+def install_frame_serializer(backend, config) -> Optional[FrameSerializer]:
+    """
+    Installe le sérialiseur sur un backend Redis de cachelib / Flask-Caching.
+
+    Args:
+        backend: Backend du cache (`app.extensions['cache'][cache]`)
+        config: Configuration (`CACHE_FRAME_*`)
+
+    Returns:
+        Le sérialiseur installé, ou None (autre backend, `CACHE_FRAME_FORMAT=pickle`
+        ou pyarrow absent)
+    """
+    fmt = str(config.get('CACHE_FRAME_FORMAT') or 'arrow').lower()
+    if fmt == 'pickle' or not PYARROW_AVAILABLE or not isinstance(backend, BaseRedisCache):
+        return None
+    compression = str(config.get('CACHE_FRAME_COMPRESSION') or 'none').lower()
+    serializer = FrameSerializer(
+        format=fmt,
+        compression=None if compression == 'none' else compression,
+        disk_dir=config.get('CACHE_FRAME_DISK_DIR'),
+        disk_threshold=int(config.get('CACHE_FRAME_DISK_THRESHOLD', DEFAULT_DISK_THRESHOLD)),
+        disk_ttl=int(config.get('CACHE_FRAME_DISK_TTL', DEFAULT_DISK_TTL)),
+    )
+    backend.serializer = serializer
+    return serializer
+
+
+def get_frame_serializer(cache) -> Optional[FrameSerializer]:
+    """Sérialiseur installé sur le cache Flask (None s'il ne l'est pas)."""
+    serializer = getattr(getattr(cache, 'cache', None), 'serializer', None)
+    return serializer if isinstance(serializer, FrameSerializer) else None
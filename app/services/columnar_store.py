@@ -0,0 +1,120 @@
+"""
+Copie colonnaire (Parquet) des fichiers uploadés.
+
+Chaque fichier accepté à l'upload est converti une seule fois en Parquet typé,
+à côté de l'original (`<fichier>.parquet` ; pour un lien, à côté du fichier
+pointé). `load_dataframe` lit ensuite cette copie, en ne chargeant que les
+colonnes demandées, au lieu de ré-analyser le CSV (essais d'encodages) ou le
+classeur Excel (openpyxl) à chaque appel.
+
+La taille et la date de modification de l'original sont enregistrées dans les
+métadonnées du fichier Parquet : une copie absente, périmée ou illisible est
+ignorée et l'original est relu. pyarrow est optionnel.
+"""
+
+import logging
+import os
+from typing import Optional, Sequence
+
+import pandas as pd
+
+# pyarrow est optionnel - sans lui, l'original est toujours relu
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.parquet'
+_SOURCE_KEY = b'source_signature'
+
+
+def columnar_path(filepath: str) -> str:
+    """
+    Chemin de la copie colonnaire d'un fichier.
+
+    Les liens sont résolus : tous les noms d'un même fichier uploadé
+    (stockage adressé par contenu) partagent la même copie.
+    """
+    return os.path.realpath(filepath) + SUFFIX
+
+
+def _signature(filepath: str) -> bytes:
+    stat = os.stat(filepath)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode('ascii')
+
+
+def write_columnar_copy(filepath: str, df: pd.DataFrame) -> bool:
+    """
+    Écrit la copie Parquet de `df`, lu depuis `filepath`.
+
+    Returns:
+        True si la copie a été écrite ; False si pyarrow est absent ou si le
+        DataFrame n'est pas convertible (colonnes aux types mélangés, noms non
+        textuels...). L'échec n'empêche jamais l'upload.
+    """
+    if not PYARROW_AVAILABLE:
+        return False
+    target = columnar_path(filepath)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        if not all(isinstance(c, str) for c in df.columns):
+            raise ValueError("noms de colonnes non textuels")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SOURCE_KEY] = _signature(filepath)
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, target)
+        return True
+    except Exception as e:
+        logger.info("Copie colonnaire non créée pour %s: %s", filepath, e)
+        for path in (tmp_path, target):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return False
+
+
+def read_columnar_copy(filepath: str, columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Lit la copie Parquet de `filepath` si elle est à jour.
+
+    Args:
+        filepath: Chemin du fichier original
+        columns: Colonnes à charger (toutes si None)
+
+    Returns:
+        DataFrame, ou None si la copie est absente, périmée ou illisible
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    target = columnar_path(filepath)
+    try:
+        if not os.path.exists(target):
+            return None
+        metadata = pq.read_schema(target).metadata or {}
+        if metadata.get(_SOURCE_KEY) != _signature(filepath):
+            return None
+        if columns is not None:
+            # Projection : seules les colonnes demandées sont lues
+            unique = list(dict.fromkeys(columns))
+            return pq.read_table(target, columns=unique).to_pandas()[list(columns)]
+        return pq.read_table(target).to_pandas()
+    except Exception as e:
+        logger.warning("Copie colonnaire illisible pour %s: %s", filepath, e)
+        return None
+
+
+def remove_columnar_copy(filepath: str) -> None:
+    """Supprime la copie colonnaire d'un fichier, si elle existe."""
+    try:
+        os.remove(columnar_path(filepath))
+    except OSError:
+        pass
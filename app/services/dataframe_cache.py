@@ -0,0 +1,192 @@
+"""
+Cache des DataFrames chargés, partagé par toutes les routes d'un worker.
+
+Un même fichier est lu par l'upload, puis par chaque test statistique et
+chaque prévision : `load_dataframe` passe par ce cache LRU, borné en octets
+(`memory_usage(deep=True)`) et non en nombre d'entrées.
+
+La clé contient le chemin résolu (pour un upload, l'objet nommé par
+l'empreinte du contenu), la taille, la date de modification, les colonnes
+demandées et les réglages de compaction : un fichier modifié n'est jamais
+servi depuis le cache. Les DataFrames retournés sont des vues en lecture
+seule : les tableaux partagés refusent toute écriture en place (ajouter ou
+remplacer une colonne reste possible, la vue étant une copie superficielle).
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _freeze(df: pd.DataFrame) -> None:
+    """Rend les tableaux du DataFrame non modifiables en place."""
+    try:
+        arrays = df._mgr.arrays
+    except AttributeError:
+        return
+    for array in arrays:
+        # ndarray, ou tableau d'extension adossé à un ndarray (dates, category)
+        array = getattr(array, '_ndarray', array)
+        if hasattr(array, 'flags'):
+            array.flags.writeable = False
+
+
+def _view(df: pd.DataFrame) -> pd.DataFrame:
+    return df.copy(deep=False)
+
+
+class DataFrameCache:
+    """
+    Cache LRU des DataFrames, borné par l'occupation mémoire.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes: Occupation maximale des DataFrames gardés (0 = cache désactivé)
+        """
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'uncacheable': 0}
+
+    @staticmethod
+    def key(filepath: str, columns: Optional[Sequence[str]] = None, variant: Any = None) -> Tuple:
+        """Clé d'un fichier dans son état actuel (chemin résolu, taille, mtime)."""
+        path = os.path.realpath(filepath)
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns,
+                tuple(columns) if columns is not None else None, variant)
+
+    def get(self, filepath: str, columns: Optional[Sequence[str]],
+            loader: Callable[[], pd.DataFrame], variant: Any = None) -> pd.DataFrame:
+        """
+        Retourne le DataFrame de `filepath` (colonnes `columns`), chargé par
+        `loader()` s'il n'est pas en cache.
+
+        Une demande de colonnes est servie depuis le DataFrame complet s'il est
+        déjà en cache. Un seul chargement à la fois par clé : les autres
+        threads attendent son résultat.
+        """
+        if self.max_bytes <= 0:
+            return loader()
+        key = self.key(filepath, columns, variant)
+        full_key = key[:3] + (None, variant)
+
+        with self._lock:
+            cached = self._lookup(key, full_key, columns)
+            if cached is not None:
+                self._stats['hits'] += 1
+                return cached
+            self._stats['misses'] += 1
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                cached = self._lookup(key, full_key, columns)
+                if cached is not None:
+                    return cached
+            try:
+                df = loader()
+                # Mis en cache avant de libérer la clé : un thread arrivé entre-temps
+                # attend ce chargement au lieu d'en lancer un second
+                self._store(key, df)
+            finally:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+            return _view(df)
+
+    def _lookup(self, key: Tuple, full_key: Tuple, columns) -> Optional[pd.DataFrame]:
+        for candidate in (key, full_key):
+            entry = self._entries.get(candidate)
+            if entry is None:
+                continue
+            self._entries.move_to_end(candidate)
+            df = entry['df']
+            if columns is not None and candidate is full_key:
+                # Les colonnes inconnues lèvent la même erreur qu'une lecture
+                try:
+                    df = df[list(columns)]
+                except KeyError as e:
+                    raise ValueError(f"Colonnes introuvables dans le fichier: {e}")
+            return _view(df)
+        return None
+
+    def _store(self, key: Tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            with self._lock:
+                self._stats['uncacheable'] += 1
+            logger.info("DataFrame trop volumineux pour le cache (%d octets): %s", size, key[0])
+            return
+        _freeze(df)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._resident_bytes -= previous['bytes']
+            # Les versions précédentes du même fichier ne serviront plus
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self._resident_bytes -= self._entries.pop(stale)['bytes']
+            self._entries[key] = {'df': df, 'bytes': size}
+            self._resident_bytes += size
+            while self._resident_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._resident_bytes -= evicted['bytes']
+                self._stats['evictions'] += 1
+
+    def invalidate(self, filepath: Optional[str] = None) -> None:
+        """Retire un fichier (ou tous les fichiers) du cache."""
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+                self._resident_bytes = 0
+                return
+            path = os.path.realpath(filepath)
+            for key in [k for k in self._entries if k[0] == path]:
+                self._resident_bytes -= self._entries.pop(key)['bytes']
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache (hits, misses, octets résidents...)."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            stats = dict(self._stats)
+            stats['hit_ratio'] = round(self._stats['hits'] / lookups, 4) if lookups else None
+            stats['resident_bytes'] = self._resident_bytes
+            stats['max_bytes'] = self.max_bytes
+            stats['entries'] = len(self._entries)
+            return stats
+
+
+# Instance singleton du cache (une par processus worker)
+_cache_instance: Optional[DataFrameCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_dataframe_cache(max_bytes: Optional[int] = None) -> DataFrameCache:
+    """
+    Obtient l'instance singleton du cache des DataFrames.
+
+    Args:
+        max_bytes: Budget en octets (utilisé à la création ou pour l'ajuster)
+
+    Returns:
+        Instance de DataFrameCache
+    """
+    global _cache_instance
+
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = DataFrameCache(DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+        elif max_bytes is not None:
+            _cache_instance.max_bytes = max(0, int(max_bytes))
+    return _cache_instance
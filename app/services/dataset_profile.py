@@ -0,0 +1,179 @@
+"""
+Profil d'un jeu de données, calculé une fois à l'upload (ou à l'import API).
+
+Les statistiques de toutes les colonnes numériques sont calculées ensemble,
+sur un seul tableau numpy : effectif, valeurs manquantes, min/max,
+moyenne/écart-type, quartiles, asymétrie et aplatissement (mêmes formules
+que pandas). Les colonnes de dates sont contrôlées (ordre croissant,
+doublons) et leur fréquence d'échantillonnage est déduite.
+
+Le profil est enregistré dans `DataFile.file_metadata` et dans le résumé de
+l'objet uploadé ; les pages le relisent via `get_file_profile` au lieu de
+rebalayer les données.
+"""
+
+import logging
+import math
+import os
+import warnings
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _number(value) -> Optional[float]:
+    """float JSON-serializable (None pour NaN/Inf)."""
+    if value is None:
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _numeric_profiles(numeric: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+    n = (~np.isnan(values)).sum(axis=0).astype(np.float64)
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        # Colonnes entièrement vides : RuntimeWarning « All-NaN slice »
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        centered = values - mean
+        m2 = np.nansum(centered ** 2, axis=0) / n
+        m3 = np.nansum(centered ** 3, axis=0) / n
+        m4 = np.nansum(centered ** 4, axis=0) / n
+        std = np.sqrt(m2 * n / (n - 1))
+        # Coefficients corrigés du biais (Series.skew / Series.kurt)
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+        kurt = ((n + 1) * (m4 / m2 ** 2 - 3) + 6) * (n - 1) / ((n - 2) * (n - 3))
+        skew = np.where((n > 2) & (m2 > 0), skew, np.nan)
+        kurt = np.where((n > 3) & (m2 > 0), kurt, np.nan)
+        minimum = np.nanmin(values, axis=0)
+        maximum = np.nanmax(values, axis=0)
+        quantiles = np.nanquantile(values, QUANTILES, axis=0)
+
+    profiles = {}
+    for i, column in enumerate(numeric.columns):
+        profiles[str(column)] = {
+            'dtype': numeric.dtypes.iloc[i].name,
+            'count': int(n[i]),
+            'nan': int(len(numeric) - n[i]),
+            'min': _number(minimum[i]),
+            'max': _number(maximum[i]),
+            'mean': _number(mean[i]),
+            'std': _number(std[i]),
+            'q25': _number(quantiles[0, i]),
+            'q50': _number(quantiles[1, i]),
+            'q75': _number(quantiles[2, i]),
+            'skew': _number(skew[i]),
+            'kurtosis': _number(kurt[i]),
+        }
+    return profiles
+
+
+def _date_profile(dates: pd.Series) -> Dict[str, Any]:
+    """Bornes, ordre, doublons et fréquence d'une série de dates."""
+    valid = dates.dropna()
+    profile = {
+        'dtype': dates.dtype.name,
+        'count': int(len(valid)),
+        'nan': int(len(dates) - len(valid)),
+        'start': valid.min().isoformat() if len(valid) else None,
+        'end': valid.max().isoformat() if len(valid) else None,
+        'monotonic': bool(valid.is_monotonic_increasing),
+        'duplicates': int(valid.duplicated().sum()),
+        'frequency': None,
+        'median_step_seconds': None,
+    }
+    unique = pd.DatetimeIndex(valid.drop_duplicates().sort_values())
+    if len(unique) >= 2:
+        profile['median_step_seconds'] = _number(np.median(np.diff(unique.asi8)) / 1e9)
+    if len(unique) >= 3:
+        try:
+            profile['frequency'] = pd.infer_freq(unique)
+        except (TypeError, ValueError):
+            pass
+    return profile
+
+
+def profile_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Profil JSON-serializable d'un DataFrame.
+
+    Returns:
+        {'version', 'rows', 'columns': {nom: statistiques}, 'date_column'}
+    """
+    columns: Dict[str, Dict[str, Any]] = {}
+    numeric = df.select_dtypes(include=[np.number])
+    numeric_profiles = _numeric_profiles(numeric) if len(numeric.columns) else {}
+
+    date_column = None
+    for position, column in enumerate(df.columns):
+        name = str(column)
+        series = df.iloc[:, position]
+        if name in numeric_profiles:
+            columns[name] = numeric_profiles[name]
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            columns[name] = _date_profile(series)
+            date_column = date_column or name
+        else:
+            count = int(series.count())
+            columns[name] = {
+                'dtype': series.dtype.name,
+                'count': count,
+                'nan': int(len(series) - count),
+                'unique': int(series.nunique(dropna=True)),
+            }
+
+    profile = {'version': PROFILE_VERSION, 'rows': int(len(df)), 'columns': columns,
+               'date_column': date_column}
+    if date_column is None and isinstance(df.index, pd.DatetimeIndex):
+        profile['index'] = _date_profile(df.index.to_series())
+    return profile
+
+
+def get_file_profile(filepath: str) -> Optional[Dict[str, Any]]:
+    """
+    Profil enregistré pour un fichier uploadé, ou None.
+
+    Lu dans le résumé de l'objet (stockage par contenu), sinon dans
+    `DataFile.file_metadata` s'il correspond encore au fichier.
+    """
+    if not filepath or not os.path.exists(filepath):
+        return None
+    from app.services.upload_store import OBJECTS_DIR, UploadStore, file_extension
+
+    root = os.path.dirname(filepath)
+    if os.path.basename(root) == OBJECTS_DIR:
+        # Objet lu directement (nom réutilisé depuis par un autre upload)
+        root = os.path.dirname(root)
+    store = UploadStore(root)
+    sha256 = store.sha256_of(filepath)
+    if sha256:
+        summary = store.lookup(sha256, file_extension(filepath))
+        if summary and summary.get('profile'):
+            return summary['profile']
+
+    from app.services.file_format import load_recorded_metadata
+    metadata = load_recorded_metadata(filepath)
+    profile = (metadata or {}).get('profile')
+    return profile if isinstance(profile, dict) else None
+
+
+def current_file_profile() -> Optional[Dict[str, Any]]:
+    """Profil du fichier courant de la session Flask (`current_file`), ou None."""
+    from flask import session
+    from app.services.upload_store import current_upload_path
+
+    filename = session.get('current_file')
+    if not filename:
+        return None
+    try:
+        return get_file_profile(current_upload_path(filename))
+    except Exception as e:
+        logger.debug("Profil indisponible pour %s: %s", filename, e)
+        return None
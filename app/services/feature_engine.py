@@ -0,0 +1,245 @@
+"""
+Moteur de features incrémental pour la boucle de prévision récursive.
+
+`make_features` recalcule tous les lags, moyennes mobiles et la volatilité sur
+l'historique complet à chaque pas de prévision. Ce moteur est initialisé une
+seule fois à partir de l'historique puis avance d'une ligne par pas prédit :
+
+- buffer circulaire des différences pour les lags (`lag_diff_*`)
+- sommes courantes pour les moyennes mobiles (`ma_diff_*`, `ma_price_*`)
+- variance glissante de Welford pour la volatilité (`volatility`)
+
+Le vecteur produit est celui qu'on obtiendrait avec `make_features` suivi de
+`bfill().ffill().fillna(0)` et `prepare_features_for_prediction` sur la
+dernière ligne, mais en O(1) par pas au lieu de O(taille de l'historique).
+"""
+
+import math
+from collections import deque
+from itertools import islice
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.utils import (
+    FEATURE_LAGS,
+    FEATURE_DIFF_WINDOWS,
+    FEATURE_PRICE_WINDOWS,
+    VOLATILITY_WINDOW,
+    default_feature_value,
+    normalize_feature_columns,
+)
+
+# Fenêtre utilisée pour l'écart-type des différences récentes (intervalle de confiance)
+RECENT_DIFF_WINDOW = 20
+
+
+class _RollingMean:
+    """Moyenne mobile sur une fenêtre fixe, maintenue par somme courante."""
+
+    __slots__ = ('window', 'values', 'total')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, value: float):
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+
+    def value(self) -> float:
+        # Même sémantique que rolling(window).mean() : NaN tant que la fenêtre n'est pas pleine
+        if len(self.values) < self.window:
+            return math.nan
+        return self.total / self.window
+
+
+class _RollingStd:
+    """Écart-type glissant (ddof=1) maintenu par l'algorithme de Welford."""
+
+    __slots__ = ('window', 'values', 'mean', 'ssqdm')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.ssqdm = 0.0
+
+    def push(self, value: float):
+        self.values.append(value)
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.ssqdm += delta * (value - self.mean)
+
+        if n > self.window:
+            old = self.values.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.ssqdm -= delta * (old - self.mean)
+
+    def value(self) -> float:
+        n = len(self.values)
+        if n < self.window or n < 2:
+            return math.nan
+        return math.sqrt(max(self.ssqdm, 0.0) / (n - 1))
+
+
+class IncrementalFeatureEngine:
+    """
+    Calcule les features de prévision de manière incrémentale.
+
+    L'historique fourni doit être celui utilisé par la boucle de prévision :
+    index temporel trié et colonne cible sans valeurs manquantes (c'est le cas
+    après `prepare_data_for_ml` et `df.reindex(X.index)`).
+    """
+
+    def __init__(self, history: pd.DataFrame, target_col: str, feature_cols):
+        """
+        Initialise le moteur à partir de l'historique.
+
+        Args:
+            history: DataFrame historique avec DatetimeIndex
+            target_col: Nom de la colonne cible
+            feature_cols: Colonnes attendues par le modèle (ordre conservé)
+
+        Raises:
+            ValueError: Si l'historique est vide ou si la cible contient des NaN
+        """
+        if history is None or len(history) == 0:
+            raise ValueError("Historique vide: impossible d'initialiser le moteur de features")
+        if target_col not in history.columns:
+            raise ValueError(f"La colonne cible '{target_col}' est introuvable dans l'historique")
+
+        self.target_col = target_col
+        self.feature_cols = normalize_feature_columns(feature_cols)
+
+        self._max_lag = max(FEATURE_LAGS)
+        self._diffs = deque(maxlen=max(self._max_lag + 1, RECENT_DIFF_WINDOW))
+        self._diff_means = {w: _RollingMean(w) for w in FEATURE_DIFF_WINDOWS}
+        self._price_means = {w: _RollingMean(w) for w in FEATURE_PRICE_WINDOWS}
+        self._volatility = _RollingStd(VOLATILITY_WINDOW)
+        self._n_rows = 0
+
+        self.last_price = math.nan
+        self.last_date = None
+
+        prices = pd.to_numeric(history[target_col], errors='coerce').to_numpy(dtype=float)
+        if np.isnan(prices).any():
+            raise ValueError(f"La colonne cible '{target_col}' contient des valeurs manquantes")
+
+        # Seule la fin de l'historique influence les fenêtres : on n'y rejoue que
+        # les dernières lignes, l'initialisation reste donc en O(1)
+        seed_rows = max(max(FEATURE_PRICE_WINDOWS), VOLATILITY_WINDOW, self._diffs.maxlen) + 1
+        start = max(0, len(prices) - seed_rows)
+        for price, date in zip(prices[start:], history.index[start:]):
+            self.push(price, date)
+        self._n_rows = len(prices)
+
+        # Colonnes d'origine reprises telles quelles (dernière valeur connue)
+        self._passthrough = {}
+        last_row = history.iloc[-1]
+        for col in history.columns:
+            col = str(col)
+            if col == target_col:
+                continue
+            value = last_row[col]
+            if pd.api.types.is_numeric_dtype(history[col]):
+                value = float(value) if not (np.isnan(value) or np.isinf(value)) else 0.0
+            self._passthrough[col] = value
+
+        generated = self._generated()
+        self._resolvers = [self._resolver(col, generated) for col in self.feature_cols]
+
+    def push(self, price: float, date):
+        """
+        Avance le moteur d'une ligne (nouveau prix prédit).
+
+        Args:
+            price: Valeur de la colonne cible pour la nouvelle ligne
+            date: Date (Timestamp) de la nouvelle ligne
+        """
+        price = float(price)
+        if self._n_rows > 0:
+            diff = price - self.last_price
+            self._diffs.append(diff)
+            for rolling in self._diff_means.values():
+                rolling.push(diff)
+        for rolling in self._price_means.values():
+            rolling.push(price)
+        self._volatility.push(price)
+
+        self.last_price = price
+        self.last_date = date
+        self._n_rows += 1
+
+    def _lag(self, lag: int) -> float:
+        if len(self._diffs) <= lag:
+            return math.nan
+        return self._diffs[-1 - lag]
+
+    def _generated(self):
+        """Associe chaque feature générée par make_features à sa fonction de calcul."""
+        generated = {
+            f'{self.target_col}_diff': lambda: self._lag(0),
+            'day_of_week': lambda: self.last_date.dayofweek,
+            'day_of_month': lambda: self.last_date.day,
+            'month': lambda: self.last_date.month,
+            'volatility': self._volatility.value,
+        }
+        for lag in FEATURE_LAGS:
+            generated[f'lag_diff_{lag}'] = (lambda lag=lag: self._lag(lag))
+        for w, rolling in self._diff_means.items():
+            generated[f'ma_diff_{w}'] = rolling.value
+        for w, rolling in self._price_means.items():
+            generated[f'ma_price_{w}'] = rolling.value
+        return generated
+
+    def _resolver(self, col: str, generated):
+        if col in generated:
+            compute = generated[col]
+
+            def resolve():
+                value = compute()
+                # bfill().ffill().fillna(0) : une feature encore indéfinie sur la
+                # dernière ligne l'est aussi sur toutes les précédentes
+                return 0.0 if isinstance(value, float) and math.isnan(value) else value
+            return resolve
+        if col == self.target_col:
+            return lambda: self.last_price
+        if col in self._passthrough:
+            value = self._passthrough[col]
+            return lambda: value
+        return lambda: default_feature_value(col, last_value=self.last_price, last_date=self.last_date)
+
+    def feature_vector(self) -> List:
+        """Retourne les valeurs des features du modèle pour la dernière ligne."""
+        return [resolve() for resolve in self._resolvers]
+
+    def feature_frame(self) -> pd.DataFrame:
+        """Retourne les features de la dernière ligne sous forme de DataFrame (1 ligne)."""
+        return pd.DataFrame([self.feature_vector()], columns=self.feature_cols, index=[self.last_date])
+
+    def recent_diff_std(self, window: int = RECENT_DIFF_WINDOW) -> float:
+        """
+        Écart-type (ddof=0) des dernières différences de la cible.
+
+        Returns:
+            L'écart-type, ou NaN si aucune différence n'est disponible
+        """
+        if not self._diffs:
+            return math.nan
+        window = min(window, len(self._diffs))
+        recent = islice(self._diffs, len(self._diffs) - window, None)
+        return float(np.std(np.fromiter(recent, dtype=float, count=window)))
+
+    @property
+    def n_rows(self) -> int:
+        """Nombre de lignes (historique + prévisions) vues par le moteur."""
+        return self._n_rows
+
@@ -0,0 +1,307 @@
+"""
+Détection du format des fichiers CSV en une seule passe.
+
+L'encodage, le séparateur, le séparateur décimal et la présence d'une ligne
+d'en-tête sont déduits d'un échantillon borné du début du fichier (BOM, puis
+décodage UTF-8 strict, puis régularité du nombre de champs par ligne pour
+chaque séparateur candidat). Le fichier est ensuite lu par un seul
+`pd.read_csv` avec ces paramètres, au lieu d'une lecture complète par
+encodage essayé.
+
+Le format détecté à l'upload est enregistré dans `DataFile.file_metadata`
+avec la taille et la date de modification du fichier ; les lectures suivantes
+le réutilisent tant que le fichier n'a pas changé.
+"""
+
+import codecs
+import csv
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 64 * 1024
+MAX_SAMPLE_LINES = 200
+DELIMITERS = (',', ';', '\t', '|')
+FORMAT_MEMO_SIZE = 256
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+_NUMBER = re.compile(r'^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$')
+_DECIMAL_COMMA = re.compile(r'^[+-]?\d*,\d+$')
+_DECIMAL_POINT = re.compile(r'^[+-]?\d*\.\d+$')
+
+DEFAULT_FORMAT = {'encoding': 'utf-8', 'delimiter': ',', 'decimal': '.', 'header': True}
+
+_format_memo: 'OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]' = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _detect_encoding(sample: bytes, complete: bool) -> str:
+    """Encodage de l'échantillon : BOM, sinon UTF-8 strict, sinon cp1252 / latin-1."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Un caractère multi-octets coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def _sample_lines(text: str, complete: bool):
+    lines = text.splitlines()
+    if not complete and lines:
+        # Dernière ligne probablement tronquée
+        lines = lines[:-1]
+    return [line for line in lines[:MAX_SAMPLE_LINES] if line.strip()]
+
+
+def _detect_delimiter(lines) -> str:
+    """Séparateur donnant le nombre de champs le plus régulier d'une ligne à l'autre."""
+    best, best_score = ',', None
+    for delimiter in DELIMITERS:
+        counts = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        if not counts:
+            continue
+        fields, occurrences = Counter(counts).most_common(1)[0]
+        if fields < 2:
+            continue
+        score = (occurrences / len(counts), fields)
+        if best_score is None or score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def _is_number(value: str) -> bool:
+    return bool(_NUMBER.match(value.strip()))
+
+
+def detect_csv_format(source: Union[str, bytes], sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Détecte le format d'un CSV à partir des `sample_size` premiers octets.
+
+    Args:
+        source: Chemin du fichier ou début de son contenu
+        sample_size: Taille maximale de l'échantillon lu (SAMPLE_SIZE par défaut)
+
+    Returns:
+        Dictionnaire {encoding, delimiter, decimal, header}
+    """
+    sample_size = sample_size or SAMPLE_SIZE
+    if isinstance(source, (bytes, bytearray)):
+        sample = bytes(source[:sample_size])
+        complete = len(source) <= sample_size
+    else:
+        with open(source, 'rb') as fh:
+            sample = fh.read(sample_size + 1)
+        complete = len(sample) <= sample_size
+        sample = sample[:sample_size]
+
+    fmt = dict(DEFAULT_FORMAT)
+    fmt['encoding'] = _detect_encoding(sample, complete)
+    text = codecs.getincrementaldecoder(fmt['encoding'])(errors='replace').decode(sample, final=complete)
+    lines = _sample_lines(text, complete)
+    if not lines:
+        return fmt
+
+    fmt['delimiter'] = _detect_delimiter(lines)
+    rows = list(csv.reader(lines, delimiter=fmt['delimiter']))
+    values = [value.strip() for row in rows[1:] for value in row]
+
+    if fmt['delimiter'] != ',':
+        commas = sum(1 for value in values if _DECIMAL_COMMA.match(value))
+        points = sum(1 for value in values if _DECIMAL_POINT.match(value))
+        if commas > points:
+            fmt['decimal'] = ','
+
+    # Sans en-tête, la première ligne est entièrement numérique comme les suivantes
+    first = [value for value in rows[0] if value.strip()]
+    if len(rows) > 1 and first and all(_is_number(value) for value in first):
+        fmt['header'] = False
+    return fmt
+
+
+def read_csv(source, fmt: Dict[str, Any], **kwargs) -> pd.DataFrame:
+    """Lit un CSV en une passe avec le format détecté."""
+    df = pd.read_csv(
+        source,
+        encoding=fmt.get('encoding', 'utf-8'),
+        sep=fmt.get('delimiter', ','),
+        decimal=fmt.get('decimal', '.'),
+        header=0 if fmt.get('header', True) else None,
+        **kwargs
+    )
+    if not fmt.get('header', True):
+        df.columns = [f"Colonne {i + 1}" for i in range(len(df.columns))]
+    return df
+
+
+def file_signature(filepath: str) -> Tuple[int, int]:
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def remember_format(filepath: str, fmt: Dict[str, Any]) -> None:
+    """Mémorise le format d'un fichier dans le processus (jusqu'à sa modification)."""
+    signature = file_signature(filepath)
+    with _memo_lock:
+        _format_memo[filepath] = (signature, dict(fmt))
+        _format_memo.move_to_end(filepath)
+        while len(_format_memo) > FORMAT_MEMO_SIZE:
+            _format_memo.popitem(last=False)
+
+
+def get_csv_format(filepath: str) -> Dict[str, Any]:
+    """
+    Format d'un CSV : mémorisé, enregistré à l'upload, ou détecté sur échantillon.
+    """
+    signature = file_signature(filepath)
+    with _memo_lock:
+        memo = _format_memo.get(filepath)
+        if memo is not None and memo[0] == signature:
+            _format_memo.move_to_end(filepath)
+            return dict(memo[1])
+
+    fmt = load_recorded_format(filepath, signature) or detect_csv_format(filepath)
+    remember_format(filepath, fmt)
+    return fmt
+
+
+def read_csv_fallback(source, fmt: Dict[str, Any], **kwargs) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Lit un CSV avec son format ; si le contenu contient plus loin des octets
+    invalides pour l'encodage détecté sur l'échantillon, il est relu en
+    cp1252 puis latin-1.
+
+    Args:
+        source: Chemin ou fichier ouvert en binaire (rembobiné avant chaque relecture)
+
+    Returns:
+        Tuple (DataFrame, format effectivement utilisé)
+    """
+    try:
+        return read_csv(source, fmt, **kwargs), fmt
+    except UnicodeDecodeError:
+        for encoding in ('cp1252', 'latin-1'):
+            if encoding == fmt['encoding']:
+                continue
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            fixed = dict(fmt, encoding=encoding)
+            try:
+                return read_csv(source, fixed, **kwargs), fixed
+            except UnicodeDecodeError:
+                continue
+        raise
+
+
+def load_csv(filepath: str, **kwargs) -> pd.DataFrame:
+    """
+    Lit un CSV en une passe avec son format.
+
+    Si le fichier a dû être relu dans un autre encodage (`read_csv_fallback`),
+    le format mémorisé est corrigé.
+    """
+    fmt = get_csv_format(filepath)
+    df, used = read_csv_fallback(filepath, fmt, **kwargs)
+    if used is not fmt:
+        remember_format(filepath, used)
+    return df
+
+
+# -- DataFile.file_metadata -------------------------------------------------
+
+def _rollback():
+    try:
+        from app.extensions import db
+        db.session.rollback()
+    except Exception:
+        pass
+
+
+def file_metadata(filepath: str) -> Dict[str, Any]:
+    """Métadonnées à enregistrer pour un fichier uploadé (format CSV compris)."""
+    size, mtime_ns = file_signature(filepath)
+    metadata = {'size': size, 'mtime_ns': mtime_ns}
+    if filepath.endswith('.csv'):
+        metadata['csv_format'] = get_csv_format(filepath)
+    return metadata
+
+
+def record_file_metadata(filepath: str, user: Optional[str] = None,
+                         extra: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Enregistre les métadonnées du fichier dans la table `data_files`.
+
+    Args:
+        filepath: Chemin du fichier (son nom et `user` sont la clé de l'enregistrement)
+        user: Utilisateur à l'origine de l'upload
+        extra: Métadonnées supplémentaires (ex: empreinte du contenu)
+
+    Returns:
+        Les métadonnées enregistrées, ou None si la base est indisponible
+    """
+    from app.models.data_file import DataFile
+
+    metadata = file_metadata(filepath)
+    metadata.update(extra or {})
+    try:
+        DataFile.save_metadata(os.path.basename(filepath), metadata, user=user)
+        return metadata
+    except Exception as e:
+        _rollback()
+        logger.warning("Métadonnées du fichier %s non enregistrées: %s", filepath, e)
+        return None
+
+
+def load_recorded_metadata(filepath: str, signature: Optional[Tuple[int, int]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Métadonnées enregistrées à l'upload, si elles correspondent encore au fichier.
+
+    Hors contexte d'application ou base indisponible : None.
+    """
+    try:
+        from flask import has_app_context
+        if not has_app_context():
+            return None
+        from app.models.data_file import DataFile
+        record = DataFile.get_by_filename(os.path.basename(filepath))
+    except Exception as e:
+        _rollback()
+        logger.debug("Métadonnées indisponibles pour %s: %s", filepath, e)
+        return None
+    if record is None:
+        return None
+    metadata = record.metadata_dict()
+    signature = signature or file_signature(filepath)
+    if (metadata.get('size'), metadata.get('mtime_ns')) != tuple(signature):
+        return None
+    if metadata.get('sha256'):
+        # Nom associé depuis à un autre contenu (stockage par contenu)
+        from app.services.upload_store import UploadStore
+        sha256 = UploadStore(os.path.dirname(filepath)).sha256_of(filepath)
+        if sha256 and sha256 != metadata['sha256']:
+            return None
+    return metadata
+
+
+def load_recorded_format(filepath: str, signature: Optional[Tuple[int, int]] = None) -> Optional[Dict[str, Any]]:
+    """Format CSV enregistré à l'upload, s'il correspond encore au fichier."""
+    fmt = (load_recorded_metadata(filepath, signature) or {}).get('csv_format')
+    return dict(fmt) if isinstance(fmt, dict) else None
@@ -0,0 +1,134 @@
+"""
+Historique de prévision préalloué pour la boucle récursive.
+
+La boucle de prévision ajoutait chaque ligne prédite avec `pd.concat`, ce qui
+recopie tout l'historique à chaque pas. Ce buffer réserve dès le départ un
+tableau NumPy de taille historique + horizon pour la colonne cible et les
+bornes de l'intervalle de confiance, et précalcule les dates futures. Les
+autres colonnes, recopiées telles quelles à chaque pas par l'ancienne boucle,
+ne sont pas conservées : le moteur n'affiche que la cible et ses bornes.
+"""
+
+import math
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class ForecastHistoryBuffer:
+    """
+    Historique (lignes connues + lignes prédites) d'une prévision récursive.
+    """
+
+    def __init__(self, history: pd.DataFrame, target_col: str, horizon: int, time_offset):
+        """
+        Initialise le buffer.
+
+        Args:
+            history: DataFrame historique avec DatetimeIndex
+            target_col: Nom de la colonne cible
+            horizon: Nombre de pas de prévision
+            time_offset: Pas de temps entre deux prévisions (Timedelta ou DateOffset)
+
+        Raises:
+            ValueError: Si l'historique est vide ou si la colonne cible est absente
+        """
+        if history is None or len(history) == 0:
+            raise ValueError("Historique vide: impossible d'initialiser le buffer de prévision")
+        if target_col not in history.columns:
+            raise ValueError(f"La colonne cible '{target_col}' est introuvable dans l'historique")
+
+        self.target_col = target_col
+        self.horizon = max(0, int(horizon))
+        self.n_history = len(history)
+        self._history_index = history.index
+
+        self._values = np.empty(self.n_history + self.horizon, dtype=float)
+        self._values[:self.n_history] = pd.to_numeric(history[target_col], errors='coerce').to_numpy(dtype=float)
+        self._lower = np.empty(self.horizon, dtype=float)
+        self._upper = np.empty(self.horizon, dtype=float)
+        self._size = self.n_history
+
+        self._dates = self._future_dates(history.index[-1], time_offset)
+
+    def _future_dates(self, last_date, time_offset) -> List:
+        """Précalcule les dates des pas de prévision."""
+        dates = []
+        for step in range(1, self.horizon + 1):
+            if isinstance(last_date, pd.Timestamp) and not pd.isna(last_date):
+                last_date = last_date + time_offset
+                dates.append(last_date)
+            else:
+                # Index sans date exploitable : même repli que l'ancienne boucle
+                dates.append(pd.Timestamp.now() + pd.Timedelta(days=step))
+        return dates
+
+    @property
+    def n_forecast(self) -> int:
+        """Nombre de pas déjà prédits."""
+        return self._size - self.n_history
+
+    @property
+    def next_date(self):
+        """Date du prochain pas de prévision."""
+        if self.n_forecast >= self.horizon:
+            raise IndexError("Horizon de prévision atteint")
+        return self._dates[self.n_forecast]
+
+    @property
+    def last_value(self) -> float:
+        """Dernière valeur connue ou prédite de la cible."""
+        return float(self._values[self._size - 1])
+
+    @property
+    def last_date(self):
+        """Date de la dernière ligne (historique ou prévision)."""
+        if self.n_forecast == 0:
+            return self._history_index[-1]
+        return self._dates[self.n_forecast - 1]
+
+    def append(self, value: float, lower: float = math.nan, upper: float = math.nan):
+        """
+        Ajoute une ligne prédite.
+
+        Args:
+            value: Valeur prédite de la cible
+            lower: Borne inférieure de l'intervalle de confiance
+            upper: Borne supérieure de l'intervalle de confiance
+
+        Returns:
+            La date de la ligne ajoutée
+        """
+        date = self.next_date
+        step = self.n_forecast
+        self._values[self._size] = value
+        self._lower[step] = lower
+        self._upper[step] = upper
+        self._size += 1
+        return date
+
+    @property
+    def values(self) -> np.ndarray:
+        """Valeurs de la cible (historique puis prévisions), vue sans copie."""
+        return self._values[:self._size]
+
+    @property
+    def forecast_values(self) -> np.ndarray:
+        """Valeurs prédites."""
+        return self._values[self.n_history:self._size]
+
+    @property
+    def lower_bounds(self) -> np.ndarray:
+        """Bornes inférieures des pas prédits."""
+        return self._lower[:self.n_forecast]
+
+    @property
+    def upper_bounds(self) -> np.ndarray:
+        """Bornes supérieures des pas prédits."""
+        return self._upper[:self.n_forecast]
+
+    @property
+    def forecast_dates(self) -> List:
+        """Dates des pas prédits."""
+        return self._dates[:self.n_forecast]
@@ -0,0 +1,248 @@
+"""
+Cache des résultats de prévision, adressé par contenu.
+
+La clé combine l'empreinte SHA-256 du fichier de données, celle du modèle et
+les paramètres normalisés (cible, nombre de pas, intervalle, confiance). Un
+fichier remplacé (nouvel upload, modèle réentraîné) change d'empreinte : les
+anciens résultats ne sont plus jamais lus et expirent d'eux-mêmes.
+
+Les résultats sont stockés dans le backend Flask-Caching (Redis en
+production). Les calculs identiques simultanés sont regroupés : un seul
+calcule, les autres attendent son résultat (dans le processus via un
+événement, entre processus via un verrou `cache.add`).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'forecast:v1:'
+DEFAULT_TIMEOUT = 3600
+DIGEST_MEMO_SIZE = 256
+
+_digest_memo: 'OrderedDict[str, Tuple[int, int, str]]' = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def content_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Empreinte SHA-256 du contenu d'un fichier.
+
+    Mémorisée par (taille, date de modification) : le fichier n'est relu que
+    s'il a changé.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        memo = _digest_memo.get(path)
+        if memo is not None and memo[:2] == signature:
+            _digest_memo.move_to_end(path)
+            return memo[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    hexdigest = digest.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[path] = signature + (hexdigest,)
+        _digest_memo.move_to_end(path)
+        while len(_digest_memo) > DIGEST_MEMO_SIZE:
+            _digest_memo.popitem(last=False)
+    return hexdigest
+
+
+class _InFlight:
+    """Calcul en cours pour une clé (partagé par les requêtes identiques du processus)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ForecastCache:
+    """
+    Cache des prévisions avec regroupement des calculs identiques.
+
+    Sans contexte d'application (ex: processus de jobs `spawn`), le cache
+    Flask n'est pas disponible : seuls les calculs simultanés du processus
+    sont regroupés.
+    """
+
+    def __init__(self, cache=None, timeout: Optional[int] = None, lock_timeout: int = 300,
+                 wait_interval: float = 0.1):
+        self._cache = cache
+        self._timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_interval = wait_interval
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    # -- Backend -----------------------------------------------------------
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from app.extensions import cache
+            return cache
+        return self._cache
+
+    @property
+    def timeout(self) -> int:
+        if self._timeout is not None:
+            return self._timeout
+        try:
+            from flask import current_app
+            return int(current_app.config.get('FORECAST_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+        except RuntimeError:
+            return DEFAULT_TIMEOUT
+
+    def _backend_call(self, method: str, *args, **kwargs):
+        """Appel au cache Flask ; None si le cache est indisponible."""
+        try:
+            return getattr(self.cache, method)(*args, **kwargs)
+        except RuntimeError:
+            # Hors contexte d'application
+            return None
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning("Cache des prévisions indisponible (%s): %s", method, e)
+            return None
+
+    # -- Clés --------------------------------------------------------------
+
+    @staticmethod
+    def key(data_path: str, model_path: str, target: str, steps: int, interval: str,
+            confidence: float, model_sha256: Optional[str] = None) -> str:
+        """Clé du résultat : empreintes du fichier et du modèle + paramètres normalisés."""
+        parts = [
+            content_digest(data_path),
+            model_sha256 or content_digest(model_path),
+            str(target).strip(),
+            int(steps),
+            str(interval).strip().lower(),
+            float(confidence),
+        ]
+        raw = json.dumps(parts, separators=(',', ':'))
+        return KEY_PREFIX + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    # -- Lecture / calcul --------------------------------------------------
+
+    def enabled(self) -> bool:
+        return self.timeout > 0
+
+    def get(self, key: str):
+        """Résultat en cache ou None."""
+        if not self.enabled():
+            return None
+        cached = self._backend_call('get', key)
+        if cached is not None:
+            self._count('hits')
+        return cached
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Retourne le résultat en cache ou le calcule une seule fois.
+
+        Returns:
+            Tuple (résultat, True si le résultat n'a pas été calculé par cet appel)
+        """
+        if not self.enabled():
+            return compute(), False
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.result, True
+
+        try:
+            result, shared = self._compute_once(key, compute)
+            inflight.result = result
+            return result, shared
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+
+    def _compute_once(self, key, compute):
+        """Calcule sous verrou distribué ; attend le résultat si un autre processus calcule déjà."""
+        lock_key = f"{key}:lock"
+        acquired = self._backend_call('add', lock_key, os.getpid(), timeout=self.lock_timeout) is not False
+        if not acquired:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                cached = self._backend_call('get', key)
+                if cached is not None:
+                    self._count('coalesced')
+                    return cached, True
+                if self._backend_call('get', lock_key) is None:
+                    # Le calcul concurrent a échoué ou a expiré : on calcule nous-mêmes
+                    break
+
+        self._count('misses')
+        try:
+            result = compute()
+            self._backend_call('set', key, result, timeout=self.timeout)
+            return result, False
+        finally:
+            if acquired:
+                self._backend_call('delete', lock_key)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache des prévisions."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._inflight)
+        stats['timeout'] = self.timeout
+        return stats
+
+
+_forecast_cache_instance = None
+_forecast_cache_lock = threading.Lock()
+
+
+def get_forecast_cache() -> ForecastCache:
+    """
+    Obtient l'instance singleton du cache des prévisions.
+
+    Returns:
+        Instance de ForecastCache (utilise `app.extensions.cache`)
+    """
+    global _forecast_cache_instance
+
+    with _forecast_cache_lock:
+        if _forecast_cache_instance is None:
+            _forecast_cache_instance = ForecastCache()
+        return _forecast_cache_instance
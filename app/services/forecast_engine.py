@@ -0,0 +1,363 @@
+"""
+Moteur de prévision unique.
+
+La route `/previsions/`, les jobs en arrière-plan et la page Streamlit des
+prévisions appellent tous `ForecastEngine.forecast` (ou la fonction `forecast`
+du module) : préparation des données, boucle récursive (features
+incrémentales, historique préalloué), intervalle de confiance et métriques
+sont calculés au même endroit.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import DateOffset
+
+from app import utils as _utils
+from app.services.feature_engine import IncrementalFeatureEngine
+from app.services.forecast_buffer import ForecastHistoryBuffer
+
+# Intervalles de prévision supportés
+FORECAST_INTERVALS = {
+    'heure': pd.Timedelta(hours=1),
+    'jour': pd.Timedelta(days=1),
+    'semaine': pd.Timedelta(weeks=1),
+    'mois': DateOffset(months=1)
+}
+
+# z-scores de l'intervalle de confiance (95% par défaut)
+Z_SCORES = {90: 1.645, 95: 1.96, 99: 2.576}
+DEFAULT_Z_SCORE = 1.96
+
+# Nombre de lignes d'historique affichées avec la prévision
+HISTORY_DISPLAY_ROWS = 50
+
+DISPLAY_COLUMNS = ['Période', 'Date', 'Prévision', 'Variation', 'Borne inf.', 'Borne sup.']
+
+
+def _clean_float(value) -> float:
+    """Convertit en float en remplaçant NaN/Inf par 0.0."""
+    value = float(value)
+    return 0.0 if np.isnan(value) or np.isinf(value) else value
+
+
+def calculate_forecast_metrics(historical_data, forecast_data, target_column):
+    """Calcule les métriques de prévision avec gestion des NaN."""
+    # Fonction helper pour nettoyer les NaN
+    def clean_nan(value):
+        return 0.0 if np.isnan(value) or np.isinf(value) else float(value)
+
+    metrics = {
+        'historical_mean': clean_nan(historical_data[target_column].mean()),
+        'historical_std': clean_nan(historical_data[target_column].std()),
+        'forecast_mean': clean_nan(forecast_data[target_column].mean()),
+        'forecast_range': [
+            clean_nan(forecast_data[target_column].min()),
+            clean_nan(forecast_data[target_column].max())
+        ],
+        'confidence_range': [
+            clean_nan(forecast_data['lower_bound'].min()),
+            clean_nan(forecast_data['upper_bound'].max())
+        ]
+    }
+    return metrics
+
+
+class ForecastResult:
+    """
+    Résultat d'une prévision.
+
+    Attributes:
+        target_column: Colonne prédite (après résolution du nom)
+        forecast_df: DataFrame indexé par date ('%Y-%m-%d') avec la prévision,
+            `lower_bound`, `upper_bound` et `<cible>_diff`
+        historical_data: Dernières lignes de l'historique (pour l'affichage)
+        metrics: Métriques calculées par `calculate_forecast_metrics`
+        dates: Dates (Timestamp) des pas prédits
+        errors: Erreurs rencontrées pendant la boucle (pas remplacés par la dernière valeur)
+        warnings: Avertissements de compatibilité modèle / données
+    """
+
+    def __init__(self, target_column, forecast_df, historical_data, metrics, dates, errors=None, warnings=None):
+        self.target_column = target_column
+        self.forecast_df = forecast_df
+        self.historical_data = historical_data
+        self.metrics = metrics
+        self.dates = dates
+        self.errors = errors or []
+        self.warnings = warnings or []
+
+    @property
+    def values(self) -> List[float]:
+        """Valeurs prédites."""
+        return self.forecast_df[self.target_column].tolist()
+
+    def display_data(self) -> List[Dict[str, Any]]:
+        """Lignes du tableau de prévision affiché à l'utilisateur."""
+        target_column = self.target_column
+        display_data = []
+        for i, (date, row) in enumerate(self.forecast_df.iterrows(), 1):
+            display_data.append({
+                'Période': i,
+                'Date': date if isinstance(date, str) else date.strftime('%Y-%m-%d'),
+                'Prévision': round(_clean_float(row[target_column]), 4),
+                'Variation': round(_clean_float(row.get(f'{target_column}_diff', 0.0)), 6),
+                'Borne inf.': round(_clean_float(row.get('lower_bound', 0.0)), 4),
+                'Borne sup.': round(_clean_float(row.get('upper_bound', 0.0)), 4)
+            })
+        return display_data
+
+
+def _resolve_model(model, feature_cols=None):
+    """
+    Accepte un LoadedModel du registre, un artifact (dict) ou un estimateur.
+
+    Returns:
+        Tuple (estimateur, feature_columns normalisées)
+    """
+    if isinstance(model, tuple) and len(model) == 3:
+        estimator, cols = model[0], model[1]
+    elif isinstance(model, dict):
+        estimator, cols, _ = _utils.validate_model_artifact(model)
+    else:
+        estimator = model
+        cols = feature_cols if feature_cols is not None else getattr(model, 'feature_names_in_', None)
+        if cols is None:
+            raise ValueError("Les colonnes de features du modèle sont inconnues: fournissez feature_cols")
+    if feature_cols is not None:
+        cols = feature_cols
+    return estimator, _utils.normalize_feature_columns(list(cols))
+
+
+def _advance(history_buffer, feature_engine, value: float, lower: float, upper: float) -> None:
+    """
+    Ajoute un pas prédit à l'historique et au moteur de features, en une étape.
+
+    Le moteur avance en premier (`push` convertit la valeur avant toute
+    modification) : si l'appel échoue, ni l'un ni l'autre n'a avancé et le
+    pas peut être rejoué sans doublon.
+    """
+    feature_engine.push(value, history_buffer.next_date)
+    history_buffer.append(value, lower, upper)
+
+
+class ForecastEngine:
+    """
+    Prévision récursive à partir d'un modèle de différences de prix.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            logger: Logger utilisé pour les messages (ex: current_app.logger)
+        """
+        self.logger = logger or logging.getLogger(__name__)
+
+    def prepare(self, df: pd.DataFrame, target_column: str, feature_cols: List[str]):
+        """
+        Nettoie les données et vérifie leur compatibilité avec le modèle.
+
+        Returns:
+            Tuple (DataFrame aligné sur les lignes exploitables, colonne cible, avertissements)
+
+        Raises:
+            ValueError: Si la colonne cible est introuvable ou si la préparation échoue
+        """
+        df = df.copy()
+
+        # Aplatir les MultiIndex columns si présents
+        if isinstance(df.columns, pd.MultiIndex):
+            self.logger.info("MultiIndex columns détecté, aplatissement en cours...")
+            df.columns = ['_'.join(str(c) for c in col).strip() if isinstance(col, tuple) else str(col)
+                         for col in df.columns.values]
+            self.logger.info(f"Nouvelles colonnes après aplatissement: {list(df.columns)}")
+
+        # Forcer les noms de colonnes à être des strings simples
+        df.columns = [str(col) for col in df.columns]
+        self.logger.info(f"Colonnes disponibles: {list(df.columns)}")
+
+        if isinstance(target_column, tuple):
+            target_column = '_'.join(str(c) for c in target_column).strip()
+            self.logger.info(f"target_column converti en: {target_column}")
+
+        # Vérifier que la colonne cible existe
+        if target_column not in df.columns:
+            possible_cols = [col for col in df.columns if target_column.lower() in col.lower() or col.lower() in target_column.lower()]
+            if possible_cols:
+                actual_target = possible_cols[0]
+                self.logger.warning(f"Colonne '{target_column}' non trouvée. Utilisation de '{actual_target}' à la place.")
+                target_column = actual_target
+            else:
+                raise ValueError(f"La colonne '{target_column}' n'existe pas dans le fichier. Colonnes disponibles: {list(df.columns)}")
+
+        # S'assurer que le DataFrame a un index datetime
+        df = _utils.ensure_datetime_index(df)
+
+        try:
+            X, y, feature_cols_raw = _utils.prepare_data_for_ml(df, target_column)
+        except Exception as e:
+            self.logger.error(f"Erreur dans prepare_data_for_ml: {str(e)}")
+            raise ValueError(f"Erreur lors de la préparation des données: {str(e)}")
+
+        # Valider la compatibilité entre le modèle et les données
+        feature_cols_generated = _utils.normalize_feature_columns(feature_cols_raw)
+        is_compatible, missing_cols, extra_cols, warnings = _utils.validate_model_data_compatibility(
+            feature_cols, feature_cols_generated, X
+        )
+        for warning in warnings:
+            self.logger.warning(warning)
+        if not is_compatible:
+            self.logger.warning(f"Colonnes manquantes: {missing_cols[:10]}. Elles seront remplies avec des valeurs par défaut.")
+
+        return df.reindex(X.index), target_column, warnings
+
+    def forecast(self, df: pd.DataFrame, model, target: str = 'Close', steps: int = 10,
+                 interval: str = 'jour', confidence: float = 95,
+                 feature_cols: Optional[List[str]] = None,
+                 progress: Optional[Callable[[int, int], None]] = None) -> ForecastResult:
+        """
+        Calcule une prévision récursive.
+
+        Args:
+            df: Données historiques (telles que chargées depuis le fichier)
+            model: LoadedModel du registre, artifact (dict) ou estimateur
+            target: Colonne à prédire
+            steps: Nombre de pas de prévision
+            interval: Intervalle entre deux pas ('heure', 'jour', 'semaine', 'mois')
+            confidence: Niveau de confiance en % (90, 95 ou 99)
+            feature_cols: Colonnes de features (obligatoire pour un estimateur seul)
+            progress: Appelé après chaque pas avec (pas effectués, total)
+
+        Returns:
+            ForecastResult
+
+        Raises:
+            ValueError: Si les paramètres ou les données ne permettent pas de prévoir
+        """
+        if interval not in FORECAST_INTERVALS:
+            raise ValueError(f"Intervalle de prévision non supporté: {interval}")
+        time_offset = FORECAST_INTERVALS[interval]
+        steps = int(steps)
+        estimator, feature_cols = _resolve_model(model, feature_cols)
+
+        df, target_column, warnings = self.prepare(df, target, feature_cols)
+
+        # S'assurer que l'historique de la boucle a un DatetimeIndex
+        current_df = _utils.ensure_datetime_index(df.copy())
+
+        # Écart-type initial pour l'intervalle de confiance
+        initial_std = np.std(current_df[target_column].diff().dropna())
+        if np.isnan(initial_std) or initial_std == 0:
+            initial_std = current_df[target_column].std() * 0.01 if current_df[target_column].std() > 0 else 1.0
+
+        z_score = Z_SCORES.get(int(confidence), DEFAULT_Z_SCORE)
+        errors_encountered = []
+
+        # Historique préalloué (historique + horizon, dates précalculées) et
+        # features calculées incrémentalement : aucune copie du DataFrame par pas
+        history_buffer = ForecastHistoryBuffer(current_df, target_column, steps, time_offset)
+        feature_engine = IncrementalFeatureEngine(current_df, target_column, feature_cols)
+
+        for i in range(1, steps + 1):
+            try:
+                # Features de la dernière ligne, dans l'ordre attendu par le modèle
+                X_latest = feature_engine.feature_frame()
+
+                try:
+                    prediction = estimator.predict(X_latest)
+                    predicted_diff = float(prediction[0])
+
+                    # Valider que la prédiction est raisonnable
+                    if np.isnan(predicted_diff) or np.isinf(predicted_diff):
+                        self.logger.warning(f"Prédiction NaN/Inf à l'itération {i}, utilisation de 0.0")
+                        predicted_diff = 0.0
+                except Exception as e:
+                    self.logger.warning(f"Prédiction échouée à l'itération {i}: {e}")
+                    predicted_diff = 0.0
+
+                # Marge d'erreur à partir de l'écart-type des différences récentes
+                std_dev = feature_engine.recent_diff_std()
+                if np.isnan(std_dev) or std_dev == 0:
+                    std_dev = initial_std
+                margin_error = z_score * std_dev
+
+                last_known_price = history_buffer.last_value
+                new_price = last_known_price + predicted_diff
+
+                # Valider que le nouveau prix est raisonnable
+                if np.isnan(new_price) or np.isinf(new_price):
+                    self.logger.warning(f"Prix calculé invalide à l'itération {i}, utilisation du dernier prix")
+                    new_price = last_known_price
+
+                _advance(history_buffer, feature_engine, new_price,
+                         new_price - margin_error, new_price + margin_error)
+
+            except Exception as e:
+                error_msg = f"Erreur à l'itération {i}: {str(e)}"
+                self.logger.error(error_msg)
+                errors_encountered.append(error_msg)
+
+                # En cas d'erreur critique, arrêter si c'est la première itération
+                if i == 1:
+                    raise ValueError(f"Échec de la première itération de prévision: {e}")
+
+                # Pour les itérations suivantes, répéter la dernière valeur valide
+                # (aussi dans le moteur de features, qui reste aligné sur l'historique)
+                last_value = history_buffer.last_value
+                try:
+                    _advance(history_buffer, feature_engine, last_value, last_value * 0.95, last_value * 1.05)
+                except Exception as fallback_error:
+                    self.logger.error(f"Prévision interrompue à l'itération {i}: {fallback_error}")
+                    break
+
+            if progress is not None:
+                progress(i, steps)
+
+        if errors_encountered:
+            self.logger.warning(f"{len(errors_encountered)} erreurs rencontrées pendant les prévisions")
+
+        if history_buffer.n_forecast == 0:
+            raise ValueError("Aucune prévision n'a pu être générée. Vérifiez vos données et votre modèle.")
+
+        forecast_dates = list(history_buffer.forecast_dates)
+        forecast_values = [_clean_float(v) for v in history_buffer.forecast_values]
+        lower_bounds = [_clean_float(v) for v in history_buffer.lower_bounds]
+        upper_bounds = [_clean_float(v) for v in history_buffer.upper_bounds]
+
+        # Variations par rapport au pas précédent (le premier par rapport au dernier prix connu)
+        base_value = _clean_float(df[target_column].iloc[-1])
+        diff_values = [_clean_float(v) for v in np.diff(np.asarray([base_value] + forecast_values))]
+
+        forecast_df = pd.DataFrame({
+            'Date': [d.strftime('%Y-%m-%d') for d in forecast_dates],
+            target_column: forecast_values,
+            'lower_bound': lower_bounds,
+            'upper_bound': upper_bounds,
+            f'{target_column}_diff': diff_values
+        }).set_index('Date')
+
+        historical_data = df.iloc[-min(HISTORY_DISPLAY_ROWS, len(df)):]
+        metrics = calculate_forecast_metrics(historical_data, forecast_df, target_column)
+
+        return ForecastResult(
+            target_column=target_column,
+            forecast_df=forecast_df,
+            historical_data=historical_data,
+            metrics=metrics,
+            dates=forecast_dates,
+            errors=errors_encountered,
+            warnings=warnings
+        )
+
+
+def forecast(df: pd.DataFrame, model, target: str = 'Close', steps: int = 10, interval: str = 'jour',
+             confidence: float = 95, feature_cols: Optional[List[str]] = None,
+             logger: Optional[logging.Logger] = None,
+             progress: Optional[Callable[[int, int], None]] = None) -> ForecastResult:
+    """Raccourci pour `ForecastEngine(logger).forecast(...)`."""
+    return ForecastEngine(logger=logger).forecast(
+        df, model, target=target, steps=steps, interval=interval,
+        confidence=confidence, feature_cols=feature_cols, progress=progress
+    )
@@ -0,0 +1,147 @@
+"""
+Représentation compacte en mémoire des DataFrames chargés.
+
+pandas lit les prix en float64, les volumes en int64 et les dates ou les
+tickers en chaînes Python (`object`). `compact_dataframe` convertit chaque
+colonne vers un type plus économe quand c'est sans perte :
+
+- dates textuelles -> datetime64 (une seule analyse, au chargement) ;
+- float64 -> float32 si les valeurs sont identiques après conversion (ou
+  dans la tolérance relative DATAFRAME_FLOAT_TOLERANCE) ;
+- int64 -> int32 si toutes les valeurs tiennent sur 32 bits ;
+- chaînes peu variées -> category.
+
+L'occupation mémoire avant/après est conservée dans `df.attrs['memory']`.
+"""
+
+import logging
+import os
+import re
+import warnings
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOAT_TOLERANCE = 0.0
+DEFAULT_CATEGORY_RATIO = 0.5
+DATE_SAMPLE_SIZE = 100
+
+# AAAA-MM-JJ, JJ/MM/AAAA, AAAA.MM.JJ... (éventuellement suivi d'une heure)
+_DATE_PATTERN = re.compile(r'^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}(?:[ T]\d{1,2}:\d{2}.*)?\s*$')
+# Convention française : le jour en premier lorsque l'année est à la fin
+_DAY_FIRST_PATTERN = re.compile(r'^\s*\d{1,2}[/.]\d{1,2}[/.]\d{4}')
+
+_INT32 = np.iinfo(np.int32)
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    """Occupation mémoire du DataFrame en octets (chaînes comprises)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _parse_dates(series: pd.Series) -> Optional[pd.Series]:
+    """Colonne convertie en datetime64, ou None si ce ne sont pas toutes des dates."""
+    sample = series.dropna().iloc[:DATE_SAMPLE_SIZE]
+    if sample.empty or not all(isinstance(v, str) and _DATE_PATTERN.match(v) for v in sample):
+        return None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return pd.to_datetime(series, dayfirst=bool(_DAY_FIRST_PATTERN.match(sample.iloc[0])))
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _downcast_float(series: pd.Series, tolerance: float) -> Optional[pd.Series]:
+    values = series.to_numpy()
+    with np.errstate(over='ignore', invalid='ignore'):
+        compact = values.astype(np.float32)
+        restored = compact.astype(np.float64)
+        same = (restored == values) | (np.isnan(values) & np.isnan(restored))
+        if tolerance > 0:
+            same |= np.abs(restored - values) <= tolerance * np.abs(values)
+    if not same.all():
+        return None
+    return pd.Series(compact, index=series.index, name=series.name)
+
+
+def _downcast_int(series: pd.Series) -> Optional[pd.Series]:
+    if series.empty or series.min() < _INT32.min or series.max() > _INT32.max:
+        return None
+    return series.astype(np.int32)
+
+
+def _to_category(series: pd.Series, ratio: float) -> Optional[pd.Series]:
+    if series.empty or series.nunique(dropna=True) > ratio * len(series):
+        return None
+    try:
+        category = series.astype('category')
+    except TypeError:
+        return None
+    # Sur quelques lignes, le dictionnaire coûte plus que les chaînes
+    if category.memory_usage(deep=True) >= series.memory_usage(deep=True):
+        return None
+    return category
+
+
+def compact_dataframe(df: pd.DataFrame, float_tolerance: Optional[float] = None,
+                      category_ratio: Optional[float] = None) -> pd.DataFrame:
+    """
+    Retourne `df` avec des types compacts (le DataFrame d'origine est inchangé).
+
+    Args:
+        df: DataFrame tel que lu depuis le fichier
+        float_tolerance: Écart relatif admis pour passer en float32 (0 = sans perte)
+        category_ratio: Proportion maximale de valeurs distinctes pour une category
+
+    Returns:
+        DataFrame compact ; `attrs['memory']` = {'before': octets, 'after': octets}
+    """
+    options = compaction_options()
+    if float_tolerance is None:
+        float_tolerance = options['float_tolerance']
+    if category_ratio is None:
+        category_ratio = options['category_ratio']
+
+    before = memory_usage(df)
+    result = df.copy(deep=False)
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        dtype = series.dtype
+        converted = None
+        if dtype == np.float64:
+            converted = _downcast_float(series, float_tolerance)
+        elif dtype == np.int64:
+            converted = _downcast_int(series)
+        elif dtype == object:
+            converted = _parse_dates(series)
+            if converted is None:
+                converted = _to_category(series, category_ratio)
+        if converted is not None:
+            result.isetitem(position, converted)
+
+    after = memory_usage(result)
+    result.attrs['memory'] = {'before': before, 'after': after}
+    logger.debug("DataFrame compacté: %d -> %d octets", before, after)
+    return result
+
+
+def compaction_options() -> Dict[str, Any]:
+    """
+    Réglages de la compaction : configuration Flask si disponible, sinon
+    variables d'environnement (Streamlit, scripts).
+    """
+    try:
+        from flask import current_app
+        config = current_app.config
+        enabled = config.get('DATAFRAME_COMPACT', True)
+        tolerance = config.get('DATAFRAME_FLOAT_TOLERANCE', DEFAULT_FLOAT_TOLERANCE)
+        ratio = config.get('DATAFRAME_CATEGORY_RATIO', DEFAULT_CATEGORY_RATIO)
+    except RuntimeError:
+        enabled = os.environ.get('DATAFRAME_COMPACT', 'true').lower() == 'true'
+        tolerance = os.environ.get('DATAFRAME_FLOAT_TOLERANCE', DEFAULT_FLOAT_TOLERANCE)
+        ratio = os.environ.get('DATAFRAME_CATEGORY_RATIO', DEFAULT_CATEGORY_RATIO)
+    return {'enabled': bool(enabled), 'float_tolerance': float(tolerance), 'category_ratio': float(ratio)}
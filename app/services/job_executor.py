@@ -0,0 +1,429 @@
+"""
+Exécuteur des jobs en arrière-plan (prévisions longues).
+
+Trois backends, choisis par `JOB_EXECUTOR_BACKEND` :
+
+- `threads` : pool de threads dans le worker gunicorn (comportement historique).
+  Simple, mais la boucle de prévision (Python/pandas) garde le GIL : les jobs
+  s'exécutent les uns après les autres et ralentissent les requêtes du worker.
+- `processes` : pool de processus créé avec le contexte `spawn` ou `forkserver`
+  (`JOB_EXECUTOR_START_METHOD`). Chaque processus précharge les modèles de
+  `MODELS_DIR` au démarrage.
+- `external` : les jobs sont déposés dans une file sur disque
+  (`logs/jobs/queue/`) et exécutés par `scripts/job_worker.py`, éventuellement
+  sur une autre machine partageant le dossier.
+
+La file est bornée : au-delà de `JOB_EXECUTOR_WORKERS + JOB_QUEUE_MAX` jobs en
+cours, `submit_job` lève `JobQueueFull` (HTTP 429 avec Retry-After).
+
+Les tâches de fond courtes (`submit_background`) ont leur propre petit pool de
+threads (`JOB_BACKGROUND_WORKERS`), lui aussi borné : au-delà de
+`JOB_BACKGROUND_WORKERS + JOB_BACKGROUND_QUEUE_MAX` tâches, la tâche est
+abandonnée. Elles ne prennent donc jamais la place des prévisions.
+"""
+
+import importlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from app.services.job_store import job_store_settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('threads', 'processes', 'external')
+START_METHODS = ('spawn', 'forkserver')
+
+
+class JobQueueFull(Exception):
+    """La file des jobs est pleine (à traduire en HTTP 429)."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobExecutorUnavailable(Exception):
+    """L'exécuteur ne peut pas accepter de jobs (à traduire en HTTP 503)."""
+
+    def __init__(self, message, retry_after=30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def task_path(fn) -> str:
+    """Chemin importable d'une fonction (`module:nom`)."""
+    return f"{fn.__module__}:{fn.__qualname__}"
+
+
+def resolve_task(path: str):
+    """Importe la fonction désignée par `module:nom`."""
+    module_name, _, name = path.partition(':')
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _init_process_worker(models_dir, registry_size, mmap_mode, preload, store_settings=None,
+                         cache_settings=None):
+    """Initialise un processus du pool : stockage des jobs, cache, registre de modèles et préchargement."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    if cache_settings:
+        # Application minimale dont le contexte reste actif pendant toute la vie du
+        # processus : le cache Flask (résultats de prévision) y est accessible
+        from flask import Flask
+        from app.extensions import cache
+        worker_app = Flask('job_worker')
+        worker_app.config.update(cache_settings)
+        cache.init_app(worker_app)
+        from app.services.cache_serializer import install_frame_serializer
+        install_frame_serializer(worker_app.extensions['cache'][cache], worker_app.config)
+        worker_app.app_context().push()
+
+    if store_settings:
+        from app.services.job_store import configure_job_store
+        configure_job_store(store_settings)
+
+    from app.services.model_registry import get_model_registry
+    registry = get_model_registry(registry_size, mmap_mode=mmap_mode)
+    if preload and models_dir:
+        registry.preload(models_dir, freeze=False)
+
+
+def _run_in_app_context(app, fn, *args):
+    with app.app_context():
+        return fn(*args)
+
+
+def claim_external_job(queue_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Réserve le plus ancien job de la file externe.
+
+    Le fichier est renommé en `.<jobid>.running` : le renommage est atomique,
+    un seul worker obtient donc chaque job même si plusieurs partagent la file.
+    """
+    try:
+        names = sorted(
+            (name for name in os.listdir(queue_dir) if name.endswith('.json') and not name.startswith('.')),
+            key=lambda name: os.path.getmtime(os.path.join(queue_dir, name))
+        )
+    except OSError:
+        return None
+    for name in names:
+        running_path = os.path.join(queue_dir, f".{name[:-len('.json')]}.running")
+        try:
+            os.rename(os.path.join(queue_dir, name), running_path)
+        except OSError:
+            # Déjà pris par un autre worker
+            continue
+        try:
+            with open(running_path, encoding='utf-8') as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.error("Job illisible %s: %s", name, e)
+            os.remove(running_path)
+            continue
+        payload['_path'] = running_path
+        return payload
+    return None
+
+
+def run_external_job(payload: Dict[str, Any]) -> bool:
+    """Exécute un job réservé par `claim_external_job` puis le retire de la file."""
+    jobid = payload.get('jobid')
+    try:
+        fn = resolve_task(payload['task'])
+        fn(jobid, *payload.get('args', []))
+        return True
+    except Exception as e:
+        logger.error("Job %s interrompu: %s", jobid, e)
+        from app import utils as _utils
+        _utils.write_job_error(jobid, f"Job interrompu: {e}")
+        return False
+    finally:
+        try:
+            os.remove(payload['_path'])
+        except (KeyError, OSError):
+            pass
+
+
+class JobExecutor:
+    """
+    Exécuteur configurable avec file bornée et compteurs.
+
+    S'utilise comme une extension Flask : l'instance est créée dans
+    `app.extensions` puis configurée par `init_app`. Avant `init_app`, les jobs
+    sont exécutés dans un pool de 4 threads.
+    """
+
+    def __init__(self, app=None):
+        self.backend = 'threads'
+        self.max_workers = 4
+        self.queue_max = 16
+        self.retry_after = 5
+        self.start_method = 'spawn'
+        self.queue_dir = None
+        self.background_workers = 2
+        self.background_queue_max = 8
+        self._pool = None
+        self._background_pool = None
+        self._background_in_flight = 0
+        self._pool_args = None
+        self._app = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'background_submitted': 0,
+            'background_dropped': 0,
+        }
+        self._avg_seconds = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure l'exécuteur à partir de la configuration de l'application."""
+        backend = str(app.config.get('JOB_EXECUTOR_BACKEND', 'threads')).lower()
+        if backend not in BACKENDS:
+            app.logger.warning(f"JOB_EXECUTOR_BACKEND inconnu: {backend}. Utilisation de 'threads'.")
+            backend = 'threads'
+        start_method = str(app.config.get('JOB_EXECUTOR_START_METHOD', 'spawn')).lower()
+        if start_method not in START_METHODS or start_method not in multiprocessing.get_all_start_methods():
+            app.logger.warning(f"JOB_EXECUTOR_START_METHOD non supporté: {start_method}. Utilisation de 'spawn'.")
+            start_method = 'spawn'
+
+        self.shutdown(wait=False)
+        with self._lock:
+            self.backend = backend
+            self.start_method = start_method
+            self.max_workers = max(1, int(app.config.get('JOB_EXECUTOR_WORKERS', 4)))
+            self.queue_max = max(0, int(app.config.get('JOB_QUEUE_MAX', 16)))
+            self.retry_after = max(1, int(app.config.get('JOB_RETRY_AFTER', 5)))
+            self.queue_dir = app.config.get('JOB_QUEUE_DIR')
+            self.background_workers = max(1, int(app.config.get('JOB_BACKGROUND_WORKERS', 2)))
+            self.background_queue_max = max(0, int(app.config.get('JOB_BACKGROUND_QUEUE_MAX', 8)))
+            self._pool_args = (
+                app.config.get('MODELS_DIR'),
+                app.config.get('MODEL_REGISTRY_SIZE'),
+                app.config.get('MODEL_MMAP_MODE'),
+                app.config.get('JOB_WORKER_PRELOAD_MODELS', True),
+                job_store_settings(app.config),
+                {key: value for key, value in app.config.items()
+                 if key.startswith(('CACHE_', 'MARKET_STORE_', 'STOCK_API_', 'DATAFRAME_', 'RATE_LIMIT_'))
+                 or key == 'FORECAST_CACHE_TIMEOUT'},
+            )
+            self._app = app
+
+        app.extensions['job_executor'] = self
+
+    # -- Pools -------------------------------------------------------------
+
+    def _get_pool(self):
+        """Crée le pool à la première soumission (après le fork des workers gunicorn)."""
+        with self._lock:
+            if self._pool is None:
+                if self.backend == 'processes':
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_process_worker,
+                        initargs=self._pool_args or (None, None, None, False, None, None)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            return self._pool
+
+    def _get_background_pool(self):
+        with self._lock:
+            if self._background_pool is None:
+                self._background_pool = ThreadPoolExecutor(max_workers=self.background_workers,
+                                                           thread_name_prefix='background')
+            return self._background_pool
+
+    def shutdown(self, wait=True):
+        """Arrête les pools courants (de nouveaux pools sont créés à la prochaine soumission)."""
+        with self._lock:
+            pools = (self._pool, self._background_pool)
+            self._pool = self._background_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+    def _queue_path(self) -> str:
+        if self.queue_dir:
+            queue_dir = self.queue_dir
+        else:
+            from app.utils import _ensure_jobs_dir
+            queue_dir = os.path.join(_ensure_jobs_dir(), 'queue')
+        os.makedirs(queue_dir, exist_ok=True)
+        return queue_dir
+
+    # -- Soumission --------------------------------------------------------
+
+    def _estimate_retry_after(self, queued: int) -> int:
+        """Délai conseillé avant de réessayer, d'après la durée moyenne des jobs."""
+        if not self._avg_seconds:
+            return self.retry_after
+        return max(1, int(math.ceil(self._avg_seconds * (queued + 1) / self.max_workers)))
+
+    def _reserve(self):
+        """Réserve une place dans la file ou lève JobQueueFull."""
+        capacity = self.max_workers + self.queue_max
+        with self._lock:
+            in_flight = self._external_in_flight() if self.backend == 'external' else self._in_flight
+            if in_flight >= capacity:
+                self._stats['rejected'] += 1
+                retry_after = self._estimate_retry_after(in_flight - self.max_workers)
+                raise JobQueueFull(
+                    f"File des jobs pleine ({in_flight}/{capacity}). Réessayez dans {retry_after} s.",
+                    retry_after=retry_after
+                )
+            self._in_flight += 1
+            self._stats['submitted'] += 1
+
+    def _release(self, started, failed=False):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._stats['failed' if failed else 'completed'] += 1
+            # Moyenne glissante de la durée des jobs (pour Retry-After)
+            self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    def submit(self, fn, *args, **kwargs):
+        """Soumet une fonction (API de concurrent.futures, sans file bornée)."""
+        return self._get_pool().submit(fn, *args, **kwargs)
+
+    def submit_background(self, fn, *args):
+        """
+        Soumet une tâche de fond courte, sans suivi dans le stockage des jobs
+        (ex: rafraîchissement du cache des APIs boursières).
+
+        La tâche s'exécute dans le pool de threads des tâches de fond du
+        worker, dans le contexte de l'application, quel que soit le backend.
+
+        Returns:
+            Future de la tâche, ou None si elle est abandonnée (pool des tâches
+            de fond plein)
+        """
+        capacity = self.background_workers + self.background_queue_max
+        with self._lock:
+            if self._background_in_flight >= capacity:
+                self._stats['background_dropped'] += 1
+                return None
+            self._background_in_flight += 1
+            self._stats['background_submitted'] += 1
+        try:
+            if self._app is not None:
+                future = self._get_background_pool().submit(_run_in_app_context, self._app, fn, *args)
+            else:
+                future = self._get_background_pool().submit(fn, *args)
+        except RuntimeError:
+            self._release_background()
+            raise
+        future.add_done_callback(lambda _: self._release_background())
+        return future
+
+    def _release_background(self):
+        with self._lock:
+            self._background_in_flight = max(0, self._background_in_flight - 1)
+
+    def submit_job(self, jobid: str, fn, *args):
+        """
+        Soumet un job dont l'état est suivi dans le stockage des jobs.
+
+        Args:
+            jobid: Identifiant du job (déjà enregistré comme 'pending')
+            fn: Fonction module-level (importable, donc sérialisable pour les processus)
+            *args: Arguments de la fonction (sérialisables en JSON pour le backend externe)
+
+        Raises:
+            JobQueueFull: Si la file est pleine
+            JobExecutorUnavailable: Si le backend ne peut pas accepter le job
+        """
+        self._reserve()
+        started = time.perf_counter()
+
+        if self.backend == 'external':
+            try:
+                self._enqueue_external(jobid, fn, args)
+            except OSError as e:
+                self._release(started, failed=True)
+                raise JobExecutorUnavailable(f"File externe des jobs indisponible: {e}")
+            # Le job est désormais suivi par le worker externe
+            with self._lock:
+                self._in_flight = max(0, self._in_flight - 1)
+            return None
+
+        try:
+            if self.backend == 'threads' and self._app is not None:
+                # Même contexte d'application que la requête (cache, configuration)
+                future = self._get_pool().submit(_run_in_app_context, self._app, fn, jobid, *args)
+            else:
+                future = self._get_pool().submit(fn, jobid, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # Pool cassé (processus tué) ou arrêté : on le recrée à la prochaine soumission
+            self.shutdown(wait=False)
+            self._release(started, failed=True)
+            raise JobExecutorUnavailable(f"Exécuteur des jobs indisponible: {e}")
+
+        def _done(fut):
+            error = fut.exception()
+            self._release(started, failed=error is not None)
+            if error is not None:
+                logger.error("Job %s interrompu: %s", jobid, error)
+                from app import utils as _utils
+                _utils.write_job_error(jobid, f"Job interrompu: {error}")
+                if isinstance(error, BrokenProcessPool):
+                    self.shutdown(wait=False)
+
+        future.add_done_callback(_done)
+        return future
+
+    def _enqueue_external(self, jobid, fn, args):
+        """Dépose le job dans la file sur disque (écriture atomique)."""
+        queue_dir = self._queue_path()
+        payload = {'jobid': jobid, 'task': task_path(fn), 'args': list(args), 'queued_at': time.time()}
+        tmp_path = os.path.join(queue_dir, f".{jobid}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(payload, fh, ensure_ascii=False, default=str)
+        os.replace(tmp_path, os.path.join(queue_dir, f"{jobid}.json"))
+
+    def _external_in_flight(self) -> int:
+        """Jobs en attente ou en cours dans la file externe."""
+        try:
+            return sum(1 for name in os.listdir(self._queue_path()) if name.endswith(('.json', '.running')))
+        except OSError:
+            return 0
+
+    # -- Observabilité -----------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Longueur de la file, jobs en cours et compteurs."""
+        with self._lock:
+            if self.backend == 'external':
+                in_flight = self._external_in_flight()
+            else:
+                in_flight = self._in_flight
+            stats = dict(self._stats)
+            stats.update({
+                'backend': self.backend,
+                'start_method': self.start_method if self.backend == 'processes' else None,
+                'max_workers': self.max_workers,
+                'queue_max': self.queue_max,
+                'in_flight': in_flight,
+                'running': min(in_flight, self.max_workers),
+                'queued': max(0, in_flight - self.max_workers),
+                'avg_job_seconds': round(self._avg_seconds, 3) if self._avg_seconds else None,
+                'background_in_flight': self._background_in_flight,
+            })
+            return stats
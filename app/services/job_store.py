@@ -0,0 +1,448 @@
+"""
+Stockage de l'état et des résultats des jobs en arrière-plan.
+
+L'état d'un job (petit document : statut, métadonnées, erreur, horodatages) est
+stocké séparément de son résultat (qui contient notamment le graphique en
+base64). Les endpoints de polling lisent uniquement l'état ; le résultat n'est
+lu qu'une fois le job terminé.
+
+Backends (`JOB_STORE_BACKEND`) :
+
+- `filesystem` : `<id>.status.json` et `<id>.result.json` dans `logs/jobs/`
+  (ou `JOB_STORE_DIR`), écrits de façon atomique. Les jobs plus anciens que
+  `JOB_TTL` sont supprimés par un nettoyage périodique.
+- `redis` : un hash par job et une clé pour le résultat, expirés par Redis
+  après `JOB_TTL`. À utiliser quand plusieurs instances partagent les jobs.
+
+Pendant l'exécution, `JobProgress` enregistre l'avancement (pas `i/total`,
+durée des étapes) dans l'état du job ; `wait_for_change` permet au flux SSE
+`/jobs/events/<id>` de le transmettre dès qu'il change.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_GC_INTERVAL = 600
+STATUS_SUFFIX = '.status.json'
+RESULT_SUFFIX = '.result.json'
+SETTINGS_KEYS = ('JOB_STORE_BACKEND', 'JOB_STORE_DIR', 'JOB_STORE_URL', 'JOB_TTL')
+
+
+def default_jobs_dir() -> str:
+    """Dossier historique des jobs : `logs/jobs/` à la racine du projet."""
+    project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(project_dir, 'logs', 'jobs')
+
+
+def _dumps(payload) -> str:
+    # Compact : le résultat contient des images base64 volumineuses
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+# Réveille les flux SSE du processus dès qu'un job change (sans attendre le
+# prochain passage de la boucle de lecture)
+_changed = threading.Condition()
+
+
+def _notify():
+    with _changed:
+        _changed.notify_all()
+
+
+def _doc_version(doc):
+    if doc is None:
+        return None
+    return doc.get('status'), doc.get('updated_at')
+
+
+class JobStore:
+    """Interface commune des backends de stockage des jobs."""
+
+    ttl = DEFAULT_TTL
+
+    def create(self, jobid: str, meta: Optional[Dict[str, Any]] = None):
+        """Enregistre un job en attente."""
+        raise NotImplementedError
+
+    def set_result(self, jobid: str, result: Any):
+        """Enregistre le résultat puis marque le job comme terminé."""
+        raise NotImplementedError
+
+    def set_error(self, jobid: str, error: str):
+        """Marque le job en échec."""
+        raise NotImplementedError
+
+    def set_progress(self, jobid: str, progress: Dict[str, Any]):
+        """Marque le job en cours et enregistre son avancement."""
+        self._update(jobid, 'running', progress=progress)
+
+    def get_status(self, jobid: str) -> Optional[Dict[str, Any]]:
+        """État du job (statut, meta, erreur), sans lire le résultat. None si inconnu."""
+        raise NotImplementedError
+
+    def get_result(self, jobid: str) -> Any:
+        """Résultat d'un job terminé (None si absent)."""
+        raise NotImplementedError
+
+    def delete(self, jobid: str):
+        """Supprime l'état et le résultat du job."""
+        raise NotImplementedError
+
+    def gc(self, now: Optional[float] = None) -> int:
+        """Supprime les jobs expirés et retourne leur nombre."""
+        return 0
+
+    def wait_for_change(self, jobid: str, since=None, timeout: float = 15.0,
+                        poll_interval: float = 0.25) -> Optional[Dict[str, Any]]:
+        """
+        Attend que l'état du job diffère de `since` (voir `version`).
+
+        Les écritures du même processus réveillent l'attente immédiatement ;
+        celles des autres processus sont vues au plus tard après `poll_interval`.
+
+        Returns:
+            Dernier état lu (éventuellement inchangé à l'expiration du délai), None si inconnu
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.get_status(jobid)
+            remaining = deadline - time.monotonic()
+            if status is None or _doc_version(status) != since or remaining <= 0:
+                return status
+            with _changed:
+                _changed.wait(min(poll_interval, remaining))
+
+    @staticmethod
+    def version(status: Optional[Dict[str, Any]]):
+        """Identifiant d'une version de l'état (à passer à `wait_for_change`)."""
+        return _doc_version(status)
+
+    def get(self, jobid: str) -> Optional[Dict[str, Any]]:
+        """Job complet (format de `read_job`) : status, meta, result, error, progress."""
+        status = self.get_status(jobid)
+        if status is None:
+            return None
+        return {
+            'status': status.get('status'),
+            'meta': status.get('meta'),
+            'result': self.get_result(jobid) if status.get('status') == 'done' else None,
+            'error': status.get('error'),
+            'progress': status.get('progress'),
+        }
+
+    def _write_status(self, jobid: str, doc: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _update(self, jobid, status, error=None, progress=None):
+        previous = self.get_status(jobid) or {}
+        self._write_status(jobid, self._status_doc(
+            status, previous.get('meta'), error, previous.get('created_at'),
+            progress if progress is not None else previous.get('progress')
+        ))
+
+    @staticmethod
+    def _status_doc(status, meta=None, error=None, created_at=None, progress=None):
+        now = time.time()
+        return {
+            'status': status,
+            'meta': meta,
+            'error': error,
+            'progress': progress,
+            'created_at': created_at or now,
+            'updated_at': now,
+        }
+
+
+class FileJobStore(JobStore):
+    """Jobs stockés sur disque, un petit fichier d'état et un fichier de résultat par job."""
+
+    def __init__(self, root: Optional[str] = None, ttl: int = DEFAULT_TTL, gc_interval: int = DEFAULT_GC_INTERVAL):
+        self.root = root or default_jobs_dir()
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self._last_gc = time.time()
+        self._gc_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, jobid, suffix):
+        return os.path.join(self.root, f"{jobid}{suffix}")
+
+    def _write(self, path, content: str):
+        """Écriture atomique : le fichier peut être lu au même moment par un autre processus."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _read_legacy(self, jobid):
+        """Ancien format : un seul `<id>.json` contenant état et résultat."""
+        return self._read(self._path(jobid, '.json'))
+
+    def _write_status(self, jobid, doc):
+        self._write(self._path(jobid, STATUS_SUFFIX), _dumps(doc))
+        _notify()
+
+    def create(self, jobid, meta=None):
+        self._write_status(jobid, self._status_doc('pending', meta or {}))
+        self.maybe_gc()
+
+    def set_result(self, jobid, result):
+        # Le résultat est écrit avant le statut : un job 'done' a toujours son résultat
+        self._write(self._path(jobid, RESULT_SUFFIX), _dumps(result))
+        self._update(jobid, 'done')
+
+    def set_error(self, jobid, error):
+        self._update(jobid, 'failed', str(error))
+
+    def get_status(self, jobid):
+        status = self._read(self._path(jobid, STATUS_SUFFIX))
+        if status is None:
+            legacy = self._read_legacy(jobid)
+            if legacy is not None:
+                legacy.pop('result', None)
+            return legacy
+        return status
+
+    def get_result(self, jobid):
+        result = self._read(self._path(jobid, RESULT_SUFFIX))
+        if result is None:
+            legacy = self._read_legacy(jobid)
+            if legacy is not None:
+                return legacy.get('result')
+        return result
+
+    def delete(self, jobid):
+        for suffix in (STATUS_SUFFIX, RESULT_SUFFIX, '.json'):
+            try:
+                os.remove(self._path(jobid, suffix))
+            except FileNotFoundError:
+                pass
+
+    def gc(self, now=None):
+        """Supprime les jobs (et fichiers temporaires orphelins) plus anciens que le TTL."""
+        limit = (now or time.time()) - self.ttl
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return 0
+        for entry in entries:
+            name = entry.name
+            if not entry.is_file() or not name.endswith(('.json', '.tmp')):
+                continue
+            try:
+                if entry.stat().st_mtime >= limit:
+                    continue
+                if name.endswith(RESULT_SUFFIX) and os.path.exists(
+                        os.path.join(self.root, name[:-len(RESULT_SUFFIX)] + STATUS_SUFFIX)):
+                    # Supprimé avec son fichier d'état (qui est plus récent)
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            if name.endswith(STATUS_SUFFIX):
+                removed += 1
+                try:
+                    os.remove(os.path.join(self.root, name[:-len(STATUS_SUFFIX)] + RESULT_SUFFIX))
+                except OSError:
+                    pass
+            elif name.endswith('.json') and not name.endswith(RESULT_SUFFIX):
+                removed += 1
+        if removed:
+            logger.info("%d job(s) expiré(s) supprimé(s) de %s", removed, self.root)
+        return removed
+
+    def maybe_gc(self):
+        """Lance le nettoyage au plus une fois par `gc_interval` secondes."""
+        now = time.time()
+        if now - self._last_gc < self.gc_interval or not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_gc = now
+            self.gc(now)
+        except Exception as e:
+            logger.warning("Nettoyage des jobs impossible: %s", e)
+        finally:
+            self._gc_lock.release()
+
+
+class RedisJobStore(JobStore):
+    """Jobs stockés dans Redis (partagés entre instances), expirés après le TTL."""
+
+    def __init__(self, client=None, url: Optional[str] = None, ttl: int = DEFAULT_TTL, prefix: str = 'job:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, jobid):
+        return f"{self.prefix}{jobid}"
+
+    def _write_status(self, jobid, doc):
+        key = self._key(jobid)
+        self.client.hset(key, mapping={
+            'status': doc['status'],
+            'meta': _dumps(doc['meta']),
+            'error': doc['error'] or '',
+            'progress': _dumps(doc['progress']),
+            'created_at': doc['created_at'],
+            'updated_at': doc['updated_at'],
+        })
+        self.client.expire(key, self.ttl)
+        _notify()
+
+    def create(self, jobid, meta=None):
+        self._write_status(jobid, self._status_doc('pending', meta or {}))
+
+    def set_result(self, jobid, result):
+        self.client.set(f"{self._key(jobid)}:result", _dumps(result), ex=self.ttl)
+        self._update(jobid, 'done')
+
+    def set_error(self, jobid, error):
+        self._update(jobid, 'failed', str(error))
+
+    def get_status(self, jobid):
+        status, meta, error, progress, created_at, updated_at = self.client.hmget(
+            self._key(jobid), 'status', 'meta', 'error', 'progress', 'created_at', 'updated_at'
+        )
+        if status is None:
+            return None
+        return {
+            'status': _decode(status),
+            'meta': json.loads(_decode(meta)) if meta else None,
+            'error': _decode(error) or None,
+            'progress': json.loads(_decode(progress)) if progress else None,
+            'created_at': float(created_at) if created_at else None,
+            'updated_at': float(updated_at) if updated_at else None,
+        }
+
+    def get_result(self, jobid):
+        raw = self.client.get(f"{self._key(jobid)}:result")
+        return json.loads(raw) if raw else None
+
+    def delete(self, jobid):
+        self.client.delete(self._key(jobid), f"{self._key(jobid)}:result")
+
+
+def job_store_settings(config: Mapping) -> Dict[str, Any]:
+    """Extrait les réglages du stockage (transmis tels quels aux processus de jobs)."""
+    settings = {key: config.get(key) for key in SETTINGS_KEYS}
+    if not settings['JOB_STORE_URL'] and settings['JOB_STORE_BACKEND'] == 'redis':
+        settings['JOB_STORE_URL'] = config.get('CACHE_REDIS_URL')
+    return settings
+
+
+def create_job_store(settings: Mapping) -> JobStore:
+    """Crée le backend décrit par les réglages `JOB_STORE_*`."""
+    backend = str(settings.get('JOB_STORE_BACKEND') or 'filesystem').lower()
+    ttl = int(settings.get('JOB_TTL') or DEFAULT_TTL)
+    if backend == 'redis':
+        url = settings.get('JOB_STORE_URL')
+        if not url:
+            raise ValueError("JOB_STORE_URL (ou CACHE_REDIS_URL) est requis pour JOB_STORE_BACKEND=redis")
+        store = RedisJobStore(url=url, ttl=ttl)
+        store.client.ping()
+        return store
+    if backend != 'filesystem':
+        raise ValueError(f"JOB_STORE_BACKEND inconnu: {backend}")
+    return FileJobStore(settings.get('JOB_STORE_DIR'), ttl=ttl)
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def configure_job_store(settings: Mapping) -> JobStore:
+    """Crée le stockage des jobs du processus ; repli sur le disque si Redis est indisponible."""
+    global _store_instance
+    try:
+        store = create_job_store(settings)
+    except Exception as e:
+        logger.warning(f"Stockage des jobs indisponible: {e}. Utilisation du stockage fichier.")
+        store = FileJobStore(settings.get('JOB_STORE_DIR'), ttl=int(settings.get('JOB_TTL') or DEFAULT_TTL))
+    with _store_lock:
+        _store_instance = store
+    return store
+
+
+def get_job_store() -> JobStore:
+    """Obtient le stockage des jobs du processus (fichiers dans `logs/jobs/` par défaut)."""
+    global _store_instance
+    with _store_lock:
+        if _store_instance is None:
+            _store_instance = FileJobStore()
+        return _store_instance
+
+
+class JobProgress:
+    """
+    Enregistre l'avancement d'un job dans son état : étape courante, pas
+    `step/total` de la prévision et durée de chaque étape terminée.
+
+    Les pas sont écrits au plus une fois par `min_interval` secondes (et au
+    dernier pas) pour ne pas ralentir la boucle de prévision.
+    """
+
+    def __init__(self, jobid: str, store: Optional[JobStore] = None, min_interval: float = 0.2):
+        self.jobid = jobid
+        self.store = store or get_job_store()
+        self.min_interval = min_interval
+        self.stage_name = None
+        self.step_done = 0
+        self.total = None
+        self.timings: Dict[str, float] = {}
+        self._last_write = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'stage': self.stage_name,
+            'step': self.step_done,
+            'total': self.total,
+            'timings': dict(self.timings),
+        }
+
+    def _write(self):
+        self._last_write = time.monotonic()
+        try:
+            self.store.set_progress(self.jobid, self.snapshot())
+        except Exception as e:
+            # L'avancement est informatif : il ne doit pas faire échouer le job
+            logger.debug("Avancement du job %s non enregistré: %s", self.jobid, e)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mesure une étape du job (chargement, prévision, graphique...)."""
+        self.stage_name = name
+        self._write()
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[name] = round(time.perf_counter() - started, 4)
+
+    def step(self, done: int, total: int):
+        """Callback d'avancement de la boucle de prévision."""
+        self.step_done, self.total = done, total
+        if done >= total or time.monotonic() - self._last_write >= self.min_interval:
+            self._write()
@@ -0,0 +1,276 @@
+"""
+Stockage local des séries boursières (OHLCV), partitionné en Parquet.
+
+Chaque série (API, symbole, intervalle) est rangée par mois :
+`<racine>/<api>/<SYMBOLE>/<intervalle>/<AAAA>/<MM>.parquet`. Le service des
+APIs boursières n'y ajoute que les barres reçues depuis la dernière barre
+enregistrée : les nouvelles barres sont fusionnées avec la partition
+existante, dédoublonnées sur `Date` (la plus récente l'emporte, la dernière
+barre d'une séance en cours étant révisée) puis réécrites de façon atomique.
+Les écritures d'une même série sont sérialisées entre threads et entre
+processus (workers gunicorn) par un verrou `fcntl.flock` sur le fichier
+`.lock` du répertoire de la série.
+
+Les lectures par plage de dates n'ouvrent que les partitions concernées et
+filtrent sur `Date` à la lecture. pyarrow est optionnel : sans lui, le
+stockage est désactivé et le service retélécharge la fenêtre complète.
+"""
+
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou limité au processus
+    fcntl = None
+
+import pandas as pd
+
+from app.services.columnar_store import PYARROW_AVAILABLE, pa, pq
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMN = 'Date'
+_COMPONENT = re.compile(r'^[A-Za-z0-9_.\-]+$')
+
+
+def _component(value: str) -> str:
+    """Segment de chemin sûr (pas de séparateur, ni '.' / '..')."""
+    value = str(value)
+    if not _COMPONENT.match(value) or set(value) == {'.'}:
+        raise ValueError(f"Segment de chemin invalide pour le stockage: {value!r}")
+    return value
+
+
+def align_timestamp(value, tz) -> Optional[pd.Timestamp]:
+    """Horodatage comparable aux dates de la série (même fuseau)."""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    if tz is not None and value.tzinfo is None:
+        return value.tz_localize(tz)
+    if tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
+
+
+class MarketDataStore:
+    """
+    Séries OHLCV partitionnées par (API, symbole, intervalle, année/mois).
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Répertoire racine du stockage
+        """
+        self.root = root
+        self._lock = threading.Lock()
+        self._series_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+    def series_dir(self, source: str, symbol: str, interval: str) -> str:
+        """Répertoire d'une série."""
+        return os.path.join(self.root, _component(source), _component(symbol.upper()), _component(interval))
+
+    def _series_lock(self, source: str, symbol: str, interval: str) -> threading.Lock:
+        with self._lock:
+            return self._series_locks.setdefault((source, symbol.upper(), interval), threading.Lock())
+
+    @contextmanager
+    def _locked(self, source: str, symbol: str, interval: str):
+        """Verrou exclusif d'une série, entre threads puis entre processus."""
+        with self._series_lock(source, symbol, interval):
+            if fcntl is None:
+                yield
+                return
+            directory = self.series_dir(source, symbol, interval)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, '.lock'), 'a') as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def partitions(self, source: str, symbol: str, interval: str) -> List[Tuple[int, int, str]]:
+        """Partitions existantes d'une série, triées : [(année, mois, chemin)]."""
+        directory = self.series_dir(source, symbol, interval)
+        found = []
+        if not os.path.isdir(directory):
+            return found
+        for year in os.listdir(directory):
+            if not year.isdigit():
+                continue
+            year_dir = os.path.join(directory, year)
+            for name in os.listdir(year_dir):
+                month, ext = os.path.splitext(name)
+                if ext == '.parquet' and month.isdigit():
+                    found.append((int(year), int(month), os.path.join(year_dir, name)))
+        return sorted(found)
+
+    def _partition_path(self, directory: str, year: int, month: int) -> str:
+        return os.path.join(directory, f"{year:04d}", f"{month:02d}.parquet")
+
+    def _read_partition(self, path: str, filters=None) -> pd.DataFrame:
+        return pq.read_table(path, filters=filters).to_pandas()
+
+    def _write_partition(self, path: str, df: pd.DataFrame) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def last_timestamp(self, source: str, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        """Date de la dernière barre enregistrée, ou None si la série est vide."""
+        for _, _, path in reversed(self.partitions(source, symbol, interval)):
+            dates = pq.read_table(path, columns=[DATE_COLUMN]).column(DATE_COLUMN).to_pandas()
+            if dates.notna().any():
+                return dates.max()
+        return None
+
+    def first_timestamp(self, source: str, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        """Date de la première barre enregistrée, ou None si la série est vide."""
+        for _, _, path in self.partitions(source, symbol, interval):
+            dates = pq.read_table(path, columns=[DATE_COLUMN]).column(DATE_COLUMN).to_pandas()
+            if dates.notna().any():
+                return dates.min()
+        return None
+
+    def write(self, source: str, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """
+        Fusionne des barres dans la série.
+
+        Seules les partitions (mois) couvertes par `df` sont relues et
+        réécrites ; une barre déjà présente est remplacée par la nouvelle.
+
+        Returns:
+            Nombre de barres reçues qui n'étaient pas encore enregistrées
+        """
+        if DATE_COLUMN not in df.columns:
+            raise ValueError(f"Colonne {DATE_COLUMN} absente")
+        if not all(isinstance(c, str) for c in df.columns) or df.columns.duplicated().any():
+            raise ValueError("Noms de colonnes non textuels ou en double")
+        frame = df[df[DATE_COLUMN].notna()]
+        if frame.empty:
+            return 0
+        directory = self.series_dir(source, symbol, interval)
+        dates = frame[DATE_COLUMN]
+        months = (dates.dt.year * 100 + dates.dt.month).to_numpy()
+
+        added = 0
+        with self._locked(source, symbol, interval):
+            for key, part in frame.groupby(months, sort=True):
+                path = self._partition_path(directory, int(key) // 100, int(key) % 100)
+                new = part.drop_duplicates(DATE_COLUMN, keep='last')
+                if os.path.exists(path):
+                    existing = self._read_partition(path)
+                    added += int((~new[DATE_COLUMN].isin(existing[DATE_COLUMN])).sum())
+                    new = pd.concat([existing, new], ignore_index=True)
+                    new = new.drop_duplicates(DATE_COLUMN, keep='last')
+                else:
+                    added += len(new)
+                self._write_partition(path, new.sort_values(DATE_COLUMN, kind='stable'))
+        return added
+
+    def read(self, source: str, symbol: str, interval: str, start=None, end=None,
+             last: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Barres de la série entre `start` et `end` (inclus), triées par date.
+
+        Args:
+            start: Date de début (None = depuis la première barre)
+            end: Date de fin (None = jusqu'à la dernière barre)
+            last: Ne garder que les `last` dernières barres de la plage
+
+        Returns:
+            DataFrame (vide si aucune barre dans la plage), ou None si la série
+            n'existe pas
+        """
+        partitions = self.partitions(source, symbol, interval)
+        if not partitions:
+            return None
+        schema = pq.read_schema(partitions[-1][2])
+        tz = getattr(schema.field(DATE_COLUMN).type, 'tz', None)
+        start, end = align_timestamp(start, tz), align_timestamp(end, tz)
+
+        filters = []
+        if start is not None:
+            filters.append((DATE_COLUMN, '>=', start))
+        if end is not None:
+            filters.append((DATE_COLUMN, '<=', end))
+
+        frames = []
+        # Les partitions sont parcourues de la plus récente à la plus ancienne
+        # pour s'arrêter dès que `last` barres sont réunies
+        count = 0
+        for year, month, path in reversed(partitions):
+            period = pd.Period(year=year, month=month, freq='M')
+            if start is not None and period.end_time < start.tz_localize(None):
+                break
+            if end is not None and period.start_time > end.tz_localize(None):
+                continue
+            part = self._read_partition(path, filters=filters or None)
+            frames.append(part)
+            count += len(part)
+            if last is not None and count >= last:
+                break
+
+        if not frames:
+            return schema.empty_table().to_pandas()
+        df = pd.concat(reversed(frames), ignore_index=True)
+        df = df.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+        if last is not None:
+            df = df.tail(last).reset_index(drop=True)
+        return df
+
+    def delete(self, source: str, symbol: str, interval: str) -> None:
+        """Supprime une série."""
+        with self._locked(source, symbol, interval):
+            for _, _, path in self.partitions(source, symbol, interval):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# Une instance par répertoire : les verrous des séries sont partagés par les threads
+_stores: Dict[str, MarketDataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_market_store(config=None) -> Optional[MarketDataStore]:
+    """
+    Stockage local des séries sous `MARKET_STORE_DIR`.
+
+    Args:
+        config: Configuration (par défaut celle de l'application Flask, sinon
+            les variables d'environnement)
+
+    Returns:
+        MarketDataStore, ou None si le stockage est désactivé
+        (`MARKET_STORE_ENABLED`) ou si pyarrow est absent
+    """
+    if config is None:
+        try:
+            from flask import current_app
+            config = current_app.config
+        except RuntimeError:
+            config = {
+                'MARKET_STORE_ENABLED': os.environ.get('MARKET_STORE_ENABLED', 'true').lower() == 'true',
+                'MARKET_STORE_DIR': os.environ.get('MARKET_STORE_DIR'),
+            }
+    if not PYARROW_AVAILABLE or not config.get('MARKET_STORE_ENABLED', True):
+        return None
+    root = os.path.abspath(config.get('MARKET_STORE_DIR') or os.path.join('data', 'market'))
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = MarketDataStore(root)
+        return _stores[root]
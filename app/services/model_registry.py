@@ -0,0 +1,288 @@
+"""
+Registre des modèles ML chargés en mémoire.
+
+Chaque artifact `.joblib` de `MODELS_DIR` est désérialisé et validé une seule
+fois par worker, puis conservé dans un cache LRU borné. La clé de cache inclut
+le chemin, la date de modification et la taille du fichier : remplacer un
+modèle sur disque invalide automatiquement l'entrée correspondante.
+
+Si un fichier `<modele>.sha256` accompagne l'artifact, son empreinte est
+vérifiée au chargement et exposée dans les métadonnées.
+
+Avec `gunicorn --preload`, `preload()` charge tous les modèles dans le
+processus maître avant le fork : les workers partagent alors les mêmes pages
+mémoire (copy-on-write). Les artifacts enregistrés sans compression
+(`scripts/prepare_models.py --uncompressed`) peuvent en plus être chargés avec
+`mmap_mode='r'` : les tableaux numpy des arbres restent des pages du fichier,
+partagées par tous les processus via le cache du système.
+"""
+
+import gc
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Dict, Optional
+
+import joblib
+
+from app.utils import validate_model_artifact
+
+logger = logging.getLogger(__name__)
+
+# Modèle validé tel que retourné par le registre
+LoadedModel = namedtuple('LoadedModel', ['model', 'feature_cols', 'metadata'])
+
+MODEL_EXTENSION = '.joblib'
+
+
+def _file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcule l'empreinte SHA-256 d'un fichier par blocs."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_expected_sha256(model_path: str) -> Optional[str]:
+    """Lit l'empreinte attendue dans `<modele>.sha256` si le fichier existe."""
+    sidecar = os.path.splitext(model_path)[0] + '.sha256'
+    if not os.path.exists(sidecar):
+        return None
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as fh:
+            content = fh.read().strip()
+        return content.split()[0].lower() if content else None
+    except OSError:
+        return None
+
+
+class ModelRegistry:
+    """
+    Cache LRU des artifacts de modèles, partagé par toutes les requêtes d'un worker.
+    """
+
+    def __init__(self, max_entries: int = 4, mmap_mode: Optional[str] = None):
+        """
+        Initialise le registre.
+
+        Args:
+            max_entries: Nombre maximal de modèles gardés en mémoire
+            mmap_mode: Mode passé à `joblib.load` (ex: 'r'), None pour un chargement classique
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.mmap_mode = mmap_mode or None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._listings: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'evictions': 0,
+            'load_errors': 0,
+            'load_seconds_total': 0.0,
+            'last_load_seconds': {},
+            'preloaded': 0,
+        }
+
+    @staticmethod
+    def _fingerprint(path: str):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def list_models(self, models_dir: str) -> Dict[str, str]:
+        """
+        Liste les modèles disponibles dans un dossier.
+
+        Le listing n'est recalculé que si la date de modification du dossier change.
+
+        Returns:
+            Dict {nom_fichier: description}
+        """
+        if not models_dir or not os.path.isdir(models_dir):
+            return {}
+
+        dir_mtime = os.stat(models_dir).st_mtime_ns
+        with self._lock:
+            listing = self._listings.get(models_dir)
+            if listing and listing['mtime'] == dir_mtime:
+                return dict(listing['models'])
+
+        models = {}
+        for file in sorted(os.listdir(models_dir)):
+            if file.endswith(MODEL_EXTENSION):
+                models[file] = f"Modèle: {file.replace(MODEL_EXTENSION, '')}"
+
+        with self._lock:
+            self._listings[models_dir] = {'mtime': dir_mtime, 'models': models}
+        return dict(models)
+
+    def get(self, model_path: str) -> LoadedModel:
+        """
+        Retourne le modèle validé correspondant à un chemin, en le chargeant si nécessaire.
+
+        Args:
+            model_path: Chemin de l'artifact `.joblib`
+
+        Returns:
+            LoadedModel(model, feature_cols, metadata)
+
+        Raises:
+            FileNotFoundError: Si le fichier n'existe pas
+            ValueError: Si l'artifact est invalide ou ne correspond pas à son empreinte
+        """
+        path = os.path.abspath(model_path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Le modèle {os.path.basename(path)} est introuvable.")
+
+        fingerprint = self._fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry['fingerprint'] == fingerprint:
+                self._entries.move_to_end(path)
+                self._stats['hits'] += 1
+                return entry['loaded']
+            self._stats['misses'] += 1
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # Un seul chargement à la fois par modèle ; les autres threads attendent le résultat
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry and entry['fingerprint'] == fingerprint:
+                    self._entries.move_to_end(path)
+                    return entry['loaded']
+            loaded = self._load(path)
+            with self._lock:
+                self._entries[path] = {'fingerprint': fingerprint, 'loaded': loaded}
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+                    logger.info("Modèle retiré du registre (LRU): %s", os.path.basename(evicted))
+            return loaded
+
+    def _load(self, path: str) -> LoadedModel:
+        """Désérialise et valide un artifact."""
+        name = os.path.basename(path)
+        started = time.perf_counter()
+        try:
+            expected_sha256 = _read_expected_sha256(path)
+            actual_sha256 = None
+            if expected_sha256:
+                actual_sha256 = _file_sha256(path)
+                if actual_sha256 != expected_sha256:
+                    raise ValueError(
+                        f"L'empreinte SHA-256 du modèle {name} ne correspond pas à {name.replace(MODEL_EXTENSION, '.sha256')}"
+                    )
+
+            # joblib ignore mmap_mode (avec un avertissement) pour les fichiers compressés
+            artifact = joblib.load(path, mmap_mode=self.mmap_mode)
+            model, feature_cols, metadata = validate_model_artifact(artifact, path)
+        except Exception:
+            with self._lock:
+                self._stats['load_errors'] += 1
+            raise
+
+        elapsed = time.perf_counter() - started
+        metadata = dict(metadata)
+        metadata['sha256'] = actual_sha256
+        metadata['load_seconds'] = elapsed
+        with self._lock:
+            self._stats['loads'] += 1
+            self._stats['load_seconds_total'] += elapsed
+            self._stats['last_load_seconds'][name] = round(elapsed, 4)
+        logger.info("Modèle chargé dans le registre: %s (%.3fs)", name, elapsed)
+        return LoadedModel(model, feature_cols, metadata)
+
+    def preload(self, models_dir: str, freeze: bool = True) -> Dict[str, str]:
+        """
+        Charge tous les modèles d'un dossier, typiquement avant le fork des workers.
+
+        Args:
+            models_dir: Dossier des artifacts `.joblib`
+            freeze: Appelle `gc.freeze()` pour que le ramasse-miettes ne réécrive
+                pas les objets chargés dans les workers (ce qui dupliquerait leurs pages)
+
+        Returns:
+            Dict {nom_fichier: erreur} des modèles qui n'ont pas pu être chargés
+        """
+        models = self.list_models(models_dir)
+        if len(models) > self.max_entries:
+            # Un modèle préchargé puis évincé serait rechargé séparément par chaque worker
+            logger.warning(
+                "%d modèles à précharger pour un registre de %d entrées: MODEL_REGISTRY_SIZE ajusté",
+                len(models), self.max_entries
+            )
+            self.max_entries = len(models)
+
+        errors = {}
+        for file in models:
+            try:
+                self.get(os.path.join(models_dir, file))
+                with self._lock:
+                    self._stats['preloaded'] += 1
+            except Exception as e:
+                errors[file] = str(e)
+                logger.warning("Préchargement du modèle %s impossible: %s", file, e)
+
+        if freeze and hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+        return errors
+
+    def invalidate(self, model_path: Optional[str] = None):
+        """Retire un modèle (ou tous les modèles) du registre."""
+        with self._lock:
+            if model_path is None:
+                self._entries.clear()
+                self._listings.clear()
+            else:
+                self._entries.pop(os.path.abspath(model_path), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs du registre (hits, misses, temps de chargement...)."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            stats = dict(self._stats)
+            stats['last_load_seconds'] = dict(self._stats['last_load_seconds'])
+            stats['load_seconds_total'] = round(stats['load_seconds_total'], 4)
+            stats['hit_ratio'] = round(self._stats['hits'] / lookups, 4) if lookups else None
+            stats['entries'] = [os.path.basename(path) for path in self._entries]
+            stats['max_entries'] = self.max_entries
+            stats['mmap_mode'] = self.mmap_mode
+            return stats
+
+
+# Instance singleton du registre (une par processus worker)
+_registry_instance: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry(max_entries: Optional[int] = None, mmap_mode: Optional[str] = None) -> ModelRegistry:
+    """
+    Obtient l'instance singleton du registre de modèles.
+
+    Args:
+        max_entries: Taille du LRU (utilisée à la création ou pour l'ajuster)
+        mmap_mode: Mode mmap de `joblib.load` (utilisé à la création ou pour l'ajuster)
+
+    Returns:
+        Instance de ModelRegistry
+    """
+    global _registry_instance
+
+    with _registry_lock:
+        if _registry_instance is None:
+            _registry_instance = ModelRegistry(max_entries=max_entries or 4, mmap_mode=mmap_mode)
+        else:
+            if max_entries:
+                _registry_instance.max_entries = max(1, int(max_entries))
+            if mmap_mode:
+                _registry_instance.mmap_mode = mmap_mode
+    return _registry_instance
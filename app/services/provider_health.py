@@ -0,0 +1,191 @@
+"""
+Santé des fournisseurs de données boursières : latence, taux d'erreur et
+disjoncteur (« circuit breaker »).
+
+Chaque appel réel à un fournisseur (hors cache) enregistre sa durée et son
+issue dans une fenêtre glissante. Seuls les échecs du fournisseur (réseau,
+délai, HTTP 5xx, limitation) comptent comme erreurs : une requête invalide
+(symbole inconnu, clé ou intervalle invalide) ne dit rien de sa santé.
+
+Quand le taux d'erreur de la fenêtre dépasse `STOCK_API_BREAKER_ERROR_RATE`
+(au moins `STOCK_API_BREAKER_MIN_CALLS` appels), le disjoncteur s'ouvre : le fournisseur est ignoré pendant
+`STOCK_API_BREAKER_COOLDOWN` secondes, puis un seul appel d'essai est
+autorisé (demi-ouvert) ; son succès referme le disjoncteur, son échec le
+rouvre.
+
+Les latences des appels réussis donnent le délai au-delà duquel le service
+envoie une requête de couverture (« hedged request ») au fournisseur suivant
+(percentile `STOCK_API_HEDGE_PERCENTILE`, `STOCK_API_HEDGE_DELAY` tant qu'il
+y a trop peu de mesures). État propre à chaque processus.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+WINDOW_SIZE = 50
+# Mesures de latence nécessaires avant d'utiliser le percentile
+MIN_LATENCY_SAMPLES = 5
+
+
+def failover_options() -> Dict[str, Any]:
+    """
+    Réglages du basculement entre fournisseurs : configuration Flask si
+    disponible, sinon variables d'environnement.
+    """
+    names = {
+        'enabled': ('STOCK_API_FAILOVER', 'true'),
+        'order': ('STOCK_API_FAILOVER_ORDER', 'yahoo,alpha_vantage,iex_cloud'),
+        'hedge_percentile': ('STOCK_API_HEDGE_PERCENTILE', 0.95),
+        'hedge_delay': ('STOCK_API_HEDGE_DELAY', 3.0),
+        'error_rate': ('STOCK_API_BREAKER_ERROR_RATE', 0.5),
+        'min_calls': ('STOCK_API_BREAKER_MIN_CALLS', 5),
+        'cooldown': ('STOCK_API_BREAKER_COOLDOWN', 60.0),
+    }
+    try:
+        from flask import current_app
+        config = current_app.config
+    except RuntimeError:
+        config = os.environ
+    options = {key: config.get(name, default) for key, (name, default) in names.items()}
+    if isinstance(options['enabled'], str):
+        options['enabled'] = options['enabled'].lower() == 'true'
+    if isinstance(options['order'], str):
+        options['order'] = [p.strip() for p in options['order'].split(',') if p.strip()]
+    for key in ('hedge_percentile', 'hedge_delay', 'error_rate', 'cooldown'):
+        options[key] = float(options[key])
+    options['min_calls'] = int(options['min_calls'])
+    return options
+
+
+class _Provider:
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW_SIZE)
+        self.outcomes = deque(maxlen=WINDOW_SIZE)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial = False
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+
+
+class ProviderHealth:
+    """
+    Latences et disjoncteurs par fournisseur.
+    """
+
+    def __init__(self, error_rate: float = 0.5, min_calls: int = 5, cooldown: float = 60.0):
+        """
+        Args:
+            error_rate: Taux d'erreur (0-1) de la fenêtre qui ouvre le disjoncteur
+            min_calls: Appels nécessaires dans la fenêtre avant d'ouvrir
+            cooldown: Durée (secondes) pendant laquelle un fournisseur est ignoré
+        """
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._providers: Dict[str, _Provider] = {}
+
+    def _get(self, provider: str) -> _Provider:
+        state = self._providers.get(provider)
+        if state is None:
+            state = self._providers[provider] = _Provider()
+        return state
+
+    def _cooled_down(self, state: _Provider) -> bool:
+        return time.monotonic() - state.opened_at >= self.cooldown
+
+    def available(self, provider: str) -> bool:
+        """Le fournisseur peut-il être essayé (sans réserver l'appel d'essai) ?"""
+        with self._lock:
+            state = self._get(provider)
+            if state.state == CLOSED:
+                return True
+            return not state.trial and (state.state == HALF_OPEN or self._cooled_down(state))
+
+    def allow(self, provider: str) -> bool:
+        """
+        Autorise un appel au fournisseur ; après le délai d'un disjoncteur
+        ouvert, seul le premier appel (essai) est autorisé.
+        """
+        with self._lock:
+            state = self._get(provider)
+            if state.state == CLOSED:
+                return True
+            if state.state == OPEN and self._cooled_down(state):
+                state.state = HALF_OPEN
+            if state.state == HALF_OPEN and not state.trial:
+                state.trial = True
+                return True
+            state.rejected += 1
+            return False
+
+    def record(self, provider: str, latency: float, ok: Optional[bool]) -> None:
+        """
+        Enregistre l'issue d'un appel autorisé par `allow`.
+
+        Args:
+            ok: True (succès), False (échec du fournisseur) ou None (erreur de
+                la requête : ni succès ni échec, l'état ne change pas)
+        """
+        with self._lock:
+            state = self._get(provider)
+            state.calls += 1
+            if ok is None:
+                # L'appel d'essai éventuel est libéré sans décider de la reprise
+                state.trial = False
+                return
+            state.outcomes.append(ok)
+            if ok:
+                state.latencies.append(latency)
+            else:
+                state.errors += 1
+            if state.state == HALF_OPEN:
+                state.trial = False
+                if ok:
+                    state.state = CLOSED
+                    state.outcomes.clear()
+                else:
+                    self._open(state)
+            elif state.state == CLOSED and len(state.outcomes) >= self.min_calls:
+                errors = state.outcomes.count(False)
+                if errors / len(state.outcomes) >= self.error_rate:
+                    self._open(state)
+
+    def _open(self, state: _Provider) -> None:
+        state.state = OPEN
+        state.opened_at = time.monotonic()
+        state.outcomes.clear()
+
+    def latency_percentile(self, provider: str, percentile: float) -> Optional[float]:
+        """Latence (secondes) au percentile donné (0-1), ou None sans assez de mesures."""
+        with self._lock:
+            latencies = list(self._get(provider).latencies)
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return float(np.percentile(latencies, percentile * 100))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """État, appels, erreurs et latence médiane de chaque fournisseur."""
+        with self._lock:
+            providers = {name: (state.state, state.calls, state.errors, state.rejected,
+                                list(state.latencies), list(state.outcomes))
+                         for name, state in self._providers.items()}
+        stats = {}
+        for name, (state, calls, errors, rejected, latencies, outcomes) in providers.items():
+            stats[name] = {
+                'state': state,
+                'calls': calls,
+                'errors': errors,
+                'rejected': rejected,
+                'error_rate': round(outcomes.count(False) / len(outcomes), 3) if outcomes else 0.0,
+                'latency_p50': round(float(np.median(latencies)), 3) if latencies else None,
+            }
+        return stats
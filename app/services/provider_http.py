@@ -0,0 +1,133 @@
+"""
+Sessions HTTP partagées pour les APIs boursières (Alpha Vantage, IEX Cloud).
+
+Une `requests.Session` par fournisseur et par processus : les connexions
+TCP/TLS sont gardées ouvertes (keep-alive) et réutilisées d'un appel à
+l'autre. Les erreurs transitoires (connexion refusée ou coupée, HTTP
+500/502/503/504) sont retentées un nombre borné de fois, avec un délai
+exponentiel aléatoire (jitter) qui respecte `Retry-After`. Les délais de
+connexion et de lecture sont distincts, et chaque appel journalise sa latence.
+
+Réglages : STOCK_API_CONNECT_TIMEOUT, STOCK_API_READ_TIMEOUT,
+STOCK_API_RETRIES, STOCK_API_BACKOFF, STOCK_API_POOL_SIZE (configuration
+Flask si disponible, sinon variables d'environnement).
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_SIZE = 10
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Sessions par fournisseur, recréées après un fork (pid différent)
+_sessions: Dict[str, Tuple[int, requests.Session]] = {}
+_sessions_lock = threading.Lock()
+
+
+def http_options() -> Dict[str, Any]:
+    """
+    Réglages des appels HTTP : configuration Flask si disponible, sinon
+    variables d'environnement (scripts).
+    """
+    names = {
+        'connect_timeout': ('STOCK_API_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+        'read_timeout': ('STOCK_API_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+        'retries': ('STOCK_API_RETRIES', DEFAULT_RETRIES),
+        'backoff': ('STOCK_API_BACKOFF', DEFAULT_BACKOFF),
+        'pool_size': ('STOCK_API_POOL_SIZE', DEFAULT_POOL_SIZE),
+    }
+    try:
+        from flask import current_app
+        config = current_app.config
+    except RuntimeError:
+        config = os.environ
+    options = {key: float(config.get(name, default)) for key, (name, default) in names.items()}
+    options['retries'] = int(options['retries'])
+    options['pool_size'] = int(options['pool_size'])
+    return options
+
+
+def _build_session(options: Dict[str, Any]) -> requests.Session:
+    retry = Retry(
+        total=options['retries'],
+        connect=options['retries'],
+        read=options['retries'],
+        status=options['retries'],
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET'}),
+        backoff_factor=options['backoff'],
+        backoff_jitter=options['backoff'],
+        respect_retry_after_header=True,
+        # Après le dernier essai, la réponse 5xx est retournée à l'appelant
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=options['pool_size'], max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_provider_session(provider: str) -> requests.Session:
+    """
+    Session HTTP partagée d'un fournisseur (une par processus).
+
+    Args:
+        provider: Nom de l'API ('alpha_vantage', 'iex_cloud')
+    """
+    pid = os.getpid()
+    with _sessions_lock:
+        entry = _sessions.get(provider)
+        if entry is None or entry[0] != pid:
+            _sessions[provider] = entry = (pid, _build_session(http_options()))
+        return entry[1]
+
+
+def _retry_count(response: Optional[requests.Response]) -> int:
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(retries.history) if retries is not None else 0
+
+
+def provider_get(provider: str, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+    """
+    GET via la session du fournisseur, avec délais de connexion et de lecture
+    séparés ; journalise la latence et le nombre de tentatives.
+
+    Raises:
+        requests.exceptions.RequestException: Délai dépassé ou connexion
+            impossible après les tentatives
+    """
+    options = http_options()
+    started = time.perf_counter()
+    response = None
+    try:
+        response = get_provider_session(provider).get(
+            url, params=params, timeout=(options['connect_timeout'], options['read_timeout']), verify=True
+        )
+        return response
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info("Appel %s: HTTP %s en %.0f ms (%d nouvelle(s) tentative(s))", provider,
+                    response.status_code if response is not None else 'erreur', elapsed_ms,
+                    _retry_count(response))
+
+
+def close_sessions() -> None:
+    """Ferme les sessions (connexions gardées ouvertes) du processus."""
+    with _sessions_lock:
+        for _, session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,217 @@
+"""
+Limitation de débit par seau à jetons (« token bucket »), partagée entre workers.
+
+Un seau par clé : `capacity` jetons au plus, rechargés à `rate` jetons par
+seconde ; chaque appel consomme un jeton. L'état d'un seau se résume à deux
+nombres (jetons restants, date de mise à jour) : chaque vérification est en
+O(1), quel que soit le nombre d'appels dans la fenêtre.
+
+Backends (`RATE_LIMIT_BACKEND`) :
+
+- `memory` : seaux du processus (développement, worker unique). Les seaux
+  redevenus pleins sont oubliés périodiquement : la mémoire ne croît pas avec
+  le nombre de sessions vues.
+- `redis` : un hash par seau, mis à jour par un script Lua atomique (horloge
+  du serveur Redis) et expiré dès qu'il serait de nouveau plein. Tous les
+  workers et toutes les instances partagent le même budget. En cas d'erreur
+  Redis, l'appel est vérifié par le backend mémoire du processus.
+
+Utilisé par le service des APIs boursières (budget par fournisseur et par clé
+API) et par l'upload (`/upload/api_fetch`, par session).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit:'
+DEFAULT_SWEEP_INTERVAL = 60
+
+# KEYS[1] = seau ; ARGV = capacité, jetons par seconde, coût (0 = lecture seule)
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+end
+if cost > 0 then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+end
+local retry_after = 0
+if allowed == 0 then
+    retry_after = (cost - tokens) / rate
+end
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+def _result(allowed: bool, tokens: float, capacity: float, retry_after: float) -> Dict[str, Any]:
+    return {
+        'allowed': bool(allowed),
+        'remaining': max(0, int(tokens)),
+        'limit': int(capacity),
+        'retry_after': round(max(0.0, retry_after), 3),
+    }
+
+
+def hash_identifier(value: Optional[str]) -> str:
+    """Identifiant stable d'une clé API (la clé elle-même n'est pas stockée)."""
+    if not value:
+        return 'default'
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Interface commune des backends."""
+
+    def acquire(self, key: str, capacity: float, rate: float, cost: int = 1) -> Dict[str, Any]:
+        """
+        Consomme `cost` jetons du seau `key` s'ils sont disponibles.
+
+        Args:
+            key: Seau (par exemple 'alpha_vantage:<clé>:minute' ou 'session:<id>')
+            capacity: Nombre maximal de jetons (rafale autorisée)
+            rate: Jetons rechargés par seconde
+            cost: Jetons consommés (0 = lecture du budget sans consommer)
+
+        Returns:
+            Dict {'allowed', 'remaining', 'limit', 'retry_after' (secondes)}
+        """
+        raise NotImplementedError
+
+    def remaining(self, key: str, capacity: float, rate: float) -> Dict[str, Any]:
+        """Budget restant du seau, sans consommer de jeton."""
+        return self.acquire(key, capacity, rate, cost=0)
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Seaux du processus ; les seaux pleins sont oubliés périodiquement."""
+
+    def __init__(self, sweep_interval: float = DEFAULT_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        # clé -> (jetons, mise à jour, date à laquelle le seau est de nouveau plein)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._last_sweep = time.monotonic()
+
+    def acquire(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            state = self._buckets.get(key)
+            tokens = capacity if state is None else min(capacity, state[0] + (now - state[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if cost > 0:
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return _result(allowed, tokens, capacity, 0.0 if allowed else (cost - tokens) / rate)
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for key in [k for k, state in self._buckets.items() if state[2] <= now]:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class RedisRateLimiter(RateLimiter):
+    """Seaux partagés dans Redis, mis à jour par un script Lua atomique."""
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = KEY_PREFIX):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = MemoryRateLimiter()
+
+    def acquire(self, key, capacity, rate, cost=1):
+        try:
+            allowed, tokens, retry_after = self._script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        except Exception as e:
+            logger.warning("Rate limiting Redis indisponible (%s), repli sur la mémoire du processus", e)
+            return self._fallback.acquire(key, capacity, rate, cost)
+        return _result(int(allowed) == 1, float(tokens), capacity, float(retry_after))
+
+
+def rate_limit_settings(config=None) -> Dict[str, Any]:
+    """
+    Réglages du rate limiting : configuration Flask si disponible, sinon
+    variables d'environnement (scripts, processus de jobs).
+    """
+    if config is None:
+        try:
+            from flask import current_app
+            config = current_app.config
+        except RuntimeError:
+            config = os.environ
+    backend = str(config.get('RATE_LIMIT_BACKEND') or 'memory').lower()
+    url = config.get('RATE_LIMIT_URL') or None
+    if backend == 'redis' and not url:
+        url = config.get('CACHE_REDIS_URL') or None
+    return {'backend': backend, 'url': url}
+
+
+def create_rate_limiter(settings: Dict[str, Any]) -> RateLimiter:
+    """Crée le backend décrit par les réglages `RATE_LIMIT_*`."""
+    backend = settings['backend']
+    if backend == 'redis':
+        if not settings['url']:
+            raise ValueError("RATE_LIMIT_URL (ou CACHE_REDIS_URL) est requis pour RATE_LIMIT_BACKEND=redis")
+        limiter = RedisRateLimiter(url=settings['url'])
+        limiter.client.ping()
+        return limiter
+    if backend != 'memory':
+        raise ValueError(f"RATE_LIMIT_BACKEND inconnu: {backend}")
+    return MemoryRateLimiter()
+
+
+# Un limiteur par réglages et par processus (les seaux mémoire ne sont pas partagés après fork)
+_limiters: Dict[Tuple[int, str, Optional[str]], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(config=None) -> RateLimiter:
+    """
+    Limiteur du processus ; repli sur la mémoire si Redis est indisponible.
+
+    Args:
+        config: Configuration (par défaut celle de l'application Flask, sinon
+            les variables d'environnement)
+    """
+    settings = rate_limit_settings(config)
+    key = (os.getpid(), settings['backend'], settings['url'])
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            try:
+                limiter = create_rate_limiter(settings)
+            except Exception as e:
+                logger.warning(f"Rate limiting partagé indisponible: {e}. Utilisation de la mémoire du processus.")
+                limiter = MemoryRateLimiter()
+            _limiters[key] = limiter
+        return limiter
@@ -0,0 +1,167 @@
+"""
+Regroupement des appels identiques simultanés (« single flight »).
+
+Pour une même clé, un seul appel est exécuté à la fois :
+- dans le processus, les autres threads attendent son résultat (événement) ;
+- entre processus (workers Gunicorn, instances), un verrou court est pris
+  dans le cache Flask (`cache.add`, atomique avec Redis). Les autres
+  processus retournent la valeur précédente si elle existe, sinon attendent
+  que le résultat apparaisse dans le cache (ou que le verrou disparaisse).
+
+Utilisé par le service des APIs boursières : à l'expiration d'une entrée
+populaire, un seul appel au fournisseur au lieu d'un par requête.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = 'singleflight:'
+DEFAULT_LOCK_TIMEOUT = 60
+
+
+class _Call:
+    """Appel en cours pour une clé (partagé par les threads du processus)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Un seul appel en cours par clé, dans le processus et entre processus.
+    """
+
+    def __init__(self, cache=None, lock_timeout: int = DEFAULT_LOCK_TIMEOUT, wait_interval: float = 0.1):
+        """
+        Args:
+            cache: Cache Flask-Caching portant les verrous (par défaut `app.extensions.cache`)
+            lock_timeout: Durée de vie du verrou entre processus (secondes)
+            wait_interval: Intervalle d'interrogation du cache pendant l'attente
+        """
+        self._cache = cache
+        self.lock_timeout = lock_timeout
+        self.wait_interval = wait_interval
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {'calls': 0, 'coalesced': 0, 'remote_waits': 0, 'previous_values': 0, 'lock_errors': 0}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from app.extensions import cache
+            return cache
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache):
+        self._cache = cache
+
+    def _backend_call(self, method: str, *args, **kwargs):
+        """Appel au cache Flask ; None si le cache est indisponible."""
+        try:
+            return getattr(self.cache, method)(*args, **kwargs)
+        except RuntimeError:
+            # Hors contexte d'application
+            return None
+        except Exception as e:
+            self._count('lock_errors')
+            logger.warning("Verrou de regroupement indisponible (%s): %s", method, e)
+            return None
+
+    def do(self, key: str, fn: Callable[[], Any],
+           lookup: Optional[Callable[[], Any]] = None,
+           previous: Optional[Callable[[], Any]] = None) -> Tuple[Any, bool]:
+        """
+        Exécute `fn()` une seule fois pour `key`.
+
+        Args:
+            key: Clé de l'appel
+            fn: Appel à exécuter (il enregistre lui-même son résultat dans le cache)
+            lookup: Relit le résultat dans le cache (None si absent) ; sans lui,
+                seul le regroupement dans le processus est fait
+            previous: Valeur précédente à servir au lieu d'attendre un appel
+                en cours dans un autre processus (None si absente)
+
+        Returns:
+            Tuple (résultat, True si le résultat ne vient pas de cet appel)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            result, shared = self._call_once(key, fn, lookup, previous)
+            call.result = result
+            return result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _call_once(self, key, fn, lookup, previous):
+        """Exécute sous verrou distribué, ou attend l'appel d'un autre processus."""
+        if lookup is None:
+            self._count('calls')
+            return fn(), False
+
+        lock_key = LOCK_PREFIX + key
+        acquired = self._backend_call('add', lock_key, os.getpid(), timeout=self.lock_timeout) is not False
+        if not acquired:
+            value = previous() if previous is not None else None
+            if value is not None:
+                self._count('previous_values')
+                return value, True
+            self._count('remote_waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                value = lookup()
+                if value is not None:
+                    return value, True
+                if self._backend_call('get', lock_key) is None:
+                    # L'appel concurrent a échoué ou a expiré : on appelle nous-mêmes
+                    break
+        else:
+            # Un autre processus a pu terminer entre notre lecture et le verrou
+            value = lookup()
+            if value is not None:
+                self._backend_call('delete', lock_key)
+                return value, True
+
+        self._count('calls')
+        try:
+            return fn(), False
+        finally:
+            if acquired:
+                self._backend_call('delete', lock_key)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs des appels regroupés."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
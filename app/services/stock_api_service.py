@@ -7,46 +7,107 @@ Ce module fournit une interface unifiée pour accéder à différentes APIs bour
 - IEX Cloud (gratuit avec clé API, limité selon le plan)
 
 Le service implémente :
-- Un cache intelligent pour réduire les appels API
+- Un cache intelligent pour réduire les appels API : une entrée fraîche
+  (`cache_timeout`) est servie telle quelle, une entrée périmée
+  (`stale_timeout` de plus) est servie immédiatement pendant que l'exécuteur
+  partagé la rafraîchit ; les symboles les plus demandés sont rafraîchis
+  avant leur expiration
+- Un seul appel en cours par requête identique (voir singleflight), dans le
+  processus et entre workers
 - Un rate limiting par API pour respecter les quotas
+- Un basculement entre fournisseurs (`fetch_with_failover`) : requête de
+  couverture vers le fournisseur suivant quand le premier tarde, disjoncteur
+  qui ignore un fournisseur en échec (voir provider_health)
+- Des sessions HTTP partagées par API (keep-alive, nouvelles tentatives avec
+  délai exponentiel, voir provider_http)
 - Une gestion d'erreurs robuste
 - Une normalisation des données retournées
+- Un stockage local des séries (Parquet, voir market_store) : seules les
+  barres postérieures à la dernière barre enregistrée sont téléchargées
 """
 
+import io
+import logging
 import os
 import re
+import threading
 import time
-from collections import defaultdict
-from typing import Optional, Dict, Any, Tuple
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from datetime import datetime, timedelta
 
 import pandas as pd
 import requests
 import yfinance as yf
-from flask import current_app
+from flask import current_app, has_app_context
 from flask_caching import Cache
+from app.services.frame_compaction import compact_dataframe, compaction_options
+from app.services.market_store import align_timestamp, get_market_store
+from app.services.provider_health import ProviderHealth, failover_options
+from app.services.provider_http import provider_get
+from app.services.rate_limiter import get_rate_limiter, hash_identifier
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 # Configuration des quotas par API
 API_QUOTAS = {
     'yahoo': {
         'requests_per_minute': 2000,  # Limite approximative (pas de limite officielle stricte)
         'requests_per_day': None,  # Pas de limite quotidienne connue
-        'cache_timeout': 300  # 5 minutes par défaut
+        'cache_timeout': 300,  # 5 minutes par défaut (données fraîches)
+        'stale_timeout': 3600,  # Puis servies périmées pendant le rafraîchissement
+        'max_concurrency': 4  # fetch_many : un seul téléchargement groupé en général
     },
     'alpha_vantage': {
         'requests_per_minute': 5,
         'requests_per_day': 500,
-        'cache_timeout': 3600  # 1 heure (API gratuite limitée)
+        'cache_timeout': 3600,  # 1 heure (API gratuite limitée)
+        'stale_timeout': 6 * 3600,
+        'max_concurrency': 2  # Appels simultanés de fetch_many
     },
     'iex_cloud': {
         'requests_per_minute': 100,  # Selon le plan gratuit
         'requests_per_day': 50000,  # Selon le plan gratuit
-        'cache_timeout': 300  # 5 minutes
+        'cache_timeout': 300,  # 5 minutes
+        'stale_timeout': 3600,
+        'max_concurrency': 4
     }
 }
 
-# Rate limiting par API (en mémoire)
-_rate_limiters: Dict[str, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+# Intervalle utilisé par chaque API quand aucun n'est demandé
+DEFAULT_INTERVALS = {'yahoo': '1d', 'alpha_vantage': 'daily', 'iex_cloud': '1d'}
+
+# Intervalles équivalents entre fournisseurs (nom Yahoo -> nom du fournisseur),
+# pour le basculement
+PROVIDER_INTERVALS = {
+    'yahoo': {i: i for i in ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h',
+                             '1d', '5d', '1wk', '1mo', '3mo')},
+    'alpha_vantage': {'1d': 'daily', '1wk': 'weekly', '1mo': 'monthly'},
+    'iex_cloud': {'1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m', '60m': '1h', '1h': '1h',
+                  '1d': '1d', '1wk': '1w', '1mo': '1mo'},
+}
+
+YAHOO_INTRADAY_INTERVALS = ('1m', '2m', '5m', '15m', '30m', '60m', '90m')
+IEX_INTRADAY_INTERVALS = ('1m', '5m', '15m', '30m', '1h')
+# Plages IEX Cloud, de la plus courte à la plus longue
+IEX_RANGES = ('5d', '1m', '3m', '6m', '1y', '2y', '5y')
+# Barres d'une réponse Alpha Vantage 'compact' et durée qu'elles couvrent
+ALPHA_VANTAGE_COMPACT_BARS = 100
+ALPHA_VANTAGE_COMPACT_SPAN = {'daily': pd.Timedelta(days=140), 'weekly': pd.Timedelta(weeks=100),
+                              'monthly': pd.Timedelta(days=3000)}
+# Écart toléré entre le début de la fenêtre demandée et la première barre
+# enregistrée (week-ends, jours fériés)
+WINDOW_TOLERANCE = pd.Timedelta(days=5)
+
+# Rafraîchissement planifié : nombre de requêtes suivies au plus par worker
+POPULARITY_MAX_KEYS = 1000
+
+# Variables d'environnement des clés API (budget de rate limiting par clé)
+API_KEY_ENV = {'alpha_vantage': 'ALPHAVANTAGE_KEY', 'iex_cloud': 'IEX_CLOUD_API_KEY'}
+# Seaux de rate limiting : (nom, quota dans API_QUOTAS, durée de la fenêtre en secondes)
+RATE_LIMIT_WINDOWS = (('minute', 'requests_per_minute', 60), ('day', 'requests_per_day', 86400))
 
 
 class StockAPIError(Exception):
@@ -54,9 +115,72 @@ class StockAPIError(Exception):
     pass
 
 
+class ProviderError(StockAPIError):
+    """
+    Échec côté fournisseur (réseau, délai dépassé, HTTP 5xx) : compté par le
+    disjoncteur, contrairement aux erreurs de la requête (symbole inconnu,
+    clé ou intervalle invalide).
+    """
+    pass
+
+
+class ProviderUnavailable(StockAPIError):
+    """Exception levée lorsque le disjoncteur d'un fournisseur est ouvert."""
+    pass
+
+
 class RateLimitExceeded(StockAPIError):
     """Exception levée lorsque le rate limit est dépassé."""
-    pass
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _period_offset(period: str) -> Optional[pd.DateOffset]:
+    """Durée d'une période Yahoo ('7d', '1mo', '1y') ou IEX ('1m', '5y') ; None pour 'max'/'ytd'."""
+    match = re.match(r'^(\d+)(d|wk|mo|m|y)$', period or '')
+    if not match:
+        return None
+    unit = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'm': 'months', 'y': 'years'}[match.group(2)]
+    return pd.DateOffset(**{unit: int(match.group(1))})
+
+
+def _yahoo_period(interval: str) -> str:
+    """Période téléchargée par défaut pour un intervalle Yahoo."""
+    if interval in YAHOO_INTRADAY_INTERVALS:
+        return '7d'
+    if interval == '1h':
+        return '60d'
+    return '1y'
+
+
+def _iex_range(interval: str) -> str:
+    """Plage téléchargée par défaut pour un intervalle IEX Cloud."""
+    if interval in IEX_INTRADAY_INTERVALS:
+        return '1d'
+    return {'1d': '1m', '1w': '3m', '1mo': '1y'}.get(interval, '1y')
+
+
+def _equivalent_interval(source: str, interval: Optional[str], target: str) -> Optional[str]:
+    """Intervalle de `target` équivalent à `interval` de `source`, ou None."""
+    interval = interval or DEFAULT_INTERVALS[source]
+    canonical = next((name for name, value in PROVIDER_INTERVALS[source].items() if value == interval), None)
+    if canonical is None:
+        return None
+    return PROVIDER_INTERVALS[target].get(canonical)
+
+
+def _batch_frame(data: Optional[pd.DataFrame], symbol: str) -> pd.DataFrame:
+    """Données d'un symbole dans un téléchargement groupé yfinance (colonnes (symbole, champ))."""
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return pd.DataFrame()
+        data = data[symbol]
+    # Les dates sont communes au lot : lignes vides pour les autres symboles
+    return data.dropna(how='all').reset_index()
 
 
 class StockAPIService:
@@ -73,8 +197,29 @@ class StockAPIService:
         Args:
             cache: Instance Flask-Caching (optionnel)
         """
+        self._singleflight = SingleFlight()
         self.cache = cache
-        self._rate_limiters = _rate_limiters
+        self._lock = threading.Lock()
+        # Rafraîchissements en cours (clés de cache) et popularité des requêtes
+        self._refreshing: set = set()
+        self._popularity: Counter = Counter()
+        self._requests: Dict[str, Tuple] = {}
+        self._scheduler_pid: Optional[int] = None
+        self._health: Optional[ProviderHealth] = None
+        self._stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0,
+                       'refreshes': 0, 'refresh_errors': 0, 'scheduled_refreshes': 0,
+                       'skipped_refreshes': 0,
+                       'hedged_requests': 0, 'failovers': 0}
+    
+    @property
+    def cache(self) -> Optional[Cache]:
+        return self._cache
+    
+    @cache.setter
+    def cache(self, cache: Optional[Cache]) -> None:
+        # Les verrous entre workers sont pris dans le même cache que les données
+        self._cache = cache
+        self._singleflight.cache = cache
         
     def get_available_apis(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -90,7 +235,8 @@ class StockAPIService:
             'name': 'Yahoo Finance',
             'requires_key': False,
             'has_key': True,  # Pas de clé requise
-            'quotas': API_QUOTAS['yahoo']
+            'quotas': API_QUOTAS['yahoo'],
+            'rate_limit': self.rate_limit_status('yahoo')
         }
         
         # Alpha Vantage
@@ -99,7 +245,8 @@ class StockAPIService:
             'name': 'Alpha Vantage',
             'requires_key': True,
             'has_key': bool(alphavantage_key),
-            'quotas': API_QUOTAS['alpha_vantage']
+            'quotas': API_QUOTAS['alpha_vantage'],
+            'rate_limit': self.rate_limit_status('alpha_vantage', alphavantage_key)
         }
         
         # IEX Cloud
@@ -108,21 +255,32 @@ class StockAPIService:
             'name': 'IEX Cloud',
             'requires_key': True,
             'has_key': bool(iex_key),
-            'quotas': API_QUOTAS['iex_cloud']
+            'quotas': API_QUOTAS['iex_cloud'],
+            'rate_limit': self.rate_limit_status('iex_cloud', iex_key)
         }
         
         return apis
     
-    def _check_rate_limit(self, api_name: str, identifier: str) -> bool:
+    def _rate_limit_buckets(self, api_name: str, api_key: Optional[str]) -> List[Tuple[str, str, float, float]]:
+        """Seaux d'une API pour une clé : [(fenêtre, seau, capacité, jetons par seconde)]."""
+        quota = API_QUOTAS[api_name]
+        env = API_KEY_ENV.get(api_name)
+        identity = hash_identifier(api_key or (os.getenv(env) if env else None))
+        return [(window, f"{api_name}:{identity}:{window}", quota[name], quota[name] / seconds)
+                for window, name, seconds in RATE_LIMIT_WINDOWS if quota.get(name)]
+    
+    def _check_rate_limit(self, api_name: str, api_key: Optional[str] = None) -> bool:
         """
-        Vérifie le rate limiting pour une API et un identifiant.
+        Consomme un appel du budget de l'API pour une clé (par minute et par
+        jour), partagé par tous les workers avec le backend Redis.
         
         Args:
             api_name: Nom de l'API
-            identifier: Identifiant unique (session ID, IP, etc.)
+            api_key: Clé API (par défaut celle de l'env) ; les appels sans clé
+                partagent le même budget
             
         Returns:
-            True si la requête est autorisée, False sinon
+            True si la requête est autorisée
             
         Raises:
             RateLimitExceeded: Si la limite est dépassée
@@ -130,24 +288,34 @@ class StockAPIService:
         if api_name not in API_QUOTAS:
             return True
         
-        quota = API_QUOTAS[api_name]
-        now = time.time()
-        
-        # Nettoyer les anciennes entrées (fenêtre glissante)
-        limiter = self._rate_limiters[api_name][identifier]
-        limiter[:] = [ts for ts in limiter if now - ts < 60]  # Fenêtre de 1 minute
-        
-        # Vérifier la limite par minute
-        if len(limiter) >= quota['requests_per_minute']:
-            raise RateLimitExceeded(
-                f"Rate limit dépassé pour {api_name}: "
-                f"{quota['requests_per_minute']} requêtes/min maximum"
-            )
-        
-        # Enregistrer la requête
-        limiter.append(now)
+        limiter = get_rate_limiter()
+        for window, bucket, capacity, rate in self._rate_limit_buckets(api_name, api_key):
+            result = limiter.acquire(bucket, capacity, rate)
+            if not result['allowed']:
+                unit = 'min' if window == 'minute' else 'jour'
+                raise RateLimitExceeded(
+                    f"Rate limit dépassé pour {api_name}: {result['limit']} requêtes/{unit} maximum "
+                    f"(réessayer dans {result['retry_after']:.0f} s)",
+                    retry_after=result['retry_after']
+                )
         return True
     
+    def rate_limit_status(self, api_name: str, api_key: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Budget restant d'une API pour une clé, sans le consommer.
+        
+        Returns:
+            Dict {fenêtre ('minute', 'day'): {'remaining', 'limit', 'retry_after'}}
+        """
+        if api_name not in API_QUOTAS:
+            return {}
+        limiter = get_rate_limiter()
+        status = {}
+        for window, bucket, capacity, rate in self._rate_limit_buckets(api_name, api_key):
+            result = limiter.remaining(bucket, capacity, rate)
+            status[window] = {k: result[k] for k in ('remaining', 'limit', 'retry_after')}
+        return status
+    
     def _validate_symbol(self, symbol: str) -> bool:
         """Valide le format d'un symbole boursier."""
         if not symbol or len(symbol) > 20:
@@ -189,56 +357,682 @@ class StockAPIService:
         symbol = symbol.upper()
         api_name = api_name.lower()
         
-        # Vérifier le rate limiting (utiliser un identifiant générique pour le cache)
+        self._track(api_name, symbol, interval, api_key, kwargs)
+        
+        # Vérifier le cache (une entrée périmée est servie et rafraîchie en arrière-plan)
+        cached_data = self._cached_or_refresh(api_name, symbol, interval, api_key, **kwargs)
+        if cached_data is not None:
+            return cached_data
+        
+        # Un seul appel au fournisseur par clé : les requêtes simultanées attendent
+        # son résultat, ou reçoivent la valeur précédente si un autre worker appelle
+        self._count('misses')
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        df, _ = self._singleflight.do(
+            cache_key,
+            lambda: self._fetch_and_cache(api_name, symbol, interval, api_key, **kwargs),
+            lookup=(lambda: self._cache_get(api_name, symbol, interval, **kwargs)) if self.cache else None,
+            previous=(lambda: self._previous_value(cache_key)) if self.cache else None,
+        )
+        return df
+    
+    def _fetch_and_cache(self, api_name: str, symbol: str, interval: Optional[str],
+                         api_key: Optional[str], **kwargs) -> pd.DataFrame:
+        """Appelle l'API (rate limiting, stockage local) et met le résultat en cache."""
+        # Fournisseur ignoré tant que son disjoncteur est ouvert (sans consommer de quota)
+        health = self.provider_health()
+        if not health.available(api_name):
+            raise ProviderUnavailable(f"{api_name} temporairement ignoré après des erreurs répétées")
+        
+        # Vérifier le rate limiting (budget partagé par fournisseur et clé API)
         try:
-            self._check_rate_limit(api_name, 'global')
+            self._check_rate_limit(api_name, api_key)
         except RateLimitExceeded as e:
             if current_app:
                 current_app.logger.warning(str(e))
             raise
         
-        # Vérifier le cache
-        if self.cache:
-            cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
-            cached_data = self.cache.get(cache_key)
-            if cached_data is not None:
-                if current_app:
-                    current_app.logger.debug(f"Données récupérées du cache: {cache_key}")
-                return cached_data
+        if not health.allow(api_name):
+            raise ProviderUnavailable(f"{api_name} temporairement ignoré après des erreurs répétées")
         
-        # Appeler l'API appropriée
+        # Appeler l'API appropriée (seulement les barres manquantes si la série est stockée)
+        started = time.perf_counter()
+        outcome = None
         try:
-            if api_name == 'yahoo':
-                df = self._fetch_yahoo(symbol, interval, **kwargs)
-            elif api_name == 'alpha_vantage':
-                df = self._fetch_alpha_vantage(symbol, interval, api_key, **kwargs)
-            elif api_name == 'iex_cloud':
-                df = self._fetch_iex_cloud(symbol, interval, api_key, **kwargs)
+            store = get_market_store()
+            if store is not None:
+                df = self._fetch_with_store(store, api_name, symbol, interval, api_key, **kwargs)
             else:
-                raise StockAPIError(f"API non supportée: {api_name}")
+                df = self._normalize_dataframe(self._call_api(api_name, symbol, interval, api_key, **kwargs))
+            outcome = True
         except Exception as e:
             if current_app:
                 current_app.logger.error(f"Erreur lors de l'appel API {api_name} pour {symbol}: {e}")
+            # Seuls les échecs du fournisseur comptent pour le disjoncteur ; les
+            # erreurs de la requête (symbole inconnu, clé invalide) sont neutres
+            if isinstance(e, (ProviderError, RateLimitExceeded, requests.exceptions.RequestException)):
+                outcome = False
             if isinstance(e, (StockAPIError, RateLimitExceeded)):
                 raise
             raise StockAPIError(f"Erreur API {api_name}: {str(e)}")
-        
-        # Normaliser le DataFrame
-        df = self._normalize_dataframe(df)
+        finally:
+            health.record(api_name, time.perf_counter() - started, outcome)
         
         # Mettre en cache
+        self._cache_set(api_name, symbol, interval, df, **kwargs)
+        return df
+    
+    def _previous_value(self, cache_key: str) -> Optional[pd.DataFrame]:
+        """Dernière valeur connue d'une entrée du cache (fraîche ou périmée), ou None."""
+        entry = self._cache_entry(cache_key)
+        return entry['data'] if entry else None
+    
+    def _cache_entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Entrée du cache {'data', 'fetched_at'}, ou None."""
+        if not self.cache:
+            return None
+        try:
+            entry = self.cache.get(cache_key)
+        except Exception as e:
+            logger.warning("Cache des APIs boursières indisponible: %s", e)
+            return None
+        return entry if isinstance(entry, dict) and 'fetched_at' in entry else None
+    
+    def _cache_get(self, api_name: str, symbol: str, interval: Optional[str],
+                   **kwargs) -> Optional[pd.DataFrame]:
+        """Données fraîches d'un symbole en cache, ou None."""
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        entry = self._cache_entry(cache_key)
+        if entry is None or time.time() - entry['fetched_at'] >= API_QUOTAS[api_name]['cache_timeout']:
+            return None
+        if current_app:
+            current_app.logger.debug(f"Données récupérées du cache: {cache_key}")
+        return entry['data']
+    
+    def _cached_or_refresh(self, api_name: str, symbol: str, interval: Optional[str],
+                           api_key: Optional[str], **kwargs) -> Optional[pd.DataFrame]:
+        """
+        Données en cache, fraîches ou périmées (le rafraîchissement est alors
+        soumis à l'exécuteur partagé) ; None si l'entrée a expiré.
+        """
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        entry = self._cache_entry(cache_key)
+        if entry is None:
+            return None
+        if time.time() - entry['fetched_at'] < API_QUOTAS[api_name]['cache_timeout']:
+            self._count('fresh_hits')
+        else:
+            self._count('stale_hits')
+            self.schedule_refresh(api_name, symbol, interval, api_key, **kwargs)
+        return entry['data']
+    
+    def _cache_set(self, api_name: str, symbol: str, interval: Optional[str],
+                   df: pd.DataFrame, **kwargs) -> None:
+        """Met en cache les données d'un symbole (fraîches puis périmées, selon l'API)."""
         if self.cache and api_name in API_QUOTAS:
             cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
-            timeout = API_QUOTAS[api_name]['cache_timeout']
-            self.cache.set(cache_key, df, timeout=timeout)
+            quota = API_QUOTAS[api_name]
+            timeout = quota['cache_timeout'] + quota.get('stale_timeout', 0)
+            self.cache.set(cache_key, {'data': df, 'fetched_at': time.time()}, timeout=timeout)
             if current_app:
                 current_app.logger.debug(f"Données mises en cache: {cache_key} (timeout: {timeout}s)")
+    
+    # -- Rafraîchissement en arrière-plan -----------------------------------
+    
+    def schedule_refresh(self, api_name: str, symbol: str, interval: Optional[str] = None,
+                         api_key: Optional[str] = None, **kwargs):
+        """
+        Soumet le rafraîchissement d'une entrée à l'exécuteur partagé.
+        
+        Returns:
+            Future de la tâche, ou None si un rafraîchissement de cette entrée
+            est déjà en cours dans le worker (ou si l'exécuteur le refuse)
+        """
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        with self._lock:
+            if cache_key in self._refreshing:
+                return None
+            self._refreshing.add(cache_key)
+        try:
+            from app.extensions import executor
+            future = executor.submit_background(refresh_stock_data, api_name, symbol, interval, api_key, kwargs)
+        except Exception as e:
+            with self._lock:
+                self._refreshing.discard(cache_key)
+            logger.warning("Rafraîchissement de %s non soumis: %s", cache_key, e)
+            return None
+        if future is None:
+            # Pool des tâches de fond plein : l'entrée sera rafraîchie à une prochaine lecture
+            with self._lock:
+                self._refreshing.discard(cache_key)
+            logger.debug("Rafraîchissement de %s abandonné (tâches de fond en attente)", cache_key)
+            return None
+        
+        def _done(fut):
+            with self._lock:
+                self._refreshing.discard(cache_key)
+            error = fut.exception()
+            if error is not None:
+                self._count('refresh_errors')
+                logger.warning("Rafraîchissement de %s en échec: %s", cache_key, error)
+        
+        future.add_done_callback(_done)
+        return future
+    
+    def refresh(self, api_name: str, symbol: str, interval: Optional[str] = None,
+                api_key: Optional[str] = None, **kwargs) -> pd.DataFrame:
+        """
+        Rafraîchit une entrée du cache (tâche de fond).
         
+        Un seul rafraîchissement à la fois entre workers : si un autre worker
+        le fait déjà, la valeur actuelle est retournée sans appel.
+        """
+        self._count('refreshes')
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        df, _ = self._singleflight.do(
+            cache_key,
+            lambda: self._fetch_and_cache(api_name, symbol, interval, api_key, **kwargs),
+            lookup=(lambda: self._cache_get(api_name, symbol, interval, **kwargs)) if self.cache else None,
+            previous=(lambda: self._previous_value(cache_key)) if self.cache else None,
+        )
         return df
     
-    def _fetch_yahoo(self, symbol: str, interval: Optional[str] = None, 
-                    **kwargs) -> pd.DataFrame:
-        """Récupère des données depuis Yahoo Finance."""
+    def _track(self, api_name: str, symbol: str, interval: Optional[str],
+               api_key: Optional[str], kwargs: Dict[str, Any]) -> None:
+        """Compte une requête (popularité) et démarre le planificateur du worker."""
+        cache_key = self._get_cache_key(api_name, symbol, interval, **kwargs)
+        with self._lock:
+            self._popularity[cache_key] += 1
+            self._requests[cache_key] = (api_name, symbol, interval, api_key, dict(kwargs))
+            if len(self._popularity) > POPULARITY_MAX_KEYS:
+                for key, _ in self._popularity.most_common()[POPULARITY_MAX_KEYS // 2:]:
+                    del self._popularity[key]
+                    self._requests.pop(key, None)
+        self._ensure_scheduler()
+    
+    def refresh_popular(self, top_n: int, ahead: float = 0.8, reserve: float = 0.0) -> int:
+        """
+        Rafraîchit les `top_n` requêtes les plus demandées dont l'entrée
+        approche de l'expiration (âge ≥ `ahead` × cache_timeout) ou a expiré.
+        
+        Les rafraîchissements consomment le budget des appels des utilisateurs
+        (mêmes seaux) : une clé d'API n'est rafraîchie que s'il lui reste, après
+        l'appel, au moins `reserve` × la limite de chaque fenêtre (par minute et
+        par jour). Ses entrées périmées seront rafraîchies à la demande.
+        
+        Les compteurs de popularité sont ensuite divisés par deux : seules
+        les demandes récentes comptent.
+        
+        Returns:
+            Nombre de rafraîchissements soumis
+        """
+        with self._lock:
+            popular = [(key, self._requests[key]) for key, _ in self._popularity.most_common(top_n)]
+            for key in list(self._popularity):
+                self._popularity[key] //= 2
+                if not self._popularity[key]:
+                    del self._popularity[key]
+                    self._requests.pop(key, None)
+        
+        submitted = skipped = 0
+        now = time.time()
+        budgets: Dict[Tuple[str, Optional[str]], Dict[str, Dict[str, Any]]] = {}
+        for cache_key, (api_name, symbol, interval, api_key, kwargs) in popular:
+            entry = self._cache_entry(cache_key)
+            if entry is not None and now - entry['fetched_at'] < ahead * API_QUOTAS[api_name]['cache_timeout']:
+                continue
+            budget = budgets.get((api_name, api_key))
+            if budget is None:
+                budget = budgets[(api_name, api_key)] = self.rate_limit_status(api_name, api_key)
+            if any(window['remaining'] - 1 < reserve * window['limit'] for window in budget.values()):
+                skipped += 1
+                continue
+            if self.schedule_refresh(api_name, symbol, interval, api_key, **kwargs) is not None:
+                submitted += 1
+                for window in budget.values():
+                    window['remaining'] -= 1
+        if submitted:
+            self._count('scheduled_refreshes', submitted)
+        if skipped:
+            self._count('skipped_refreshes', skipped)
+            logger.debug("%d rafraîchissement(s) reporté(s) : budget des APIs réservé aux utilisateurs", skipped)
+        return submitted
+    
+    def _ensure_scheduler(self) -> None:
+        """Démarre le planificateur de rafraîchissement (un thread par worker)."""
+        if not has_app_context() or self._scheduler_pid == os.getpid():
+            return
+        config = current_app.config
+        top_n = int(config.get('STOCK_API_REFRESH_TOP_N', 0))
+        if top_n <= 0 or not self.cache:
+            return
+        with self._lock:
+            if self._scheduler_pid == os.getpid():
+                return
+            self._scheduler_pid = os.getpid()
+        app = current_app._get_current_object()
+        interval = float(config.get('STOCK_API_REFRESH_INTERVAL', 60))
+        ahead = float(config.get('STOCK_API_REFRESH_AHEAD', 0.8))
+        reserve = float(config.get('STOCK_API_REFRESH_RESERVE', 0.5))
+        
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.refresh_popular(top_n, ahead, reserve)
+                except Exception as e:
+                    logger.warning("Rafraîchissement planifié en échec: %s", e)
+        
+        threading.Thread(target=loop, name='stock-api-refresh', daemon=True).start()
+    
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += value
+    
+    def provider_health(self) -> ProviderHealth:
+        """Latences et disjoncteurs des fournisseurs (créés avec les réglages de l'application)."""
+        with self._lock:
+            if self._health is None:
+                options = failover_options()
+                self._health = ProviderHealth(options['error_rate'], options['min_calls'], options['cooldown'])
+            return self._health
+    
+    def _failover_candidates(self, api_name: str, interval: Optional[str], api_key: Optional[str],
+                             options: Dict[str, Any]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Fournisseurs à essayer, dans l'ordre : [(API, intervalle, clé API)]."""
+        order = [api_name]
+        if options['enabled']:
+            order += [p for p in options['order'] if p != api_name and p in API_QUOTAS]
+        health = self.provider_health()
+        candidates = []
+        for provider in order:
+            if provider == api_name:
+                provider_interval, key = interval, api_key
+            else:
+                # La clé fournie appartient au fournisseur demandé : les autres utilisent l'env
+                env = API_KEY_ENV.get(provider)
+                provider_interval, key = _equivalent_interval(api_name, interval, provider), None
+                if provider_interval is None or (env and not os.getenv(env)):
+                    continue
+            if health.available(provider):
+                candidates.append((provider, provider_interval, key))
+        return candidates
+    
+    def fetch_with_failover(self, api_name: str, symbol: str, interval: Optional[str] = None,
+                            api_key: Optional[str] = None, **kwargs) -> Tuple[pd.DataFrame, str]:
+        """
+        Récupère des données en basculant vers d'autres fournisseurs si besoin.
+        
+        Le fournisseur demandé est appelé en premier. S'il n'a pas répondu
+        après sa latence habituelle (percentile `STOCK_API_HEDGE_PERCENTILE`),
+        une requête de couverture part vers le fournisseur suivant de
+        `STOCK_API_FAILOVER_ORDER` (avec un intervalle équivalent et une clé
+        configurée) ; une erreur fait passer au suivant immédiatement. Le
+        premier DataFrame normalisé reçu est retourné ; les autres requêtes
+        sont annulées si elles n'ont pas démarré, sinon leur résultat ne sert
+        qu'à alimenter le cache. Les fournisseurs dont le disjoncteur est
+        ouvert sont ignorés.
+        
+        Args:
+            api_name: Fournisseur demandé ('yahoo', 'alpha_vantage', 'iex_cloud')
+            symbol: Symbole boursier
+            interval: Intervalle, dans les noms du fournisseur demandé
+            api_key: Clé API du fournisseur demandé
+            **kwargs: Paramètres additionnels (voir fetch_stock_data)
+            
+        Returns:
+            Tuple (DataFrame normalisé, fournisseur qui a répondu)
+            
+        Raises:
+            RateLimitExceeded: Si tous les fournisseurs essayés sont limités
+            StockAPIError: Si aucun fournisseur n'a pu répondre
+        """
+        options = failover_options()
+        candidates = self._failover_candidates(api_name, interval, api_key, options)
+        if not candidates:
+            raise ProviderUnavailable(f"{api_name} temporairement ignoré et aucun fournisseur de secours disponible")
+        if len(candidates) == 1:
+            provider, provider_interval, key = candidates[0]
+            return self.fetch_stock_data(provider, symbol, provider_interval, key, **kwargs), provider
+        
+        # Les threads reprennent le contexte de l'application (configuration, logger)
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def fetch(provider, provider_interval, key):
+            if app is None:
+                return self.fetch_stock_data(provider, symbol, provider_interval, key, **kwargs)
+            with app.app_context():
+                return self.fetch_stock_data(provider, symbol, provider_interval, key, **kwargs)
+        
+        health = self.provider_health()
+        queue = list(candidates)
+        pending = {}
+        errors: List[Tuple[str, Exception]] = []
+        pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix='hedge')
+        
+        def launch():
+            provider, provider_interval, key = queue.pop(0)
+            pending[pool.submit(fetch, provider, provider_interval, key)] = provider
+            return provider
+        
+        try:
+            last = launch()
+            while pending:
+                delay = None
+                if queue:
+                    delay = health.latency_percentile(last, options['hedge_percentile']) or options['hedge_delay']
+                done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    # Le dernier fournisseur tarde : requête de couverture
+                    self._count('hedged_requests')
+                    last = launch()
+                    continue
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        errors.append((provider, e))
+                        continue
+                    if provider != api_name:
+                        self._count('failovers')
+                        logger.info("Données %s servies par %s au lieu de %s", symbol, provider, api_name)
+                    return df, provider
+                # Erreur : le fournisseur suivant est essayé sans attendre
+                if queue:
+                    last = launch()
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        if all(isinstance(e, RateLimitExceeded) for _, e in errors):
+            raise errors[0][1]
+        raise StockAPIError("Aucun fournisseur n'a répondu: " + '; '.join(f"{p}: {e}" for p, e in errors))
+    
+    def fetch_many(self, api_name: str, symbols: Sequence[str],
+                   interval: Optional[str] = None,
+                   api_key: Optional[str] = None,
+                   **kwargs) -> Dict[str, Dict[str, Any]]:
+        """
+        Récupère les données de plusieurs symboles (liste de suivi).
+        
+        Les symboles absents du cache sont téléchargés en un seul appel groupé
+        pour Yahoo Finance (yfinance accepte une liste de symboles), sinon par
+        des appels `fetch_stock_data` simultanés, au plus `max_concurrency`
+        (voir API_QUOTAS). Chaque symbole est normalisé, stocké et mis en cache
+        séparément ; l'échec d'un symbole n'interrompt pas les autres.
+        
+        Args:
+            api_name: Nom de l'API ('yahoo', 'alpha_vantage', 'iex_cloud')
+            symbols: Symboles boursiers
+            interval: Intervalle des données (dépend de l'API)
+            api_key: Clé API optionnelle (prioritaire sur celle de l'env)
+            **kwargs: Paramètres supplémentaires (voir fetch_stock_data)
+            
+        Returns:
+            {'data': {symbole: DataFrame}, 'errors': {symbole: message}}
+            
+        Raises:
+            StockAPIError: Si l'API n'est pas supportée
+        """
+        api_name = api_name.lower()
+        if api_name not in API_QUOTAS:
+            raise StockAPIError(f"API non supportée: {api_name}")
+        
+        data: Dict[str, pd.DataFrame] = {}
+        errors: Dict[str, str] = {}
+        pending: List[str] = []
+        for symbol in dict.fromkeys((s or '').strip().upper() for s in symbols):
+            if not self._validate_symbol(symbol):
+                errors[symbol] = "Symbole invalide (format attendu: lettres/chiffres, tirets, points)"
+                continue
+            cached_data = self._cached_or_refresh(api_name, symbol, interval, api_key, **kwargs)
+            if cached_data is not None:
+                data[symbol] = cached_data
+            else:
+                pending.append(symbol)
+        
+        if api_name == 'yahoo' and len(pending) > 1:
+            fetched, failed = self._fetch_yahoo_batch(pending, interval, **kwargs)
+        else:
+            fetched, failed = self._fetch_concurrently(api_name, pending, interval, api_key, **kwargs)
+        data.update(fetched)
+        errors.update(failed)
+        if errors and current_app:
+            current_app.logger.warning(f"fetch_many {api_name}: {len(errors)} symbole(s) en échec: {errors}")
+        return {'data': data, 'errors': errors}
+    
+    def _fetch_concurrently(self, api_name: str, symbols: List[str], interval: Optional[str],
+                            api_key: Optional[str], **kwargs) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """Appels `fetch_stock_data` en parallèle (au plus `max_concurrency`)."""
+        data, errors = {}, {}
+        if not symbols:
+            return data, errors
+        # Les threads reprennent le contexte de l'application (configuration, logger)
+        app = current_app._get_current_object() if has_app_context() else None
+        
+        def fetch(symbol):
+            if app is None:
+                return self.fetch_stock_data(api_name, symbol, interval, api_key, **kwargs)
+            with app.app_context():
+                return self.fetch_stock_data(api_name, symbol, interval, api_key, **kwargs)
+        
+        workers = min(len(symbols), API_QUOTAS[api_name].get('max_concurrency', 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch-many') as pool:
+            futures = {pool.submit(fetch, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    data[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = str(e)
+        return data, errors
+    
+    def _fetch_yahoo_batch(self, symbols: List[str], interval: Optional[str],
+                           **kwargs) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """
+        Un seul téléchargement Yahoo Finance pour plusieurs symboles.
+        
+        Avec le stockage local, le lot part de la plus ancienne des dernières
+        barres enregistrées (ou de la fenêtre complète si un symbole n'a pas
+        d'historique suffisant) ; chaque symbole ne fusionne que ses barres.
+        """
+        data, errors = {}, {}
+        try:
+            self._check_rate_limit('yahoo')
+        except RateLimitExceeded as e:
+            return data, {symbol: str(e) for symbol in symbols}
+        
+        store = get_market_store()
+        plans = {}
+        for symbol in symbols:
+            try:
+                plans[symbol] = self._store_plan(store, 'yahoo', symbol, interval, **kwargs) if store else None
+            except ValueError as e:
+                errors[symbol] = str(e)
+        to_download = [s for s, plan in plans.items() if plan is None or plan['since'] is not False]
+        
+        raw = None
+        if to_download:
+            sinces = [plans[s]['since'] if plans[s] else None for s in to_download]
+            since = None if any(x is None for x in sinces) else min(sinces)
+            try:
+                raw = self._download_yahoo(to_download, interval, since, period=kwargs.get('period'),
+                                           group_by='ticker')
+            except Exception as e:
+                if current_app:
+                    current_app.logger.error(f"Erreur lors de l'appel groupé Yahoo ({len(to_download)} symboles): {e}")
+                errors.update({symbol: f"Erreur Yahoo Finance: {e}" for symbol in to_download})
+                to_download = []
+        
+        for symbol, plan in plans.items():
+            if symbol in errors:
+                continue
+            try:
+                frame = _batch_frame(raw, symbol) if symbol in to_download else None
+                full_window = plan is None or plan['since'] is None
+                if frame is not None and frame.empty and full_window:
+                    raise StockAPIError("Aucune donnée retournée par Yahoo Finance")
+                if plan is None:
+                    df = self._normalize_dataframe(frame)
+                else:
+                    df = self._store_merge(store, plan, frame)
+                self._cache_set('yahoo', symbol, interval, df, **kwargs)
+                data[symbol] = df
+            except Exception as e:
+                errors[symbol] = str(e)
+        return data, errors
+    
+    def _call_api(self, api_name: str, symbol: str, interval: Optional[str],
+                  api_key: Optional[str], **kwargs) -> pd.DataFrame:
+        """Appelle l'API `api_name` (données brutes, non normalisées)."""
+        if api_name == 'yahoo':
+            return self._fetch_yahoo(symbol, interval, **kwargs)
+        if api_name == 'alpha_vantage':
+            return self._fetch_alpha_vantage(symbol, interval, api_key, **kwargs)
+        if api_name == 'iex_cloud':
+            return self._fetch_iex_cloud(symbol, interval, api_key, **kwargs)
+        raise StockAPIError(f"API non supportée: {api_name}")
+    
+    def _window(self, api_name: str, interval: str, now: pd.Timestamp,
+                **kwargs) -> Tuple[Optional[pd.Timestamp], Optional[int]]:
+        """
+        Fenêtre retournée par défaut, identique à celle que l'API télécharge :
+        (date de début, nombre de barres), None = sans limite.
+        """
+        if api_name == 'alpha_vantage':
+            if kwargs.get('outputsize', 'compact') == 'compact':
+                return None, ALPHA_VANTAGE_COMPACT_BARS
+            return None, None
+        if api_name == 'iex_cloud':
+            offset = _period_offset(_iex_range(interval))
+        else:
+            offset = _period_offset(kwargs.get('period') or _yahoo_period(interval))
+        return (now - offset if offset is not None else None), None
+    
+    def _store_plan(self, store, api_name: str, symbol: str, interval: Optional[str],
+                    **kwargs) -> Dict[str, Any]:
+        """
+        Ce qu'il faut télécharger pour compléter une série stockée.
+        
+        La première fois (ou si la série ne couvre pas la fenêtre demandée),
+        la fenêtre complète (`since` None) ; ensuite seulement la fin de la
+        série, à partir de la dernière barre enregistrée (révisée si la séance
+        était en cours). Une plage `start`/`end` entièrement couverte par la
+        série est servie sans appel réseau (`since` False).
+        """
+        start, end = kwargs.get('start'), kwargs.get('end')
+        series = (api_name, symbol, interval or DEFAULT_INTERVALS.get(api_name, 'default'))
+        store.series_dir(*series)  # ValueError si un segment est invalide
+        try:
+            last = store.last_timestamp(*series)
+            first = store.first_timestamp(*series) if last is not None else None
+        except Exception as e:
+            logger.warning("Série locale illisible %s: %s", series, e)
+            last = first = None
+        
+        tz = last.tz if last is not None else None
+        now = align_timestamp(pd.Timestamp.now(tz='UTC'), tz)
+        window_start, bars = self._window(api_name, series[2], now, **kwargs)
+        if start is not None or end is not None:
+            window_start, bars = align_timestamp(start, tz), None
+        
+        since = last
+        if last is not None and window_start is not None:
+            if first > window_start + WINDOW_TOLERANCE or last < window_start:
+                # Historique trop court ou trop ancien : fenêtre complète
+                since = None
+            elif end is not None and align_timestamp(end, tz) <= last:
+                # Plage déjà couverte : lecture sur disque uniquement
+                since = False
+        return {'series': series, 'since': since, 'start': window_start, 'end': end, 'bars': bars}
+    
+    def _store_merge(self, store, plan: Dict[str, Any], fresh: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Enregistre les barres téléchargées (données brutes, None si aucun appel)
+        et retourne la fenêtre du plan, lue sur disque.
+        """
+        series = plan['series']
+        if fresh is not None:
+            fresh = self._normalize_dataframe(fresh)
+            if fresh.empty:
+                logger.debug("Aucune nouvelle barre pour %s", series)
+            else:
+                try:
+                    added = store.write(*series, fresh)
+                    logger.debug("%d nouvelle(s) barre(s) enregistrée(s) pour %s", added, series)
+                except Exception as e:
+                    logger.warning("Série non enregistrée %s: %s", series, e)
+                    return fresh
+        
+        df = store.read(*series, start=plan['start'], end=plan['end'], last=plan['bars'])
+        if df is None:
+            return fresh
+        if compaction_options()['enabled']:
+            df = compact_dataframe(df)
+        return df
+    
+    def _fetch_with_store(self, store, api_name: str, symbol: str, interval: Optional[str],
+                          api_key: Optional[str], **kwargs) -> pd.DataFrame:
+        """
+        Complète la série stockée par les barres manquantes, puis la lit sur disque.
+        
+        Returns:
+            DataFrame normalisé : la fenêtre par défaut de l'API, ou la plage
+            `start`/`end` demandée
+        """
+        plan = self._store_plan(store, api_name, symbol, interval, **kwargs)
+        kwargs.pop('start', None)
+        kwargs.pop('end', None)
+        fresh = None
+        if plan['since'] is None:
+            fresh = self._call_api(api_name, symbol, interval, api_key, **kwargs)
+        elif plan['since'] is not False:
+            fresh = self._call_api(api_name, symbol, interval, api_key, since=plan['since'], **kwargs)
+        return self._store_merge(store, plan, fresh)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du service (cache, rafraîchissements, appels regroupés)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['refreshing'] = len(self._refreshing)
+            stats['tracked_requests'] = len(self._popularity)
+        stats['scheduler'] = self._scheduler_pid == os.getpid()
+        stats['singleflight'] = self._singleflight.stats()
+        stats['providers'] = self.provider_health().stats()
+        return stats
+    
+    def stored_data(self, api_name: str, symbol: str, interval: Optional[str] = None,
+                    start=None, end=None) -> Optional[pd.DataFrame]:
+        """
+        Plage `start`/`end` d'une série stockée, lue sur disque sans appel API.
+        
+        Returns:
+            DataFrame normalisé, ou None si la série n'est pas stockée
+        """
+        store = get_market_store()
+        if store is None:
+            return None
+        api_name = api_name.lower()
+        series = (api_name, symbol.upper(), interval or DEFAULT_INTERVALS.get(api_name, 'default'))
+        try:
+            return store.read(*series, start=start, end=end)
+        except ValueError as e:
+            raise StockAPIError(str(e))
+    
+    def _download_yahoo(self, tickers, interval: Optional[str] = None,
+                        since: Optional[pd.Timestamp] = None, period: Optional[str] = None,
+                        **options) -> Optional[pd.DataFrame]:
+        """
+        Appel yf.download pour un symbole ou une liste de symboles.
+        
+        Args:
+            since: Première barre à télécharger (sinon `period` ou une période
+                adaptée à l'intervalle)
+            **options: Options de yf.download (ex: group_by='ticker')
+        """
         yf_interval = interval or '1d'
         
         # Validation de l'intervalle
@@ -247,25 +1041,31 @@ class StockAPIService:
         if yf_interval not in valid_intervals:
             raise StockAPIError(f"Intervalle Yahoo invalide: {yf_interval}")
         
-        # Choix d'une période adaptée à l'intervalle
-        period = kwargs.get('period', None)
-        if not period:
-            if yf_interval in ('1m', '2m', '5m', '15m', '30m', '60m', '90m'):
-                period = '7d'
-            elif yf_interval == '1h':
-                period = '60d'
-            else:
-                period = '1y'
+        # Depuis la dernière barre stockée, sinon une période adaptée à l'intervalle
+        if since is not None:
+            intraday = yf_interval in YAHOO_INTRADAY_INTERVALS or yf_interval == '1h'
+            window = {'start': since if intraday else since.strftime('%Y-%m-%d')}
+        else:
+            window = {'period': period or _yahoo_period(yf_interval)}
         
+        # Timeout de 30 secondes
+        return yf.download(
+            tickers, 
+            interval=yf_interval, 
+            progress=False, 
+            timeout=30,
+            **window,
+            **options
+        )
+    
+    def _fetch_yahoo(self, symbol: str, interval: Optional[str] = None, 
+                    since: Optional[pd.Timestamp] = None, **kwargs) -> pd.DataFrame:
+        """Récupère des données depuis Yahoo Finance."""
         try:
-            # Timeout de 30 secondes
-            data = yf.download(
-                symbol, 
-                interval=yf_interval, 
-                period=period, 
-                progress=False, 
-                timeout=30
-            )
+            data = self._download_yahoo(symbol, interval, since, period=kwargs.get('period'))
+            
+            if since is not None and (data is None or data.empty):
+                return pd.DataFrame()
             
             if data is None or data.empty:
                 raise StockAPIError("Aucune donnée retournée par Yahoo Finance")
@@ -276,11 +1076,15 @@ class StockAPIService:
             data.reset_index(inplace=True)
             return data
             
-        except Exception as e:
+        except StockAPIError as e:
             raise StockAPIError(f"Erreur Yahoo Finance: {str(e)}")
+        except Exception as e:
+            # Exception levée par yfinance (réseau, délai, limitation du fournisseur)
+            raise ProviderError(f"Erreur Yahoo Finance: {str(e)}")
     
     def _fetch_alpha_vantage(self, symbol: str, interval: Optional[str] = None,
-                            api_key: Optional[str] = None, **kwargs) -> pd.DataFrame:
+                            api_key: Optional[str] = None, since: Optional[pd.Timestamp] = None,
+                            **kwargs) -> pd.DataFrame:
         """Récupère des données depuis Alpha Vantage."""
         # Validation de l'intervalle
         valid_intervals = {'daily', 'weekly', 'monthly'}
@@ -307,18 +1111,28 @@ class StockAPIService:
         if not func:
             raise StockAPIError("Intervalle Alpha Vantage invalide")
         
+        # 'compact' (100 dernières barres) suffit tant que la dernière barre
+        # stockée est dans ces 100 barres
+        outputsize = kwargs.get('outputsize', 'compact')
+        if since is not None:
+            span = ALPHA_VANTAGE_COMPACT_SPAN[chosen_interval]
+            recent = since >= align_timestamp(pd.Timestamp.now(tz='UTC'), since.tz) - span
+            outputsize = 'compact' if recent else 'full'
+        
         url = "https://www.alphavantage.co/query"
         params = {
             'function': func,
             'symbol': symbol,
             'datatype': 'csv',
-            'outputsize': kwargs.get('outputsize', 'compact'),
+            'outputsize': outputsize,
             'apikey': key.upper()
         }
         
         try:
-            resp = requests.get(url, params=params, timeout=30, verify=True)
+            resp = provider_get('alpha_vantage', url, params=params)
             
+            if resp.status_code >= 500:
+                raise ProviderError(f"Erreur HTTP {resp.status_code} depuis Alpha Vantage")
             if resp.status_code != 200:
                 raise StockAPIError(f"Erreur HTTP {resp.status_code} depuis Alpha Vantage")
             
@@ -333,7 +1147,7 @@ class StockAPIService:
             if not resp.text or len(resp.text) < 50:
                 raise StockAPIError("Réponse API Alpha Vantage vide ou invalide")
             
-            df = pd.read_csv(pd.compat.StringIO(resp.text))
+            df = pd.read_csv(io.StringIO(resp.text))
             if df.empty or len(df) < 1:
                 raise StockAPIError("Aucune donnée retournée par Alpha Vantage")
             
@@ -345,16 +1159,17 @@ class StockAPIService:
             return df
             
         except requests.exceptions.Timeout:
-            raise StockAPIError("Timeout lors de l'appel API Alpha Vantage")
+            raise ProviderError("Timeout lors de l'appel API Alpha Vantage")
         except requests.exceptions.RequestException as e:
-            raise StockAPIError(f"Erreur réseau Alpha Vantage: {str(e)}")
+            raise ProviderError(f"Erreur réseau Alpha Vantage: {str(e)}")
         except (StockAPIError, RateLimitExceeded):
             raise
         except Exception as e:
             raise StockAPIError(f"Erreur inattendue Alpha Vantage: {str(e)}")
     
     def _fetch_iex_cloud(self, symbol: str, interval: Optional[str] = None,
-                        api_key: Optional[str] = None, **kwargs) -> pd.DataFrame:
+                        api_key: Optional[str] = None, since: Optional[pd.Timestamp] = None,
+                        **kwargs) -> pd.DataFrame:
         """Récupère des données depuis IEX Cloud."""
         # Obtenir la clé API
         key = api_key or os.getenv('IEX_CLOUD_API_KEY')
@@ -371,32 +1186,26 @@ class StockAPIService:
         
         # Mapping des intervalles IEX Cloud
         # Options: 1m, 1d, 1w, 1m (month), 1y, 5y
-        if chosen_interval in ('1m', '5m', '15m', '30m', '1h'):
-            # Données intraday
-            url = f"https://cloud.iexapis.com/stable/stock/{symbol}/chart/1d"
-        else:
-            # Données historiques
-            range_param = '1y'  # Par défaut 1 an
-            if chosen_interval == '1d':
-                range_param = '1m'  # 1 mois de données quotidiennes
-            elif chosen_interval == '1w':
-                range_param = '3m'
-            elif chosen_interval == '1mo':
-                range_param = '1y'
-            
-            url = f"https://cloud.iexapis.com/stable/stock/{symbol}/chart/{range_param}"
+        range_param = _iex_range(chosen_interval)
+        if since is not None and chosen_interval not in IEX_INTRADAY_INTERVALS:
+            # Plus courte plage couvrant la dernière barre stockée
+            now = align_timestamp(pd.Timestamp.now(tz='UTC'), since.tz)
+            range_param = next((r for r in IEX_RANGES if now - _period_offset(r) <= since), range_param)
+        url = f"https://cloud.iexapis.com/stable/stock/{symbol}/chart/{range_param}"
         
         params = {
             'token': key
         }
         
         try:
-            resp = requests.get(url, params=params, timeout=30, verify=True)
+            resp = provider_get('iex_cloud', url, params=params)
             
             if resp.status_code == 401:
                 raise StockAPIError("Clé API IEX Cloud invalide ou expirée")
             elif resp.status_code == 402:
                 raise StockAPIError("Quota IEX Cloud dépassé - veuillez vérifier votre plan")
+            elif resp.status_code >= 500:
+                raise ProviderError(f"Erreur HTTP {resp.status_code} depuis IEX Cloud")
             elif resp.status_code != 200:
                 raise StockAPIError(f"Erreur HTTP {resp.status_code} depuis IEX Cloud")
             
@@ -422,16 +1231,18 @@ class StockAPIService:
                 if old_col in df.columns:
                     df.rename(columns={old_col: new_col}, inplace=True)
             
-            # Convertir la date si nécessaire
+            # Convertir la date si nécessaire (intraday : date + minute)
             if 'Date' in df.columns:
+                if 'minute' in df.columns:
+                    df['Date'] = df['Date'].astype(str) + ' ' + df.pop('minute').astype(str)
                 df['Date'] = pd.to_datetime(df['Date'])
             
             return df
             
         except requests.exceptions.Timeout:
-            raise StockAPIError("Timeout lors de l'appel API IEX Cloud")
+            raise ProviderError("Timeout lors de l'appel API IEX Cloud")
         except requests.exceptions.RequestException as e:
-            raise StockAPIError(f"Erreur réseau IEX Cloud: {str(e)}")
+            raise ProviderError(f"Erreur réseau IEX Cloud: {str(e)}")
         except ValueError as e:
             raise StockAPIError(f"Erreur de parsing JSON IEX Cloud: {str(e)}")
         except (StockAPIError, RateLimitExceeded):
@@ -478,9 +1289,20 @@ class StockAPIService:
             df.sort_values('Date', inplace=True)
             df.reset_index(drop=True, inplace=True)
         
+        # Types compacts (float32/int32 sans perte, category) pour le cache et la session
+        if compaction_options()['enabled']:
+            df = compact_dataframe(df)
+        
         return df
 
 
+def refresh_stock_data(api_name: str, symbol: str, interval: Optional[str],
+                       api_key: Optional[str], kwargs: Dict[str, Any]) -> None:
+    """Tâche de fond de l'exécuteur partagé : rafraîchit une entrée du cache."""
+    from app.extensions import cache
+    get_stock_api_service(cache=cache).refresh(api_name, symbol, interval, api_key, **kwargs)
+
+
 # Instance singleton du service
 _service_instance: Optional[StockAPIService] = None
 
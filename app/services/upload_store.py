@@ -0,0 +1,378 @@
+"""
+Stockage des fichiers uploadés adressé par contenu.
+
+Les octets d'un fichier accepté sont rangés une seule fois sous
+`<UPLOAD_FOLDER>/.objects/<sha256>.<ext>`. Le nom choisi par l'utilisateur
+(`<UPLOAD_FOLDER>/<nom>`) est un lien symbolique vers cet objet (lien physique
+ou copie si le système ne le permet pas) et la correspondance nom -> empreinte
+est enregistrée dans la table `data_files`.
+
+Les noms sont communs à tous les utilisateurs : la session garde aussi
+l'empreinte du fichier courant, et `current_upload_path` lit l'objet de cette
+empreinte si un autre upload a depuis associé le nom à un autre contenu.
+
+Les données dérivées sont rangées à côté de l'objet : la copie colonnaire
+(`<objet>.parquet`) et le résumé (`<objet>.json` : colonnes, types, aperçu,
+format CSV). Un fichier déjà reçu sous un autre nom est donc reconnu par son
+empreinte et réutilisé sans analyse antivirus, lecture ni conversion.
+
+Un objet vers lequel plus aucun nom ne pointe (nom supprimé ou associé à un
+autre contenu) est supprimé avec ses données dérivées par `gc`, lancé au plus
+une fois par heure lors d'un `link` ou d'un `remove`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OBJECTS_DIR = '.objects'
+READ_BLOCK = 1024 * 1024
+GC_INTERVAL = 3600
+# Âge minimal d'un objet non référencé avant sa suppression : entre `ingest` et
+# `link`, un objet en cours d'upload n'a pas encore de nom
+GC_MIN_AGE = 3600
+
+# Dernier nettoyage par répertoire (les instances sont créées à chaque requête)
+_last_gc: Dict[str, float] = {}
+_gc_lock = threading.Lock()
+
+
+def save_and_hash(stream: BinaryIO, dest_path: str) -> Tuple[str, int]:
+    """
+    Écrit `stream` dans `dest_path` en calculant son empreinte au passage.
+
+    Returns:
+        Tuple (sha256 hexadécimal, taille en octets)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, 'wb') as fh:
+        for block in iter(lambda: stream.read(READ_BLOCK), b''):
+            fh.write(block)
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadStore:
+    """Objets adressés par contenu et noms d'upload pointant vers eux."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+
+    # -- Objets ------------------------------------------------------------
+
+    def object_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, f"{sha256}.{ext.lstrip('.').lower()}")
+
+    @staticmethod
+    def summary_path(object_path: str) -> str:
+        return object_path + '.json'
+
+    def lookup(self, sha256: str, ext: str) -> Optional[Dict[str, Any]]:
+        """
+        Résumé d'un objet déjà accepté, ou None.
+
+        Un objet sans résumé (upload interrompu ou rejeté à la lecture) n'est
+        pas réutilisé.
+        """
+        path = self.object_path(sha256, ext)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(self.summary_path(path), encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def ingest(self, src_path: str, sha256: str, ext: str) -> str:
+        """Range `src_path` comme objet `sha256` (déplacé) ; retourne le chemin de l'objet."""
+        os.makedirs(self.objects_dir, exist_ok=True)
+        path = self.object_path(sha256, ext)
+        if os.path.exists(path):
+            os.remove(src_path)
+        else:
+            # shutil.move : le fichier temporaire peut être sur un autre disque
+            shutil.move(src_path, path)
+        return path
+
+    def save_summary(self, sha256: str, ext: str, summary: Dict[str, Any]) -> None:
+        """Enregistre le résumé d'un objet : il est dès lors réutilisable."""
+        path = self.summary_path(self.object_path(sha256, ext))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(summary, fh, separators=(',', ':'), default=str)
+        os.replace(tmp_path, path)
+
+    # -- Noms --------------------------------------------------------------
+
+    def link(self, filename: str, object_path: str) -> str:
+        """
+        Fait pointer `<root>/<filename>` vers l'objet (remplace l'ancien fichier).
+
+        Returns:
+            Chemin du nom
+        """
+        name_path = os.path.join(self.root, filename)
+        tmp_path = f"{name_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.symlink(os.path.relpath(object_path, self.root), tmp_path)
+        except (OSError, NotImplementedError):
+            # Liens symboliques non autorisés (Windows sans privilège)
+            try:
+                os.link(object_path, tmp_path)
+            except OSError:
+                shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, name_path)
+        self.maybe_gc()
+        return name_path
+
+    def remove(self, name_path: str) -> None:
+        """Supprime un nom ; son objet aussi s'il n'a jamais été accepté (pas de résumé)."""
+        target = os.path.realpath(name_path) if os.path.islink(name_path) else None
+        try:
+            os.remove(name_path)
+        except OSError:
+            pass
+        if target is not None and not os.path.exists(self.summary_path(target)):
+            for path in (target, target + '.parquet'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.maybe_gc()
+
+    def sha256_of(self, name_path: str) -> Optional[str]:
+        """Empreinte d'un nom pointant vers un objet, sinon None."""
+        target = os.path.realpath(name_path)
+        if os.path.dirname(target) != os.path.realpath(self.objects_dir):
+            return None
+        return os.path.basename(target).split('.', 1)[0]
+
+    def resolve(self, filename: str, sha256: Optional[str] = None) -> str:
+        """
+        Chemin à lire pour `filename`, uploadé avec le contenu `sha256`.
+
+        Si le nom désigne depuis un autre contenu, retourne l'objet d'origine et
+        touche son résumé pour que `gc` le conserve tant qu'il est lu. Sans
+        empreinte, le nom lui-même.
+        """
+        name_path = os.path.join(self.root, filename)
+        if not sha256 or self.sha256_of(name_path) == sha256:
+            return name_path
+        path = self.object_path(sha256, file_extension(filename))
+        if os.path.exists(path):
+            try:
+                os.utime(self.summary_path(path))
+            except OSError:
+                pass
+            return path
+        # Nom copié (sans lien) dont l'objet a été nettoyé : valable s'il a le même contenu
+        if os.path.isfile(name_path) and not os.path.islink(name_path) and file_sha256(name_path) == sha256:
+            return name_path
+        return path
+
+    # -- Nettoyage ---------------------------------------------------------
+
+    def _referenced(self) -> Tuple[set, set]:
+        """Objets désignés par un nom : cibles des liens symboliques, inodes des liens physiques."""
+        objects_dir = os.path.realpath(self.objects_dir)
+        targets, inodes = set(), set()
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_symlink():
+                    target = os.path.realpath(entry.path)
+                    if os.path.dirname(target) == objects_dir:
+                        targets.add(os.path.basename(target))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    if stat.st_nlink > 1:
+                        inodes.add((stat.st_dev, stat.st_ino))
+            except OSError:
+                pass
+        return targets, inodes
+
+    def gc(self, min_age: float = GC_MIN_AGE, now: Optional[float] = None) -> int:
+        """
+        Supprime les objets vers lesquels aucun nom ne pointe, avec leur résumé
+        et leur copie colonnaire.
+
+        Un nom copié (ni lien symbolique ni lien physique possible) ne retient
+        pas l'objet : il garde ses octets, seule la déduplication est perdue.
+
+        Args:
+            min_age: Âge minimal (secondes) des fichiers d'un objet supprimé
+            now: Horodatage de référence (défaut : maintenant)
+
+        Returns:
+            Nombre d'objets supprimés
+        """
+        now = time.time() if now is None else now
+        try:
+            entries = list(os.scandir(self.objects_dir))
+        except FileNotFoundError:
+            return 0
+        targets, inodes = self._referenced()
+
+        # Fichiers de chaque objet : `<sha256>.<ext>` et ses dérivés `<sha256>.<ext>.*`
+        families: Dict[str, list] = {}
+        for entry in entries:
+            families.setdefault('.'.join(entry.name.split('.', 2)[:2]), []).append(entry)
+
+        removed = 0
+        for name, family in families.items():
+            if name in targets:
+                continue
+            try:
+                stats = {entry.name: entry.stat(follow_symlinks=False) for entry in family}
+            except OSError:
+                continue
+            primary = stats.get(name)
+            if primary is not None and (primary.st_dev, primary.st_ino) in inodes:
+                continue
+            if any(now - stat.st_mtime < min_age for stat in stats.values()):
+                continue
+            for entry in family:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            removed += 1
+        if removed:
+            logger.info("%d objet(s) non référencé(s) supprimé(s) de %s", removed, self.objects_dir)
+        return removed
+
+    def maybe_gc(self) -> None:
+        """Lance `gc` au plus une fois par `GC_INTERVAL` secondes pour ce répertoire."""
+        now = time.time()
+        with _gc_lock:
+            if now - _last_gc.get(self.root, 0.0) < GC_INTERVAL:
+                return
+            _last_gc[self.root] = now
+        try:
+            self.gc(now=now)
+        except Exception as e:
+            logger.warning("Nettoyage des objets uploadés impossible: %s", e)
+
+
+def file_extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[-1].lower()
+
+
+def preview_rows(df: pd.DataFrame, rows: int = 5) -> list:
+    """Premières lignes en chaînes ('' pour les valeurs manquantes, quel que soit le type)."""
+    head = df.head(rows).astype(object)
+    return head.where(head.notna(), '').astype(str).values.tolist()
+
+
+def dataframe_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Colonnes, aperçu (5 lignes) et types d'un DataFrame, en types JSON-serializables,
+    ainsi que l'occupation mémoire avant/après compaction si elle est connue.
+    """
+    raw_dtypes = df.dtypes.apply(lambda x: x.name).to_dict()
+    summary = {
+        'columns': [str(c) for c in df.columns.tolist()],
+        'preview': preview_rows(df),
+        'dtypes': {str(k): v for k, v in raw_dtypes.items()},
+    }
+    if 'memory' in df.attrs:
+        summary['memory'] = dict(df.attrs['memory'])
+    return summary
+
+
+def accept_upload(store: UploadStore, filepath: str, df: pd.DataFrame, sha256: Optional[str] = None,
+                  user: Optional[str] = None, columnar_copy: bool = True) -> Dict[str, Any]:
+    """
+    Enregistre un fichier accepté et lu en entier.
+
+    Métadonnées dans `data_files` (nom -> empreinte, format, profil), copie
+    colonnaire, puis résumé de l'objet : les uploads suivants du même contenu
+    réutilisent tout cela sans relire le fichier.
+
+    Returns:
+        Résumé du fichier
+    """
+    from app.services.columnar_store import write_columnar_copy
+    from app.services.dataset_profile import profile_dataframe
+    from app.services.file_format import get_csv_format, record_file_metadata
+
+    profile = profile_dataframe(df)
+    extra = {'profile': profile}
+    if sha256:
+        extra['sha256'] = sha256
+    record_file_metadata(filepath, user=user, extra=extra)
+    if columnar_copy:
+        write_columnar_copy(filepath, df)
+    summary = dataframe_summary(df)
+    summary['profile'] = profile
+    if sha256:
+        ext = file_extension(filepath)
+        summary.update({'sha256': sha256, 'size': os.path.getsize(filepath), 'rows': int(len(df))})
+        if ext == 'csv':
+            summary['csv_format'] = get_csv_format(filepath)
+        store.save_summary(sha256, ext, summary)
+    return summary
+
+
+def reuse_upload(store: UploadStore, filename: str, sha256: str, summary: Dict[str, Any],
+                 user: Optional[str] = None) -> str:
+    """
+    Associe `filename` à un contenu déjà accepté, sans le relire.
+
+    Returns:
+        Chemin du nom
+    """
+    from app.services.file_format import record_file_metadata, remember_format
+
+    ext = file_extension(filename)
+    filepath = store.link(filename, store.object_path(sha256, ext))
+    if summary.get('csv_format'):
+        remember_format(filepath, summary['csv_format'])
+    extra = {'sha256': sha256}
+    if summary.get('profile'):
+        extra['profile'] = summary['profile']
+    record_file_metadata(filepath, user=user, extra=extra)
+    return filepath
+
+
+def get_upload_store(config) -> UploadStore:
+    """Stockage des uploads sous `UPLOAD_FOLDER`."""
+    return UploadStore(config.get('UPLOAD_FOLDER', 'uploads'))
+
+
+def current_upload_path(filename: Optional[str] = None) -> Optional[str]:
+    """
+    Chemin du fichier `filename` (défaut : `current_file` de la session Flask).
+
+    Pour le fichier courant, le contenu lu est celui que l'utilisateur a uploadé
+    (`current_file_sha256`), même si un autre utilisateur a réutilisé le nom.
+    """
+    from flask import current_app, session
+
+    current = session.get('current_file')
+    filename = filename or current
+    if not filename:
+        return None
+    sha256 = session.get('current_file_sha256') if filename == current else None
+    return get_upload_store(current_app.config).resolve(filename, sha256)
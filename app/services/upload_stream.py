@@ -0,0 +1,431 @@
+"""
+Upload en plusieurs morceaux pour les fichiers plus gros que MAX_CONTENT_LENGTH.
+
+Le client ouvre une session d'upload, envoie le fichier par morceaux (chacun
+sous MAX_CONTENT_LENGTH) puis la termine. Chaque morceau est écrit sur disque
+au fil de la lecture de la requête ; dans le même passage, les octets sont
+hachés (SHA-256) et transmis à ClamAV (commande INSTREAM). À la fin de
+l'upload, l'empreinte et le verdict antivirus sont donc déjà connus, sans
+relire le fichier.
+
+Un upload interrompu reprend à l'offset renvoyé par `status()`. Si un morceau
+arrive dans un autre processus (plusieurs workers) que le précédent,
+l'empreinte est recalculée depuis la partie déjà reçue et le fichier est
+analysé depuis le disque à la fin.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+DEFAULT_TTL = 24 * 3600
+INCOMING_DIR = '.incoming'
+
+
+class UploadError(Exception):
+    """Erreur d'upload, avec le code HTTP à renvoyer."""
+
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ClamAVStream:
+    """
+    Analyse ClamAV en flux (commande INSTREAM de clamd).
+
+    Les données sont envoyées par blocs `<longueur sur 4 octets><données>` ;
+    un bloc de longueur nulle termine le flux et clamd renvoie son verdict.
+    """
+
+    MAX_BLOCK = 64 * 1024
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, timeout: float = 30):
+        self.host = host or os.getenv('CLAMAV_HOST', 'localhost')
+        self.port = int(port or os.getenv('CLAMAV_PORT', '3310'))
+        self.timeout = timeout
+        self._sock = None
+
+    def open(self) -> 'ClamAVStream':
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.sendall(b'zINSTREAM\0')
+        return self
+
+    def send(self, data: bytes) -> None:
+        view = memoryview(data)
+        for start in range(0, len(view), self.MAX_BLOCK):
+            block = view[start:start + self.MAX_BLOCK]
+            self._sock.sendall(struct.pack('!L', len(block)) + bytes(block))
+
+    def finish(self) -> Tuple[bool, str]:
+        """
+        Termine le flux et lit le verdict.
+
+        Returns:
+            Tuple (fichier accepté, statut). Une erreur de clamd (taille
+            maximale du flux dépassée...) n'entraîne pas de rejet : comme pour
+            un ClamAV indisponible, l'erreur est journalisée.
+        """
+        try:
+            self._sock.sendall(struct.pack('!L', 0))
+            response = b''
+            while not response.endswith(b'\0'):
+                data = self._sock.recv(4096)
+                if not data:
+                    break
+                response += data
+        finally:
+            self.close()
+        reply = response.rstrip(b'\0').decode('utf-8', 'replace').strip()
+        # Réponses : "stream: OK", "stream: <signature> FOUND", "<message> ERROR"
+        if reply.endswith('FOUND'):
+            return False, reply.split(':', 1)[-1].strip()
+        if reply.endswith('OK'):
+            return True, 'scan-ok'
+        logger.warning("ClamAV INSTREAM: %s", reply or 'réponse vide')
+        return True, 'clamav-error'
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+def scan_file(path: str) -> Tuple[bool, str]:
+    """Analyse un fichier déjà sur disque en l'envoyant à clamd par INSTREAM."""
+    try:
+        scanner = ClamAVStream().open()
+    except OSError as e:
+        logger.warning("ClamAV indisponible ou non configuré: %s", e)
+        return True, 'clamav-unavailable'
+    try:
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(READ_BLOCK), b''):
+                scanner.send(block)
+        return scanner.finish()
+    except OSError as e:
+        scanner.close()
+        logger.warning("ClamAV indisponible pendant l'analyse: %s", e)
+        return True, 'clamav-unavailable'
+
+
+class _StreamState:
+    """État d'un upload dans le processus qui a reçu ses morceaux."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hasher = hashlib.sha256()
+        self.offset = 0
+        self.scanner: Optional[ClamAVStream] = None
+        # Tous les octets reçus ont été transmis au scanner
+        self.scanned = True
+        self.scan_unavailable = False
+
+
+class ChunkedUploads:
+    """Sessions d'upload par morceaux, stockées sous `<root>/.incoming/`."""
+
+    def __init__(self, root: str, max_size: int = DEFAULT_MAX_SIZE, ttl: int = DEFAULT_TTL,
+                 scan: bool = True):
+        self.root = os.path.join(root, INCOMING_DIR)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.scan = scan
+        self._states: Dict[str, _StreamState] = {}
+        self._lock = threading.Lock()
+
+    # -- Fichiers ----------------------------------------------------------
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.root, f"{upload_id}.json")
+
+    def _read_meta(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            uuid.UUID(upload_id)
+        except (ValueError, TypeError):
+            raise UploadError("Identifiant d'upload invalide", 404)
+        try:
+            with open(self._meta_path(upload_id), encoding='utf-8') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise UploadError("Upload inconnu ou expiré", 404)
+
+    def _state(self, upload_id: str) -> _StreamState:
+        with self._lock:
+            state = self._states.get(upload_id)
+            if state is None:
+                state = self._states[upload_id] = _StreamState()
+            return state
+
+    def _forget(self, upload_id: str) -> Optional[_StreamState]:
+        with self._lock:
+            return self._states.pop(upload_id, None)
+
+    # -- Cycle de vie ------------------------------------------------------
+
+    def start(self, filename: str, total_size: Optional[int] = None) -> Dict[str, Any]:
+        """Ouvre une session d'upload."""
+        if total_size is not None and total_size > self.max_size:
+            raise UploadError("Fichier trop volumineux", 413)
+        os.makedirs(self.root, exist_ok=True)
+        self.gc()
+        upload_id = str(uuid.uuid4())
+        meta = {'upload_id': upload_id, 'filename': filename, 'total_size': total_size,
+                'created_at': time.time()}
+        tmp_path = f"{self._meta_path(upload_id)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, self._meta_path(upload_id))
+        open(self._part_path(upload_id), 'wb').close()
+        return dict(meta, offset=0)
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        """État d'un upload ; `offset` est la position à laquelle reprendre."""
+        meta = self._read_meta(upload_id)
+        return dict(meta, offset=os.path.getsize(self._part_path(upload_id)))
+
+    def append(self, upload_id: str, offset: int, stream: BinaryIO) -> int:
+        """
+        Ajoute un morceau lu depuis `stream` à la position `offset`.
+
+        Returns:
+            Nouvel offset (octets reçus)
+        """
+        meta = self._read_meta(upload_id)
+        part_path = self._part_path(upload_id)
+        state = self._state(upload_id)
+        with state.lock:
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise UploadError("Offset inattendu", 409, offset=current)
+            if state.offset != current:
+                # Morceaux précédents reçus par un autre processus
+                self._catch_up(state, part_path, current)
+            if self.scan and state.scanner is None and current == 0 and not state.scan_unavailable:
+                try:
+                    state.scanner = ClamAVStream().open()
+                except OSError as e:
+                    logger.warning("ClamAV indisponible ou non configuré: %s", e)
+                    state.scan_unavailable = True
+
+            try:
+                with open(part_path, 'ab') as fh:
+                    for block in iter(lambda: stream.read(READ_BLOCK), b''):
+                        if state.offset + len(block) > self.max_size:
+                            raise UploadError("Fichier trop volumineux", 413)
+                        fh.write(block)
+                        state.hasher.update(block)
+                        state.offset += len(block)
+                        self._feed_scanner(state, block)
+            except Exception:
+                # Morceau refusé ou incomplet : le client le renverra depuis `current`
+                self._truncate(state, part_path, current)
+                raise
+
+            os.utime(self._meta_path(upload_id))
+            total = meta.get('total_size')
+            if total is not None and state.offset > total:
+                self._truncate(state, part_path, current)
+                raise UploadError("Morceau au-delà de la taille annoncée", 400, offset=current)
+            return state.offset
+
+    def complete(self, upload_id: str, expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Termine l'upload : vérifie la taille et l'empreinte, obtient le verdict antivirus.
+
+        Returns:
+            Dictionnaire {filename, path, size, sha256, clean, av_status} ; le
+            fichier reçu est à `path` et doit être déplacé par l'appelant.
+        """
+        meta = self._read_meta(upload_id)
+        part_path = self._part_path(upload_id)
+        state = self._state(upload_id)
+        with state.lock:
+            size = os.path.getsize(part_path)
+            if meta.get('total_size') is not None and size != meta['total_size']:
+                raise UploadError("Upload incomplet", 409, offset=size)
+            if size == 0:
+                raise UploadError("Le fichier est vide", 400)
+            if state.offset != size:
+                self._catch_up(state, part_path, size)
+            sha256 = state.hasher.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != sha256:
+                raise UploadError("Empreinte SHA-256 différente du fichier envoyé", 400)
+
+            if not self.scan:
+                clean, av_status = True, 'scan-disabled'
+            elif state.scanner is not None and state.scanned:
+                try:
+                    clean, av_status = state.scanner.finish()
+                except OSError as e:
+                    logger.warning("ClamAV indisponible pendant l'analyse: %s", e)
+                    clean, av_status = True, 'clamav-unavailable'
+                state.scanner = None
+            elif state.scan_unavailable:
+                clean, av_status = True, 'clamav-unavailable'
+            else:
+                clean, av_status = scan_file(part_path)
+        self._forget(upload_id)
+        return {'filename': meta['filename'], 'path': part_path, 'size': size,
+                'sha256': sha256, 'clean': clean, 'av_status': av_status}
+
+    def discard(self, upload_id: str) -> None:
+        """Supprime un upload (abandonné, rejeté ou déplacé)."""
+        state = self._forget(upload_id)
+        if state is not None and state.scanner is not None:
+            state.scanner.close()
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def gc(self, now: Optional[float] = None) -> int:
+        """
+        Supprime les uploads inactifs depuis plus que le TTL, puis libère
+        l'état (empreinte, connexion ClamAV) des uploads dont les fichiers
+        n'existent plus, supprimés ici ou par un autre processus.
+        """
+        now = now or time.time()
+        removed = 0
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        self._drop_orphan_states()
+        return removed
+
+    # -- Interne -----------------------------------------------------------
+
+    def _drop_orphan_states(self) -> None:
+        with self._lock:
+            orphans = [upload_id for upload_id in self._states
+                       if not os.path.exists(self._meta_path(upload_id))]
+            states = [self._states.pop(upload_id) for upload_id in orphans]
+        for state in states:
+            with state.lock:
+                if state.scanner is not None:
+                    state.scanner.close()
+                    state.scanner = None
+
+    def _feed_scanner(self, state: _StreamState, block: bytes) -> None:
+        if state.scanner is None:
+            return
+        try:
+            state.scanner.send(block)
+        except OSError as e:
+            logger.warning("ClamAV interrompu pendant l'upload, analyse à la fin: %s", e)
+            state.scanner.close()
+            state.scanner = None
+            state.scanned = False
+
+    def _catch_up(self, state: _StreamState, part_path: str, size: int) -> None:
+        """Recalcule l'empreinte des `size` premiers octets ; l'analyse se fera depuis le disque."""
+        state.hasher = hashlib.sha256()
+        with open(part_path, 'rb') as fh:
+            remaining = size
+            while remaining > 0:
+                block = fh.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                state.hasher.update(block)
+                remaining -= len(block)
+        state.offset = size
+        if state.scanner is not None:
+            state.scanner.close()
+            state.scanner = None
+        state.scanned = False
+
+    def _truncate(self, state: _StreamState, part_path: str, size: int) -> None:
+        with open(part_path, 'ab') as fh:
+            fh.truncate(size)
+        self._catch_up(state, part_path, size)
+
+
+_uploads_instance = None
+_uploads_lock = threading.Lock()
+
+
+def get_chunked_uploads(config) -> ChunkedUploads:
+    """
+    Obtient l'instance des uploads par morceaux du processus.
+
+    Args:
+        config: Configuration Flask (UPLOAD_FOLDER, UPLOAD_MAX_SIZE, UPLOAD_INCOMING_TTL)
+    """
+    global _uploads_instance
+
+    root = config.get('UPLOAD_FOLDER', 'uploads')
+    with _uploads_lock:
+        if _uploads_instance is None or _uploads_instance.root != os.path.join(root, INCOMING_DIR):
+            _uploads_instance = ChunkedUploads(
+                root,
+                max_size=int(config.get('UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)),
+                ttl=int(config.get('UPLOAD_INCOMING_TTL', DEFAULT_TTL)),
+                scan=bool(config.get('UPLOAD_AV_SCAN', True)),
+            )
+        return _uploads_instance
+
+
+def convert_upload(jobid: str, filepath: str, sha256: Optional[str] = None) -> None:
+    """
+    Job de conversion d'un fichier uploadé par morceaux.
+
+    Lit le fichier complet une fois, enregistre son format dans `data_files`,
+    écrit sa copie colonnaire et le résumé de son contenu (`sha256`) ; le
+    résultat du job résume le fichier.
+    """
+    from app import utils as _utils
+    from app.services.columnar_store import columnar_path
+    from app.services.upload_store import UploadStore, accept_upload
+
+    try:
+        df = _utils.load_dataframe(filepath)
+        columnar = _columnar_copy_enabled()
+        accept_upload(UploadStore(os.path.dirname(filepath)), filepath, df, sha256=sha256,
+                      columnar_copy=columnar)
+        _utils.write_job_result(jobid, {
+            'filename': os.path.basename(filepath),
+            'rows': int(len(df)),
+            'columns': [str(c) for c in df.columns],
+            'columnar_copy': bool(columnar and os.path.exists(columnar_path(filepath))),
+            'memory': df.attrs.get('memory'),
+        })
+    except Exception as e:
+        logger.exception("Conversion de %s impossible", filepath)
+        _utils.write_job_error(jobid, str(e))
+
+
+def _columnar_copy_enabled() -> bool:
+    try:
+        from flask import current_app
+        return bool(current_app.config.get('UPLOAD_COLUMNAR_COPY', True))
+    except RuntimeError:
+        return True
@@ -20,27 +20,54 @@ def allowed_file(filename, allowed_extensions=None):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
 
-def load_dataframe(filepath):
-    """Charge un DataFrame selon le format du fichier."""
+def load_dataframe(filepath, columns=None):
+    """
+    Charge un DataFrame selon le format du fichier.
+
+    Les DataFrames déjà chargés par le worker sont servis depuis un cache LRU
+    borné en mémoire (vues en lecture seule : copier avant de modifier en
+    place). Sinon, la copie Parquet créée à l'upload est lue en priorité
+    (seules les colonnes `columns` sont alors chargées) ; l'original est relu
+    si elle est absente ou périmée. Les types sont ensuite compactés (dates,
+    float32/int32, category) si DATAFRAME_COMPACT est actif.
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Le fichier {filepath} n'existe pas")
-    
+
+    from app.services.dataframe_cache import get_dataframe_cache
+    from app.services.frame_compaction import compaction_options
+    options = compaction_options()
+    return get_dataframe_cache().get(
+        filepath, columns, lambda: _load_dataframe(filepath, columns, options),
+        variant=tuple(sorted(options.items()))
+    )
+
+
+def _load_dataframe(filepath, columns, compaction):
+    from app.services.columnar_store import read_columnar_copy
+    df = read_columnar_copy(filepath, columns)
+    if df is None:
+        df = _read_original(filepath)
+        if columns is not None:
+            try:
+                df = df[list(columns)]
+            except KeyError as e:
+                raise ValueError(f"Colonnes introuvables dans le fichier: {e}")
+
+    if compaction['enabled']:
+        from app.services.frame_compaction import compact_dataframe
+        df = compact_dataframe(df, compaction['float_tolerance'], compaction['category_ratio'])
+    return df
+
+
+def _read_original(filepath):
+    """Lit le fichier original (CSV ou Excel)."""
     try:
         if filepath.endswith('.csv'):
-            # Essayer différentes encodages pour les CSV
-            encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(filepath, encoding=encoding)
-                    if not df.empty:
-                        return df
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    # Si ce n'est pas un problème d'encodage, relancer l'erreur
-                    raise
-            # Si aucun encodage n'a fonctionné, essayer avec utf-8 et errors='ignore'
-            return pd.read_csv(filepath, encoding='utf-8', errors='ignore')
+            # Format (encodage, séparateurs, en-tête) détecté une fois sur un
+            # échantillon ou relu depuis DataFile.file_metadata : une seule lecture
+            from app.services.file_format import load_csv
+            return load_csv(filepath)
         else:
             # Pour Excel, essayer de lire le premier onglet
             try:
@@ -377,6 +404,13 @@ def get_real_time_users_from_db(db_path=None, seed=True):
             return []
 
 
+# Fenêtres utilisées par make_features (partagées avec le moteur incrémental)
+FEATURE_LAGS = (1, 2, 3, 5, 7, 14)
+FEATURE_DIFF_WINDOWS = (3, 7, 14)
+FEATURE_PRICE_WINDOWS = (7, 14, 30)
+VOLATILITY_WINDOW = 20
+
+
 def make_features(data, target_col='Close'):
     """
     Crée les features nécessaires à la prédiction du modèle ML.
@@ -385,17 +419,15 @@ def make_features(data, target_col='Close'):
     data[f'{target_col}_diff'] = data[target_col].diff()
     
     # Lags de différence
-    lags = [1, 2, 3, 5, 7, 14]
-    for lag in lags:
+    for lag in FEATURE_LAGS:
         data[f'lag_diff_{lag}'] = data[f'{target_col}_diff'].shift(lag)
     
     # Moyennes mobiles de différence
-    windows = [3, 7, 14]
-    for w in windows:
+    for w in FEATURE_DIFF_WINDOWS:
         data[f'ma_diff_{w}'] = data[f'{target_col}_diff'].rolling(window=w).mean()
     
     # Moyennes mobiles de prix
-    for w in [7, 14, 30]:
+    for w in FEATURE_PRICE_WINDOWS:
         data[f'ma_price_{w}'] = data[target_col].rolling(window=w).mean()
     
     # Features temporelles
@@ -427,7 +459,7 @@ def make_features(data, target_col='Close'):
                 data['month'] = 1
     
     # Volatilité
-    data['volatility'] = data[target_col].rolling(window=20).std()
+    data['volatility'] = data[target_col].rolling(window=VOLATILITY_WINDOW).std()
     
     return data
 
@@ -504,60 +536,42 @@ def _ensure_jobs_dir(app_root=None):
     return jobs_dir
 
 
-def _job_path(jobid, app_root=None):
-    jobs_dir = _ensure_jobs_dir(app_root)
-    return os.path.join(jobs_dir, f"{jobid}.json")
+def _job_store(app_root=None):
+    """Job store of the process, or a filesystem store under `app_root`."""
+    from app.services.job_store import FileJobStore, get_job_store
+    if app_root is not None:
+        return FileJobStore(_ensure_jobs_dir(app_root))
+    return get_job_store()
 
 
 def write_job_pending(jobid, meta=None, app_root=None):
-    """Write a pending job file with metadata."""
-    payload = {
-        'status': 'pending',
-        'meta': meta or {},
-        'result': None,
-        'error': None
-    }
-    path = _job_path(jobid, app_root)
-    with open(path, 'w', encoding='utf-8') as fh:
-        json.dump(payload, fh, ensure_ascii=False, indent=2, default=str)
+    """Write a pending job with metadata."""
+    _job_store(app_root).create(jobid, meta)
 
 
 def write_job_result(jobid, result, app_root=None):
     """Mark job as done and store result payload."""
-    path = _job_path(jobid, app_root)
-    payload = {
-        'status': 'done',
-        'meta': None,
-        'result': result,
-        'error': None
-    }
-    with open(path, 'w', encoding='utf-8') as fh:
-        json.dump(payload, fh, ensure_ascii=False, indent=2, default=str)
+    _job_store(app_root).set_result(jobid, result)
 
 
 def write_job_error(jobid, error_message, app_root=None):
     """Mark job as failed and store error message."""
-    path = _job_path(jobid, app_root)
-    payload = {
-        'status': 'failed',
-        'meta': None,
-        'result': None,
-        'error': str(error_message)
-    }
-    with open(path, 'w', encoding='utf-8') as fh:
-        json.dump(payload, fh, ensure_ascii=False, indent=2, default=str)
+    _job_store(app_root).set_error(jobid, error_message)
+
+
+def read_job_status(jobid, app_root=None):
+    """Return job status (status, meta, error) without reading the result, or None."""
+    return _job_store(app_root).get_status(jobid)
 
 
 def read_job(jobid, app_root=None):
-    """Read job file and return dict or None if missing/invalid."""
-    path = _job_path(jobid, app_root)
-    if not os.path.exists(path):
-        return None
-    try:
-        with open(path, 'r', encoding='utf-8') as fh:
-            return json.load(fh)
-    except Exception:
-        return None
+    """Read job and return dict (status, meta, result, error) or None if missing."""
+    return _job_store(app_root).get(jobid)
+
+
+def delete_job(jobid, app_root=None):
+    """Remove job status and result."""
+    _job_store(app_root).delete(jobid)
 
 
 ### ML Model utilities
@@ -720,6 +734,40 @@ def ensure_datetime_index(df, date_column=None):
     return df
 
 
+def default_feature_value(col, last_value=None, last_date=None):
+    """
+    Valeur par défaut d'une feature attendue par le modèle mais absente des données.
+
+    Args:
+        col: Nom de la feature
+        last_value: Dernière valeur de la colonne cible (None si indisponible)
+        last_date: Dernière date de l'historique (None si l'index n'est pas temporel)
+
+    Returns:
+        Valeur scalaire à utiliser pour la feature
+    """
+    col_lower = col.lower()
+    if 'lag' in col_lower or 'diff' in col_lower:
+        return 0.0
+    if 'ma' in col_lower:
+        # Moyenne mobile - utiliser la dernière valeur disponible
+        return last_value if last_value is not None else 0.0
+    if 'volatility' in col_lower:
+        return 0.0
+    if 'day_of' in col_lower or 'month' in col_lower:
+        # Features temporelles - utiliser la date actuelle
+        if last_date is None:
+            return 0
+        if 'day_of_week' in col_lower:
+            return last_date.dayofweek
+        if 'day_of_month' in col_lower:
+            return last_date.day
+        if 'month' in col_lower:
+            return last_date.month
+        return 0
+    return 0.0
+
+
 def prepare_features_for_prediction(features_df, model_feature_cols, current_df=None, target_column=None):
     """
     Prépare les features pour la prédiction en s'assurant que toutes les colonnes requises sont présentes.
@@ -755,33 +803,13 @@ def prepare_features_for_prediction(features_df, model_feature_cols, current_df=
         elif current_df is not None and target_column and col == target_column:
             features_df[col] = current_df[target_column].iloc[-1] if len(current_df) > 0 else 0.0
         else:
-            # Valeur par défaut intelligente selon le type de feature
-            if 'lag' in col.lower() or 'diff' in col.lower():
-                features_df[col] = 0.0
-            elif 'ma' in col.lower():
-                # Moyenne mobile - utiliser la dernière valeur disponible
-                if target_column and target_column in features_df.columns:
-                    features_df[col] = features_df[target_column].iloc[-1] if len(features_df) > 0 else 0.0
-                else:
-                    features_df[col] = 0.0
-            elif 'volatility' in col.lower():
-                features_df[col] = 0.0
-            elif 'day_of' in col.lower() or 'month' in col.lower():
-                # Features temporelles - utiliser la date actuelle
-                if isinstance(features_df.index, pd.DatetimeIndex) and len(features_df) > 0:
-                    last_date = features_df.index[-1]
-                    if 'day_of_week' in col.lower():
-                        features_df[col] = last_date.dayofweek
-                    elif 'day_of_month' in col.lower():
-                        features_df[col] = last_date.day
-                    elif 'month' in col.lower():
-                        features_df[col] = last_date.month
-                    else:
-                        features_df[col] = 0
-                else:
-                    features_df[col] = 0
-            else:
-                features_df[col] = 0.0
+            last_value = None
+            if target_column and target_column in features_df.columns and len(features_df) > 0:
+                last_value = features_df[target_column].iloc[-1]
+            last_date = None
+            if isinstance(features_df.index, pd.DatetimeIndex) and len(features_df) > 0:
+                last_date = features_df.index[-1]
+            features_df[col] = default_feature_value(col, last_value=last_value, last_date=last_date)
     
     # S'assurer que les colonnes sont dans le bon ordre
     # Garder seulement les colonnes du modèle
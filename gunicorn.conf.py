@@ -0,0 +1,22 @@
+"""
+Configuration Gunicorn commune à tous les points d'entrée (Procfile,
+railway.json, docker-compose.yml, scripts/start.sh).
+
+Avec MODEL_PRELOAD=true, l'application (et ses modèles ML) est chargée une
+seule fois dans le processus maître avant le fork : les workers partagent
+les modèles en copy-on-write au lieu d'en charger chacun une copie.
+
+Workers à threads (gthread) : un flux de progression SSE (/jobs/events/<id>,
+ouvert jusqu'à JOB_EVENTS_TIMEOUT secondes) occupe un thread, pas tout le
+worker, et le worker continue de signaler qu'il est vivant pendant le flux.
+Le délai `timeout` doit rester supérieur à JOB_EVENTS_TIMEOUT.
+"""
+
+import os
+
+preload_app = os.environ.get('MODEL_PRELOAD', 'false').lower() == 'true'
+
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+keepalive = 5
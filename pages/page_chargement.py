@@ -52,14 +52,23 @@ def afficher():
                 taille_mb = fichier_telecharge.size / (1024 * 1024)
                 st.metric("Taille", f"{taille_mb:.2f} MB")
             
+            memoire = df.attrs.get('memory')
+            if memoire:
+                st.caption(
+                    f"Mémoire : {memoire['before'] / (1024 * 1024):.2f} MB → "
+                    f"{memoire['after'] / (1024 * 1024):.2f} MB après compaction des types"
+                )
+            
             # Types de colonnes
             st.markdown("### 📋 Types de colonnes")
             
+            # Comptes repris du profil calculé au chargement
+            profil = st.session_state['profil_donnees']['columns']
             types_df = pd.DataFrame({
                 'Colonne': df.columns,
                 'Type': df.dtypes.astype(str),
-                'Valeurs non-nulles': df.count().values,
-                'Valeurs nulles': df.isnull().sum().values
+                'Valeurs non-nulles': [profil[str(c)]['count'] for c in df.columns],
+                'Valeurs nulles': [profil[str(c)]['nan'] for c in df.columns]
             })
             
             st.dataframe(types_df, use_container_width=True)
@@ -84,7 +93,7 @@ def afficher():
             # Valeurs manquantes
             st.markdown("### 🔍 Analyse des valeurs manquantes")
             
-            valeurs_manquantes = df.isnull().sum()
+            valeurs_manquantes = pd.Series({c: profil[str(c)]['nan'] for c in df.columns}, dtype=int)
             colonnes_avec_manquantes = valeurs_manquantes[valeurs_manquantes > 0]
             
             if len(colonnes_avec_manquantes) > 0:
@@ -111,6 +120,7 @@ def afficher():
                     st.session_state['donnees_actuelles'] = None
                     st.session_state['colonnes_fichier'] = []
                     st.session_state['types_colonnes'] = {}
+                    st.session_state['profil_donnees'] = None
                     st.rerun()
             
             with col2:
@@ -6,10 +6,11 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
-import joblib
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from streamlit_utils import obtenir_colonnes_numeriques
+from app.services.forecast_engine import FORECAST_INTERVALS, Z_SCORES, forecast
+from app.services.model_registry import get_model_registry
 
 
 def afficher():
@@ -52,7 +53,8 @@ def afficher():
     chemin_modele = os.path.join(st.session_state['dossier_modeles'], modele_selectionne)
     
     try:
-        modele = joblib.load(chemin_modele)
+        # Même registre que l'application Flask : artifact validé et chargé une seule fois
+        modele = get_model_registry().get(chemin_modele)
         st.success(f"✅ Modèle '{modeles_disponibles[modele_selectionne]}' chargé")
     except Exception as e:
         st.error(f"❌ Erreur lors du chargement du modèle : {str(e)}")
@@ -84,9 +86,25 @@ def afficher():
         step=1
     )
     
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        intervalle = st.selectbox(
+            "Intervalle entre deux prévisions",
+            list(FORECAST_INTERVALS.keys()),
+            index=list(FORECAST_INTERVALS.keys()).index('jour')
+        )
+    
+    with col2:
+        niveau_confiance = st.selectbox(
+            "Niveau de confiance (%)",
+            sorted(Z_SCORES.keys()),
+            index=sorted(Z_SCORES.keys()).index(95)
+        )
+    
     # Bouton de prévision
     if st.button("🚀 Générer les prévisions", type="primary"):
-        generer_previsions(df, modele, colonne_cible, nb_previsions)
+        generer_previsions(df, modele, colonne_cible, nb_previsions, intervalle, niveau_confiance)
 
 
 def charger_modeles_disponibles():
@@ -107,40 +125,30 @@ def charger_modeles_disponibles():
     return modeles
 
 
-def generer_previsions(df, modele, colonne_cible, nb_previsions):
-    """Génère les prévisions avec le modèle."""
+def generer_previsions(df, modele, colonne_cible, nb_previsions, intervalle='jour', niveau_confiance=95):
+    """Génère les prévisions avec le modèle (même moteur que l'application Flask)."""
     
     st.markdown("### 📊 Résultats des prévisions")
     
     try:
-        # Préparer les données
-        donnees_historiques = df[colonne_cible].dropna()
-        
-        if len(donnees_historiques) == 0:
+        if df[colonne_cible].dropna().empty:
             st.error("❌ Aucune donnée disponible pour cette colonne")
             return
         
-        # Générer les prévisions (simulation simple)
-        # Note: Adapter selon le type de modèle réel
-        derniere_valeur = donnees_historiques.iloc[-1]
-        tendance = donnees_historiques.diff().mean()
+        resultat = forecast(df, modele, colonne_cible, nb_previsions, intervalle, niveau_confiance)
+        colonne_cible = resultat.target_column
+        donnees_historiques = resultat.historical_data[colonne_cible]
+        previsions_df = resultat.forecast_df
         
-        previsions = []
-        for i in range(nb_previsions):
-            # Prévision simple avec tendance + bruit
-            prevision = derniere_valeur + tendance * (i + 1) + np.random.normal(0, donnees_historiques.std() * 0.1)
-            previsions.append(prevision)
-        
-        # Créer un DataFrame de résultats
-        index_historique = list(range(len(donnees_historiques)))
-        index_previsions = list(range(len(donnees_historiques), len(donnees_historiques) + nb_previsions))
+        for avertissement in resultat.warnings:
+            st.warning(f"⚠️ {avertissement}")
         
         # Graphique
         fig = go.Figure()
         
         # Données historiques
         fig.add_trace(go.Scatter(
-            x=index_historique,
+            x=donnees_historiques.index,
             y=donnees_historiques.values,
             mode='lines',
             name='Données historiques',
@@ -149,32 +157,28 @@ def generer_previsions(df, modele, colonne_cible, nb_previsions):
         
         # Prévisions
         fig.add_trace(go.Scatter(
-            x=index_previsions,
-            y=previsions,
+            x=resultat.dates,
+            y=previsions_df[colonne_cible].values,
             mode='lines+markers',
             name='Prévisions',
             line=dict(color='red', width=2, dash='dash'),
             marker=dict(size=8)
         ))
         
-        # Intervalle de confiance (simulation)
-        std_prevision = donnees_historiques.std() * 0.2
-        intervalle_sup = [p + 1.96 * std_prevision for p in previsions]
-        intervalle_inf = [p - 1.96 * std_prevision for p in previsions]
-        
+        # Intervalle de confiance
         fig.add_trace(go.Scatter(
-            x=index_previsions + index_previsions[::-1],
-            y=intervalle_sup + intervalle_inf[::-1],
+            x=list(resultat.dates) + list(resultat.dates)[::-1],
+            y=list(previsions_df['upper_bound']) + list(previsions_df['lower_bound'])[::-1],
             fill='toself',
             fillcolor='rgba(255,0,0,0.2)',
             line=dict(color='rgba(255,255,255,0)'),
-            name='Intervalle de confiance 95%',
+            name=f'Intervalle de confiance {niveau_confiance}%',
             showlegend=True
         ))
         
         fig.update_layout(
             title=f"Prévisions pour {colonne_cible}",
-            xaxis_title="Index",
+            xaxis_title="Date",
             yaxis_title=colonne_cible,
             hovermode='x unified'
         )
@@ -184,32 +188,31 @@ def generer_previsions(df, modele, colonne_cible, nb_previsions):
         # Tableau des prévisions
         st.markdown("#### 📋 Tableau des prévisions")
         
-        previsions_df = pd.DataFrame({
-            'Index': index_previsions,
-            'Prévision': previsions,
-            'Borne inférieure': intervalle_inf,
-            'Borne supérieure': intervalle_sup
-        })
+        tableau_df = pd.DataFrame(resultat.display_data())
         
-        st.dataframe(previsions_df, use_container_width=True)
+        st.dataframe(tableau_df, use_container_width=True)
         
         # Métriques
         st.markdown("#### 📈 Métriques")
         
+        metriques = resultat.metrics
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Moyenne historique", f"{donnees_historiques.mean():.2f}")
+            st.metric("Moyenne historique", f"{metriques['historical_mean']:.2f}")
         
         with col2:
-            st.metric("Moyenne prévisions", f"{np.mean(previsions):.2f}")
+            st.metric("Moyenne prévisions", f"{metriques['forecast_mean']:.2f}")
         
         with col3:
-            variation = ((np.mean(previsions) - donnees_historiques.mean()) / donnees_historiques.mean()) * 100
+            if metriques['historical_mean']:
+                variation = ((metriques['forecast_mean'] - metriques['historical_mean']) / metriques['historical_mean']) * 100
+            else:
+                variation = 0.0
             st.metric("Variation", f"{variation:.2f}%")
         
         # Téléchargement
-        csv = previsions_df.to_csv(index=False).encode('utf-8')
+        csv = tableau_df.to_csv(index=False).encode('utf-8')
         st.download_button(
             label="📥 Télécharger les prévisions (CSV)",
             data=csv,
@@ -219,4 +222,4 @@ def generer_previsions(df, modele, colonne_cible, nb_previsions):
         
     except Exception as e:
         st.error(f"❌ Erreur lors de la génération des prévisions : {str(e)}")
-        st.exception(e)
\ No newline at end of file
+        st.exception(e)
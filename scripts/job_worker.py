@@ -0,0 +1,75 @@
+"""Run background jobs queued by the app with JOB_EXECUTOR_BACKEND=external.
+
+The web workers only drop a small JSON file per job in the queue directory
+(logs/jobs/queue/ or JOB_QUEUE_DIR); this process claims the files by atomic
+rename, runs the task and writes the result with the usual job helpers, so
+/previsions/jobs/<jobid> and /jobs/status/<jobid> work unchanged.
+
+Start as many workers as needed (they can share the queue directory):
+
+  python scripts/job_worker.py
+  python scripts/job_worker.py --queue-dir /shared/jobs/queue --poll 0.5
+  python scripts/job_worker.py --once      # drain the queue then exit
+
+Models of MODELS_DIR are preloaded at startup (JOB_WORKER_PRELOAD_MODELS).
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger('job_worker')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued background jobs.')
+    parser.add_argument('--queue-dir', help='Queue directory (default: JOB_QUEUE_DIR or logs/jobs/queue)')
+    parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+    parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from app import create_app
+    from app.utils import _ensure_jobs_dir
+    from app.services.job_executor import claim_external_job, run_external_job
+    from app.services.model_registry import get_model_registry
+
+    # Same configuration as the web app (MODELS_DIR, registry size, mmap mode...)
+    app = create_app()
+    config = app.config
+    queue_dir = args.queue_dir or config.get('JOB_QUEUE_DIR') or os.path.join(_ensure_jobs_dir(), 'queue')
+    os.makedirs(queue_dir, exist_ok=True)
+
+    registry = get_model_registry(config.get('MODEL_REGISTRY_SIZE'), mmap_mode=config.get('MODEL_MMAP_MODE'))
+    if config.get('JOB_WORKER_PRELOAD_MODELS', True):
+        errors = registry.preload(config['MODELS_DIR'], freeze=False)
+        logger.info('Models preloaded from %s (%d error(s))', config['MODELS_DIR'], len(errors))
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    logger.info('Waiting for jobs in %s', queue_dir)
+    while not stopping:
+        payload = claim_external_job(queue_dir)
+        if payload is None:
+            if args.once:
+                break
+            time.sleep(args.poll)
+            continue
+        started = time.perf_counter()
+        with app.app_context():
+            ok = run_external_job(payload)
+        logger.info('Job %s %s in %.2fs', payload.get('jobid'), 'done' if ok else 'failed',
+                    time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,13 +7,22 @@ this script will wrap it into a dict with keys:
   - 'feature_columns': a conservative default feature list used by the app
 
 Usage:
-  python scripts/prepare_models.py path/to/model.joblib [--inplace]
+  python scripts/prepare_models.py path/to/model.joblib [--inplace] [--uncompressed] [--sha256]
 
 If `--inplace` is provided the original file will be overwritten; otherwise a new
 file will be created next to the original named `<orig>_artifact.joblib`.
+
+Artifacts are always saved with `compress=0`; `--uncompressed` also rewrites files that
+are already in artifact format (e.g. saved elsewhere with compression) so that the app can load it
+with `MODEL_MMAP_MODE=r`: the numpy arrays of the trees are then memory-mapped and
+shared between gunicorn workers instead of being copied in each one.
+
+`--sha256` writes a `<artifact>.sha256` file next to the artifact; the app checks it
+when the model is loaded.
 """
 import os
 import argparse
+import hashlib
 import joblib
 
 DEFAULT_FEATURE_COLUMNS = [
@@ -26,24 +35,44 @@ DEFAULT_FEATURE_COLUMNS = [
 ]
 
 
-def prepare_model(path, inplace=False):
+def write_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(chunk)
+    sidecar = os.path.splitext(path)[0] + '.sha256'
+    with open(sidecar, 'w', encoding='utf-8') as fh:
+        fh.write(digest.hexdigest() + '\n')
+    print(f"Saved checksum to: {sidecar}")
+    return sidecar
+
+
+def prepare_model(path, inplace=False, uncompressed=False, sha256=False):
     if not os.path.exists(path):
         raise FileNotFoundError(path)
 
     obj = joblib.load(path)
     if isinstance(obj, dict) and 'model' in obj and 'feature_columns' in obj:
-        print(f"{os.path.basename(path)} already in artifact format. Skipping.")
-        return path
-
-    artifact = {
-        'model': obj,
-        'feature_columns': DEFAULT_FEATURE_COLUMNS
-    }
+        if not uncompressed:
+            print(f"{os.path.basename(path)} already in artifact format. Skipping.")
+            if sha256:
+                write_sha256(path)
+            return path
+        artifact = obj
+    else:
+        artifact = {
+            'model': obj,
+            'feature_columns': DEFAULT_FEATURE_COLUMNS
+        }
 
     base, ext = os.path.splitext(path)
     out_path = path if inplace else f"{base}_artifact{ext}"
-    joblib.dump(artifact, out_path)
+    joblib.dump(artifact, out_path, compress=0)
     print(f"Saved artifact to: {out_path}")
+
+    # Le contenu a changé : une empreinte existante serait désormais fausse
+    if sha256 or os.path.exists(os.path.splitext(out_path)[0] + '.sha256'):
+        write_sha256(out_path)
     return out_path
 
 
@@ -51,9 +80,12 @@ def main():
     parser = argparse.ArgumentParser(description='Wrap model joblib into artifact dict')
     parser.add_argument('model_path', help='Path to .joblib model file')
     parser.add_argument('--inplace', action='store_true', help='Overwrite original file')
+    parser.add_argument('--uncompressed', action='store_true',
+                        help='Save with compress=0 so the artifact can be memory-mapped (MODEL_MMAP_MODE=r)')
+    parser.add_argument('--sha256', action='store_true', help='Write a <artifact>.sha256 checksum file')
     args = parser.parse_args()
 
-    prepare_model(args.model_path, inplace=args.inplace)
+    prepare_model(args.model_path, inplace=args.inplace, uncompressed=args.uncompressed, sha256=args.sha256)
 
 
 if __name__ == '__main__':
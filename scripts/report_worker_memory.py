@@ -0,0 +1,220 @@
+"""Report per-worker memory (RSS / PSS) to size instances.
+
+RSS counts every page a process maps, so pages shared by gunicorn workers
+(copy-on-write after `--preload`, memory-mapped model arrays) are counted once
+per worker. PSS divides each shared page between the processes that map it:
+the sum of the PSS is what the instance really uses.
+
+Two modes (Linux only, reads /proc/<pid>/smaps_rollup):
+
+  # Running server: gunicorn master pid and its workers
+  python scripts/report_worker_memory.py --pid $(cat gunicorn.pid) --json before.json
+  python scripts/report_worker_memory.py --pid $(cat gunicorn.pid) --compare before.json
+
+  # Offline simulation: N forked workers loading the models of app/models/
+  #   - per-worker : each worker loads its own copy (current default)
+  #   - preload    : models loaded before fork (MODEL_PRELOAD=true + gunicorn --preload)
+  #   - preload+mmap : same with MODEL_MMAP_MODE=r (artifacts saved with compress=0)
+  python scripts/report_worker_memory.py --simulate --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+DEFAULT_MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'models')
+
+
+def read_memory(pid):
+    """Return the memory counters of a process in kB."""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                parts = line.split()
+                key = parts[0].rstrip(':')
+                if key in SMAPS_FIELDS:
+                    values[key] = int(parts[1])
+    except FileNotFoundError:
+        # Older kernels: only RSS is available
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    values['Rss'] = int(line.split()[1])
+    return values
+
+
+def find_children(pid):
+    """Return the pids whose parent is `pid` (gunicorn workers)."""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                # The process name may contain spaces: split after ')'
+                fields = fh.read().rsplit(')', 1)[1].split()
+        except (FileNotFoundError, ProcessLookupError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def snapshot(master_pid):
+    """Memory of the master and of each of its workers."""
+    report = {'master': {'pid': master_pid, **read_memory(master_pid)}, 'workers': []}
+    for pid in find_children(master_pid):
+        report['workers'].append({'pid': pid, **read_memory(pid)})
+    processes = [report['master']] + report['workers']
+    report['total'] = {key: sum(p.get(key, 0) for p in processes) for key in SMAPS_FIELDS}
+    return report
+
+
+def _mb(kb):
+    return f"{kb / 1024:8.1f}"
+
+
+def print_report(report, title=None, baseline=None):
+    if title:
+        print(f"\n== {title} ==")
+    print(f"{'process':<16}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}")
+    rows = [('master', report['master'])] + [(f"worker {w['pid']}", w) for w in report['workers']]
+    rows.append(('total', report['total']))
+    for name, values in rows:
+        shared = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+        private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+        print(f"{name:<16}{_mb(values.get('Rss', 0)):>10}{_mb(values.get('Pss', 0)):>10}"
+              f"{_mb(shared):>11}{_mb(private):>12}")
+
+    workers = report['workers']
+    if workers:
+        avg_pss = sum(w.get('Pss', 0) for w in workers) / len(workers)
+        print(f"average worker PSS: {avg_pss / 1024:.1f} MB")
+
+    if baseline:
+        for key in ('Rss', 'Pss'):
+            delta = report['total'].get(key, 0) - baseline['total'].get(key, 0)
+            print(f"total {key} delta vs baseline: {delta / 1024:+.1f} MB")
+
+
+def _touch_models(registry, models_dir):
+    """Load every model through the registry and run one prediction (touches the tree arrays)."""
+    import pandas as pd
+
+    for file in registry.list_models(models_dir):
+        loaded = registry.get(os.path.join(models_dir, file))
+        X = pd.DataFrame([[0.0] * len(loaded.feature_cols)], columns=loaded.feature_cols)
+        if not hasattr(loaded.model, 'feature_names_in_'):
+            X = X.to_numpy()
+        try:
+            loaded.model.predict(X)
+        except Exception as e:
+            print(f"  predict failed for {file}: {e}", file=sys.stderr)
+
+
+def _run_scenario(registry_cls, models_dir, workers, preload, mmap_mode):
+    """Fork a fake master for the scenario and return its memory report."""
+    read_fd, write_fd = os.pipe()
+    master = os.fork()
+    if master == 0:
+        os.close(read_fd)
+        registry = registry_cls(max_entries=64, mmap_mode=mmap_mode)
+        if preload:
+            registry.preload(models_dir)
+
+        pids, ready = [], []
+        for _ in range(workers):
+            r, w = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(r)
+                _touch_models(registry, models_dir)
+                os.write(w, b'1')
+                os.close(w)
+                # Stay alive until the master has measured us
+                time.sleep(3600)
+                os._exit(0)
+            os.close(w)
+            pids.append(pid)
+            ready.append(r)
+        for r in ready:
+            os.read(r, 1)
+            os.close(r)
+
+        report = snapshot(os.getpid())
+        for pid in pids:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+        os.write(write_fd, json.dumps(report).encode())
+        os.close(write_fd)
+        os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    os.waitpid(master, 0)
+    return json.loads(b''.join(chunks).decode())
+
+
+def simulate(models_dir, workers):
+    # Imported before forking so that configuration errors are reported here
+    from app.services.model_registry import ModelRegistry
+
+    if not os.listdir(models_dir):
+        print(f"No model found in {models_dir}")
+        return
+    scenarios = [
+        ('per-worker', False, None),
+        ('preload', True, None),
+        ('preload+mmap', True, 'r'),
+    ]
+    baseline = None
+    for title, preload, mmap_mode in scenarios:
+        report = _run_scenario(ModelRegistry, models_dir, workers, preload, mmap_mode)
+        print_report(report, title=title, baseline=baseline)
+        baseline = baseline or report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report RSS/PSS of gunicorn workers')
+    parser.add_argument('--pid', type=int, help='gunicorn master pid')
+    parser.add_argument('--json', help='Save the snapshot to this file')
+    parser.add_argument('--compare', help='Snapshot file (--json) to compare with')
+    parser.add_argument('--simulate', action='store_true', help='Fork workers locally and compare loading strategies')
+    parser.add_argument('--workers', type=int, default=4, help='Number of workers for --simulate')
+    parser.add_argument('--models-dir', default=DEFAULT_MODELS_DIR, help='Models folder for --simulate')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/status'):
+        parser.error('this script needs /proc (Linux)')
+
+    if args.simulate:
+        simulate(args.models_dir, args.workers)
+        return
+    if not args.pid:
+        parser.error('--pid or --simulate is required')
+
+    report = snapshot(args.pid)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline=baseline)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Saved snapshot to: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,15 +11,21 @@ echo "🚀 Démarrage de l'application BoursA..."
 echo "📍 Port: $PORT"
 echo "🌐 Écoute sur: 0.0.0.0:$PORT"
 
+# Préchargement des modèles ML avant le fork des workers (mémoire partagée) :
+# gunicorn.conf.py active preload_app quand MODEL_PRELOAD=true (il fixe aussi
+# les workers à threads et le timeout, communs à tous les points d'entrée)
+if [ "${MODEL_PRELOAD:-false}" = "true" ]; then
+    echo "🧠 Préchargement des modèles activé (preload_app)"
+fi
+
 # Démarrer Gunicorn
 # Utiliser exec pour que Gunicorn soit le processus principal (PID 1)
 # Important pour que Render détecte correctement le processus
 exec gunicorn \
+    -c gunicorn.conf.py \
     -w 4 \
     -b 0.0.0.0:$PORT \
     --access-logfile - \
     --error-logfile - \
-    --timeout 120 \
-    --keep-alive 5 \
     wsgi:app
 
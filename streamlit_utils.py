@@ -8,6 +8,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from app.services.file_format import SAMPLE_SIZE, detect_csv_format, read_csv_fallback
+from app.services.dataset_profile import profile_dataframe
+from app.services.frame_compaction import compact_dataframe, compaction_options
+
 
 def initialiser_session():
     """Initialise les variables de session si elles n'existent pas."""
@@ -25,6 +29,10 @@ def initialiser_session():
     if 'types_colonnes' not in st.session_state:
         st.session_state['types_colonnes'] = {}
     
+    # Profil des données (statistiques par colonne, calculé une fois au chargement)
+    if 'profil_donnees' not in st.session_state:
+        st.session_state['profil_donnees'] = None
+    
     # Historique des tests
     if 'historique_tests' not in st.session_state:
         st.session_state['historique_tests'] = []
@@ -125,24 +133,12 @@ def charger_fichier(fichier_telecharge):
         nom_fichier = fichier_telecharge.name
         
         if nom_fichier.endswith('.csv'):
-            # Essayer différents encodages
-            encodages = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-            df = None
-            
-            for encodage in encodages:
-                try:
-                    fichier_telecharge.seek(0)
-                    df = pd.read_csv(fichier_telecharge, encoding=encodage)
-                    if not df.empty:
-                        break
-                except UnicodeDecodeError:
-                    continue
-                except Exception:
-                    raise
-            
-            if df is None or df.empty:
-                fichier_telecharge.seek(0)
-                df = pd.read_csv(fichier_telecharge, encoding='utf-8', errors='ignore')
+            # Format détecté sur un échantillon, puis une seule lecture (relue en
+            # cp1252 / latin-1 si un octet invalide apparaît après l'échantillon)
+            fichier_telecharge.seek(0)
+            echantillon = fichier_telecharge.read(SAMPLE_SIZE + 1)
+            fichier_telecharge.seek(0)
+            df, _ = read_csv_fallback(fichier_telecharge, detect_csv_format(echantillon))
                 
         elif nom_fichier.endswith(('.xlsx', '.xls')):
             df = pd.read_excel(fichier_telecharge, engine='openpyxl')
@@ -150,6 +146,10 @@ def charger_fichier(fichier_telecharge):
             st.error("Format de fichier non supporté. Utilisez CSV ou Excel.")
             return None
         
+        # Types compacts : la copie gardée dans la session occupe moins de mémoire
+        if compaction_options()['enabled']:
+            df = compact_dataframe(df)
+        
         return df
         
     except pd.errors.EmptyDataError:
@@ -172,6 +172,7 @@ def sauvegarder_dans_session(df, nom_fichier):
     st.session_state['donnees_actuelles'] = df
     st.session_state['colonnes_fichier'] = df.columns.tolist()
     st.session_state['types_colonnes'] = df.dtypes.apply(lambda x: x.name).to_dict()
+    st.session_state['profil_donnees'] = profile_dataframe(df)
 
 
 def ajouter_a_historique(nom_test, nom_fichier, colonnes_utilisees, p_value, 
@@ -36,6 +36,14 @@ def app():
         os.remove(test_db_path)
 
 
+@pytest.fixture(autouse=True)
+def empty_dataframe_cache():
+    """Chaque test part d'un cache de DataFrames vide (singleton du processus)."""
+    from app.services.dataframe_cache import get_dataframe_cache
+    get_dataframe_cache().invalidate()
+    yield
+
+
 @pytest.fixture
 def client(app):
     """Crée un client de test Flask."""
@@ -0,0 +1,115 @@
+"""
+Tests pour la sérialisation des DataFrames du cache Redis.
+"""
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from cachelib import RedisCache, SimpleCache
+from app.services.cache_serializer import (
+    DISK_PREFIX, INLINE_PREFIX, FrameSerializer, install_frame_serializer
+)
+
+
+class FakeRedis:
+    """Sous-ensemble des commandes Redis utilisées par cachelib."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+        return True
+
+    def setnx(self, name, value):
+        return self.data.setdefault(name, value) is value
+
+    def expire(self, name, time):
+        return True
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+
+def _frame(rows=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=rows, freq='h', tz='UTC'),
+        'Close': rng.normal(100, 5, rows).astype(np.float32),
+        'Volume': rng.integers(0, 10_000, rows),
+        'Ticker': pd.Categorical(['AAPL', 'MSFT'] * (rows // 2)),
+    })
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = RedisCache(host=FakeRedis(), key_prefix='')
+    install_frame_serializer(backend, {'CACHE_FRAME_DISK_DIR': str(tmp_path),
+                                       'CACHE_FRAME_COMPRESSION': 'zstd'})
+    return backend
+
+
+class TestFrameSerializer:
+    """Arrow IPC / Parquet, compatibilité avec le format cachelib."""
+
+    @pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+    @pytest.mark.parametrize('compression', ['zstd', 'lz4', None])
+    def test_round_trip(self, fmt, compression, tmp_path):
+        serializer = FrameSerializer(format=fmt, compression=compression, disk_dir=str(tmp_path))
+        df = _frame()
+        value = {'data': df, 'fetched_at': 123.0}
+        payload = serializer.dumps(value)
+        assert payload.startswith(INLINE_PREFIX)
+        restored = serializer.loads(payload)
+        assert restored['fetched_at'] == 123.0
+        pd.testing.assert_frame_equal(restored['data'], df)
+
+    def test_smaller_than_pickle(self, tmp_path):
+        df = _frame(5000)
+        payload = FrameSerializer(disk_dir=str(tmp_path)).dumps(df)
+        assert len(payload) < len(pickle.dumps(df, pickle.HIGHEST_PROTOCOL))
+
+    def test_other_values_keep_cachelib_format(self, backend):
+        serializer = backend.serializer
+        assert serializer.dumps(42) == b'42'
+        assert serializer.dumps({'a': 1}).startswith(b'!')
+        # Entrée écrite avant l'installation du sérialiseur
+        backend._write_client.set('ancienne', b'!' + pickle.dumps(_frame(10)))
+        assert len(backend.get('ancienne')) == 10
+
+    def test_unsupported_frames_are_pickled(self, tmp_path):
+        serializer = FrameSerializer(disk_dir=str(tmp_path))
+        df = pd.DataFrame({0: [1, 2], 'mixte': [1, 'a']})
+        pd.testing.assert_frame_equal(serializer.loads(serializer.dumps(df)), df)
+        assert serializer.stats()['frames_pickled'] == 1
+
+    def test_install_only_on_redis(self):
+        assert install_frame_serializer(SimpleCache(), {}) is None
+        assert install_frame_serializer(RedisCache(host=FakeRedis()), {'CACHE_FRAME_FORMAT': 'pickle'}) is None
+
+
+class TestDiskTier:
+    """Grosses valeurs sur le disque local, référence dans Redis."""
+
+    def test_large_values_go_to_disk(self, backend, tmp_path):
+        backend.serializer.disk_threshold = 10_000
+        df = _frame(5000)
+        backend.set('petit', _frame(10))
+        backend.set('gros', df)
+        assert backend._read_client.get('petit').startswith(INLINE_PREFIX)
+        reference = backend._read_client.get('gros')
+        assert reference.startswith(DISK_PREFIX) and len(reference) < 100
+        pd.testing.assert_frame_equal(backend.get('gros'), df)
+
+        stats = backend.serializer.stats()
+        assert (stats['frames_serialized'], stats['disk_writes'], stats['disk_reads']) == (2, 1, 1)
+        assert stats['bytes_disk'] > 10_000 and stats['serialize_seconds'] > 0
+
+        # Fichier nettoyé : l'entrée est absente
+        assert backend.serializer.gc(now=os.path.getmtime(next(tmp_path.rglob('*.frames'))) + 10 ** 6) == 1
+        assert backend.get('gros') is None
+        assert backend.serializer.stats()['disk_misses'] == 1
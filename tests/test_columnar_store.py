@@ -0,0 +1,110 @@
+"""
+Tests pour la copie colonnaire des fichiers uploadés.
+"""
+import os
+from io import BytesIO
+import pandas as pd
+import pytest
+from app.utils import load_dataframe
+from app.services import columnar_store
+from app.services.columnar_store import columnar_path, read_columnar_copy, write_columnar_copy
+from app.services.dataframe_cache import get_dataframe_cache
+
+pytestmark = pytest.mark.skipif(not columnar_store.PYARROW_AVAILABLE, reason="pyarrow non installé")
+
+
+def _csv(tmp_path, df, name='data.csv'):
+    path = str(tmp_path / name)
+    df.to_csv(path, index=False)
+    return path
+
+
+def _frame():
+    return pd.DataFrame({
+        'Date': ['2024-01-01', '2024-01-02', '2024-01-03'],
+        'Close': [1.5, 2.5, None],
+        'Volume': [10, 20, 30],
+        'Ticker': ['A', 'B', 'C'],
+    })
+
+
+class TestColumnarCopy:
+    """Écriture et lecture de la copie Parquet."""
+
+    def test_round_trip(self, tmp_path):
+        """La copie restitue exactement le DataFrame lu depuis l'original."""
+        path = _csv(tmp_path, _frame())
+        original = load_dataframe(path)
+        assert write_columnar_copy(path, original)
+        assert os.path.exists(columnar_path(path))
+
+        copy = read_columnar_copy(path)
+        pd.testing.assert_frame_equal(copy, original)
+        pd.testing.assert_frame_equal(load_dataframe(path), original)
+
+    def test_projection(self, tmp_path, monkeypatch):
+        """Seules les colonnes demandées sont lues, dans l'ordre demandé."""
+        path = _csv(tmp_path, _frame())
+        write_columnar_copy(path, load_dataframe(path))
+        # Le DataFrame complet est en mémoire : le vider pour forcer la lecture de la copie
+        get_dataframe_cache().invalidate()
+        read = []
+        read_table = columnar_store.pq.read_table
+        monkeypatch.setattr(columnar_store.pq, 'read_table',
+                            lambda target, columns=None: read.append(columns) or read_table(target, columns=columns))
+
+        df = load_dataframe(path, columns=['Volume', 'Close'])
+        assert list(df.columns) == ['Volume', 'Close']
+        assert read == [['Volume', 'Close']]
+
+    def test_stale_copy_is_ignored(self, tmp_path):
+        """Un original modifié après la conversion est relu."""
+        path = _csv(tmp_path, _frame())
+        write_columnar_copy(path, load_dataframe(path))
+
+        changed = _frame().assign(Volume=[1, 2, 3])
+        changed.to_csv(path, index=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert read_columnar_copy(path) is None
+        assert load_dataframe(path)['Volume'].tolist() == [1, 2, 3]
+
+    def test_missing_column_falls_back(self, tmp_path):
+        """Une colonne inconnue donne la même erreur avec ou sans copie."""
+        path = _csv(tmp_path, _frame())
+        with pytest.raises(ValueError):
+            load_dataframe(path, columns=['Absente'])
+        write_columnar_copy(path, load_dataframe(path))
+        with pytest.raises(ValueError):
+            load_dataframe(path, columns=['Absente'])
+
+    def test_unconvertible_frame(self, tmp_path):
+        """Un DataFrame aux types mélangés n'est pas converti."""
+        path = _csv(tmp_path, _frame())
+        mixed = pd.DataFrame({'A': [1, 'x', 2.5]})
+        assert not write_columnar_copy(path, mixed)
+        assert not os.path.exists(columnar_path(path))
+        assert not write_columnar_copy(path, pd.DataFrame({0: [1, 2]}))
+
+
+class TestUploadConversion:
+    """Conversion à l'upload et lecture par les routes."""
+
+    def test_upload_writes_copy(self, app, client):
+        body = _frame().to_csv(index=False).encode('utf-8')
+        response = client.post('/upload_file', data={'data_file': (BytesIO(body), 'prices.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_json()
+
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'prices.csv')
+        copy = read_columnar_copy(path)
+        assert copy is not None
+        assert copy['Volume'].tolist() == [10, 20, 30]
+
+    def test_upload_without_copy(self, app, client):
+        app.config['UPLOAD_COLUMNAR_COPY'] = False
+        body = _frame().to_csv(index=False).encode('utf-8')
+        client.post('/upload_file', data={'data_file': (BytesIO(body), 'prices.csv')},
+                    content_type='multipart/form-data')
+        assert not os.path.exists(columnar_path(os.path.join(app.config['UPLOAD_FOLDER'], 'prices.csv')))
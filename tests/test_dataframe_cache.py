@@ -0,0 +1,143 @@
+"""
+Tests pour le cache des DataFrames chargés.
+"""
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.dataframe_cache import DataFrameCache
+from app.utils import load_dataframe
+
+
+def _csv(tmp_path, name='data.csv', rows=100):
+    path = str(tmp_path / name)
+    pd.DataFrame({'Close': np.arange(rows) + 0.5, 'Volume': np.arange(rows)}).to_csv(path, index=False)
+    return path
+
+
+class _Loader:
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return pd.read_csv(self.path)
+
+
+class TestDataFrameCache:
+    """LRU borné en octets."""
+
+    def test_hits_and_read_only_views(self, tmp_path):
+        cache = DataFrameCache()
+        path = _csv(tmp_path)
+        loader = _Loader(path)
+        first = cache.get(path, None, loader)
+        second = cache.get(path, None, loader)
+        assert loader.calls == 1
+        assert cache.stats()['hit_ratio'] == 0.5
+        assert cache.stats()['resident_bytes'] == int(first.memory_usage(deep=True).sum())
+
+        with pytest.raises(ValueError):
+            second.loc[0, 'Close'] = 1.0
+        # Une colonne ajoutée à une vue n'atteint pas le cache
+        second['Extra'] = 1
+        assert 'Extra' not in cache.get(path, None, loader).columns
+
+    def test_projection_from_full_frame(self, tmp_path):
+        cache = DataFrameCache()
+        path = _csv(tmp_path)
+        loader = _Loader(path)
+        cache.get(path, None, loader)
+        assert list(cache.get(path, ['Volume'], loader).columns) == ['Volume']
+        assert loader.calls == 1
+        with pytest.raises(ValueError):
+            cache.get(path, ['Absente'], loader)
+
+    def test_single_load_while_storing(self, tmp_path, monkeypatch):
+        """Un thread arrivé pendant la mise en cache attend le chargement en cours."""
+        cache = DataFrameCache()
+        path = _csv(tmp_path)
+        loader = _Loader(path)
+        storing = threading.Event()
+        original_store = cache._store
+
+        def slow_store(key, df):
+            storing.set()
+            time.sleep(0.2)
+            original_store(key, df)
+
+        monkeypatch.setattr(cache, '_store', slow_store)
+        first = threading.Thread(target=cache.get, args=(path, None, loader))
+        first.start()
+        assert storing.wait(5)
+        cache.get(path, None, loader)
+        first.join()
+        assert loader.calls == 1
+
+    def test_failed_load_is_not_cached(self, tmp_path):
+        cache = DataFrameCache()
+        path = _csv(tmp_path)
+
+        def failing():
+            raise ValueError("illisible")
+
+        with pytest.raises(ValueError):
+            cache.get(path, None, failing)
+        assert cache.stats()['entries'] == 0
+        loader = _Loader(path)
+        cache.get(path, None, loader)
+        assert loader.calls == 1
+
+    def test_eviction_by_bytes(self, tmp_path):
+        paths = [_csv(tmp_path, f'{i}.csv') for i in range(3)]
+        size = int(pd.read_csv(paths[0]).memory_usage(deep=True).sum())
+        cache = DataFrameCache(max_bytes=2 * size)
+        loaders = [_Loader(p) for p in paths]
+        for path, loader in zip(paths, loaders):
+            cache.get(path, None, loader)
+        stats = cache.stats()
+        assert (stats['entries'], stats['evictions']) == (2, 1)
+        assert stats['resident_bytes'] <= cache.max_bytes
+
+        cache.get(paths[0], None, loaders[0])
+        assert loaders[0].calls == 2
+
+    def test_oversized_frame_is_not_kept(self, tmp_path):
+        cache = DataFrameCache(max_bytes=10)
+        path = _csv(tmp_path)
+        loader = _Loader(path)
+        cache.get(path, None, loader)
+        cache.get(path, None, loader)
+        assert loader.calls == 2
+        assert cache.stats()['uncacheable'] == 2
+
+    def test_modified_file_is_reloaded(self, tmp_path):
+        cache = DataFrameCache()
+        path = _csv(tmp_path)
+        loader = _Loader(path)
+        cache.get(path, None, loader)
+        pd.DataFrame({'Close': [1.0]}).to_csv(path, index=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert len(cache.get(path, None, loader)) == 1
+        assert cache.stats()['entries'] == 1
+
+
+class TestLoadDataframe:
+    """Partage entre les routes via load_dataframe."""
+
+    def test_names_of_same_content_share_entry(self, tmp_path, monkeypatch):
+        from app import utils
+        path = _csv(tmp_path)
+        link = str(tmp_path / 'alias.csv')
+        os.symlink(path, link)
+        calls = []
+        read_original = utils._read_original
+        monkeypatch.setattr(utils, '_read_original', lambda p: calls.append(p) or read_original(p))
+
+        assert load_dataframe(path)['Close'].dtype == np.float32
+        load_dataframe(link, columns=['Close'])
+        assert len(calls) == 1
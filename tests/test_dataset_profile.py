@@ -0,0 +1,92 @@
+"""
+Tests pour le profil des jeux de données calculé à l'upload.
+"""
+import os
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from app.extensions import db
+from app.models.data_file import DataFile
+from app.services.dataset_profile import get_file_profile, profile_dataframe
+from app.services.upload_store import UploadStore, accept_upload
+
+
+def _frame(rows=50):
+    rng = np.random.default_rng(0)
+    close = rng.normal(100, 5, rows)
+    close[3] = np.nan
+    return pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=rows, freq='D'),
+        'Close': close,
+        'Volume': rng.integers(0, 1000, rows).astype(np.int32),
+        'Ticker': ['AAPL'] * rows,
+        'Vide': np.full(rows, np.nan),
+    })
+
+
+class TestProfileDataframe:
+    """Statistiques vectorisées."""
+
+    def test_numeric_matches_pandas(self):
+        df = _frame()
+        profile = profile_dataframe(df)
+        assert profile['rows'] == 50
+        for column in ('Close', 'Volume'):
+            stats, series = profile['columns'][column], df[column].astype(float)
+            assert stats['count'] == series.count()
+            assert stats['nan'] == series.isna().sum()
+            for key, expected in (('mean', series.mean()), ('std', series.std()), ('min', series.min()),
+                                  ('max', series.max()), ('q50', series.median()), ('q25', series.quantile(0.25)),
+                                  ('skew', series.skew()), ('kurtosis', series.kurt())):
+                assert stats[key] == pytest.approx(expected, rel=1e-9), (column, key)
+
+    def test_empty_and_text_columns(self):
+        profile = profile_dataframe(_frame())
+        assert profile['columns']['Vide']['count'] == 0
+        assert profile['columns']['Vide']['mean'] is None
+        assert profile['columns']['Ticker'] == {'dtype': 'object', 'count': 50, 'nan': 0, 'unique': 1}
+
+    def test_dates(self):
+        profile = profile_dataframe(_frame())
+        dates = profile['columns']['Date']
+        assert profile['date_column'] == 'Date'
+        assert (dates['monotonic'], dates['duplicates'], dates['frequency']) == (True, 0, 'D')
+        assert dates['median_step_seconds'] == 86400
+
+        shuffled = pd.DataFrame({'Date': pd.to_datetime(['2024-01-03', '2024-01-01', '2024-01-01'])})
+        dates = profile_dataframe(shuffled)['columns']['Date']
+        assert (dates['monotonic'], dates['duplicates']) == (False, 1)
+
+
+class TestStoredProfile:
+    """Profil enregistré à l'upload et relu par les pages."""
+
+    def test_upload_stores_profile(self, app, client):
+        body = _frame().to_csv(index=False).encode('utf-8')
+        response = client.post('/upload_file', data={'data_file': (BytesIO(body), 'prices.csv')},
+                               content_type='multipart/form-data')
+        payload = response.get_json()
+        assert response.status_code == 200, payload
+        assert payload['profile']['columns']['Date']['frequency'] == 'D'
+
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'prices.csv')
+        assert get_file_profile(path) == payload['profile']
+
+        page = client.get('/visualisation/')
+        assert page.status_code == 200
+        assert b'Profil de prices.csv' in page.data
+        assert b'global_profile = {' in client.get('/tests/').data
+
+    def test_profile_from_data_files(self, tmp_path):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        path = str(tmp_path / 'prices.csv')
+        _frame().to_csv(path, index=False)
+        with app.app_context():
+            DataFile.__table__.create(db.engine)
+            accept_upload(UploadStore(str(tmp_path)), path, pd.read_csv(path))
+            profile = get_file_profile(path)
+        assert profile['columns']['Close']['nan'] == 1
@@ -0,0 +1,93 @@
+"""
+Tests pour le moteur de features incrémental.
+"""
+import pytest
+import pandas as pd
+import numpy as np
+from app.utils import make_features, prepare_features_for_prediction
+from app.services.feature_engine import IncrementalFeatureEngine
+
+
+ALL_FEATURES = [
+    'Close_diff',
+    'lag_diff_1', 'lag_diff_2', 'lag_diff_3', 'lag_diff_5', 'lag_diff_7', 'lag_diff_14',
+    'ma_diff_3', 'ma_diff_7', 'ma_diff_14',
+    'ma_price_7', 'ma_price_14', 'ma_price_30',
+    'day_of_week', 'day_of_month', 'month',
+    'volatility'
+]
+
+
+def _history(periods, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=periods, freq='D')
+    return pd.DataFrame({
+        'Close': rng.normal(0, 1, periods).cumsum() + 100,
+        'Volume': rng.integers(1000, 10000, periods)
+    }, index=dates)
+
+
+def _reference_vector(current_df, feature_cols):
+    """Calcul d'origine de la boucle de prévision (historique complet à chaque pas)."""
+    features_df = make_features(current_df, target_col='Close')
+    features_df = features_df.bfill().ffill().fillna(0)
+    X = prepare_features_for_prediction(features_df, feature_cols, current_df=current_df, target_column='Close')
+    return X[feature_cols].iloc[-1].to_numpy(dtype=float)
+
+
+def _run_parity(history, feature_cols, steps=40):
+    engine = IncrementalFeatureEngine(history, 'Close', feature_cols)
+    current_df = history.copy()
+    rng = np.random.default_rng(1)
+
+    for _ in range(steps):
+        expected = _reference_vector(current_df, feature_cols)
+        actual = np.asarray(engine.feature_vector(), dtype=float)
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+        recent = current_df['Close'].diff().dropna()
+        if len(recent) > 0:
+            assert engine.recent_diff_std() == pytest.approx(np.std(recent.iloc[-min(20, len(recent)):]))
+
+        new_price = float(current_df['Close'].iloc[-1]) + rng.normal()
+        next_date = current_df.index[-1] + pd.Timedelta(days=1)
+        new_row = pd.DataFrame([{'Close': new_price, 'Volume': float(current_df['Volume'].iloc[-1])}], index=[next_date])
+        current_df = pd.concat([current_df, new_row])
+        engine.push(new_price, next_date)
+
+
+class TestIncrementalFeatureEngine:
+    """Tests de parité avec make_features."""
+
+    def test_parity_long_history(self):
+        """Historique plus long que toutes les fenêtres."""
+        _run_parity(_history(120), ALL_FEATURES)
+
+    def test_parity_short_history(self):
+        """Historique trop court : les features indéfinies valent 0 comme après fillna."""
+        _run_parity(_history(5), ALL_FEATURES, steps=35)
+
+    def test_parity_passthrough_and_defaults(self):
+        """Colonnes d'origine et features absentes de make_features."""
+        feature_cols = ['Volume', 'Close', 'ma_price_50', 'day_of_year', 'custom_feature', 'lag_diff_3']
+        _run_parity(_history(60), feature_cols, steps=10)
+
+    def test_feature_frame_column_order(self):
+        """Le DataFrame produit respecte l'ordre des colonnes du modèle."""
+        feature_cols = ['volatility', 'Close_diff', ('ma_price', '7')]
+        engine = IncrementalFeatureEngine(_history(40), 'Close', feature_cols)
+        frame = engine.feature_frame()
+        assert list(frame.columns) == ['volatility', 'Close_diff', 'ma_price_7']
+        assert len(frame) == 1
+
+    def test_empty_history(self):
+        """Un historique vide est refusé."""
+        with pytest.raises(ValueError, match="Historique vide"):
+            IncrementalFeatureEngine(pd.DataFrame({'Close': []}), 'Close', ALL_FEATURES)
+
+    def test_missing_values_in_target(self):
+        """La cible ne doit pas contenir de NaN."""
+        history = _history(30)
+        history.iloc[10, 0] = np.nan
+        with pytest.raises(ValueError, match="valeurs manquantes"):
+            IncrementalFeatureEngine(history, 'Close', ALL_FEATURES)
@@ -0,0 +1,144 @@
+"""
+Tests pour la détection du format des CSV.
+"""
+import os
+from io import BytesIO
+import pandas as pd
+import pytest
+from flask import Flask
+from app.extensions import db
+from app.models.data_file import DataFile
+from app.services import file_format
+from app.services.file_format import (
+    SAMPLE_SIZE, detect_csv_format, get_csv_format, load_csv, load_recorded_format, read_csv_fallback,
+    record_file_metadata
+)
+from app.utils import load_dataframe
+
+
+def _write(tmp_path, content, name='data.csv'):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as fh:
+        fh.write(content)
+    return path
+
+
+class TestDetectCsvFormat:
+    """Détection sur échantillon."""
+
+    def test_standard_csv(self):
+        fmt = detect_csv_format(b'Date,Close\n2024-01-01,1.5\n2024-01-02,2.5\n')
+        assert fmt == {'encoding': 'utf-8', 'delimiter': ',', 'decimal': '.', 'header': True}
+
+    def test_bom_and_legacy_encodings(self):
+        assert detect_csv_format('a,b\nété,1\n'.encode('utf-8-sig'))['encoding'] == 'utf-8-sig'
+        assert detect_csv_format('a,b\nété,1\n'.encode('utf-16'))['encoding'] == 'utf-16'
+        assert detect_csv_format('a,b\n€ été,1\n'.encode('cp1252'))['encoding'] == 'cp1252'
+        assert detect_csv_format(b'a,b\n\x81,1\n')['encoding'] == 'latin-1'
+
+    def test_truncated_multibyte_character(self):
+        """Un caractère UTF-8 coupé par la limite de l'échantillon reste de l'UTF-8."""
+        content = ('a,b\n' + 'é,1\n' * 100).encode('utf-8')
+        assert detect_csv_format(content, sample_size=5)['encoding'] == 'utf-8'
+
+    def test_french_dialect(self):
+        content = 'Date;Cours;Volume\n01/01/2024;1,5;10\n02/01/2024;2,75;20\n'.encode('cp1252')
+        fmt = detect_csv_format(content)
+        assert (fmt['delimiter'], fmt['decimal'], fmt['header']) == (';', ',', True)
+
+    def test_tab_and_no_header(self):
+        fmt = detect_csv_format(b'1.5\t2\t3\n4.5\t5\t6\n')
+        assert (fmt['delimiter'], fmt['header']) == ('\t', False)
+
+
+class TestLoadCsv:
+    """Lecture en une passe."""
+
+    def test_single_parse(self, tmp_path, monkeypatch):
+        path = _write(tmp_path, 'Date;Cours\n01/01/2024;1,5\n02/01/2024;2,5\n'.encode('latin-1'))
+        calls = []
+        read_csv = pd.read_csv
+        monkeypatch.setattr(file_format.pd, 'read_csv', lambda *a, **k: calls.append(k) or read_csv(*a, **k))
+
+        df = load_dataframe(path)
+        assert len(calls) == 1
+        assert list(df.columns) == ['Date', 'Cours']
+        assert df['Cours'].tolist() == [1.5, 2.5]
+
+    def test_no_header_columns(self, tmp_path):
+        df = load_csv(_write(tmp_path, b'1,2\n3,4\n'))
+        assert list(df.columns) == ['Colonne 1', 'Colonne 2']
+        assert len(df) == 2
+
+    def test_invalid_bytes_after_sample(self, tmp_path, monkeypatch):
+        """Des octets non UTF-8 au-delà de l'échantillon déclenchent une relecture corrigée."""
+        monkeypatch.setattr(file_format, 'SAMPLE_SIZE', 16)
+        content = ('Nom,Valeur\n' + 'abc,1\n' * 10).encode('utf-8') + 'Café,2\n'.encode('cp1252')
+        path = _write(tmp_path, content)
+
+        df = load_csv(path)
+        assert df['Nom'].iloc[-1] == 'Café'
+        assert get_csv_format(path)['encoding'] == 'cp1252'
+
+    def test_fallback_on_uploaded_stream(self):
+        """Même relecture pour un fichier uploadé (Streamlit) : ASCII sur l'échantillon, Latin-1 ensuite."""
+        content = b'Nom,Valeur\n' + b'abc,1\n' * (SAMPLE_SIZE // 6) + 'Café,2\n'.encode('latin-1')
+        stream = BytesIO(content)
+        fmt = detect_csv_format(stream.read(SAMPLE_SIZE + 1))
+        assert fmt['encoding'] == 'utf-8'
+        stream.seek(0)
+        df, used = read_csv_fallback(stream, fmt)
+        assert df['Nom'].iloc[-1] == 'Café'
+        assert used['encoding'] == 'cp1252'
+
+    def test_memo_follows_file(self, tmp_path):
+        path = _write(tmp_path, b'a,b\n1,2\n')
+        assert get_csv_format(path)['delimiter'] == ','
+        with open(path, 'wb') as fh:
+            fh.write(b'a;b\n1;2\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert get_csv_format(path)['delimiter'] == ';'
+
+
+@pytest.fixture
+def db_app():
+    """Application minimale avec une base SQLite en mémoire."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        DataFile.__table__.create(db.engine)
+        yield app
+
+
+class TestRecordedFormat:
+    """Format enregistré dans DataFile.file_metadata."""
+
+    def test_record_and_reuse(self, db_app, tmp_path, monkeypatch):
+        path = _write(tmp_path, b'a;b\n1,5;2\n')
+        metadata = record_file_metadata(path, user='alice')
+        assert metadata['csv_format']['delimiter'] == ';'
+
+        record = DataFile.get_by_filename('data.csv')
+        assert record.user == 'alice'
+        assert record.metadata_dict()['csv_format'] == metadata['csv_format']
+
+        # Une nouvelle lecture (autre processus) ne rééchantillonne pas le fichier
+        monkeypatch.setattr(file_format, '_format_memo', type(file_format._format_memo)())
+        monkeypatch.setattr(file_format, 'detect_csv_format', lambda *a, **k: pytest.fail("détection"))
+        assert get_csv_format(path)['decimal'] == ','
+
+    def test_stale_record_is_ignored(self, db_app, tmp_path):
+        path = _write(tmp_path, b'a,b\n1,2\n')
+        record_file_metadata(path)
+        with open(path, 'wb') as fh:
+            fh.write(b'a;b;c\n1;2;3\n')
+        assert load_recorded_format(path) is None
+
+    def test_database_unavailable(self, app, tmp_path):
+        """Sans base joignable, l'enregistrement échoue sans erreur."""
+        path = _write(tmp_path, b'a,b\n1,2\n')
+        with app.app_context():
+            assert record_file_metadata(path) is None
+            assert load_recorded_format(path) is None
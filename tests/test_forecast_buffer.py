@@ -0,0 +1,73 @@
+"""
+Tests pour le buffer d'historique de prévision.
+"""
+import pytest
+import pandas as pd
+import numpy as np
+from pandas.tseries.offsets import DateOffset
+from app.services.forecast_buffer import ForecastHistoryBuffer
+
+
+def _history(periods=30):
+    dates = pd.date_range('2024-01-31', periods=periods, freq='D')
+    return pd.DataFrame({
+        'Close': np.linspace(100, 130, periods),
+        'Volume': np.arange(periods, dtype=float),
+        'Ticker': ['ABC'] * periods
+    }, index=dates)
+
+
+def _concat_reference(history, predictions, time_offset):
+    """Ancienne boucle : une concaténation par pas prédit."""
+    current_df = history[['Close']].copy()
+    for price in predictions:
+        next_date = current_df.index[-1] + time_offset
+        current_df = pd.concat([current_df, pd.DataFrame([{'Close': price}], index=[next_date])])
+    return current_df
+
+
+class TestForecastHistoryBuffer:
+    """Tests pour ForecastHistoryBuffer."""
+
+    @pytest.mark.parametrize('time_offset', [pd.Timedelta(days=1), pd.Timedelta(hours=1), DateOffset(months=1)])
+    def test_matches_concat_loop(self, time_offset):
+        """Dates et valeurs identiques à la concaténation pas à pas."""
+        history = _history()
+        predictions = [131.0 + i * 0.5 for i in range(12)]
+        buffer = ForecastHistoryBuffer(history, 'Close', len(predictions), time_offset)
+
+        for price in predictions:
+            buffer.append(price, price - 1, price + 1)
+
+        expected = _concat_reference(history, predictions, time_offset)
+        assert buffer.forecast_dates == list(expected.index[len(history):])
+        np.testing.assert_array_equal(buffer.values, expected['Close'].to_numpy())
+        np.testing.assert_array_equal(buffer.forecast_values, predictions)
+
+    def test_last_value_and_date(self):
+        """La dernière valeur suit les ajouts, la prochaine date est précalculée."""
+        history = _history(5)
+        buffer = ForecastHistoryBuffer(history, 'Close', 2, pd.Timedelta(days=1))
+
+        assert buffer.last_value == history['Close'].iloc[-1]
+        assert buffer.last_date == history.index[-1]
+        assert buffer.next_date == history.index[-1] + pd.Timedelta(days=1)
+
+        date = buffer.append(200.0, 190.0, 210.0)
+        assert date == history.index[-1] + pd.Timedelta(days=1)
+        assert buffer.last_value == 200.0
+        assert buffer.last_date == date
+        assert buffer.lower_bounds.tolist() == [190.0]
+        assert buffer.upper_bounds.tolist() == [210.0]
+
+    def test_horizon_exceeded(self):
+        """On ne peut pas ajouter plus de pas que l'horizon prévu."""
+        buffer = ForecastHistoryBuffer(_history(5), 'Close', 1, pd.Timedelta(days=1))
+        buffer.append(1.0)
+        with pytest.raises(IndexError):
+            buffer.append(2.0)
+
+    def test_empty_history(self):
+        """Un historique vide est refusé."""
+        with pytest.raises(ValueError, match="Historique vide"):
+            ForecastHistoryBuffer(pd.DataFrame({'Close': []}), 'Close', 5, pd.Timedelta(days=1))
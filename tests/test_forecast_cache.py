@@ -0,0 +1,180 @@
+"""
+Tests pour le cache des résultats de prévision.
+"""
+import os
+import threading
+import time
+import pytest
+from app.extensions import cache
+from app.services import forecast_cache as forecast_cache_module
+from app.services.forecast_cache import ForecastCache, content_digest
+from tests.test_forecast_engine import parity_files, _dataset  # noqa: F401
+
+
+def _touch(path, content):
+    """Réécrit un fichier en garantissant une nouvelle date de modification."""
+    stat = os.stat(path)
+    with open(path, 'w') as fh:
+        fh.write(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+class TestContentKey:
+    """Clés adressées par contenu."""
+
+    def test_digest_follows_content(self, tmp_path):
+        path = str(tmp_path / 'data.csv')
+        with open(path, 'w') as fh:
+            fh.write('a,b\n1,2\n')
+        first = content_digest(path)
+        assert content_digest(path) == first
+
+        _touch(path, 'a,b\n1,3\n')
+        assert content_digest(path) != first
+
+    def test_key_normalization(self, tmp_path):
+        """Paramètres équivalents : même clé ; fichier ou paramètre différent : autre clé."""
+        data, model = str(tmp_path / 'data.csv'), str(tmp_path / 'model.joblib')
+        for path, content in ((data, 'x'), (model, 'm')):
+            with open(path, 'w') as fh:
+                fh.write(content)
+
+        key = ForecastCache.key(data, model, 'Close', 10, 'jour', 95)
+        assert ForecastCache.key(data, model, ' Close', '10', 'Jour', 95.0) == key
+        assert ForecastCache.key(data, model, 'Close', 11, 'jour', 95) != key
+        assert ForecastCache.key(data, model, 'Close', 10, 'jour', 95, model_sha256='abc') != key
+
+        _touch(model, 'm2')
+        assert ForecastCache.key(data, model, 'Close', 10, 'jour', 95) != key
+
+
+class TestForecastCache:
+    """Lecture, calcul et regroupement."""
+
+    def test_get_or_compute(self, app):
+        with app.app_context():
+            forecast_cache = ForecastCache(timeout=60)
+            calls = []
+            compute = lambda: calls.append(1) or {'values': [1.0, 2.0]}
+
+            assert forecast_cache.get_or_compute('k', compute) == ({'values': [1.0, 2.0]}, False)
+            assert forecast_cache.get_or_compute('k', compute) == ({'values': [1.0, 2.0]}, True)
+            assert len(calls) == 1
+            stats = forecast_cache.stats()
+            assert (stats['hits'], stats['misses']) == (1, 1)
+
+    def test_disabled(self, app):
+        with app.app_context():
+            forecast_cache = ForecastCache(timeout=0)
+            calls = []
+            for _ in range(2):
+                forecast_cache.get_or_compute('k', lambda: calls.append(1) or 'r')
+            assert len(calls) == 2
+
+    def test_concurrent_requests_are_coalesced(self, app):
+        """Des requêtes identiques simultanées ne déclenchent qu'un calcul."""
+        forecast_cache = ForecastCache(timeout=60)
+        calls, results = [], []
+
+        def _compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'résultat'
+
+        def _request():
+            with app.app_context():
+                results.append(forecast_cache.get_or_compute('k', _compute)[0])
+
+        threads = [threading.Thread(target=_request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ['résultat'] * 5
+        assert forecast_cache.stats()['coalesced'] == 4
+
+    def test_errors_are_shared(self, app):
+        """Les requêtes regroupées reçoivent l'erreur du calcul."""
+        forecast_cache = ForecastCache(timeout=60)
+        started = threading.Event()
+        errors = []
+
+        def _compute():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("données invalides")
+
+        def _request():
+            with app.app_context():
+                try:
+                    forecast_cache.get_or_compute('k', _compute)
+                except ValueError as e:
+                    errors.append(str(e))
+
+        leader = threading.Thread(target=_request)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=_request)
+        follower.start()
+        leader.join()
+        follower.join()
+        assert errors == ["données invalides"] * 2
+
+    def test_waits_for_other_process(self, app):
+        """Si un autre processus détient le verrou, son résultat est attendu."""
+        with app.app_context():
+            forecast_cache = ForecastCache(timeout=60, wait_interval=0.02)
+            cache.add('k:lock', 12345, timeout=60)
+
+            def _other_process():
+                with app.app_context():
+                    cache.set('k', 'autre processus')
+
+            threading.Timer(0.1, _other_process).start()
+
+            result, shared = forecast_cache.get_or_compute('k', lambda: pytest.fail("calcul en double"))
+            assert (result, shared) == ('autre processus', True)
+
+
+class TestForecastRouteCache:
+    """Intégration dans /previsions/."""
+
+    def _post(self, client, steps):
+        return client.post('/previsions/', data={
+            'ajax': 'true',
+            'filename': 'parity.csv',
+            'selected_model': 'parity.joblib',
+            'target_column': 'Close',
+            'forecast_steps': str(steps),
+        })
+
+    def test_cached_forecast_is_served_synchronously(self, app, client, parity_files, monkeypatch):
+        """Une prévision longue déjà calculée est renvoyée sans passer par un job."""
+        monkeypatch.setattr(forecast_cache_module, '_forecast_cache_instance', ForecastCache())
+        first = self._post(client, 12)
+        assert first.status_code == 200
+
+        app.config['FORECAST_SYNC_MAX_STEPS'] = 5
+        second = self._post(client, 12)
+        assert second.status_code == 200
+        assert second.get_json()['forecast_data'] == first.get_json()['forecast_data']
+        assert forecast_cache_module.get_forecast_cache().stats()['hits'] == 1
+
+    def test_new_upload_invalidates(self, app, client, parity_files, monkeypatch):
+        """Un fichier modifié produit une nouvelle prévision."""
+        monkeypatch.setattr(forecast_cache_module, '_forecast_cache_instance', ForecastCache())
+        data_path, _ = parity_files
+        first = self._post(client, 5).get_json()
+
+        df = _dataset()
+        df['Close'] = df['Close'] * 2
+        df.to_csv(data_path, index=False)
+        stat = os.stat(data_path)
+        os.utime(data_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        second = self._post(client, 5).get_json()
+        assert second['forecast_data'] != first['forecast_data']
+        stats = forecast_cache_module.get_forecast_cache().stats()
+        assert (stats['hits'], stats['misses']) == (0, 2)
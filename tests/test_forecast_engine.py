@@ -0,0 +1,220 @@
+"""
+Tests pour le moteur de prévision unique.
+
+Les résultats attendus (tests/data/forecast_parity.json) ont été produits par la
+route `/previsions/` avant l'extraction du moteur : la route, les jobs et le
+moteur doivent continuer à les reproduire.
+"""
+import json
+import os
+import time
+import pytest
+import pandas as pd
+import numpy as np
+import joblib
+from sklearn.linear_model import LinearRegression
+from app import utils as _utils
+from app.blueprints.previsions.routes import _run_forecast_job
+from app.services.feature_engine import IncrementalFeatureEngine
+from app.services.forecast_engine import ForecastEngine, ForecastResult, forecast
+
+
+PARITY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'forecast_parity.json')
+
+with open(PARITY_FILE, encoding='utf-8') as fh:
+    PARITY_CASES = json.load(fh)
+
+
+def _dataset(n=160):
+    t = np.arange(n)
+    close = 100 + 0.05 * t + 3 * np.sin(t / 7) + np.cos(t / 3)
+    volume = 1000.0 + (t * 37 % 500)
+    return pd.DataFrame({
+        'Date': pd.date_range('2022-01-03', periods=n, freq='D'),
+        'Close': close,
+        'Volume': volume
+    })
+
+
+def _artifact(df):
+    X, y, cols = _utils.prepare_data_for_ml(_utils.ensure_datetime_index(df.copy(), 'Date'), 'Close')
+    model = LinearRegression().fit(X[cols], X['Close_diff'].shift(-1).fillna(0))
+    return {'model': model, 'feature_columns': cols}
+
+
+@pytest.fixture
+def parity_files(app, tmp_path):
+    """Fichier de données et modèle utilisés pour produire les résultats de référence."""
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    df = _dataset()
+    data_path = os.path.join(app.config['UPLOAD_FOLDER'], 'parity.csv')
+    df.to_csv(data_path, index=False)
+    model_path = str(models_dir / 'parity.joblib')
+    joblib.dump(_artifact(df), model_path)
+    app.config['MODELS_DIR'] = str(models_dir)
+    app.config['FORECAST_SYNC_MAX_STEPS'] = 1000
+    return data_path, model_path
+
+
+def _assert_matches(forecast_data, metrics, case):
+    expected = case['forecast_data']
+    assert len(forecast_data) == len(expected)
+    for row, expected_row in zip(forecast_data, expected):
+        assert row['Période'] == expected_row['Période']
+        assert row['Date'] == expected_row['Date']
+        for key in ('Prévision', 'Variation', 'Borne inf.', 'Borne sup.'):
+            assert row[key] == pytest.approx(expected_row[key], abs=1e-4)
+    for key, value in case['metrics'].items():
+        assert metrics[key] == pytest.approx(value, rel=1e-7)
+
+
+@pytest.mark.parametrize('case', PARITY_CASES, ids=[c['params']['forecast_interval'] for c in PARITY_CASES])
+class TestForecastParity:
+    """Parité numérique avec la route d'origine."""
+
+    def test_engine(self, parity_files, case):
+        """Le moteur reproduit les valeurs de référence."""
+        data_path, model_path = parity_files
+        params = case['params']
+        result = forecast(
+            _utils.load_dataframe(data_path), joblib.load(model_path), 'Close',
+            params['forecast_steps'], params['forecast_interval'], params['confidence_level']
+        )
+        assert isinstance(result, ForecastResult)
+        _assert_matches(result.display_data(), result.metrics, case)
+
+    def test_route(self, client, parity_files, case):
+        """La route synchrone reproduit les valeurs de référence."""
+        params = case['params']
+        response = client.post('/previsions/', data={
+            'ajax': 'true',
+            'filename': 'parity.csv',
+            'selected_model': 'parity.joblib',
+            'target_column': 'Close',
+            **{key: str(value) for key, value in params.items()}
+        })
+        assert response.status_code == 200
+        payload = response.get_json()
+        assert payload['success']
+        _assert_matches(payload['forecast_data'], payload['forecast_metrics'], case)
+
+    def test_route_async(self, app, client, parity_files, case):
+        """Au-delà du seuil, la route renvoie un jobid et le résultat est obtenu par polling."""
+        app.config['FORECAST_SYNC_MAX_STEPS'] = 0
+        response = client.post('/previsions/', data={
+            'ajax': 'true',
+            'filename': 'parity.csv',
+            'selected_model': 'parity.joblib',
+            'target_column': 'Close',
+            **{key: str(value) for key, value in case['params'].items()}
+        })
+        assert response.status_code == 202
+        payload = response.get_json()
+        jobid = payload['jobid']
+        assert payload['events_url'] == f'/jobs/events/{jobid}'
+        try:
+            deadline = time.time() + 30
+            while True:
+                poll = client.get(payload['poll_url'])
+                if poll.status_code != 202 or time.time() > deadline:
+                    break
+                time.sleep(0.05)
+            assert poll.status_code == 200, poll.get_json()
+            result = poll.get_json()
+            assert result['forecast_plot']
+            assert '<table' in result['forecast_results']
+            _assert_matches(result['forecast_data'], result['forecast_metrics'], case)
+
+            # La prévision est ajoutée une seule fois à l'historique de la session
+            client.get(payload['poll_url'])
+            with client.session_transaction() as sess:
+                assert len(sess['forecast_history']) == 1
+                assert sess['last_forecast']['forecast_data'] == result['forecast_data']
+        finally:
+            _utils.delete_job(jobid)
+
+    def test_job(self, app, parity_files, case):
+        """Le job en arrière-plan reproduit les valeurs de référence."""
+        data_path, model_path = parity_files
+        jobid = f"test-parity-{case['params']['forecast_interval']}"
+        try:
+            with app.app_context():
+                _run_forecast_job(jobid, {
+                    'model_path': model_path,
+                    'filepath': data_path,
+                    'target_column': 'Close',
+                    **case['params']
+                })
+            job = _utils.read_job(jobid)
+            assert job['status'] == 'done', job
+            result = job['result']['result']
+            _assert_matches(result['forecast_data'], result['metrics'], case)
+            assert set(job['result']['timings']) == {'model', 'data', 'forecast', 'plot', 'table'}
+            assert job['progress']['step'] == job['progress']['total'] == case['params']['forecast_steps']
+        finally:
+            _utils.delete_job(jobid)
+
+
+class TestForecastEngine:
+    """Tests de l'API du moteur."""
+
+    def test_estimator_with_feature_cols(self):
+        """Un estimateur seul est accepté avec ses colonnes de features."""
+        df = _dataset()
+        artifact = _artifact(df)
+        from_artifact = forecast(df, artifact, 'Close', 5)
+        from_estimator = forecast(df, artifact['model'], 'Close', 5, feature_cols=artifact['feature_columns'])
+        assert from_estimator.values == from_artifact.values
+        assert len(from_estimator.dates) == 5
+
+    def test_progress_callback(self):
+        """Le callback d'avancement est appelé après chaque pas."""
+        df = _dataset()
+        calls = []
+        forecast(df, _artifact(df), 'Close', 4, progress=lambda done, total: calls.append((done, total)))
+        assert calls == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+    def test_target_column_resolution(self):
+        """Un nom de colonne approchant est résolu comme dans la route."""
+        df = _dataset()
+        result = ForecastEngine().forecast(df, _artifact(df), 'close', 3)
+        assert result.target_column == 'Close'
+        assert list(result.forecast_df.columns) == ['Close', 'lower_bound', 'upper_bound', 'Close_diff']
+
+    def test_unsupported_interval(self):
+        """Un intervalle inconnu est refusé."""
+        df = _dataset()
+        with pytest.raises(ValueError, match="Intervalle de prévision non supporté"):
+            forecast(df, _artifact(df), 'Close', 3, interval='minute')
+
+    def test_error_mid_loop_keeps_features_aligned(self, monkeypatch):
+        """Un pas en erreur répète la dernière valeur, sans doublon ni décalage des features."""
+        df = _dataset()
+        artifact = _artifact(df)
+        reference = forecast(df, artifact, 'Close', 6)
+        failing_date = reference.dates[2]
+        failed, pushed = [], []
+        original_push = IncrementalFeatureEngine.push
+
+        def push(engine, price, date):
+            if date == failing_date and not failed:
+                failed.append(date)
+                raise RuntimeError("erreur injectée")
+            original_push(engine, price, date)
+            pushed.append(date)
+
+        monkeypatch.setattr(IncrementalFeatureEngine, 'push', push)
+        result = forecast(df, artifact, 'Close', 6)
+
+        assert result.dates == reference.dates
+        assert result.values[:2] == pytest.approx(reference.values[:2])
+        assert result.values[2] == pytest.approx(result.values[1])
+        # Chaque date de prévision a été poussée une seule fois dans le moteur
+        assert [d for d in pushed if d in reference.dates] == reference.dates
+
+    def test_missing_target(self):
+        """Une colonne cible absente lève une erreur explicite."""
+        df = _dataset()
+        with pytest.raises(ValueError, match="n'existe pas dans le fichier"):
+            forecast(df, _artifact(df), 'Open', 3)
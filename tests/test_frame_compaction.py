@@ -0,0 +1,85 @@
+"""
+Tests pour la compaction des types des DataFrames chargés.
+"""
+import os
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from app.services.columnar_store import read_columnar_copy
+from app.services.frame_compaction import compact_dataframe
+from app.utils import load_dataframe
+
+
+def _prices(rows=200):
+    return pd.DataFrame({
+        'Date': [f'2024-01-{i % 28 + 1:02d}' for i in range(rows)],
+        'Ticker': ['AAPL', 'MSFT'] * (rows // 2),
+        'Close': [100.5 + i * 0.25 for i in range(rows)],
+        'Volume': list(range(rows)),
+    })
+
+
+class TestCompactDataframe:
+    """Conversions et occupation mémoire."""
+
+    def test_types_and_memory(self):
+        df = _prices()
+        compact = compact_dataframe(df)
+        assert compact['Date'].dtype == 'datetime64[ns]'
+        assert compact['Ticker'].dtype == 'category'
+        assert compact['Close'].dtype == np.float32
+        assert compact['Volume'].dtype == np.int32
+        memory = compact.attrs['memory']
+        assert memory['after'] < memory['before'] / 2
+        # L'original est inchangé
+        assert df['Close'].dtype == np.float64
+
+    def test_lossy_float_needs_tolerance(self):
+        df = pd.DataFrame({'Close': [100.37, 101.12, np.nan]})
+        assert compact_dataframe(df)['Close'].dtype == np.float64
+        compact = compact_dataframe(df, float_tolerance=1e-6)
+        assert compact['Close'].dtype == np.float32
+        assert np.allclose(compact['Close'], df['Close'], rtol=1e-6, equal_nan=True)
+
+    def test_values_out_of_range_are_kept(self):
+        df = pd.DataFrame({'Volume': [1, 2 ** 40], 'Big': [1.0, 1e300]})
+        compact = compact_dataframe(df)
+        assert compact['Volume'].dtype == np.int64
+        assert compact['Big'].dtype == np.float64
+
+    def test_dates(self):
+        french = compact_dataframe(pd.DataFrame({'Date': ['02/01/2024', '13/01/2024']}))
+        assert french['Date'].tolist() == [pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-13')]
+        # Une valeur qui n'est pas une date : la colonne reste textuelle
+        mixed = compact_dataframe(pd.DataFrame({'Date': ['2024-01-02', 'inconnue', 'x']}))
+        assert mixed['Date'].dtype == object
+
+    def test_high_cardinality_strings_stay_objects(self):
+        df = pd.DataFrame({'Id': [f'id-{i}' for i in range(100)]})
+        assert compact_dataframe(df)['Id'].dtype == object
+
+
+class TestLoadAndUpload:
+    """Compaction au chargement et rapport mémoire à l'upload."""
+
+    def test_load_dataframe(self, app, tmp_path):
+        path = str(tmp_path / 'prices.csv')
+        _prices().to_csv(path, index=False)
+        with app.app_context():
+            assert load_dataframe(path)['Close'].dtype == np.float32
+            app.config['DATAFRAME_COMPACT'] = False
+            assert load_dataframe(path)['Close'].dtype == np.float64
+
+    def test_upload_reports_memory(self, app, client):
+        body = _prices().to_csv(index=False).encode('utf-8')
+        response = client.post('/upload_file', data={'data_file': (BytesIO(body), 'prices.csv')},
+                               content_type='multipart/form-data')
+        payload = response.get_json()
+        assert response.status_code == 200, payload
+        assert payload['memory']['after'] < payload['memory']['before']
+        assert payload['dtypes']['Ticker'] == 'category'
+
+        # La copie Parquet conserve les types compacts
+        copy = read_columnar_copy(os.path.join(app.config['UPLOAD_FOLDER'], 'prices.csv'))
+        assert copy['Close'].dtype == np.float32
+        assert copy['Date'].dtype == 'datetime64[ns]'
@@ -0,0 +1,188 @@
+"""
+Tests pour l'exécuteur des jobs en arrière-plan.
+"""
+import threading
+import time
+import pytest
+from app import utils as _utils
+from app.extensions import executor as app_executor
+from app.blueprints.previsions.routes import _run_forecast_job
+from app.services.job_executor import (
+    JobExecutor, JobQueueFull, claim_external_job, run_external_job, task_path
+)
+from tests.test_forecast_engine import parity_files, PARITY_CASES, _assert_matches  # noqa: F401
+
+
+def _wait_job(jobid, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = _utils.read_job(jobid)
+        if job and job.get('status') != 'pending':
+            return job
+        time.sleep(0.05)
+    return _utils.read_job(jobid)
+
+
+def _blocking_job(jobid, event):
+    event.wait(10)
+
+
+def _failing_job(jobid):
+    raise RuntimeError("panne")
+
+
+@pytest.fixture
+def job_config(app):
+    app.config.update(JOB_EXECUTOR_BACKEND='threads', JOB_EXECUTOR_WORKERS=1, JOB_QUEUE_MAX=1, JOB_RETRY_AFTER=7)
+    return app
+
+
+class TestThreadBackend:
+    """File bornée et compteurs du backend 'threads'."""
+
+    def test_queue_full(self, job_config):
+        """Au-delà de workers + file, la soumission est refusée avec un délai conseillé."""
+        executor = JobExecutor(job_config)
+        release = threading.Event()
+        try:
+            executor.submit_job('test-exec-1', _blocking_job, release)
+            executor.submit_job('test-exec-2', _blocking_job, release)
+            stats = executor.stats()
+            assert stats['in_flight'] == 2
+            assert stats['running'] == 1
+            assert stats['queued'] == 1
+
+            with pytest.raises(JobQueueFull) as exc_info:
+                executor.submit_job('test-exec-3', _blocking_job, release)
+            assert exc_info.value.retry_after == 7
+            assert executor.stats()['rejected'] == 1
+        finally:
+            release.set()
+            executor.shutdown()
+
+        stats = executor.stats()
+        assert stats['in_flight'] == 0
+        assert stats['completed'] == 2
+        assert stats['avg_job_seconds'] is not None
+
+    def test_background_tasks_are_bounded(self, job_config):
+        """Les tâches de fond ont leur propre pool ; au-delà de sa file, elles sont abandonnées."""
+        job_config.config.update(JOB_BACKGROUND_WORKERS=1, JOB_BACKGROUND_QUEUE_MAX=1)
+        executor = JobExecutor(job_config)
+        release = threading.Event()
+        try:
+            assert executor.submit_background(release.wait, 10) is not None
+            assert executor.submit_background(release.wait, 10) is not None
+            assert executor.submit_background(release.wait, 10) is None
+            # Le pool des prévisions reste libre
+            executor.submit_job('test-exec-bg', _blocking_job, release)
+            stats = executor.stats()
+            assert (stats['background_in_flight'], stats['background_dropped'], stats['in_flight']) == (2, 1, 1)
+        finally:
+            release.set()
+            executor.shutdown()
+        assert executor.stats()['background_in_flight'] == 0
+
+    def test_failed_job_is_recorded(self, job_config):
+        """Une exception non gérée par la tâche marque le job en erreur."""
+        executor = JobExecutor(job_config)
+        jobid = 'test-exec-failed'
+        _utils.write_job_pending(jobid, {})
+        try:
+            executor.submit_job(jobid, _failing_job)
+            executor.shutdown()
+            job = _wait_job(jobid)
+            assert job['status'] == 'failed'
+            assert 'panne' in job['error']
+            assert executor.stats()['failed'] == 1
+        finally:
+            _utils.delete_job(jobid)
+
+
+class TestForecastQueueLimits:
+    """Réponses de /previsions/ quand la file est pleine."""
+
+    def test_route_returns_429(self, job_config, client, parity_files):
+        """La route renvoie 429 avec Retry-After quand la file est pleine."""
+        job_config.config['FORECAST_SYNC_MAX_STEPS'] = 0
+        app_executor.init_app(job_config)
+        release = threading.Event()
+        rejected = app_executor.stats()['rejected']
+        try:
+            app_executor.submit_job('test-exec-a', _blocking_job, release)
+            app_executor.submit_job('test-exec-b', _blocking_job, release)
+            response = client.post('/previsions/', data={
+                'ajax': 'true',
+                'filename': 'parity.csv',
+                'selected_model': 'parity.joblib',
+                'target_column': 'Close',
+                'forecast_steps': '5',
+            })
+            assert response.status_code == 429
+            payload = response.get_json()
+            assert payload['success'] is False
+            assert response.headers['Retry-After'] == str(payload['retry_after'])
+
+            stats = client.get('/jobs/stats').get_json()
+            assert stats['rejected'] == rejected + 1
+            assert stats['in_flight'] == 2
+        finally:
+            release.set()
+            app_executor.shutdown()
+
+
+class TestProcessBackend:
+    """Backend 'processes' (contexte spawn)."""
+
+    def test_forecast_job_in_process(self, app, parity_files):
+        """Le job de prévision s'exécute dans un processus et reproduit la référence."""
+        case = PARITY_CASES[0]
+        data_path, model_path = parity_files
+        app.config.update(JOB_EXECUTOR_BACKEND='processes', JOB_EXECUTOR_START_METHOD='spawn',
+                          JOB_EXECUTOR_WORKERS=1)
+        executor = JobExecutor(app)
+        jobid = 'test-exec-process'
+        _utils.write_job_pending(jobid, {})
+        try:
+            future = executor.submit_job(jobid, _run_forecast_job, {
+                'model_path': model_path,
+                'filepath': data_path,
+                'target_column': 'Close',
+                **case['params']
+            })
+            future.result(timeout=120)
+            job = _wait_job(jobid)
+            assert job['status'] == 'done', job
+            result = job['result']['result']
+            _assert_matches(result['forecast_data'], result['metrics'], case)
+            assert executor.stats()['backend'] == 'processes'
+        finally:
+            executor.shutdown()
+            _utils.delete_job(jobid)
+
+
+class TestExternalBackend:
+    """Backend 'external' : file sur disque consommée par scripts/job_worker.py."""
+
+    def test_enqueue_claim_and_run(self, app, tmp_path):
+        """Le job déposé est réservé une seule fois puis exécuté."""
+        queue_dir = str(tmp_path / 'queue')
+        app.config.update(JOB_EXECUTOR_BACKEND='external', JOB_QUEUE_DIR=queue_dir,
+                          JOB_EXECUTOR_WORKERS=1, JOB_QUEUE_MAX=0)
+        executor = JobExecutor(app)
+        jobid = 'test-exec-external'
+        try:
+            assert executor.submit_job(jobid, _utils.write_job_result, {'value': 42}) is None
+            assert executor.stats()['in_flight'] == 1
+            with pytest.raises(JobQueueFull):
+                executor.submit_job('test-exec-external-2', _utils.write_job_result, {})
+
+            payload = claim_external_job(queue_dir)
+            assert payload['task'] == task_path(_utils.write_job_result) == 'app.utils:write_job_result'
+            assert claim_external_job(queue_dir) is None
+
+            assert run_external_job(payload)
+            assert _utils.read_job(jobid)['result'] == {'value': 42}
+            assert executor.stats()['in_flight'] == 0
+        finally:
+            _utils.delete_job(jobid)
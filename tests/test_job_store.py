@@ -0,0 +1,315 @@
+"""
+Tests pour le stockage des jobs en arrière-plan.
+"""
+import json
+import os
+import threading
+import time
+import pytest
+from app import utils as _utils
+from app.services import job_store as job_store_module
+from app.services.job_store import (
+    FileJobStore, JobProgress, RedisJobStore, configure_job_store, create_job_store, get_job_store
+)
+
+
+class FakeRedis:
+    """Sous-ensemble des commandes Redis utilisées par RedisJobStore."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v).encode('utf-8') for k, v in mapping.items()})
+
+    def hmget(self, key, *fields):
+        values = self.data.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def expire(self, key, ttl):
+        self.expires[key] = ttl
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode('utf-8')
+        self.expires[key] = ex
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture(params=['filesystem', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'redis':
+        return RedisJobStore(client=FakeRedis(), ttl=60)
+    return FileJobStore(str(tmp_path / 'jobs'), ttl=60)
+
+
+class TestJobStore:
+    """Comportement commun des backends."""
+
+    def test_lifecycle(self, store):
+        """pending -> done : les métadonnées sont conservées, le résultat est lu à part."""
+        store.create('job-1', {'forecast_steps': 20})
+        status = store.get_status('job-1')
+        assert status['status'] == 'pending'
+        assert status['meta'] == {'forecast_steps': 20}
+        assert store.get('job-1')['result'] is None
+
+        store.set_progress('job-1', {'step': 5, 'total': 20})
+        assert store.get_status('job-1')['status'] == 'running'
+        assert store.get('job-1')['progress'] == {'step': 5, 'total': 20}
+
+        store.set_result('job-1', {'plot_b64': 'x' * 1000, 'values': [1.5, 2.5]})
+        status = store.get_status('job-1')
+        assert status['status'] == 'done'
+        assert status['meta'] == {'forecast_steps': 20}
+        assert status['updated_at'] >= status['created_at']
+        assert status['progress'] == {'step': 5, 'total': 20}
+        assert store.get('job-1')['result'] == {'plot_b64': 'x' * 1000, 'values': [1.5, 2.5]}
+
+    def test_error_and_delete(self, store):
+        """Un job en échec garde son message ; un job supprimé est introuvable."""
+        store.create('job-2')
+        store.set_error('job-2', 'modèle invalide')
+        job = store.get('job-2')
+        assert job['status'] == 'failed'
+        assert job['error'] == 'modèle invalide'
+
+        store.delete('job-2')
+        assert store.get_status('job-2') is None
+        assert store.get('job-2') is None
+
+    def test_status_does_not_read_result(self, store, monkeypatch):
+        """La lecture de l'état ne touche pas au résultat."""
+        store.create('job-3')
+        store.set_result('job-3', {'plot_b64': 'x'})
+
+        def _fail(jobid):
+            raise AssertionError("résultat lu")
+
+        monkeypatch.setattr(store, 'get_result', _fail)
+        assert store.get_status('job-3')['status'] == 'done'
+
+    def test_wait_for_change(self, store):
+        """L'attente se termine dès qu'un autre thread modifie l'état."""
+        store.create('job-4')
+        version = store.version(store.get_status('job-4'))
+        assert store.version(store.wait_for_change('job-4', version, timeout=0.05)) == version
+
+        timer = threading.Timer(0.1, store.set_progress, args=('job-4', {'step': 1, 'total': 2}))
+        timer.start()
+        started = time.monotonic()
+        status = store.wait_for_change('job-4', version, timeout=5)
+        timer.join()
+        assert status['progress'] == {'step': 1, 'total': 2}
+        assert time.monotonic() - started < 2
+
+
+class TestJobProgress:
+    """Enregistrement de l'avancement d'un job."""
+
+    def test_stages_and_steps(self, tmp_path):
+        """Les étapes sont chronométrées, les pas sont écrits au plus une fois par intervalle."""
+        store = FileJobStore(str(tmp_path))
+        store.create('job')
+        writes = []
+        set_progress = store.set_progress
+        store.set_progress = lambda jobid, progress: writes.append(progress) or set_progress(jobid, progress)
+
+        progress = JobProgress('job', store=store, min_interval=3600)
+        with progress.stage('data'):
+            pass
+        with progress.stage('forecast'):
+            for i in range(1, 101):
+                progress.step(i, 100)
+
+        assert [w['stage'] for w in writes] == ['data', 'forecast', 'forecast']
+        assert writes[-1]['step'] == 100
+        assert set(progress.timings) == {'data', 'forecast'}
+        status = store.get_status('job')
+        assert status['status'] == 'running'
+        assert status['progress']['step'] == 100
+
+    def test_store_errors_are_ignored(self):
+        """Un stockage indisponible ne fait pas échouer le job."""
+        class BrokenStore:
+            def set_progress(self, jobid, progress):
+                raise OSError("disque plein")
+
+        progress = JobProgress('job', store=BrokenStore())
+        with progress.stage('forecast'):
+            progress.step(1, 1)
+        assert 'forecast' in progress.timings
+
+
+class TestFileJobStore:
+    """Backend fichier."""
+
+    def test_files(self, tmp_path):
+        """État et résultat sont dans deux fichiers compacts, sans fichier temporaire restant."""
+        root = str(tmp_path)
+        store = FileJobStore(root)
+        store.create('job', {'a': 1})
+        store.set_result('job', {'plot_b64': 'x' * 10000})
+
+        assert sorted(os.listdir(root)) == ['job.result.json', 'job.status.json']
+        assert os.path.getsize(os.path.join(root, 'job.status.json')) < 200
+        with open(os.path.join(root, 'job.result.json'), encoding='utf-8') as fh:
+            assert '\n' not in fh.read()
+
+    def test_legacy_file(self, tmp_path):
+        """Les jobs écrits dans l'ancien format restent lisibles."""
+        with open(tmp_path / 'old.json', 'w', encoding='utf-8') as fh:
+            json.dump({'status': 'done', 'meta': None, 'result': {'v': 1}, 'error': None}, fh, indent=2)
+        store = FileJobStore(str(tmp_path))
+        assert store.get_status('old')['status'] == 'done'
+        assert 'result' not in store.get_status('old')
+        assert store.get('old')['result'] == {'v': 1}
+
+    def test_gc(self, tmp_path):
+        """Les jobs et fichiers temporaires plus anciens que le TTL sont supprimés."""
+        root = str(tmp_path)
+        store = FileJobStore(root, ttl=60)
+        for jobid in ('old', 'recent'):
+            store.create(jobid)
+            store.set_result(jobid, {'v': jobid})
+        open(os.path.join(root, 'orphan.status.json.1.2.tmp'), 'w').close()
+        with open(os.path.join(root, 'legacy.json'), 'w') as fh:
+            fh.write('{}')
+        past = time.time() - 3600
+        for name in ('old.status.json', 'old.result.json', 'orphan.status.json.1.2.tmp', 'legacy.json'):
+            os.utime(os.path.join(root, name), (past, past))
+        os.mkdir(os.path.join(root, 'queue'))
+
+        assert store.gc() == 2
+        assert sorted(os.listdir(root)) == ['queue', 'recent.result.json', 'recent.status.json']
+
+    def test_maybe_gc_interval(self, tmp_path, monkeypatch):
+        """Le nettoyage automatique est limité à un passage par intervalle."""
+        store = FileJobStore(str(tmp_path), gc_interval=600)
+        calls = []
+        monkeypatch.setattr(store, 'gc', lambda now=None: calls.append(now) or 0)
+
+        store.create('a')
+        assert calls == []
+        store._last_gc -= 601
+        store.create('b')
+        store.create('c')
+        assert len(calls) == 1
+
+
+class TestJobStoreConfiguration:
+    """Création du stockage à partir de la configuration."""
+
+    def test_filesystem_settings(self, tmp_path):
+        store = create_job_store({'JOB_STORE_BACKEND': 'filesystem', 'JOB_STORE_DIR': str(tmp_path), 'JOB_TTL': 10})
+        assert isinstance(store, FileJobStore)
+        assert store.root == str(tmp_path)
+        assert store.ttl == 10
+
+    def test_redis_unavailable_falls_back(self, tmp_path, monkeypatch):
+        """Sans Redis joignable, le stockage fichier est utilisé."""
+        monkeypatch.setattr(job_store_module, '_store_instance', None)
+        store = configure_job_store({
+            'JOB_STORE_BACKEND': 'redis',
+            'JOB_STORE_URL': 'redis://localhost:1/0',
+            'JOB_STORE_DIR': str(tmp_path),
+        })
+        assert isinstance(store, FileJobStore)
+        assert get_job_store() is store
+
+    def test_utils_use_configured_store(self, tmp_path, monkeypatch):
+        """Les fonctions utilitaires passent par le stockage configuré."""
+        store = RedisJobStore(client=FakeRedis())
+        monkeypatch.setattr(job_store_module, '_store_instance', store)
+        _utils.write_job_pending('job', {'a': 1})
+        _utils.write_job_result('job', {'v': 2})
+        assert _utils.read_job_status('job')['status'] == 'done'
+        assert _utils.read_job('job')['result'] == {'v': 2}
+        _utils.delete_job('job')
+        assert _utils.read_job('job') is None
+
+
+class TestJobStatusEndpoint:
+    """/jobs/status lit uniquement l'état."""
+
+    def test_status_endpoint(self, client, monkeypatch):
+        store = FileJobStore(os.path.join(client.application.config['UPLOAD_FOLDER'], 'jobs'))
+        monkeypatch.setattr(job_store_module, '_store_instance', store)
+        store.create('job')
+        store.set_result('job', {'v': 1})
+        monkeypatch.setattr(store, 'get_result', lambda jobid: pytest.fail("résultat lu"))
+
+        response = client.get('/jobs/status/job')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'done', 'error': None}
+        assert client.get('/jobs/status/unknown').status_code == 404
+
+
+def _events(response):
+    """Découpe un flux SSE en liste de (événement, données)."""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':')
+                     and ': ' in line)
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class TestJobEventsEndpoint:
+    """Flux SSE /jobs/events/<jobid>."""
+
+    @pytest.fixture
+    def store(self, client, monkeypatch):
+        store = FileJobStore(os.path.join(client.application.config['UPLOAD_FOLDER'], 'jobs'))
+        monkeypatch.setattr(job_store_module, '_store_instance', store)
+        return store
+
+    def test_progress_then_result(self, client, store):
+        """Les étapes sont transmises au fil de l'eau, puis le résultat."""
+        store.create('job')
+
+        def _run():
+            time.sleep(0.1)
+            store.set_progress('job', {'step': 1, 'total': 2})
+            time.sleep(0.1)
+            store.set_progress('job', {'step': 2, 'total': 2})
+            store.set_result('job', {'v': 42})
+
+        worker = threading.Thread(target=_run)
+        worker.start()
+        response = client.get('/jobs/events/job')
+        # Le flux est lu pendant que le job avance
+        events = _events(response)
+        worker.join()
+
+        assert response.mimetype == 'text/event-stream'
+        assert events[0] == ('progress', {'status': 'pending', 'progress': None})
+        assert ('progress', {'status': 'running', 'progress': {'step': 1, 'total': 2}}) in events
+        assert events[-1] == ('done', {'status': 'done', 'progress': {'step': 2, 'total': 2}, 'result': {'v': 42}})
+
+    def test_failed_and_without_result(self, client, store):
+        """Un job en échec ferme le flux ; `?result=0` omet le résultat."""
+        store.create('bad')
+        store.set_error('bad', 'modèle invalide')
+        assert _events(client.get('/jobs/events/bad')) == [
+            ('failed', {'status': 'failed', 'error': 'modèle invalide'})
+        ]
+
+        store.create('ok')
+        store.set_result('ok', {'v': 1})
+        assert 'result' not in _events(client.get('/jobs/events/ok?result=0'))[-1][1]
+
+    def test_timeout_and_unknown(self, client, store):
+        """Le flux se ferme après JOB_EVENTS_TIMEOUT ; un job inconnu renvoie 404."""
+        client.application.config['JOB_EVENTS_TIMEOUT'] = 0.3
+        store.create('slow')
+        events = _events(client.get('/jobs/events/slow'))
+        assert events == [('progress', {'status': 'pending', 'progress': None})]
+        assert client.get('/jobs/events/unknown').status_code == 404
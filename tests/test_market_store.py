@@ -0,0 +1,194 @@
+"""
+Tests pour le stockage local des séries boursières.
+"""
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.extensions import cache
+from app.services import market_store, stock_api_service
+from app.services.market_store import MarketDataStore
+from app.services.stock_api_service import StockAPIService
+
+
+def _bars(start, periods, freq='D', tz=None, close=None):
+    dates = pd.date_range(start, periods=periods, freq=freq, tz=tz)
+    close = np.arange(periods, dtype=float) + 100 if close is None else close
+    return pd.DataFrame({'Date': dates, 'Open': close, 'High': close + 1, 'Low': close - 1,
+                         'Close': close, 'Volume': np.arange(periods) * 10})
+
+
+class _Yahoo:
+    """yf.download simulé : historique quotidien jusqu'à aujourd'hui."""
+
+    def __init__(self):
+        today = pd.Timestamp.now(tz='UTC').tz_convert(None).normalize()
+        self.history = _bars(today - pd.Timedelta(days=399), 400).set_index('Date')
+        self.calls = []
+
+    def __call__(self, tickers, interval, progress, timeout, period=None, start=None, group_by=None):
+        self.calls.append({'period': period, 'start': start})
+        if start is not None:
+            frame = self.history[self.history.index >= pd.Timestamp(start)]
+        else:
+            frame = self.history[self.history.index > self.history.index[-1] - pd.DateOffset(years=1)]
+        if isinstance(tickers, list):
+            # Téléchargement groupé : colonnes (symbole, champ), symboles inconnus absents
+            return pd.concat({t: frame for t in tickers if t in ('AAPL', 'MSFT')}, axis=1)
+        return frame.copy()
+
+
+@pytest.fixture
+def yahoo(app, tmp_path, monkeypatch):
+    app.config['MARKET_STORE_DIR'] = str(tmp_path)
+    fake = _Yahoo()
+    monkeypatch.setattr(stock_api_service.yf, 'download', fake)
+    with app.app_context():
+        yield fake
+
+
+class TestMarketDataStore:
+    """Partitions mensuelles, fusion et lecture par plage."""
+
+    def test_partitions_and_merge(self, tmp_path):
+        store = MarketDataStore(str(tmp_path))
+        assert store.write('yahoo', 'AAPL', '1d', _bars('2024-01-20', 20)) == 20
+        assert [(y, m) for y, m, _ in store.partitions('yahoo', 'AAPL', '1d')] == [(2024, 1), (2024, 2)]
+        assert (tmp_path / 'yahoo' / 'AAPL' / '1d' / '2024' / '02.parquet').exists()
+
+        # Les barres déjà présentes sont remplacées (dernière barre révisée)
+        revised = _bars('2024-02-07', 3, close=np.array([1.0, 2.0, 3.0]))
+        assert store.write('yahoo', 'AAPL', '1d', revised) == 1
+        df = store.read('yahoo', 'AAPL', '1d')
+        assert len(df) == 21
+        assert df['Date'].is_unique and df['Date'].is_monotonic_increasing
+        assert df['Close'].tail(3).tolist() == [1.0, 2.0, 3.0]
+        assert store.last_timestamp('yahoo', 'AAPL', '1d') == pd.Timestamp('2024-02-09')
+
+    def test_range_reads(self, tmp_path):
+        store = MarketDataStore(str(tmp_path))
+        store.write('yahoo', 'AAPL', '1d', _bars('2024-01-01', 90))
+        df = store.read('yahoo', 'AAPL', '1d', start='2024-02-10', end='2024-02-12')
+        assert df['Date'].dt.day.tolist() == [10, 11, 12]
+        assert len(store.read('yahoo', 'AAPL', '1d', last=5)) == 5
+        assert store.read('yahoo', 'AAPL', '1d', end='2023-01-01').empty
+        assert store.read('yahoo', 'MSFT', '1d') is None
+
+    def test_timezone_aware_intraday(self, tmp_path):
+        store = MarketDataStore(str(tmp_path))
+        store.write('yahoo', 'AAPL', '1h', _bars('2024-01-31 15:00', 4, freq='h', tz='America/New_York'))
+        df = store.read('yahoo', 'AAPL', '1h', start='2024-01-31 17:00')
+        assert len(df) == 2
+        assert str(df['Date'].dt.tz) == 'America/New_York'
+
+    @pytest.mark.skipif(market_store.fcntl is None, reason="fcntl indisponible")
+    def test_write_waits_for_other_process(self, tmp_path):
+        """Un autre processus qui écrit la série (verrou du fichier .lock) bloque l'écriture."""
+        store = MarketDataStore(str(tmp_path))
+        store.write('yahoo', 'AAPL', '1d', _bars('2024-01-01', 5))
+        lock_path = tmp_path / 'yahoo' / 'AAPL' / '1d' / '.lock'
+        with open(lock_path, 'a') as fh:
+            market_store.fcntl.flock(fh, market_store.fcntl.LOCK_EX)
+            writer = threading.Thread(target=store.write, args=('yahoo', 'AAPL', '1d', _bars('2024-01-06', 5)))
+            writer.start()
+            writer.join(0.3)
+            assert writer.is_alive()
+            market_store.fcntl.flock(fh, market_store.fcntl.LOCK_UN)
+        writer.join(5)
+        assert len(store.read('yahoo', 'AAPL', '1d')) == 10
+
+    def test_concurrent_writers_keep_all_bars(self, tmp_path):
+        """Deux instances (comme deux workers) écrivant le même mois ne perdent aucune barre."""
+        stores = [MarketDataStore(str(tmp_path)) for _ in range(2)]
+        days = pd.date_range('2024-03-01', periods=30, freq='D')
+
+        def write(store, offset):
+            for day in days[offset::2]:
+                store.write('yahoo', 'AAPL', '1d', _bars(day, 1))
+
+        threads = [threading.Thread(target=write, args=(store, i)) for i, store in enumerate(stores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(stores[0].read('yahoo', 'AAPL', '1d')) == 30
+
+    def test_rejects_path_components(self, tmp_path):
+        store = MarketDataStore(str(tmp_path))
+        with pytest.raises(ValueError):
+            store.write('yahoo', '..', '1d', _bars('2024-01-01', 2))
+
+
+class TestIncrementalFetch:
+    """Le service ne télécharge que la fin de la série."""
+
+    def test_tail_only_after_first_fetch(self, yahoo):
+        service = StockAPIService()
+        first = service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        assert yahoo.calls[-1] == {'period': '1y', 'start': None}
+
+        second = service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        since = yahoo.calls[-1]['start']
+        assert since == yahoo.history.index[-1].strftime('%Y-%m-%d')
+        pd.testing.assert_frame_equal(first, second)
+        assert second['Date'].is_unique
+
+    def test_full_window_when_store_is_too_short(self, yahoo, tmp_path):
+        MarketDataStore(str(tmp_path)).write('yahoo', 'AAPL', '1d', _bars(yahoo.history.index[-3], 3))
+        df = StockAPIService().fetch_stock_data('yahoo', 'AAPL', '1d')
+        assert yahoo.calls[-1]['period'] == '1y'
+        assert len(df) == 365
+
+    def test_covered_range_is_read_from_disk(self, yahoo):
+        service = StockAPIService()
+        service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        start, end = yahoo.history.index[-60], yahoo.history.index[-30]
+        df = service.fetch_stock_data('yahoo', 'AAPL', '1d', start=start, end=end)
+        assert len(yahoo.calls) == 1
+        assert (df['Date'].iloc[0], df['Date'].iloc[-1], len(df)) == (start, end, 31)
+        assert len(service.stored_data('yahoo', 'aapl', start=start, end=end)) == 31
+
+
+class TestFetchMany:
+    """Plusieurs symboles : appel groupé ou parallèle, échecs partiels."""
+
+    def test_yahoo_single_batch_download(self, yahoo):
+        cache.clear()
+        service = StockAPIService(cache=cache)
+        result = service.fetch_many('yahoo', ['aapl', 'MSFT', 'NOPE', '$$$', 'AAPL'], '1d')
+        assert len(yahoo.calls) == 1
+        assert sorted(result['data']) == ['AAPL', 'MSFT']
+        assert sorted(result['errors']) == ['$$$', 'NOPE']
+        assert len(result['data']['MSFT']) == 365
+
+        # Caches par symbole alimentés
+        service.fetch_stock_data('yahoo', 'MSFT', '1d')
+        assert len(yahoo.calls) == 1
+
+        # Lot suivant : seulement la fin des séries stockées
+        cache.clear()
+        result = service.fetch_many('yahoo', ['AAPL', 'MSFT'], '1d')
+        assert yahoo.calls[-1]['start'] == yahoo.history.index[-1].strftime('%Y-%m-%d')
+        assert len(result['data']['AAPL']) == 365
+
+    def test_bounded_concurrency_and_partial_failures(self, yahoo, monkeypatch):
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def fake_fetch(self, symbol, interval=None, api_key=None, **kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            if symbol == 'BAD':
+                raise stock_api_service.StockAPIError("Aucune donnée retournée par Alpha Vantage")
+            return _bars('2024-01-01', 5).rename(columns={'Date': 'timestamp'})
+
+        monkeypatch.setattr(StockAPIService, '_fetch_alpha_vantage', fake_fetch)
+        monkeypatch.setitem(stock_api_service.API_QUOTAS['alpha_vantage'], 'requests_per_minute', 100)
+        result = StockAPIService().fetch_many('alpha_vantage', ['IBM', 'BAD', 'MSFT', 'AAPL'], api_key='DEMO')
+        assert sorted(result['data']) == ['AAPL', 'IBM', 'MSFT']
+        assert list(result['errors']) == ['BAD']
+        assert peak[0] == stock_api_service.API_QUOTAS['alpha_vantage']['max_concurrency']
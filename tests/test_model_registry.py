@@ -0,0 +1,142 @@
+"""
+Tests pour le registre des modèles ML.
+"""
+import hashlib
+import os
+import pytest
+import numpy as np
+import joblib
+from sklearn.linear_model import LinearRegression
+from app.services.model_registry import ModelRegistry
+
+
+def _write_model(path, feature_columns=('f1', 'f2')):
+    model = LinearRegression().fit(np.random.randn(20, len(feature_columns)), np.random.randn(20))
+    joblib.dump({'model': model, 'feature_columns': list(feature_columns)}, path)
+    return path
+
+
+class TestModelRegistry:
+    """Tests pour ModelRegistry."""
+
+    def test_loads_once(self, tmp_path):
+        """Le modèle n'est désérialisé qu'une seule fois."""
+        path = _write_model(tmp_path / 'a.joblib')
+        registry = ModelRegistry()
+
+        first = registry.get(str(path))
+        second = registry.get(str(path))
+
+        assert first.model is second.model
+        assert first.feature_cols == ['f1', 'f2']
+        stats = registry.stats()
+        assert stats['loads'] == 1
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_reload_when_file_changes(self, tmp_path):
+        """Un fichier modifié sur disque est rechargé."""
+        path = _write_model(tmp_path / 'a.joblib')
+        registry = ModelRegistry()
+        first = registry.get(str(path))
+
+        _write_model(path, feature_columns=('f1', 'f2', 'f3'))
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        second = registry.get(str(path))
+        assert second.model is not first.model
+        assert second.feature_cols == ['f1', 'f2', 'f3']
+        assert registry.stats()['loads'] == 2
+
+    def test_lru_eviction(self, tmp_path):
+        """Le modèle le moins récemment utilisé est retiré."""
+        paths = [str(_write_model(tmp_path / f'm{i}.joblib')) for i in range(3)]
+        registry = ModelRegistry(max_entries=2)
+        for path in paths:
+            registry.get(path)
+
+        stats = registry.stats()
+        assert stats['evictions'] == 1
+        assert stats['entries'] == ['m1.joblib', 'm2.joblib']
+
+    def test_sha256_sidecar(self, tmp_path):
+        """L'empreinte `.sha256` est vérifiée au chargement."""
+        path = _write_model(tmp_path / 'model.joblib')
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        (tmp_path / 'model.sha256').write_text(digest)
+
+        loaded = ModelRegistry().get(str(path))
+        assert loaded.metadata['sha256'] == digest
+
+        (tmp_path / 'model.sha256').write_text('0' * 64)
+        with pytest.raises(ValueError, match="SHA-256"):
+            ModelRegistry().get(str(path))
+
+    def test_invalid_artifact(self, tmp_path):
+        """Un artifact invalide lève une erreur et n'est pas mis en cache."""
+        path = tmp_path / 'bad.joblib'
+        joblib.dump({'feature_columns': ['f1']}, path)
+        registry = ModelRegistry()
+
+        with pytest.raises(ValueError, match="ne contient pas de clé 'model'"):
+            registry.get(str(path))
+        assert registry.stats()['load_errors'] == 1
+        assert registry.stats()['entries'] == []
+
+    def test_missing_file(self, tmp_path):
+        """Un chemin inexistant lève FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            ModelRegistry().get(str(tmp_path / 'absent.joblib'))
+
+    def test_list_models(self, tmp_path):
+        """Le listing ne contient que les artifacts .joblib et suit le contenu du dossier."""
+        _write_model(tmp_path / 'a.joblib')
+        (tmp_path / 'a.sha256').write_text('x')
+        registry = ModelRegistry()
+
+        assert registry.list_models(str(tmp_path)) == {'a.joblib': 'Modèle: a'}
+
+        _write_model(tmp_path / 'b.joblib')
+        stat = os.stat(tmp_path)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert set(registry.list_models(str(tmp_path))) == {'a.joblib', 'b.joblib'}
+
+    def test_mmap_mode(self, tmp_path):
+        """Avec mmap_mode, les tableaux d'un artifact non compressé sont projetés en mémoire."""
+        path = _write_model(tmp_path / 'a.joblib')
+        loaded = ModelRegistry(mmap_mode='r').get(str(path))
+        assert isinstance(loaded.model.coef_, np.memmap)
+        assert not isinstance(ModelRegistry().get(str(path)).model.coef_, np.memmap)
+
+
+class TestModelPreload:
+    """Tests pour le préchargement des modèles avant fork."""
+
+    def test_preload_all_models(self, tmp_path):
+        """Tous les modèles sont chargés, le registre s'agrandit si nécessaire."""
+        for i in range(3):
+            _write_model(tmp_path / f'm{i}.joblib')
+        registry = ModelRegistry(max_entries=2)
+
+        errors = registry.preload(str(tmp_path), freeze=False)
+
+        assert errors == {}
+        stats = registry.stats()
+        assert stats['preloaded'] == 3
+        assert stats['max_entries'] == 3
+        assert stats['evictions'] == 0
+
+        registry.get(str(tmp_path / 'm0.joblib'))
+        assert registry.stats()['loads'] == 3
+
+    def test_preload_reports_errors(self, tmp_path):
+        """Un artifact invalide n'empêche pas le préchargement des autres."""
+        _write_model(tmp_path / 'good.joblib')
+        joblib.dump({'feature_columns': ['f1']}, tmp_path / 'bad.joblib')
+        registry = ModelRegistry()
+
+        errors = registry.preload(str(tmp_path), freeze=False)
+
+        assert list(errors) == ['bad.joblib']
+        assert registry.stats()['entries'] == ['good.joblib']
@@ -8,7 +8,7 @@ import joblib
 import tempfile
 import os
 from sklearn.ensemble import RandomForestRegressor
-from app.blueprints.previsions.routes import get_available_models
+from app.blueprints.previsions.routes import generate_forecast_plot, get_available_models
 from app.utils import (
     normalize_feature_columns,
     validate_model_artifact,
@@ -249,3 +249,45 @@ class TestForecastIntegration:
         # Le modèle devrait être compatible (ou au moins partiellement)
         assert isinstance(is_compatible, bool)
 
+
+
+class TestForecastPlot:
+    """Tests pour generate_forecast_plot."""
+
+    def test_result_frames_are_not_modified(self):
+        """Le tracé ne remplace pas l'index des DataFrames (résultat éventuellement en cache)."""
+        historical = pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=['2024-01-01', '2024-01-02', '2024-01-03'])
+        forecast = pd.DataFrame({'Close': [4.0], 'lower_bound': [3.5], 'upper_bound': [4.5]},
+                                index=['2024-01-04'])
+        historical_index, forecast_index = historical.index.copy(), forecast.index.copy()
+
+        assert generate_forecast_plot(historical, forecast, 'Close', 'close_price')
+        assert historical.index.equals(historical_index) and historical.index.dtype == object
+        assert forecast.index.equals(forecast_index) and forecast.index.dtype == object
+
+
+class TestForecastJobEndpoint:
+    """Tests pour le suivi des prévisions en arrière-plan."""
+    
+    def test_unknown_job(self, client):
+        """Un job inconnu renvoie 404."""
+        response = client.get('/previsions/jobs/inconnu')
+        assert response.status_code == 404
+        assert response.get_json()['status'] == 'not_found'
+    
+    def test_pending_and_failed_job(self, client):
+        """Un job en attente renvoie 202, un job en échec renvoie le message d'erreur."""
+        from app import utils as _utils
+        jobid = 'test-job-endpoint'
+        try:
+            _utils.write_job_pending(jobid, {'forecast_steps': 20})
+            response = client.get(f'/previsions/jobs/{jobid}')
+            assert response.status_code == 202
+            assert response.get_json()['status'] == 'pending'
+            
+            _utils.write_job_error(jobid, 'modèle invalide')
+            response = client.get(f'/previsions/jobs/{jobid}')
+            assert response.status_code == 500
+            assert 'modèle invalide' in response.get_json()['message']
+        finally:
+            _utils.delete_job(jobid)
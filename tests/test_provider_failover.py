@@ -0,0 +1,152 @@
+"""
+Tests pour le basculement entre fournisseurs et le disjoncteur.
+"""
+import threading
+import time
+import pandas as pd
+import pytest
+from app.services import provider_health, rate_limiter
+from app.services.provider_health import ProviderHealth
+from app.services.stock_api_service import (
+    ProviderError, ProviderUnavailable, StockAPIError, StockAPIService
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProviderHealth:
+    """Ouverture sur taux d'erreur, essai unique après le délai."""
+
+    def test_breaker_cycle(self, monkeypatch):
+        clock = _Clock()
+        monkeypatch.setattr(provider_health.time, 'monotonic', clock)
+        health = ProviderHealth(error_rate=0.5, min_calls=4, cooldown=30)
+        for ok in (True, False, True, False):
+            assert health.allow('yahoo')
+            health.record('yahoo', 0.1, ok)
+        assert health.stats()['yahoo']['state'] == 'open'
+        assert not health.available('yahoo') and not health.allow('yahoo')
+
+        clock.now += 30
+        assert health.available('yahoo')
+        assert health.allow('yahoo')
+        # Un seul appel d'essai à la fois
+        assert not health.allow('yahoo')
+        health.record('yahoo', 0.2, False)
+        assert health.stats()['yahoo']['state'] == 'open'
+
+        clock.now += 30
+        assert health.allow('yahoo')
+        health.record('yahoo', 0.2, True)
+        stats = health.stats()['yahoo']
+        assert (stats['state'], stats['calls'], stats['errors'], stats['rejected']) == ('closed', 6, 3, 2)
+
+    def test_latency_percentile(self):
+        health = ProviderHealth()
+        health.record('iex_cloud', 1.0, True)
+        assert health.latency_percentile('iex_cloud', 0.95) is None
+        for latency in (0.1, 0.2, 0.3, 0.4):
+            health.record('iex_cloud', latency, True)
+        assert health.latency_percentile('iex_cloud', 0.5) == pytest.approx(0.3)
+
+
+class _Providers:
+    """`_call_api` simulé : comportement par fournisseur."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.behaviour = {}
+
+    def __call__(self, service, api_name, symbol, interval, api_key, **kwargs):
+        self.calls.append((api_name, interval))
+        behaviour = self.behaviour.get(api_name, 'ok')
+        if behaviour == 'slow':
+            self.release.wait(5)
+        elif behaviour == 'error':
+            raise ProviderError(f"{api_name} indisponible")
+        elif behaviour == 'unknown':
+            raise StockAPIError(f"Aucune donnée retournée par {api_name}")
+        return pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=3), 'Close': [1.0, 2.0, 3.0],
+                             'Source': [api_name] * 3})
+
+
+@pytest.fixture
+def providers(app, monkeypatch):
+    app.config.update(MARKET_STORE_ENABLED=False, STOCK_API_HEDGE_DELAY=0.1,
+                      STOCK_API_FAILOVER_ORDER='yahoo,alpha_vantage,iex_cloud')
+    monkeypatch.setenv('ALPHAVANTAGE_KEY', 'DEMOKEY')
+    monkeypatch.delenv('IEX_CLOUD_API_KEY', raising=False)
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    fake = _Providers()
+    monkeypatch.setattr(StockAPIService, '_call_api', lambda self, *args, **kwargs: fake(self, *args, **kwargs))
+    with app.app_context():
+        yield fake
+    fake.release.set()
+
+
+class TestFailover:
+    """Requête de couverture, basculement sur erreur, fournisseurs ignorés."""
+
+    def test_hedged_request_wins(self, providers):
+        providers.behaviour['yahoo'] = 'slow'
+        service = StockAPIService()
+        started = time.perf_counter()
+        df, provider = service.fetch_with_failover('yahoo', 'AAPL', '1d')
+        assert time.perf_counter() - started < 2
+        assert provider == 'alpha_vantage'
+        assert df['Source'].iloc[0] == 'alpha_vantage'
+        # Intervalle équivalent ; IEX n'a pas de clé configurée
+        assert providers.calls == [('yahoo', '1d'), ('alpha_vantage', 'daily')]
+        stats = service.stats()
+        assert (stats['hedged_requests'], stats['failovers']) == (1, 1)
+
+    def test_error_fails_over_without_waiting(self, providers, app):
+        app.config['STOCK_API_HEDGE_DELAY'] = 30
+        providers.behaviour['yahoo'] = 'error'
+        started = time.perf_counter()
+        _, provider = StockAPIService().fetch_with_failover('yahoo', 'AAPL', '1wk')
+        assert time.perf_counter() - started < 2
+        assert provider == 'alpha_vantage'
+        assert providers.calls[-1] == ('alpha_vantage', 'weekly')
+
+    def test_unhealthy_provider_is_skipped(self, providers, app):
+        app.config['STOCK_API_FAILOVER'] = False
+        providers.behaviour['yahoo'] = 'error'
+        service = StockAPIService()
+        for _ in range(5):
+            with pytest.raises(StockAPIError):
+                service.fetch_with_failover('yahoo', 'AAPL')
+        with pytest.raises(ProviderUnavailable):
+            service.fetch_stock_data('yahoo', 'AAPL')
+        assert len(providers.calls) == 5
+
+        app.config['STOCK_API_FAILOVER'] = True
+        _, provider = service.fetch_with_failover('yahoo', 'AAPL')
+        assert provider == 'alpha_vantage'
+        assert len(providers.calls) == 6
+        assert service.stats()['providers']['yahoo']['state'] == 'open'
+
+    def test_no_equivalent_interval(self, providers):
+        providers.behaviour['yahoo'] = 'error'
+        with pytest.raises(StockAPIError, match='yahoo indisponible'):
+            StockAPIService().fetch_with_failover('yahoo', 'AAPL', '2m')
+        assert providers.calls == [('yahoo', '2m')]
+
+    def test_request_errors_do_not_open_breaker(self, providers, app):
+        app.config['STOCK_API_FAILOVER'] = False
+        providers.behaviour['yahoo'] = 'unknown'
+        service = StockAPIService()
+        for i in range(10):
+            with pytest.raises(StockAPIError, match='Aucune donnée'):
+                service.fetch_stock_data('yahoo', f'NOPE{i}')
+        stats = service.stats()['providers']['yahoo']
+        assert (stats['state'], stats['errors'], stats['calls']) == ('closed', 0, 10)
+        providers.behaviour['yahoo'] = 'ok'
+        assert not service.fetch_stock_data('yahoo', 'AAPL').empty
@@ -0,0 +1,96 @@
+"""
+Tests pour les sessions HTTP partagées des APIs boursières.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+import requests
+from app.services import stock_api_service
+from app.services.provider_http import close_sessions, get_provider_session, provider_get
+from app.services.stock_api_service import StockAPIService
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        server.clients.add(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('STOCK_API_BACKOFF', '0')
+    monkeypatch.setenv('STOCK_API_RETRIES', '2')
+    close_sessions()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.requests, httpd.clients, httpd.statuses = 0, set(), []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    close_sessions()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/query"
+
+
+class TestProviderSessions:
+    """Connexions réutilisées, nouvelles tentatives bornées."""
+
+    def test_connections_are_reused(self, server):
+        for _ in range(3):
+            assert provider_get('alpha_vantage', _url(server)).status_code == 200
+        assert server.requests == 3
+        assert len(server.clients) == 1
+        assert get_provider_session('alpha_vantage') is get_provider_session('alpha_vantage')
+        assert get_provider_session('alpha_vantage') is not get_provider_session('iex_cloud')
+
+    def test_retries_server_errors(self, server):
+        server.statuses = [503, 502]
+        assert provider_get('iex_cloud', _url(server)).status_code == 200
+        assert server.requests == 3
+
+        # Au-delà des tentatives, la dernière réponse est retournée
+        server.statuses = [500, 500, 500, 500]
+        assert provider_get('iex_cloud', _url(server)).status_code == 500
+        assert server.requests == 6
+
+    def test_client_errors_are_not_retried(self, server):
+        server.statuses = [401]
+        assert provider_get('iex_cloud', _url(server)).status_code == 401
+        assert server.requests == 1
+
+    def test_connection_refused(self, server, monkeypatch):
+        monkeypatch.setenv('STOCK_API_CONNECT_TIMEOUT', '1')
+        url = _url(server)
+        server.shutdown()
+        server.server_close()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            provider_get('alpha_vantage', url)
+
+
+class TestAlphaVantageResponse:
+    """Réponse CSV d'Alpha Vantage."""
+
+    def test_csv_is_parsed(self, monkeypatch):
+        body = ("timestamp,open,high,low,close,volume\n"
+                "2024-01-03,10.0,11.0,9.5,10.5,1000\n"
+                "2024-01-02,9.0,10.0,8.5,9.5,900\n")
+        response = SimpleNamespace(status_code=200, text=body)
+        monkeypatch.setattr(stock_api_service, 'provider_get', lambda *args, **kwargs: response)
+        df = StockAPIService()._fetch_alpha_vantage('IBM', 'daily', api_key='DEMO')
+        assert df['close'].tolist() == [10.5, 9.5]
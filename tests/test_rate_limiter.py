@@ -0,0 +1,118 @@
+"""
+Tests pour le rate limiting par seaux à jetons.
+"""
+import pytest
+from app.services import rate_limiter
+from app.services.rate_limiter import MemoryRateLimiter, RedisRateLimiter, get_rate_limiter
+from app.services.stock_api_service import RateLimitExceeded, StockAPIService
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """Limiteurs neufs : les seaux ne dépendent pas des autres tests."""
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+
+
+class TestMemoryRateLimiter:
+    """Rafale, recharge et oubli des seaux pleins."""
+
+    def test_burst_then_refill(self, clock):
+        limiter = MemoryRateLimiter()
+        results = [limiter.acquire('k', capacity=3, rate=0.5) for _ in range(4)]
+        assert [r['allowed'] for r in results] == [True, True, True, False]
+        assert results[2]['remaining'] == 0
+        assert results[3]['retry_after'] == pytest.approx(2.0)
+
+        clock.now += 2
+        assert limiter.acquire('k', 3, 0.5)['allowed']
+        clock.now += 100
+        assert limiter.remaining('k', 3, 0.5) == {'allowed': True, 'remaining': 3, 'limit': 3, 'retry_after': 0.0}
+
+    def test_full_buckets_are_forgotten(self, clock):
+        limiter = MemoryRateLimiter(sweep_interval=10)
+        for i in range(100):
+            limiter.acquire(f'session:{i}', capacity=10, rate=1)
+        limiter.remaining('session:new', 10, 1)
+        assert len(limiter) == 100
+        clock.now += 10
+        limiter.acquire('k', 10, 1)
+        assert len(limiter) == 1
+
+
+class _Script:
+    def __init__(self, error=None):
+        self.calls, self.error = [], error
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        if self.error:
+            raise self.error
+        return [1, '4.5', '0']
+
+
+class _Client:
+    def __init__(self, script):
+        self.script = script
+
+    def register_script(self, source):
+        assert 'TIME' in source
+        return self.script
+
+
+class TestRedisRateLimiter:
+    """Script Lua appelé par seau ; repli sur la mémoire si Redis échoue."""
+
+    def test_script_result(self):
+        script = _Script()
+        result = RedisRateLimiter(client=_Client(script)).acquire('iex:abc:minute', 100, 100 / 60)
+        assert script.calls == [(['ratelimit:iex:abc:minute'], [100, 100 / 60, 1])]
+        assert result == {'allowed': True, 'remaining': 4, 'limit': 100, 'retry_after': 0.0}
+
+    def test_falls_back_to_memory(self):
+        limiter = RedisRateLimiter(client=_Client(_Script(ConnectionError('down'))))
+        assert [limiter.acquire('k', 2, 1)['allowed'] for _ in range(3)] == [True, True, False]
+
+    def test_unreachable_redis_uses_memory(self, limiters):
+        limiter = get_rate_limiter({'RATE_LIMIT_BACKEND': 'redis', 'RATE_LIMIT_URL': 'redis://localhost:1/0'})
+        assert isinstance(limiter, MemoryRateLimiter)
+
+
+class TestStockAPIRateLimit:
+    """Budget par fournisseur et par clé API, et par session pour l'upload."""
+
+    def test_budget_per_api_key(self, app, limiters):
+        service = StockAPIService()
+        with app.app_context():
+            for _ in range(5):
+                service._check_rate_limit('alpha_vantage', 'KEY1')
+            with pytest.raises(RateLimitExceeded) as excinfo:
+                service._check_rate_limit('alpha_vantage', 'KEY1')
+            assert excinfo.value.retry_after == pytest.approx(12, abs=0.5)
+            assert service._check_rate_limit('alpha_vantage', 'KEY2')
+
+            status = service.rate_limit_status('alpha_vantage', 'KEY1')
+            assert status['minute']['remaining'] == 0
+            assert status['day'] == {'remaining': 495, 'limit': 500, 'retry_after': 0.0}
+            assert 'day' not in service.rate_limit_status('yahoo')
+
+    def test_upload_session_limit(self, client, limiters):
+        for _ in range(10):
+            assert client.post('/upload/api_fetch', json={}).status_code == 400
+        response = client.post('/upload/api_fetch', json={})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
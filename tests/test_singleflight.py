@@ -0,0 +1,114 @@
+"""
+Tests pour le regroupement des appels identiques simultanés.
+"""
+import threading
+import time
+import pandas as pd
+from cachelib import SimpleCache
+from app.extensions import cache
+from app.services import stock_api_service
+from app.services.singleflight import LOCK_PREFIX, SingleFlight
+from app.services.stock_api_service import StockAPIService
+
+
+def _concurrently(fn, count=8):
+    results, barrier = [], threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        results.append(fn())
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class _Slow:
+    def __init__(self, value='ok', delay=0.2):
+        self.value, self.delay, self.calls = value, delay, 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+class TestSingleFlight:
+    """Dans le processus et entre processus (verrou dans le cache)."""
+
+    def test_threads_share_one_call(self):
+        flight, slow = SingleFlight(cache=SimpleCache()), _Slow()
+        results = _concurrently(lambda: flight.do('k', slow))
+        assert slow.calls == 1
+        assert [r[0] for r in results] == ['ok'] * 8
+        assert sorted(r[1] for r in results) == [False] + [True] * 7
+        assert flight.stats()['coalesced'] == 7
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight(cache=SimpleCache())
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError('fournisseur indisponible')
+
+        errors = []
+        _concurrently(lambda: errors.append(_catch(lambda: flight.do('k', fail))), count=4)
+        assert [str(e) for e in errors] == ['fournisseur indisponible'] * 4
+        assert flight.stats()['in_flight'] == 0
+
+    def test_other_process_holds_lock(self):
+        backend = SimpleCache()
+        flight, slow = SingleFlight(cache=backend, wait_interval=0.01), _Slow()
+        backend.add(LOCK_PREFIX + 'k', 1234, timeout=60)
+
+        # Valeur précédente servie sans attendre
+        assert flight.do('k', slow, lookup=lambda: None, previous=lambda: 'ancienne') == ('ancienne', True)
+
+        # Sinon attente du résultat écrit par l'autre processus
+        threading.Timer(0.05, lambda: backend.set('k', 'nouvelle')).start()
+        assert flight.do('k', slow, lookup=lambda: backend.get('k')) == ('nouvelle', True)
+        assert slow.calls == 0
+
+        # Verrou libéré sans résultat : appel par ce processus
+        backend.delete('k')
+        threading.Timer(0.05, lambda: backend.delete(LOCK_PREFIX + 'k')).start()
+        assert flight.do('k', slow, lookup=lambda: backend.get('k')) == ('ok', False)
+        assert backend.get(LOCK_PREFIX + 'k') is None
+
+
+def _catch(fn):
+    try:
+        fn()
+    except Exception as e:
+        return e
+
+
+class TestStockAPICoalescing:
+    """Une entrée expirée ne déclenche qu'un appel au fournisseur."""
+
+    def test_concurrent_misses(self, app, monkeypatch):
+        app.config['MARKET_STORE_ENABLED'] = False
+        calls = []
+
+        def download(symbol, **kwargs):
+            calls.append(symbol)
+            time.sleep(0.2)
+            return pd.DataFrame({'Close': [1.0, 2.0]},
+                                index=pd.DatetimeIndex(['2024-01-02', '2024-01-03'], name='Date'))
+
+        monkeypatch.setattr(stock_api_service.yf, 'download', download)
+        with app.app_context():
+            cache.clear()
+            service = StockAPIService(cache=cache)
+
+            def fetch():
+                with app.app_context():
+                    return service.fetch_stock_data('yahoo', 'AAPL', '1d')
+
+            results = _concurrently(fetch)
+        assert calls == ['AAPL']
+        assert all(len(df) == 2 for df in results)
+        assert service.stats()['singleflight']['coalesced'] == 7
@@ -0,0 +1,122 @@
+"""
+Tests pour le cache des APIs boursières (données périmées servies pendant le rafraîchissement).
+"""
+import time
+import pandas as pd
+import pytest
+from app.extensions import cache
+from app.services import stock_api_service
+from app.services.stock_api_service import API_QUOTAS, StockAPIService
+
+
+class _Download:
+    """yf.download simulé et lent ; la valeur change à chaque appel."""
+
+    def __init__(self, delay=0.3):
+        self.delay, self.calls = delay, 0
+
+    def __call__(self, symbol, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return pd.DataFrame({'Close': [float(self.calls)]},
+                            index=pd.DatetimeIndex(['2024-01-02'], name='Date'))
+
+
+@pytest.fixture
+def service(app, monkeypatch):
+    app.config['MARKET_STORE_ENABLED'] = False
+    download = _Download()
+    monkeypatch.setattr(stock_api_service.yf, 'download', download)
+    with app.app_context():
+        cache.clear()
+        service = StockAPIService(cache=cache)
+        service.download = download
+        yield service
+
+
+def _age_entry(service, key, seconds):
+    entry = cache.get(key)
+    entry['fetched_at'] -= seconds
+    cache.set(key, entry)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+class TestStaleWhileRevalidate:
+    """Deux durées : fraîche, puis périmée mais servie."""
+
+    def test_stale_entry_is_served_then_refreshed(self, service):
+        key = service._get_cache_key('yahoo', 'AAPL', '1d')
+        assert service.fetch_stock_data('yahoo', 'AAPL', '1d')['Close'].iloc[0] == 1.0
+        _age_entry(service, key, API_QUOTAS['yahoo']['cache_timeout'] + 1)
+
+        started = time.perf_counter()
+        df = service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        assert time.perf_counter() - started < service.download.delay
+        assert df['Close'].iloc[0] == 1.0
+        assert service.stats()['stale_hits'] == 1
+
+        # Un seul rafraîchissement pour plusieurs lectures périmées
+        service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        assert _wait_for(lambda: service.stats()['refreshing'] == 0 and service.download.calls == 2)
+        assert service.download.calls == 2
+        assert service.fetch_stock_data('yahoo', 'AAPL', '1d')['Close'].iloc[0] == 2.0
+        assert service.stats()['fresh_hits'] == 1
+
+    def test_expired_entry_blocks(self, service):
+        key = service._get_cache_key('yahoo', 'AAPL', '1d')
+        service.fetch_stock_data('yahoo', 'AAPL', '1d')
+        quota = API_QUOTAS['yahoo']
+        cache.delete(key)  # Au-delà de cache_timeout + stale_timeout, l'entrée a expiré
+        assert service.fetch_stock_data('yahoo', 'AAPL', '1d')['Close'].iloc[0] == 2.0
+        assert service.stats()['misses'] == 2
+        assert quota['stale_timeout'] > quota['cache_timeout']
+
+
+class TestRefreshPopular:
+    """Rafraîchissement planifié des requêtes les plus demandées."""
+
+    def test_top_requests_near_expiry(self, service, monkeypatch):
+        for symbol, count in (('AAPL', 5), ('MSFT', 3), ('IBM', 1)):
+            for _ in range(count):
+                service.fetch_stock_data('yahoo', symbol, '1d')
+        fresh = API_QUOTAS['yahoo']['cache_timeout']
+        _age_entry(service, service._get_cache_key('yahoo', 'AAPL', '1d'), 0.9 * fresh)
+        _age_entry(service, service._get_cache_key('yahoo', 'IBM', '1d'), 0.9 * fresh)
+
+        scheduled = []
+        monkeypatch.setattr(service, 'schedule_refresh',
+                            lambda api_name, symbol, *args, **kwargs: scheduled.append(symbol) or object())
+        # MSFT est encore récent, IBM n'est pas parmi les 2 plus demandés
+        assert service.refresh_popular(top_n=2, ahead=0.8) == 1
+        assert scheduled == ['AAPL']
+        assert service.stats()['scheduled_refreshes'] == 1
+
+        # Les compteurs décroissent : seules les demandes récentes comptent
+        for _ in range(3):
+            service.refresh_popular(top_n=2, ahead=0.8)
+        assert service.stats()['tracked_requests'] == 0
+
+    def test_budget_reserved_for_users(self, service, monkeypatch):
+        """Une clé dont le budget passerait sous la réserve n'est pas rafraîchie."""
+        for symbol in ('IBM', 'MSFT'):
+            key = service._get_cache_key('alpha_vantage', symbol, 'daily')
+            service._track('alpha_vantage', symbol, 'daily', 'DEMO', {})
+            cache.set(key, {'data': pd.DataFrame(), 'fetched_at': time.time() - 2 * 3600})
+        monkeypatch.setattr(service, 'rate_limit_status', lambda api_name, api_key: {
+            'minute': {'remaining': 4, 'limit': 5, 'retry_after': 0.0},
+            'day': {'remaining': 300, 'limit': 500, 'retry_after': 0.0},
+        })
+        scheduled = []
+        monkeypatch.setattr(service, 'schedule_refresh',
+                            lambda api_name, symbol, *args, **kwargs: scheduled.append(symbol) or object())
+
+        # 4 appels restants sur 5 : un seul rafraîchissement laisse au moins 2,5 appels
+        assert service.refresh_popular(top_n=2, ahead=0.8, reserve=0.5) == 1
+        assert len(scheduled) == 1
+        assert service.stats()['skipped_refreshes'] == 1
@@ -0,0 +1,211 @@
+"""
+Tests pour le stockage des uploads adressé par contenu.
+"""
+import hashlib
+import os
+from io import BytesIO
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from flask import Flask, session
+from app.blueprints.upload import routes as upload_routes
+from app.extensions import db
+from app.models.data_file import DataFile
+from app.services.columnar_store import columnar_path
+from app.services.file_format import load_recorded_metadata
+from app.services.upload_store import UploadStore, accept_upload, current_upload_path, reuse_upload
+
+BODY = b'Date,Close,Volume\n2024-01-01,1.5,10\n2024-01-02,2.5,20\n'
+
+
+def _post(client, body, filename):
+    return client.post('/upload_file', data={'data_file': (BytesIO(body), filename)},
+                       content_type='multipart/form-data')
+
+
+class TestUploadStore:
+    """Objets, noms et résumés."""
+
+    def test_link_and_remove(self, tmp_path):
+        store = UploadStore(str(tmp_path))
+        src = tmp_path / 'incoming.csv'
+        src.write_bytes(BODY)
+        sha = hashlib.sha256(BODY).hexdigest()
+
+        name = store.link('a.csv', store.ingest(str(src), sha, 'csv'))
+        assert open(name, 'rb').read() == BODY
+        assert store.sha256_of(name) == sha
+        # Sans résumé, l'objet n'est pas réutilisable et part avec son nom
+        assert store.lookup(sha, 'csv') is None
+        store.remove(name)
+        assert not os.path.exists(store.object_path(sha, 'csv'))
+
+    def test_gc_keeps_only_referenced_objects(self, tmp_path):
+        store = UploadStore(str(tmp_path))
+        objects = {}
+        for body in (BODY, BODY + b'2024-01-03,3.5,30\n', BODY + b'2024-01-04,4.5,40\n'):
+            src = tmp_path / 'incoming.csv'
+            src.write_bytes(body)
+            sha = hashlib.sha256(body).hexdigest()
+            objects[sha] = store.ingest(str(src), sha, 'csv')
+            store.save_summary(sha, 'csv', {'sha256': sha})
+            open(objects[sha] + '.parquet', 'wb').close()
+        first, second, third = objects.values()
+
+        store.link('a.csv', first)
+        # Nouveau contenu sous le même nom : le premier objet n'a plus de nom
+        store.link('a.csv', second)
+        # Nom lié physiquement (pas de lien symbolique)
+        os.link(third, tmp_path / 'b.csv')
+
+        assert store.gc(now=os.path.getmtime(first) + 10) == 0
+        assert store.gc(min_age=0) == 1
+        remaining = sorted(os.listdir(store.objects_dir))
+        assert remaining == sorted(os.path.basename(p) + suffix for p in (second, third)
+                                   for suffix in ('', '.json', '.parquet'))
+
+
+class TestUploadDeduplication:
+    """Uploads identiques via /upload_file."""
+
+    def test_identical_upload_reuses_object(self, app, client, monkeypatch):
+        first = _post(client, BODY, 'a.csv')
+        assert first.status_code == 200, first.get_json()
+        assert 'deduplicated' not in first.get_json()
+
+        # Le second upload n'est ni analysé ni relu
+        monkeypatch.setattr(upload_routes, 'load_dataframe', lambda *a, **k: pytest.fail("relecture"))
+        monkeypatch.setattr(upload_routes, 'CLAMAV_AVAILABLE', True)
+        monkeypatch.setattr(upload_routes, 'clamd', SimpleNamespace(
+            ClamdNetworkSocket=lambda **k: pytest.fail("analyse antivirus")))
+        second = _post(client, BODY, 'b.csv')
+        payload = second.get_json()
+        assert second.status_code == 200, payload
+        assert payload['deduplicated'] is True
+        assert payload['sha256'] == hashlib.sha256(BODY).hexdigest()
+        assert payload['columns'] == first.get_json()['columns']
+        with client.session_transaction() as sess:
+            assert sess['current_file'] == 'b.csv'
+
+        folder = app.config['UPLOAD_FOLDER']
+        a, b = os.path.join(folder, 'a.csv'), os.path.join(folder, 'b.csv')
+        assert os.path.realpath(a) == os.path.realpath(b)
+        assert os.path.exists(columnar_path(b))
+        assert len([n for n in os.listdir(os.path.join(folder, '.objects')) if n.endswith('.csv')]) == 1
+
+    def test_new_content_relinks_name(self, app, client):
+        _post(client, BODY, 'a.csv')
+        changed = BODY + b'2024-01-03,3.5,30\n'
+        response = _post(client, changed, 'a.csv')
+        assert response.get_json()['sha256'] == hashlib.sha256(changed).hexdigest()
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], 'a.csv'), 'rb') as fh:
+            assert fh.read() == changed
+
+    def test_each_session_keeps_its_content(self, app, client):
+        """Deux utilisateurs qui uploadent `a.csv` lisent chacun leur contenu."""
+        other = app.test_client()
+        changed = BODY + b'2024-01-03,3.5,30\n'
+        assert _post(client, BODY, 'a.csv').status_code == 200
+        assert _post(other, changed, 'a.csv').status_code == 200
+        for user, body in ((client, BODY), (other, changed)):
+            with user.session_transaction() as sess:
+                state = dict(sess)
+            with app.test_request_context():
+                session.update(state)
+                with open(current_upload_path(), 'rb') as fh:
+                    assert fh.read() == body
+                assert current_upload_path('a.csv') == current_upload_path()
+
+    def test_failed_api_fetch_keeps_previous_upload(self, app, client, monkeypatch):
+        """Un échec avant `link` ne supprime pas l'upload déjà associé au nom."""
+        assert _post(client, BODY, 'yahoo_IBM_default.csv').status_code == 200
+        df = pd.DataFrame({'Date': ['2024-01-03'], 'Close': [3.5]})
+        monkeypatch.setattr(app, 'stock_api_service', SimpleNamespace(
+            fetch_with_failover=lambda **kwargs: (df, 'yahoo')), raising=False)
+
+        def failing_hash(path):
+            raise OSError("disque plein")
+
+        monkeypatch.setattr(upload_routes, 'file_sha256', failing_hash)
+        response = client.post('/upload/api_fetch', json={'source': 'yahoo', 'symbol': 'IBM'})
+        assert response.status_code == 500
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], 'yahoo_IBM_default.csv'), 'rb') as fh:
+            assert fh.read() == BODY
+
+    def test_rejected_content_is_not_kept(self, app, client):
+        response = _post(client, b'Date,Close\n', 'empty.csv')
+        assert response.status_code == 400
+        folder = app.config['UPLOAD_FOLDER']
+        assert not os.path.lexists(os.path.join(folder, 'empty.csv'))
+        assert not os.listdir(os.path.join(folder, '.objects'))
+
+
+@pytest.fixture
+def db_app():
+    """Application minimale avec une base SQLite en mémoire."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        DataFile.__table__.create(db.engine)
+        yield app
+
+
+class TestNameMapping:
+    """Correspondance nom -> empreinte dans data_files."""
+
+    def test_names_share_hash(self, db_app, tmp_path):
+        store = UploadStore(str(tmp_path))
+        src = tmp_path / 'incoming.csv'
+        src.write_bytes(BODY)
+        sha = hashlib.sha256(BODY).hexdigest()
+        path = store.link('a.csv', store.ingest(str(src), sha, 'csv'))
+
+        summary = accept_upload(store, path, pd.read_csv(path), sha256=sha, user='alice')
+        assert summary['rows'] == 2
+        assert store.lookup(sha, 'csv')['csv_format']['delimiter'] == ','
+        reuse_upload(store, 'b.csv', sha, summary, user='bob')
+
+        first, second = DataFile.get_by_filename('a.csv'), DataFile.get_by_filename('b.csv')
+        assert first.metadata_dict()['sha256'] == second.metadata_dict()['sha256'] == sha
+        assert second.user == 'bob'
+
+    def test_owner_records_are_replaced(self, db_app, tmp_path):
+        """Un enregistrement par (utilisateur, nom), remplacé à chaque upload."""
+        store = UploadStore(str(tmp_path))
+        bodies = (BODY, BODY + b'2024-01-03,3.5,30\n')
+        for user, body in zip(('alice', 'bob'), bodies):
+            src = tmp_path / 'incoming.csv'
+            src.write_bytes(body)
+            sha = hashlib.sha256(body).hexdigest()
+            path = store.link('a.csv', store.ingest(str(src), sha, 'csv'))
+            accept_upload(store, path, pd.read_csv(path), sha256=sha, user=user)
+
+        alice, bob = DataFile.get_by_filename('a.csv', 'alice'), DataFile.get_by_filename('a.csv', 'bob')
+        assert alice.id != bob.id
+        assert alice.metadata_dict()['sha256'] == hashlib.sha256(BODY).hexdigest()
+        assert DataFile.get_by_filename('a.csv').id == bob.id
+
+        # Nouvel upload d'alice : aucune clé de l'ancien contenu n'est conservée
+        DataFile.save_metadata('a.csv', {'sha256': 'autre'}, user='alice')
+        assert DataFile.get_by_filename('a.csv', 'alice').metadata_dict() == {'sha256': 'autre'}
+        assert DataFile.query.count() == 2
+
+    def test_relinked_name_ignores_old_metadata(self, db_app, tmp_path):
+        """Les métadonnées d'un autre contenu ne sont pas relues pour un nom réassocié."""
+        store = UploadStore(str(tmp_path))
+        src = tmp_path / 'incoming.csv'
+        src.write_bytes(BODY)
+        sha = hashlib.sha256(BODY).hexdigest()
+        path = store.link('a.csv', store.ingest(str(src), sha, 'csv'))
+        accept_upload(store, path, pd.read_csv(path), sha256=sha)
+        assert load_recorded_metadata(path)['sha256'] == sha
+
+        other = BODY.replace(b'1.5', b'9.5')
+        src.write_bytes(other)
+        other_sha = hashlib.sha256(other).hexdigest()
+        other_object = store.ingest(str(src), other_sha, 'csv')
+        # Même taille et même date : seule l'empreinte les distingue
+        os.utime(other_object, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns))
+        store.link('a.csv', other_object)
+        assert load_recorded_metadata(path) is None
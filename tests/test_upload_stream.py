@@ -0,0 +1,258 @@
+"""
+Tests pour l'upload par morceaux.
+"""
+import hashlib
+import os
+import socket
+import struct
+import threading
+import time
+from io import BytesIO
+import pytest
+from app import utils as _utils
+from app.services.columnar_store import columnar_path
+from app.services.upload_stream import ChunkedUploads, UploadError
+
+
+class FakeClamd:
+    """Serveur clamd minimal : INSTREAM, signature détectée si le flux contient EICAR."""
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        self.received = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _recv_exact(self, conn, size):
+        data = b''
+        while len(data) < size:
+            block = conn.recv(size - len(data))
+            if not block:
+                raise ConnectionError
+            data += block
+        return data
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                assert self._recv_exact(conn, 10) == b'zINSTREAM\0'
+                content = b''
+                while True:
+                    (size,) = struct.unpack('!L', self._recv_exact(conn, 4))
+                    if size == 0:
+                        break
+                    content += self._recv_exact(conn, size)
+                    self.received.append(len(content))
+                reply = b'stream: Eicar-Test-Signature FOUND\0' if b'EICAR' in content else b'stream: OK\0'
+                conn.sendall(reply)
+            except (ConnectionError, AssertionError):
+                pass
+
+    def close(self):
+        self.server.close()
+
+
+@pytest.fixture
+def clamd(monkeypatch):
+    server = FakeClamd()
+    monkeypatch.setenv('CLAMAV_HOST', '127.0.0.1')
+    monkeypatch.setenv('CLAMAV_PORT', str(server.port))
+    yield server
+    server.close()
+
+
+class TestChunkedUploads:
+    """Réception, reprise et contrôles."""
+
+    def test_chunks_are_hashed_while_written(self, tmp_path):
+        uploads = ChunkedUploads(str(tmp_path), scan=False)
+        content = b'a,b\n' + b'1,2\n' * 1000
+        upload_id = uploads.start('data.csv', len(content))['upload_id']
+
+        offset = 0
+        for start in range(0, len(content), 1500):
+            offset = uploads.append(upload_id, offset, BytesIO(content[start:start + 1500]))
+        assert uploads.status(upload_id)['offset'] == len(content)
+
+        info = uploads.complete(upload_id, hashlib.sha256(content).hexdigest())
+        assert info['sha256'] == hashlib.sha256(content).hexdigest()
+        with open(info['path'], 'rb') as fh:
+            assert fh.read() == content
+
+    def test_resume_and_other_process(self, tmp_path):
+        """Un offset erroné renvoie la position attendue ; un autre processus reprend l'upload."""
+        content = b'x' * 5000
+        first = ChunkedUploads(str(tmp_path), scan=False)
+        upload_id = first.start('data.csv')['upload_id']
+        first.append(upload_id, 0, BytesIO(content[:2000]))
+
+        with pytest.raises(UploadError) as exc_info:
+            first.append(upload_id, 0, BytesIO(content[:2000]))
+        assert (exc_info.value.status, exc_info.value.offset) == (409, 2000)
+
+        other = ChunkedUploads(str(tmp_path), scan=False)
+        other.append(upload_id, 2000, BytesIO(content[2000:]))
+        assert other.complete(upload_id)['sha256'] == hashlib.sha256(content).hexdigest()
+
+    def test_limits(self, tmp_path):
+        uploads = ChunkedUploads(str(tmp_path), max_size=100, scan=False)
+        with pytest.raises(UploadError) as exc_info:
+            uploads.start('data.csv', 1000)
+        assert exc_info.value.status == 413
+
+        upload_id = uploads.start('data.csv')['upload_id']
+        uploads.append(upload_id, 0, BytesIO(b'a' * 60))
+        with pytest.raises(UploadError):
+            uploads.append(upload_id, 60, BytesIO(b'a' * 60))
+        # Le morceau refusé n'a rien laissé sur disque
+        assert uploads.status(upload_id)['offset'] == 60
+
+        with pytest.raises(UploadError) as exc_info:
+            uploads.status('inconnu')
+        assert exc_info.value.status == 404
+
+    def test_gc(self, tmp_path):
+        uploads = ChunkedUploads(str(tmp_path), ttl=60, scan=False)
+        upload_id = uploads.start('data.csv')['upload_id']
+        assert uploads.gc(now=time.time() + 3600) == 2
+        with pytest.raises(UploadError):
+            uploads.status(upload_id)
+
+    def test_gc_releases_states(self, tmp_path, clamd):
+        """L'état en mémoire et la connexion ClamAV des uploads expirés sont libérés."""
+        uploads = ChunkedUploads(str(tmp_path), ttl=60)
+        upload_id = uploads.start('data.csv')['upload_id']
+        uploads.append(upload_id, 0, BytesIO(b'a,b\n1,2\n'))
+        scanner = uploads._states[upload_id].scanner
+        assert scanner is not None
+
+        # Upload terminé par un autre processus : l'état local est aussi libéré
+        other_id = uploads.start('data.csv')['upload_id']
+        uploads.append(other_id, 0, BytesIO(b'a,b\n'))
+        ChunkedUploads(str(tmp_path)).discard(other_id)
+
+        uploads.gc(now=time.time() + 3600)
+        assert uploads._states == {}
+        assert scanner._sock is None
+
+
+class TestStreamingScan:
+    """Analyse ClamAV pendant la réception."""
+
+    def test_bytes_are_scanned_during_upload(self, tmp_path, clamd):
+        uploads = ChunkedUploads(str(tmp_path))
+        upload_id = uploads.start('data.csv')['upload_id']
+        uploads.append(upload_id, 0, BytesIO(b'a,b\n1,2\n'))
+        uploads.append(upload_id, 8, BytesIO(b'3,4\n'))
+        deadline = time.time() + 5
+        while not clamd.received and time.time() < deadline:
+            time.sleep(0.01)
+        # Octets transmis avant la fin de l'upload
+        assert clamd.received
+
+        info = uploads.complete(upload_id)
+        assert (info['clean'], info['av_status']) == (True, 'scan-ok')
+
+    def test_infected_file(self, tmp_path, clamd):
+        uploads = ChunkedUploads(str(tmp_path))
+        upload_id = uploads.start('data.csv')['upload_id']
+        uploads.append(upload_id, 0, BytesIO(b'a,b\nEICAR,1\n'))
+        info = uploads.complete(upload_id)
+        assert info['clean'] is False
+        assert 'FOUND' in info['av_status']
+
+    def test_other_process_scans_from_disk(self, tmp_path, clamd):
+        first = ChunkedUploads(str(tmp_path))
+        upload_id = first.start('data.csv')['upload_id']
+        first.append(upload_id, 0, BytesIO(b'a,b\nEIC'))
+        other = ChunkedUploads(str(tmp_path))
+        other.append(upload_id, 7, BytesIO(b'AR,1\n'))
+        assert other.complete(upload_id)['clean'] is False
+
+    def test_clamav_unavailable(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('CLAMAV_HOST', '127.0.0.1')
+        monkeypatch.setenv('CLAMAV_PORT', '1')
+        uploads = ChunkedUploads(str(tmp_path))
+        upload_id = uploads.start('data.csv')['upload_id']
+        uploads.append(upload_id, 0, BytesIO(b'a,b\n1,2\n'))
+        assert uploads.complete(upload_id)['av_status'] == 'clamav-unavailable'
+
+
+class TestChunkedUploadRoutes:
+    """Endpoints /upload/chunked."""
+
+    def _upload(self, client, content, filename='ticks.csv', chunk=4096):
+        start = client.post('/upload/chunked', json={'filename': filename, 'size': len(content)})
+        assert start.status_code == 201
+        session = start.get_json()
+        for offset in range(0, len(content), chunk):
+            response = client.put(f"{session['upload_url']}?offset={offset}", data=content[offset:offset + chunk])
+            assert response.status_code == 200, response.get_json()
+        return client.post(session['complete_url'], json={'sha256': hashlib.sha256(content).hexdigest()})
+
+    def test_upload_preview_and_conversion(self, app, client):
+        app.config.update(UPLOAD_AV_SCAN=False, UPLOAD_PREVIEW_ROWS=10)
+        content = b'Date,Close,Volume\n' + b''.join(
+            f'2024-01-{i % 28 + 1:02d},{100 + i * 0.5},{i}\n'.encode() for i in range(2000))
+        response = self._upload(client, content)
+        assert response.status_code == 200, response.get_json()
+        payload = response.get_json()
+        assert payload['columns'] == ['Date', 'Close', 'Volume']
+        assert len(payload['preview']) == 5
+        assert payload['sha256'] == hashlib.sha256(content).hexdigest()
+
+        jobid = payload['conversion']['jobid']
+        deadline = time.time() + 30
+        job = _utils.read_job(jobid)
+        while job['status'] == 'pending' and time.time() < deadline:
+            time.sleep(0.05)
+            job = _utils.read_job(jobid)
+        _utils.delete_job(jobid)
+        assert job['status'] == 'done', job
+        assert job['result']['rows'] == 2000
+
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'ticks.csv')
+        with open(path, 'rb') as fh:
+            assert fh.read() == content
+        assert os.path.exists(columnar_path(path))
+        with client.session_transaction() as sess:
+            assert sess['current_file'] == 'ticks.csv'
+
+    def test_rejections(self, app, client):
+        app.config['UPLOAD_AV_SCAN'] = False
+        assert client.post('/upload/chunked', json={'filename': 'x.exe'}).status_code == 400
+
+        start = client.post('/upload/chunked', json={'filename': 'data.csv'}).get_json()
+        client.put(f"{start['upload_url']}?offset=0", data=b'a,b\n1,2\n')
+        response = client.put(f"{start['upload_url']}?offset=0", data=b'a,b\n1,2\n')
+        assert response.status_code == 409
+        assert response.get_json()['offset'] == 8
+
+        response = client.post(start['complete_url'], json={'sha256': '0' * 64})
+        assert response.status_code == 400
+
+        binary = client.post('/upload/chunked', json={'filename': 'data.csv'}).get_json()
+        client.put(f"{binary['upload_url']}?offset=0", data=b'\x00\x01binary')
+        assert client.post(binary['complete_url']).status_code == 400
+        assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], 'data.csv'))
+
+    def test_identical_content_is_not_converted_again(self, app, client):
+        app.config['UPLOAD_AV_SCAN'] = False
+        content = b'Date,Close\n2024-01-01,1.5\n2024-01-02,2.5\n'
+        client.post('/upload_file', data={'data_file': (BytesIO(content), 'first.csv')},
+                    content_type='multipart/form-data')
+        payload = self._upload(client, content, filename='second.csv').get_json()
+        assert payload['deduplicated'] is True
+        assert payload['conversion'] is None
+        folder = app.config['UPLOAD_FOLDER']
+        assert os.path.realpath(os.path.join(folder, 'first.csv')) == os.path.realpath(os.path.join(folder, 'second.csv'))
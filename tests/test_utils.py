@@ -1,6 +1,9 @@
 """
 Tests unitaires pour les fonctions utilitaires.
 """
+import os
+import subprocess
+import sys
 import pytest
 import pandas as pd
 import numpy as np
@@ -134,3 +137,19 @@ class TestPrepareDataForML:
         assert len(feature_cols) > 0
         assert len(X) == len(y)
 
+
+
+class TestImportWithoutFlaskConfig:
+    """Les services s'importent hors de Flask (front Streamlit)."""
+
+    def test_services_import_without_production_env(self):
+        """Sans SECRET_KEY ni DATABASE_URL, importer app.services ne charge pas la configuration."""
+        env = {k: v for k, v in os.environ.items()
+               if k not in ('SECRET_KEY', 'DATABASE_URL', 'SQLALCHEMY_DATABASE_URI', 'FLASK_ENV', 'APP_CONFIG')}
+        code = ("import sys, app.services.file_format, app.services.dataset_profile, "
+                "app.services.frame_compaction, app.services.forecast_engine, app.services.model_registry; "
+                "assert 'app.config' not in sys.modules")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, env=env,
+                                capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stderr